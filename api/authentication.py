@@ -12,14 +12,25 @@ The token_secret is the HMAC key (stored encrypted at rest).
 Replay protection:
   - Timestamp must be within ±5 minutes of server time.
   - Nonce must not have been used before within that window (tracked in UsedNonce).
+
+Cost per request: a resolved token and its decrypted secret are cached
+in-process for _CREDENTIAL_TTL seconds, and nonces seen by this process are
+kept in memory for the replay window, so a request from a known client
+costs only the UsedNonce insert.  Revoking a token, or editing or deleting
+its user, calls forget_credentials(), which drops this process's cache and
+bumps a version stamp (settings.CREDENTIALS_STAMP, see webapp.stamp) that
+other workers check before using theirs.  That insert, on the (token_id, nonce) unique
+constraint, stays the guard against a replay sent to another worker.  Old
+UsedNonce rows are removed by prune_used_nonces(), a scheduler job.
 """
 from __future__ import annotations
 
 import hashlib
 import hmac
 import re
+import threading
 import time
-from typing import Optional
+from typing import Iterable, Optional
 
 from django.utils import timezone
 from rest_framework.authentication import BaseAuthentication
@@ -35,6 +46,49 @@ _HEADER_RE = re.compile(
     re.IGNORECASE,
 )
 
+# A request is accepted while its timestamp is within the tolerance either
+# side of server time, so a nonce must be remembered for twice that.
+NONCE_WINDOW = 2 * _TIMESTAMP_TOLERANCE
+_CREDENTIAL_TTL = 30  # seconds
+
+_lock = threading.Lock()
+# token_id -> (expires at, APIToken with user, secret bytes)
+_credentials: dict[str, tuple] = {}
+# The credentials stamp when _credentials was last valid.
+_credentials_stamp: Optional[tuple] = None
+# (token_id, nonce) -> monotonic time first seen; insertion-ordered, so the
+# oldest entries are at the front.
+_seen_nonces: dict[tuple, float] = {}
+
+
+def _stamp_path() -> str:
+    from django.conf import settings
+    return str(settings.CREDENTIALS_STAMP)
+
+
+def forget_credentials(token_ids: Optional[Iterable[str]] = None) -> None:
+    """Drop cached credentials for *token_ids*, or all of them.
+
+    Other workers drop all of theirs once the current transaction commits.
+    """
+    from django.db import transaction
+    from webapp.stamp import bump_stamp
+    with _lock:
+        if token_ids is None:
+            _credentials.clear()
+        else:
+            for token_id in token_ids:
+                _credentials.pop(token_id, None)
+    transaction.on_commit(lambda: bump_stamp(_stamp_path()))
+
+
+def prune_used_nonces() -> int:
+    """Delete UsedNonce rows older than the replay window; returns the count."""
+    from webapp.models import UsedNonce
+    cutoff = timezone.now() - timezone.timedelta(seconds=NONCE_WINDOW)
+    deleted, _ = UsedNonce.objects.filter(used_at__lt=cutoff).delete()
+    return deleted
+
 
 class APITokenAuthentication(BaseAuthentication):
     """Authenticate requests using HMAC-SHA256 signed Authorization headers."""
@@ -57,9 +111,9 @@ class APITokenAuthentication(BaseAuthentication):
         signature = m.group('signature')
 
         self._check_timestamp(timestamp)
-        token = self._get_token(token_id)
+        token, secret = self._get_credential(token_id)
         self._check_nonce(token_id, nonce)
-        self._verify_signature(request, token, timestamp, nonce, signature)
+        self._verify_signature(request, secret, timestamp, nonce, signature)
         self._record_nonce(token_id, nonce)
 
         if not token.user.is_active:
@@ -82,21 +136,45 @@ class APITokenAuthentication(BaseAuthentication):
                 f'Request timestamp is too far from server time ({int(delta)}s drift, max {_TIMESTAMP_TOLERANCE}s).'
             )
 
-    def _get_token(self, token_id: str):
+    def _get_credential(self, token_id: str) -> tuple:
+        """(token, secret bytes) for *token_id*, from the cache when fresh."""
+        global _credentials_stamp
         from webapp.models import APIToken
+        from webapp.stamp import read_stamp
+        # Read the stamp before the token: a change landing in between
+        # leaves the entry one version behind, so the next request drops it.
+        stamp = read_stamp(_stamp_path())
+        if stamp != _credentials_stamp:
+            with _lock:
+                _credentials.clear()
+                _credentials_stamp = stamp
+        now = time.monotonic()
+        cached = _credentials.get(token_id)
+        if cached is not None and cached[0] > now:
+            return cached[1], cached[2]
         try:
-            return APIToken.objects.select_related('user').get(token_id=token_id)
+            token = APIToken.objects.select_related('user').get(token_id=token_id)
         except APIToken.DoesNotExist:
             raise AuthenticationFailed('Invalid or revoked token.')
+        secret = token.decrypted_secret.encode()
+        with _lock:
+            _credentials[token_id] = (now + _CREDENTIAL_TTL, token, secret)
+        return token, secret
 
     def _check_nonce(self, token_id: str, nonce: str) -> None:
-        # Intentionally left as a pre-flight check for the common (non-replay)
-        # path. The definitive replay guard is _record_nonce, which uses an
+        # Pre-flight check against the nonces this process has seen, without
+        # a query. The definitive replay guard is _record_nonce, which uses an
         # atomic insert and catches IntegrityError on the unique_together
-        # constraint. A race between two identical requests reaching this
-        # point simultaneously will be resolved safely there.
-        from webapp.models import UsedNonce
-        if UsedNonce.objects.filter(token_id=token_id, nonce=nonce).exists():
+        # constraint - that also catches a nonce first used on another worker.
+        now = time.monotonic()
+        with _lock:
+            while _seen_nonces:
+                oldest = next(iter(_seen_nonces))
+                if _seen_nonces[oldest] > now - NONCE_WINDOW:
+                    break
+                del _seen_nonces[oldest]
+            seen = (token_id, nonce) in _seen_nonces
+        if seen:
             raise AuthenticationFailed('Nonce has already been used — possible replay attack.')
 
     def _record_nonce(self, token_id: str, nonce: str) -> None:
@@ -111,11 +189,10 @@ class APITokenAuthentication(BaseAuthentication):
         except IntegrityError:
             # Concurrent request with the same nonce lost the race — treat as replay.
             raise AuthenticationFailed('Nonce has already been used — possible replay attack.')
-        # Prune nonces older than the timestamp window to keep the table small.
-        cutoff = timezone.now() - timezone.timedelta(seconds=_TIMESTAMP_TOLERANCE)
-        UsedNonce.objects.filter(token_id=token_id, used_at__lt=cutoff).delete()
+        with _lock:
+            _seen_nonces[(token_id, nonce)] = time.monotonic()
 
-    def _verify_signature(self, request, token, timestamp: int, nonce: str, signature: str) -> None:
+    def _verify_signature(self, request, secret_bytes: bytes, timestamp: int, nonce: str, signature: str) -> None:
         body  = request.body  # bytes
         body_hash = hashlib.sha256(body).hexdigest()
         canonical = '\n'.join([
@@ -127,7 +204,6 @@ class APITokenAuthentication(BaseAuthentication):
             body_hash,
         ])
 
-        secret_bytes = token.decrypted_secret.encode()
         expected = hmac.new(secret_bytes, canonical.encode(), hashlib.sha256).hexdigest()
         try:
             if not hmac.compare_digest(expected, signature.lower()):
@@ -6,7 +6,7 @@ from webapp.models import Run, StageExecution, LogEntry, RecipeResult, Task
 class StageExecutionSerializer(serializers.ModelSerializer):
     class Meta:
         model = StageExecution
-        fields = ['name', 'status', 'order', 'started_at', 'completed_at']
+        fields = ['name', 'status', 'order', 'started_at', 'completed_at', 'resource_usage']
 
 
 class LogEntrySerializer(serializers.ModelSerializer):
@@ -34,21 +34,50 @@ class RunSerializer(serializers.ModelSerializer):
         return None
 
 
+class RunListSerializer(RunSerializer):
+    """RunSerializer that can leave fields out (``fields=['id', 'status']``)."""
+
+    # Columns each field reads, for QuerySet.only().
+    COLUMNS = {
+        'id': ('id',),
+        'status': ('status',),
+        'triggered_by': ('triggered_by',),
+        'started_at': ('started_at',),
+        'completed_at': ('completed_at',),
+        'duration_seconds': ('started_at', 'completed_at'),
+        'config_snapshot': ('config_snapshot',),
+    }
+
+    class Meta(RunSerializer.Meta):
+        fields = RunSerializer.Meta.fields + ['config_snapshot']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 class RunDetailSerializer(RunSerializer):
     stages = StageExecutionSerializer(source='stage_executions', many=True)
-    logs = LogEntrySerializer(source='log_entries', many=True)
+    logs = serializers.SerializerMethodField()
     results = RecipeResultSerializer(source='recipe_results', many=True)
 
     class Meta(RunSerializer.Meta):
         fields = RunSerializer.Meta.fields + ['config_snapshot', 'stages', 'logs', 'results']
 
+    def get_logs(self, obj):
+        # Finished runs keep their lines in a RunLogArchive, not LogEntry rows.
+        from webapp.log_archive import run_log_entries
+        return LogEntrySerializer(run_log_entries(obj.id), many=True).data
+
 
 class TaskSerializer(serializers.ModelSerializer):
     run_uuid = serializers.SerializerMethodField()
 
     class Meta:
         model = Task
-        fields = ['id', 'task_type', 'status', 'run_uuid', 'created_at', 'completed_at', 'error']
+        fields = ['id', 'task_type', 'status', 'run_uuid', 'created_at', 'completed_at', 'error', 'progress']
 
     def get_run_uuid(self, obj):
         return str(obj.run_id) if obj.run_id else None
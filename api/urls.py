@@ -10,5 +10,8 @@ urlpatterns = [
     path('tasks/trigger_db_cleanup/', tasks.TriggerDbCleanupView.as_view(), name='api-trigger-cleanup'),
     path('tasks/get_task_status/', tasks.GetTaskStatusView.as_view(), name='api-task-status'),
     path('history/get_run_data/', history.GetRunDataView.as_view(), name='api-run-data'),
+    path('history/get_run_logs/', history.GetRunLogsView.as_view(), name='api-run-logs'),
     path('history/list_runs/', history.ListRunsView.as_view(), name='api-list-runs'),
+    path('history/run_stats/', history.RunStatsView.as_view(), name='api-run-stats'),
+    path('history/recipe_history/', history.RecipeHistoryView.as_view(), name='api-recipe-history'),
 ]
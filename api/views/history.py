@@ -1,40 +1,174 @@
-from datetime import date
+import base64
+import binascii
+import json
+import uuid
+from datetime import date, datetime
 
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from api.permissions import CanViewRuns
 
+# Log lines per get_run_logs request when no limit is given, and the most
+# one request may ask for.
+_LOG_EXPORT_DEFAULT = 10_000
+_LOG_EXPORT_MAX = 100_000
+# Lines encoded per chunk written to the client.
+_LOG_EXPORT_CHUNK = 500
+# Most runs one list_runs page may ask for.
+_LIST_RUNS_MAX = 1000
+# Longest window run_stats reports on.
+_RUN_STATS_MAX_DAYS = 3660
+# Most events one recipe_history request may ask for.
+_RECIPE_HISTORY_MAX = 1000
+
+
+def _get_run(uuid_val):
+    from django.core.exceptions import ValidationError as DjangoValidationError
+    from webapp.models import Run
+    try:
+        return Run.objects.get(id=uuid_val)
+    except (Run.DoesNotExist, ValueError, DjangoValidationError):
+        return None
+
 
 class GetRunDataView(APIView):
     permission_classes = [CanViewRuns]
     def get(self, request):
-        from webapp.models import Run
         from api.serializers import RunDetailSerializer
 
         uuid_val = request.query_params.get('uuid')
         if not uuid_val:
             return Response({'error': 'uuid parameter is required'}, status=400)
 
-        try:
-            run = Run.objects.get(id=uuid_val)
-        except Exception as exc:
-            from django.core.exceptions import ValidationError as DjangoValidationError
-            if not isinstance(exc, (Run.DoesNotExist, ValueError, DjangoValidationError)):
-                raise
+        run = _get_run(uuid_val)
+        if run is None:
             return Response({'error': 'Run not found'}, status=404)
 
         return Response(RunDetailSerializer(run).data)
 
 
+def _ndjson_chunks(entries, limit: int):
+    """Encode up to *limit* log entries as NDJSON, a few hundred lines per chunk."""
+    lines = []
+    for count, entry in enumerate(entries, 1):
+        lines.append(json.dumps({
+            'id': entry.id,
+            'timestamp': entry.timestamp.isoformat(),
+            'level': entry.level,
+            'stage_name': entry.stage_name,
+            'message': entry.message,
+        }, ensure_ascii=False))
+        if len(lines) >= _LOG_EXPORT_CHUNK:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+        if count >= limit:
+            break
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+async def _drain_in_thread(chunks):
+    """Async-iterate a synchronous generator one chunk at a time.
+
+    Under ASGI, Django 4.2 turns a synchronous streaming body into a list
+    before sending any of it; pulling each chunk through sync_to_async keeps
+    the database cursor open on one thread and the response streaming.
+    """
+    from asgiref.sync import sync_to_async
+    pull = sync_to_async(lambda: next(chunks, None), thread_sensitive=True)
+    while True:
+        chunk = await pull()
+        if chunk is None:
+            break
+        yield chunk
+
+
+class GetRunLogsView(APIView):
+    """A run's log lines as NDJSON, streamed from a database cursor.
+
+    Lines come in id order.  ``after_id`` skips lines up to and including
+    that id, so a client pages - or tails a live run - by passing the last
+    id it received; a response with fewer than ``limit`` lines has reached
+    the end of the log for now.
+    """
+    permission_classes = [CanViewRuns]
+
+    def get(self, request):
+        from django.core.handlers.asgi import ASGIRequest
+        from django.http import StreamingHttpResponse
+        from webapp.log_archive import iter_run_log_entries
+        from webapp.views.runs import _AsyncStreamingHttpResponse
+
+        uuid_val = request.query_params.get('uuid')
+        if not uuid_val:
+            return Response({'error': 'uuid parameter is required'}, status=400)
+        try:
+            after_id = int(request.query_params.get('after_id', 0))
+            limit = int(request.query_params.get('limit', _LOG_EXPORT_DEFAULT))
+        except ValueError:
+            return Response({'error': 'after_id and limit must be integers'}, status=400)
+        if after_id < 0 or not 1 <= limit <= _LOG_EXPORT_MAX:
+            return Response(
+                {'error': f'after_id must be >= 0 and limit between 1 and {_LOG_EXPORT_MAX}'},
+                status=400,
+            )
+        # stage= (empty) selects the lines logged outside any stage.
+        stage = request.query_params.get('stage')
+
+        run = _get_run(uuid_val)
+        if run is None:
+            return Response({'error': 'Run not found'}, status=404)
+
+        chunks = _ndjson_chunks(iter_run_log_entries(run.id, stage=stage, after_id=after_id), limit)
+        if isinstance(request._request, ASGIRequest):
+            response = _AsyncStreamingHttpResponse(_drain_in_thread(chunks),
+                                                   content_type='application/x-ndjson')
+        else:
+            response = StreamingHttpResponse(chunks, content_type='application/x-ndjson')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+def _encode_cursor(run) -> str:
+    raw = json.dumps([run.started_at.isoformat(), str(run.id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(value: str):
+    """(started_at, id) from a list_runs cursor; ValueError when it is not one."""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        started, run_id = json.loads(raw)
+        return datetime.fromisoformat(started), uuid.UUID(run_id)
+    except (TypeError, ValueError, binascii.Error) as exc:
+        raise ValueError(value) from exc
+
+
+def _csv_param(request, name: str) -> list[str]:
+    value = request.query_params.get(name, '')
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
 class ListRunsView(APIView):
+    """Runs, newest first.
+
+    Without ``limit`` every matching run is returned.  With it, at most
+    that many are, and when more remain the response carries an
+    ``X-Next-Cursor`` header (and a ``Link: rel="next"``); passing it back
+    as ``cursor`` continues after the last run returned.  The cursor is the
+    last run's (started_at, id), so pages stay stable while new runs are
+    added.
+    """
     permission_classes = [CanViewRuns]
 
     def get(self, request):
+        from django.db.models import Q
         from webapp.models import Run
-        from api.serializers import RunSerializer
+        from api.serializers import RunListSerializer, RunSerializer
 
-        qs = Run.objects.order_by('-started_at')
+        qs = Run.objects.order_by('-started_at', '-id')
 
         start_str = request.query_params.get('start_date')
         end_str = request.query_params.get('end_date')
@@ -59,4 +193,118 @@ class ListRunsView(APIView):
         elif end:
             qs = qs.filter(started_at__date__lte=end)
 
-        return Response(RunSerializer(qs, many=True).data)
+        statuses = _csv_param(request, 'status')
+        unknown = set(statuses) - {value for value, _ in Run.STATUS_CHOICES}
+        if unknown:
+            return Response({'error': f'Invalid status "{sorted(unknown)[0]}".'}, status=400)
+        if statuses:
+            qs = qs.filter(status__in=statuses)
+        triggered_by = _csv_param(request, 'triggered_by')
+        if triggered_by:
+            qs = qs.filter(triggered_by__in=triggered_by)
+
+        fields = _csv_param(request, 'fields') or RunSerializer.Meta.fields
+        unknown = [f for f in fields if f not in RunListSerializer.COLUMNS]
+        if unknown:
+            return Response({'error': f'Unknown field "{unknown[0]}".'}, status=400)
+        # started_at and id are always loaded: the cursor is built from them.
+        columns = {'id', 'started_at'}.union(*(RunListSerializer.COLUMNS[f] for f in fields))
+        qs = qs.only(*columns)
+
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                after_started, after_id = _decode_cursor(cursor)
+            except ValueError:
+                return Response({'error': 'Invalid cursor.'}, status=400)
+            qs = qs.filter(
+                Q(started_at__lt=after_started) | Q(started_at=after_started, id__lt=after_id)
+            )
+
+        limit_str = request.query_params.get('limit')
+        if limit_str is None:
+            return Response(RunListSerializer(qs, many=True, fields=fields).data)
+        try:
+            limit = int(limit_str)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= _LIST_RUNS_MAX:
+            return Response(
+                {'error': f'limit must be between 1 and {_LIST_RUNS_MAX}.'}, status=400
+            )
+
+        runs = list(qs[:limit + 1])
+        response = Response(RunListSerializer(runs[:limit], many=True, fields=fields).data)
+        if len(runs) > limit:
+            next_cursor = _encode_cursor(runs[limit - 1])
+            params = request.query_params.copy()
+            params['cursor'] = next_cursor
+            response['X-Next-Cursor'] = next_cursor
+            response['Link'] = f'<{request.build_absolute_uri(request.path)}?{params.urlencode()}>; rel="next"'
+        return response
+
+
+class RunStatsView(APIView):
+    """Daily run counts, recipe results and stage timings from RunDailyStats."""
+    permission_classes = [CanViewRuns]
+
+    def get(self, request):
+        from webapp.run_stats import daily, day_dict, summarize
+
+        days_str = request.query_params.get('days', '30')
+        try:
+            days = int(days_str)
+        except ValueError:
+            days = 0
+        if not 1 <= days <= _RUN_STATS_MAX_DAYS:
+            return Response(
+                {'error': f'days must be between 1 and {_RUN_STATS_MAX_DAYS}.'}, status=400
+            )
+
+        rows = daily(days)
+        return Response({
+            'days': days,
+            'totals': summarize(rows),
+            'daily': [day_dict(row) for row in rows],
+        })
+
+
+class RecipeHistoryView(APIView):
+    """One recipe's imports, downloads, failures etc., newest first.
+
+    ``?name=Firefox&event_type=munki_import&limit=1`` is "when did Firefox
+    last import, and which version".
+    """
+    permission_classes = [CanViewRuns]
+
+    def get(self, request):
+        from webapp.models import RecipeResult
+        from webapp.recipe_events import history
+
+        name = request.query_params.get('name', '').strip()
+        if not name:
+            return Response({'error': 'name parameter is required'}, status=400)
+        event_type = request.query_params.get('event_type') or None
+        if event_type and event_type not in dict(RecipeResult.RESULT_TYPES):
+            return Response({'error': f'Invalid event_type "{event_type}".'}, status=400)
+        try:
+            limit = int(request.query_params.get('limit', 50))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= _RECIPE_HISTORY_MAX:
+            return Response(
+                {'error': f'limit must be between 1 and {_RECIPE_HISTORY_MAX}.'}, status=400
+            )
+
+        return Response({
+            'name': name,
+            'events': [
+                {
+                    'event_type': event.event_type,
+                    'version': event.version,
+                    'run': str(event.run_id),
+                    'timestamp': event.timestamp.isoformat(),
+                }
+                for event in history(name, event_type, limit)
+            ],
+        })
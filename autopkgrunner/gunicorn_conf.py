@@ -12,8 +12,9 @@ process completely thread-free.  This prevents the macOS ObjC fork-safety
 crash that occurs when the master has active threads at fork time.
 
 Scheduler election: whichever worker first acquires the flock on
-BASE_DIR/scheduler.lock runs APScheduler.  The OS releases the lock when
-that worker exits, so gunicorn's replacement worker picks it up automatically.
+BASE_DIR/scheduler.lock runs APScheduler and the recipe watcher.  The OS
+releases the lock when that worker exits, so gunicorn's replacement worker
+picks it up automatically.
 """
 
 
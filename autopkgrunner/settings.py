@@ -88,14 +88,44 @@ TEMPLATES = [{
 
 WSGI_APPLICATION = 'autopkgrunner.wsgi.application'
 
+# webapp.sqlite_backend is Django's SQLite backend with WAL, tuned pragmas
+# and BEGIN IMMEDIATE transactions; the timeout is how long a writer waits
+# for the lock.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'webapp.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
         'OPTIONS': {'timeout': 20},
     }
 }
 
+# Optional: keep run logs (LogEntry) in their own file so log ingestion never
+# locks the main database.  Existing log rows are not moved.
+if os.environ.get('AUTOPKG_LOG_DATABASE', 'false').lower() == 'true':
+    DATABASES['logs'] = {
+        'ENGINE': 'webapp.sqlite_backend',
+        'NAME': BASE_DIR / 'logs.sqlite3',
+        # LogEntry.run refers to runs in the default database.
+        'OPTIONS': {'timeout': 20, 'foreign_keys': False},
+    }
+    DATABASE_ROUTERS = ['webapp.routers.LogDatabaseRouter']
+
+# Identifiers and parents of the recipe files on disk, shared by all workers
+# so a rescan only re-reads changed files (webapp.recipe_files).
+RECIPE_FILE_INDEX = BASE_DIR / 'recipe-files.json'
+
+# Unix sockets through which workers wake each other's run broadcasters
+# (webapp.event_channel).
+RUN_EVENTS_DIR = BASE_DIR / 'run-events'
+
+# Replaced after every Setting write so other workers reload their snapshot
+# (webapp.settings_cache).
+SETTINGS_STAMP = BASE_DIR / 'settings.stamp'
+
+# Replaced when an API token is revoked or its user changes, so other
+# workers drop the credentials they cached (api.authentication).
+CREDENTIALS_STAMP = BASE_DIR / 'credentials.stamp'
+
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.Argon2PasswordHasher',
     'django.contrib.auth.hashers.PBKDF2PasswordHasher',
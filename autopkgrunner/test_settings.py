@@ -15,7 +15,7 @@ from autopkgrunner.settings import *  # noqa: F401, F403, E402
 # Use an in-memory SQLite database for speed.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'webapp.sqlite_backend',
         'NAME': ':memory:',
     }
 }
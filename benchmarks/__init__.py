@@ -0,0 +1 @@
+"""Performance benchmarks.  Run modules directly, e.g. ``python -m benchmarks.run_command``."""
@@ -0,0 +1,236 @@
+"""A stand-in ``autopkg`` executable for benchmarks and tests.
+
+Implements the subcommands the pipeline calls - ``repo-list``,
+``repo-update``, ``verify-trust-info``, ``update-trust-info`` and
+``run ... --report-plist PATH`` - printing output shaped like the real tool
+and writing a report plist modelled on ``sample_data/example_data.plist``.
+Nothing is downloaded or built, so a full pipeline run works on any Linux
+box.
+
+Behaviour is set through environment variables, because the pipeline's own
+argv has to pass through unchanged:
+
+    FAKE_AUTOPKG_LINES          lines printed per recipe by ``run`` (40)
+    FAKE_AUTOPKG_LINE_RATE      lines/second per process; 0 = unthrottled (0)
+    FAKE_AUTOPKG_REPOS          repositories listed by ``repo-list`` (5)
+    FAKE_AUTOPKG_FAIL_EVERY     about one in N recipes fails in ``run``; 0 = none (0)
+    FAKE_AUTOPKG_UNTRUSTED_EVERY  about one in N recipes fails ``verify-trust-info`` (0)
+    FAKE_AUTOPKG_FAIL           comma-separated recipes / repo URLs that always fail
+
+Which recipes fail is decided by a CRC of the name, so a given run list
+fails the same way every time.  ``install()`` writes an executable
+``autopkg`` wrapper that can be used as ``autopkg.bin_path``.
+"""
+from __future__ import annotations
+
+import os
+import plistlib
+import stat
+import sys
+import time
+import zlib
+from pathlib import Path
+
+SAMPLE_REPORT = Path(__file__).resolve().parent.parent / 'sample_data' / 'example_data.plist'
+
+# `autopkg run` exits with this code when any recipe failed.
+RECIPE_FAILED_CODE = 70
+
+
+def install(directory) -> Path:
+    """Write an executable ``autopkg`` wrapper into *directory*; return its path."""
+    path = Path(directory) / 'autopkg'
+    path.write_text(
+        '#!/bin/sh\n'
+        # -S: only the standard library is needed, and skipping site-packages
+        # keeps start-up close to a real autopkg invocation.
+        f'exec "{sys.executable}" -S -u "{Path(__file__).resolve()}" "$@"\n'
+    )
+    path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def repo_urls(count: int) -> list[str]:
+    return [f'https://github.com/autopkg/bench-{i:03d}-recipes' for i in range(count)]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _always_fail() -> set:
+    return {v.strip() for v in os.environ.get('FAKE_AUTOPKG_FAIL', '').split(',') if v.strip()}
+
+
+def _one_in(name: str, every: int) -> bool:
+    return every > 0 and zlib.crc32(name.encode()) % every == 0
+
+
+class _Output:
+    """Writes lines to stdout no faster than FAKE_AUTOPKG_LINE_RATE."""
+
+    def __init__(self):
+        self.rate = _env_int('FAKE_AUTOPKG_LINE_RATE', 0)
+        self.count = 0
+        self.started = time.monotonic()
+
+    def line(self, text: str, stream=None) -> None:
+        (stream or sys.stdout).write(text + '\n')
+        self.count += 1
+        if self.rate:
+            ahead = self.count / self.rate - (time.monotonic() - self.started)
+            if ahead > 0:
+                sys.stdout.flush()
+                time.sleep(ahead)
+
+
+def _section(sample: dict, key: str, rows: list) -> dict:
+    template = sample.get('summary_results', {}).get(key, {})
+    return {
+        'summary_text': template.get('summary_text', ''),
+        'header': list(template.get('header', [])),
+        'data_rows': rows,
+    }
+
+
+def build_report(succeeded: list[str], failed: list[str]) -> dict:
+    """An autopkg report plist for a run where *succeeded* imported new items."""
+    try:
+        with open(SAMPLE_REPORT, 'rb') as f:
+            sample = plistlib.load(f)
+    except (OSError, plistlib.InvalidFileException):
+        sample = {}
+
+    imports, downloads = [], []
+    for recipe in succeeded:
+        name = recipe.split('.')[0]
+        downloads.append({
+            'download_path': f'~/Library/AutoPkg/Cache/local.munki.{name}/downloads/{name}.dmg',
+        })
+        imports.append({
+            'catalogs': 'testing',
+            'name': name,
+            'pkg_repo_path': f'apps/{name}/{name}-1.0.dmg',
+            'pkginfo_path': f'apps/{name}/{name}-1.0.plist',
+            'version': '1.0',
+        })
+    summary = {}
+    if downloads:
+        summary['url_downloader_summary_result'] = _section(
+            sample, 'url_downloader_summary_result', downloads)
+        summary['munki_importer_summary_result'] = _section(
+            sample, 'munki_importer_summary_result', imports)
+    return {
+        'failures': [
+            {'message': f'Error in {r}: Processor: URLDownloader: Error: HTTP 404', 'recipe': r}
+            for r in failed
+        ],
+        'summary_results': summary,
+        'has_summary_results': len(summary),
+        'report_version': sample.get('report_version', 1),
+    }
+
+
+def cmd_run(args: list[str]) -> int:
+    report_path = None
+    recipes = []
+    it = iter(args)
+    for arg in it:
+        if arg == '--report-plist':
+            report_path = next(it, None)
+        elif arg in ('-k', '--key'):
+            next(it, None)
+        elif not arg.startswith('-'):
+            recipes.append(arg)
+
+    out = _Output()
+    lines = max(1, _env_int('FAKE_AUTOPKG_LINES', 40))
+    fail_every = _env_int('FAKE_AUTOPKG_FAIL_EVERY', 0)
+    always_fail = _always_fail()
+    succeeded, failed = [], []
+
+    for recipe in recipes:
+        out.line(f'Processing {recipe}...')
+        for i in range(lines - 2):
+            out.line(f'{recipe}: URLDownloader: step {i} - checked {i * 4096} bytes')
+        if recipe in always_fail or _one_in(recipe, fail_every):
+            failed.append(recipe)
+            out.line(f'Error in {recipe}: Processor: URLDownloader: Error: HTTP 404', sys.stderr)
+        else:
+            succeeded.append(recipe)
+            out.line(f'{recipe}: MunkiImporter: Copied pkginfo to apps/{recipe.split(".")[0]}')
+
+    if failed:
+        out.line('The following recipes failed:')
+        for recipe in failed:
+            out.line(f'    {recipe}')
+    if report_path:
+        with open(report_path, 'wb') as f:
+            plistlib.dump(build_report(succeeded, failed), f)
+    return RECIPE_FAILED_CODE if failed else 0
+
+
+def cmd_repo_list(args: list[str]) -> int:
+    base = Path.home() / 'Library' / 'AutoPkg' / 'RecipeRepos'
+    for url in repo_urls(_env_int('FAKE_AUTOPKG_REPOS', 5)):
+        name = 'com.github.autopkg.' + url.rsplit('/', 1)[1]
+        print(f'{base / name} ({url})')
+    return 0
+
+
+def cmd_repo_update(args: list[str]) -> int:
+    out = _Output()
+    for url in args:
+        out.line(f'Attempting git pull for {url}...')
+        if url in _always_fail():
+            out.line(f'ERROR: could not pull {url}: Could not resolve host', sys.stderr)
+            return 1
+        out.line('Already up to date.')
+    return 0
+
+
+def cmd_verify_trust_info(args: list[str]) -> int:
+    every = _env_int('FAKE_AUTOPKG_UNTRUSTED_EVERY', 0)
+    status = 0
+    for recipe in (a for a in args if not a.startswith('-')):
+        if _one_in(recipe, every):
+            print(f'{recipe}: FAILED', file=sys.stderr)
+            print('    Parent recipe com.github.autopkg.download contents differ', file=sys.stderr)
+            status = 1
+        else:
+            print(f'{recipe}: OK')
+    return status
+
+
+def cmd_update_trust_info(args: list[str]) -> int:
+    for recipe in (a for a in args if not a.startswith('-')):
+        print(f'Wrote updated {recipe}.recipe')
+    return 0
+
+
+COMMANDS = {
+    'run': cmd_run,
+    'repo-list': cmd_repo_list,
+    'repo-update': cmd_repo_update,
+    'verify-trust-info': cmd_verify_trust_info,
+    'update-trust-info': cmd_update_trust_info,
+    'version': lambda args: print('2.7.2') or 0,
+}
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(f'Unknown verb: {argv[0] if argv else ""}', file=sys.stderr)
+        return 1
+    try:
+        return COMMANDS[argv[0]](argv[1:])
+    finally:
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
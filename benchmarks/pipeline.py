@@ -0,0 +1,298 @@
+"""End-to-end pipeline benchmark against a fake ``autopkg``.
+
+Runs the real pipeline - ``webapp.runner._execute_run`` driving
+``Orchestrator.execute`` and every stage - against the stand-in executable
+in ``benchmarks.fake_autopkg`` and a throwaway SQLite database, with a
+local repository so nothing is mounted.  While it runs, a subscriber reads
+the run's SSE broadcaster exactly as ``run_stream`` does.  Reported:
+
+  * wall time of the run and of each stage
+  * log lines persisted, and lines/s
+  * latency percentiles of every INSERT / UPDATE / DELETE the run issued
+  * SSE delivery lag: from a line being logged to a subscriber receiving it
+
+    python -m benchmarks.pipeline                          # 200 recipes x 40 lines
+    python -m benchmarks.pipeline --recipes 500 --line-rate 2000 --shards 4
+    python -m benchmarks.pipeline --fail-every 10 --untrusted-every 20 --json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Make the repository root importable when run as a script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_autopkg  # noqa: E402
+
+_WRITE_VERBS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def percentiles(samples: list[float]) -> dict:
+    """Nearest-rank p50/p95/p99/max of *samples*; empty dict when there are none."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {'p50': rank(50), 'p95': rank(95), 'p99': rank(99), 'max': ordered[-1],
+            'count': len(ordered)}
+
+
+class WriteTimer:
+    """Django execute wrapper timing write statements on every connection."""
+
+    def __init__(self):
+        self.samples: list[float] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip()[:6].upper().startswith(_WRITE_VERBS):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.samples.append(elapsed)
+
+    def _on_connection(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    @contextmanager
+    def installed(self):
+        from django.db import connection
+        from django.db.backends.signals import connection_created
+        # Start from fresh connections so every thread's gets the wrapper.
+        connection.close()
+        connection_created.connect(self._on_connection)
+        try:
+            yield self
+        finally:
+            connection_created.disconnect(self._on_connection)
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+
+class SseSubscriber(threading.Thread):
+    """Consumes a run's broadcaster the way run_stream does, timing log frames."""
+
+    def __init__(self, run_id):
+        super().__init__(daemon=True, name='benchmark-sse')
+        self.run_id = run_id
+        self.lags: list[float] = []
+        self.frames = 0
+
+    def run(self):
+        asyncio.run(self._consume())
+
+    async def _consume(self):
+        from webapp.run_broadcaster import broadcaster_manager
+
+        broadcaster = broadcaster_manager.get(self.run_id)
+        cursor = -1
+        while True:
+            frames, done = broadcaster.events_since(cursor)
+            received = time.time()
+            for frame in frames:
+                cursor += 1
+                self.frames += 1
+                payload = json.loads(frame.split(b'data: ', 1)[1])
+                if payload.get('type') == 'log':
+                    logged = datetime.fromisoformat(payload['timestamp']).timestamp()
+                    self.lags.append(received - logged)
+            if done and not frames:
+                break
+            await broadcaster.wait_for_events(cursor, timeout=15)
+
+
+@contextmanager
+def _environ(values: dict):
+    saved = {k: os.environ.get(k) for k in values}
+    os.environ.update({k: str(v) for k, v in values.items()})
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def configure(workdir: Path, opts) -> list[str]:
+    """Point the Setting store at the fake autopkg under *workdir*; return the run list."""
+    from webapp.models import Setting
+
+    for name in ('cache', 'overrides', 'repo'):
+        (workdir / name).mkdir(parents=True, exist_ok=True)
+    recipes = [f'Bench{i:04d}.munki' for i in range(opts.recipes)] + ['MakeCatalogs.munki']
+    recipe_list = workdir / 'recipe_list.txt'
+    recipe_list.write_text('\n'.join(recipes) + '\n')
+
+    settings = {
+        'autopkg.bin_path':      str(fake_autopkg.install(workdir)),
+        'autopkg.cache_path':    str(workdir / 'cache'),
+        'autopkg.recipe_list':   str(recipe_list),
+        'autopkg.overrides_dir': str(workdir / 'overrides'),
+        'repository.type':       'local',
+        'repository.local_path': str(workdir / 'repo'),
+        'repository.mount_path': str(workdir / 'repo'),
+        # EnvironmentCheck looks for this share among mounted devices.
+        'repository.share':      'autopkg-runner-benchmark',
+        'workflow.update_repos': 'true',
+        'workflow.run_shards':   str(opts.shards),
+        'workflow.trust_workers': str(opts.trust_workers),
+        'workflow.native_trust':  'false',
+        'workflow.repo_update_workers': str(opts.repo_workers),
+        'workflow.repo_freshness_check': 'false',
+        'workflow.repo_fresh_minutes':   '0',
+        'gc.clear_temp': 'false',
+        'gc.clean_repo': 'false',
+    }
+    if opts.batch_rows is not None:
+        settings['logging.db_batch_rows'] = str(opts.batch_rows)
+    if opts.batch_ms is not None:
+        settings['logging.db_batch_ms'] = str(opts.batch_ms)
+    for key, value in settings.items():
+        Setting.set(key, value)
+    return recipes
+
+
+def run_pipeline(opts, workdir: Path) -> dict:
+    """Execute one pipeline run with the current Django database; return the measurements."""
+    from webapp.log_archive import run_log_count
+    from webapp.models import Run, StageExecution, Task
+    from webapp.runner import _execute_run
+
+    recipes = configure(workdir, opts)
+    fail = ','.join(fake_autopkg.repo_urls(opts.repos)[:opts.fail_repos])
+    env = {
+        'FAKE_AUTOPKG_LINES': opts.lines,
+        'FAKE_AUTOPKG_LINE_RATE': opts.line_rate,
+        'FAKE_AUTOPKG_REPOS': opts.repos,
+        'FAKE_AUTOPKG_FAIL_EVERY': opts.fail_every,
+        'FAKE_AUTOPKG_UNTRUSTED_EVERY': opts.untrusted_every,
+        'FAKE_AUTOPKG_FAIL': fail,
+    }
+
+    run = Run.objects.create(status='pending', triggered_by='benchmark', config_snapshot={})
+    task = Task.objects.create(task_type='pipeline_run', status='pending', run=run)
+    subscriber = SseSubscriber(str(run.id))
+    timer = WriteTimer()
+
+    with _environ(env), timer.installed():
+        subscriber.start()
+        started = time.perf_counter()
+        _execute_run(run.id, task.id)
+        wall = time.perf_counter() - started
+        subscriber.join(timeout=60)
+
+    run.refresh_from_db()
+    lines = run_log_count(run.id)
+    stages = [
+        {'name': s.name, 'status': s.status,
+         'seconds': s.duration.total_seconds() if s.duration else None}
+        for s in StageExecution.objects.filter(run=run).order_by('order')
+    ]
+    return {
+        'recipes': len(recipes),
+        'status': run.status,
+        'wall_seconds': wall,
+        'log_lines': lines,
+        'lines_per_second': lines / wall if wall else 0.0,
+        'db_write_seconds': percentiles(timer.samples),
+        'sse_frames': subscriber.frames,
+        'sse_log_frames': len(subscriber.lags),
+        'sse_lag_seconds': percentiles(subscriber.lags),
+        'stages': stages,
+    }
+
+
+def setup_django(db_path: Path) -> None:
+    """Configure Django against a fresh SQLite file at *db_path* and migrate it."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'autopkgrunner.settings')
+    os.environ.setdefault('DJANGO_SECRET_KEY', 'benchmark-not-secret')
+    # Keep WebappConfig.ready() from starting the scheduler.
+    os.environ['AUTOPKG_MODE'] = 'manage'
+
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = str(db_path)
+    if 'logs' in settings.DATABASES:   # AUTOPKG_LOG_DATABASE=true
+        settings.DATABASES['logs']['NAME'] = str(db_path.with_name('logs.sqlite3'))
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def _ms(stats: dict) -> str:
+    if not stats:
+        return 'n/a'
+    return '  '.join(f'{k} {stats[k] * 1000:.1f}' for k in ('p50', 'p95', 'p99', 'max')) + ' ms'
+
+
+def print_report(result: dict, opts) -> None:
+    print(f'{result["recipes"]} recipes x {opts.lines} lines, {opts.repos} repos, '
+          f'shards={opts.shards} trust_workers={opts.trust_workers} '
+          f'repo_workers={opts.repo_workers} line_rate={opts.line_rate or "unthrottled"}')
+    print(f'  run status        {result["status"]}')
+    print(f'  wall time         {result["wall_seconds"]:.2f} s')
+    print(f'  lines persisted   {result["log_lines"]:,} ({result["lines_per_second"]:,.0f}/s)')
+    writes = result['db_write_seconds']
+    print(f'  DB writes         {writes.get("count", 0):,}: {_ms(writes)}')
+    print(f'  SSE log frames    {result["sse_log_frames"]:,}: {_ms(result["sse_lag_seconds"])} lag')
+    for stage in result['stages']:
+        seconds = f'{stage["seconds"]:.2f} s' if stage['seconds'] is not None else '-'
+        print(f'    {stage["name"]:<32} {stage["status"]:<8} {seconds:>9}')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=200, help='recipes in the run list (default: 200)')
+    parser.add_argument('--lines', type=int, default=40, help='output lines per recipe (default: 40)')
+    parser.add_argument('--line-rate', type=int, default=0,
+                        help='lines/s per autopkg process; 0 = unthrottled (default)')
+    parser.add_argument('--repos', type=int, default=10, help='repositories to update (default: 10)')
+    parser.add_argument('--fail-repos', type=int, default=0, help='repositories whose update fails')
+    parser.add_argument('--fail-every', type=int, default=0, help='about one in N recipes fails')
+    parser.add_argument('--untrusted-every', type=int, default=0,
+                        help='about one in N recipes fails trust verification')
+    parser.add_argument('--shards', type=int, default=1, help='workflow.run_shards')
+    parser.add_argument('--trust-workers', type=int, default=1, help='workflow.trust_workers')
+    parser.add_argument('--repo-workers', type=int, default=1, help='workflow.repo_update_workers')
+    parser.add_argument('--batch-rows', type=int, default=None, help='logging.db_batch_rows')
+    parser.add_argument('--batch-ms', type=int, default=None, help='logging.db_batch_ms')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    return parser
+
+
+def main(argv=None):
+    opts = build_parser().parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix='autopkg-bench-') as tmp:
+        workdir = Path(tmp)
+        setup_django(workdir / 'bench.sqlite3')
+        result = run_pipeline(opts, workdir)
+    if opts.json:
+        print(json.dumps({'options': vars(opts), **result}, indent=2))
+    else:
+        print_report(result, opts)
+
+
+if __name__ == '__main__':
+    main()
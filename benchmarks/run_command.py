@@ -0,0 +1,117 @@
+"""Throughput benchmark for libs.run_command.
+
+Pushes a few hundred MB of synthetic output through run_cmd and reports
+MB/s and lines/s, next to the previous select() + readline() text-mode
+reader for comparison.  The child writes a mix of short log lines, long
+lines and carriage-return progress updates to stdout, plus a trickle of
+stderr, so both pipes are multiplexed the way a chatty ``autopkg run`` is.
+
+    python -m benchmarks.run_command               # 300 MB, both readers
+    python -m benchmarks.run_command --mb 50 --reader chunked
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import select
+import subprocess
+import sys
+import time
+
+# Make the repository root importable when run as a script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.run_command import run_cmd  # noqa: E402
+
+_GENERATOR = r'''
+import sys
+mb = float(sys.argv[1])
+lines = []
+for i in range(2000):
+    if i % 50 == 0:
+        lines.append(("Downloading %d%%\r" % (i % 100)) * 8 + "\n")
+    elif i % 97 == 0:
+        lines.append("x" * 4000 + "\n")
+    else:
+        lines.append("Processing com.github.autopkg.recipe-%04d: step %d ok\n" % (i, i % 7))
+block = "".join(lines).encode()
+out, err = sys.stdout.buffer, sys.stderr.buffer
+remaining = int(mb * 1024 * 1024)
+while remaining > 0:
+    chunk = block[:remaining]
+    out.write(chunk)
+    remaining -= len(chunk)
+    err.write(b"WARNING: synthetic stderr line\n")
+out.flush()
+'''
+
+
+class CountingLogger:
+    """Stands in for logbook.Logger; counts what would be logged."""
+
+    def __init__(self):
+        self.lines = 0
+        self.chars = 0
+
+    def info(self, msg):
+        self.lines += 1
+        self.chars += len(msg)
+
+    error = info
+
+
+def readline_run_cmd(command, logger):
+    """The text-mode select() + readline() reader run_cmd used previously."""
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, bufsize=1)
+    open_fds = {proc.stdout, proc.stderr}
+    while open_fds:
+        readable, _, _ = select.select(open_fds, [], [])
+        for fd in readable:
+            line = fd.readline()
+            if line:
+                (logger.info if fd is proc.stdout else logger.error)(line.rstrip())
+            else:
+                open_fds.discard(fd)
+    proc.wait()
+
+
+READERS = {
+    'chunked': run_cmd,
+    'readline': readline_run_cmd,
+}
+
+
+def bench(reader: str, mb: float) -> dict:
+    logger = CountingLogger()
+    command = [sys.executable, '-c', _GENERATOR, str(mb)]
+    started = time.perf_counter()
+    READERS[reader](command, logger)
+    elapsed = time.perf_counter() - started
+    return {
+        'reader': reader,
+        'seconds': elapsed,
+        'mb_per_s': mb / elapsed,
+        'lines': logger.lines,
+        'lines_per_s': logger.lines / elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mb', type=float, default=300, help='MB of stdout to generate (default: 300)')
+    parser.add_argument('--reader', choices=[*READERS, 'both'], default='both')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per reader; best is reported')
+    opts = parser.parse_args(argv)
+
+    readers = list(READERS) if opts.reader == 'both' else [opts.reader]
+    print(f'{"reader":<10} {"seconds":>9} {"MB/s":>9} {"lines":>11} {"lines/s":>11}')
+    for reader in readers:
+        best = min((bench(reader, opts.mb) for _ in range(opts.repeat)),
+                   key=lambda r: r['seconds'])
+        print(f'{best["reader"]:<10} {best["seconds"]:>9.2f} {best["mb_per_s"]:>9.1f} '
+              f'{best["lines"]:>11,} {best["lines_per_s"]:>11,.0f}')
+
+
+if __name__ == '__main__':
+    main()
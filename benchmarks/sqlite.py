@@ -0,0 +1,221 @@
+"""Concurrent read/write benchmark for the SQLite connection profile.
+
+Reproduces what the app does to its database during a run, with plain
+sqlite3 connections on a scratch directory:
+
+  * a log writer inserting batches of log rows in transactions, the way
+    DBLogHandler.flush() does
+  * stage writers doing read-then-write transactions on a status row, the
+    way stage_callback's update_or_create does for overlapping stages
+  * readers issuing page-view queries (run list, run detail, settings)
+
+for each profile:
+
+  legacy    Django's stock SQLite setup: rollback journal, synchronous=FULL,
+            deferred BEGIN, 20 s busy timeout
+  tuned     webapp.sqlite_backend: PRAGMAS plus BEGIN IMMEDIATE
+  split     tuned, with log rows in a separate database file (LogDatabaseRouter)
+
+and reports log rows/s written, transactions that failed with "database is
+locked", and read latency percentiles.
+
+    python -m benchmarks.sqlite
+    python -m benchmarks.sqlite --seconds 20 --readers 8 --profile tuned
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Make the repository root importable when run as a script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.pipeline import percentiles  # noqa: E402
+from webapp.sqlite_backend.base import PRAGMAS  # noqa: E402
+
+PROFILES = ('legacy', 'tuned', 'split')
+
+_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS run (id INTEGER PRIMARY KEY, status TEXT, started_at REAL)',
+    'CREATE TABLE IF NOT EXISTS stage (id INTEGER PRIMARY KEY, run_id INTEGER, name TEXT, '
+    'status TEXT, updated_at REAL)',
+    'CREATE TABLE IF NOT EXISTS setting (key TEXT PRIMARY KEY, value TEXT)',
+]
+_LOG_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS logentry (id INTEGER PRIMARY KEY, run_id INTEGER, '
+    'timestamp REAL, level TEXT, message TEXT, stage_name TEXT)',
+    'CREATE INDEX IF NOT EXISTS logentry_run_ts ON logentry (run_id, timestamp)',
+]
+
+
+class Profile:
+    def __init__(self, name: str, directory: Path):
+        self.name = name
+        self.main = directory / 'db.sqlite3'
+        self.logs = directory / 'logs.sqlite3' if name == 'split' else self.main
+        self.begin = 'BEGIN' if name == 'legacy' else 'BEGIN IMMEDIATE'
+
+    def connect(self, path: Path) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, timeout=20, isolation_level=None, check_same_thread=False)
+        if self.name != 'legacy':
+            for pragma, value in PRAGMAS.items():
+                conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+
+    def create(self, runs: int) -> None:
+        main = self.connect(self.main)
+        for statement in _SCHEMA:
+            main.execute(statement)
+        logs = self.connect(self.logs)
+        for statement in _LOG_SCHEMA:
+            logs.execute(statement)
+        main.execute('BEGIN')
+        main.executemany('INSERT INTO run (id, status, started_at) VALUES (?, ?, ?)',
+                         [(i, 'success', time.time()) for i in range(1, runs + 1)])
+        main.executemany('INSERT INTO stage (run_id, name, status, updated_at) VALUES (?, ?, ?, ?)',
+                         [(i, f'Stage {s}', 'success', time.time())
+                          for i in range(1, runs + 1) for s in range(6)])
+        main.executemany('INSERT OR REPLACE INTO setting VALUES (?, ?)',
+                         [(f'key.{i}', 'value') for i in range(60)])
+        main.execute('COMMIT')
+        main.close()
+        logs.close()
+
+
+class Workload:
+    def __init__(self, profile: Profile, opts):
+        self.profile = profile
+        self.opts = opts
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.log_rows = 0
+        self.stage_updates = 0
+        self.locked = 0
+        self.read_errors = 0
+        self.read_latency: list[float] = []
+
+    def _transaction(self, conn, body) -> bool:
+        try:
+            conn.execute(self.profile.begin)
+            body()
+            conn.execute('COMMIT')
+            return True
+        except sqlite3.OperationalError:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            with self.lock:
+                self.locked += 1
+            return False
+
+    def log_writer(self):
+        conn = self.profile.connect(self.profile.logs)
+        batch = self.opts.batch
+        message = 'Bench0001.munki: URLDownloader: step 12 - checked 49152 bytes ' * 2
+        while not self.stop.is_set():
+            rows = [(1, time.time(), 'INFO', message, 'Run AutoPkg')] * batch
+            if self._transaction(conn, lambda: conn.executemany(
+                    'INSERT INTO logentry (run_id, timestamp, level, message, stage_name) '
+                    'VALUES (?, ?, ?, ?, ?)', rows)):
+                with self.lock:
+                    self.log_rows += batch
+            time.sleep(self.opts.flush_ms / 1000)
+        conn.close()
+
+    def stage_writer(self, index: int):
+        conn = self.profile.connect(self.profile.main)
+        name = f'Stage {index}'
+
+        def update():
+            conn.execute('SELECT id FROM stage WHERE run_id = 1 AND name = ?', (name,)).fetchall()
+            conn.execute('UPDATE stage SET status = ?, updated_at = ? WHERE run_id = 1 AND name = ?',
+                         ('running', time.time(), name))
+
+        while not self.stop.is_set():
+            if self._transaction(conn, update):
+                with self.lock:
+                    self.stage_updates += 1
+            time.sleep(0.005)
+        conn.close()
+
+    def reader(self):
+        main = self.profile.connect(self.profile.main)
+        logs = main if self.profile.logs == self.profile.main else self.profile.connect(self.profile.logs)
+        while not self.stop.is_set():
+            started = time.perf_counter()
+            try:
+                main.execute('SELECT * FROM run ORDER BY started_at DESC LIMIT 25').fetchall()
+                main.execute('SELECT * FROM stage WHERE run_id = 1').fetchall()
+                main.execute('SELECT key, value FROM setting').fetchall()
+                logs.execute('SELECT * FROM logentry WHERE run_id = 1 '
+                             'ORDER BY timestamp DESC LIMIT 200').fetchall()
+            except sqlite3.OperationalError:
+                with self.lock:
+                    self.read_errors += 1
+                continue
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.read_latency.append(elapsed)
+            time.sleep(0.01)
+        main.close()
+        if logs is not main:
+            logs.close()
+
+    def run(self) -> dict:
+        threads = [threading.Thread(target=self.log_writer)]
+        threads += [threading.Thread(target=self.stage_writer, args=(i,))
+                    for i in range(self.opts.stage_writers)]
+        threads += [threading.Thread(target=self.reader) for _ in range(self.opts.readers)]
+        for t in threads:
+            t.start()
+        time.sleep(self.opts.seconds)
+        self.stop.set()
+        for t in threads:
+            t.join()
+        return {
+            'profile': self.profile.name,
+            'log_rows_per_s': self.log_rows / self.opts.seconds,
+            'stage_updates': self.stage_updates,
+            'locked': self.locked,
+            'reads': len(self.read_latency),
+            'read_errors': self.read_errors,
+            'read_seconds': percentiles(self.read_latency),
+        }
+
+
+def bench(name: str, opts) -> dict:
+    with tempfile.TemporaryDirectory(prefix='autopkg-sqlite-bench-') as tmp:
+        profile = Profile(name, Path(tmp))
+        profile.create(runs=500)
+        return Workload(profile, opts).run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', choices=[*PROFILES, 'all'], default='all')
+    parser.add_argument('--seconds', type=float, default=10, help='duration per profile (default: 10)')
+    parser.add_argument('--readers', type=int, default=4, help='page-view threads (default: 4)')
+    parser.add_argument('--stage-writers', type=int, default=2,
+                        help='threads updating stage rows, like overlapping stages (default: 2)')
+    parser.add_argument('--batch', type=int, default=200, help='log rows per transaction (default: 200)')
+    parser.add_argument('--flush-ms', type=float, default=20, help='pause between log batches (default: 20)')
+    opts = parser.parse_args(argv)
+
+    profiles = PROFILES if opts.profile == 'all' else (opts.profile,)
+    print(f'{"profile":<8} {"log rows/s":>11} {"stage tx":>9} {"locked":>7} {"reads":>7} '
+          f'{"read p50":>9} {"p95":>8} {"p99":>8} {"max":>8}')
+    for name in profiles:
+        r = bench(name, opts)
+        lat = {k: v * 1000 for k, v in r['read_seconds'].items() if k != 'count'}
+        print(f'{r["profile"]:<8} {r["log_rows_per_s"]:>11,.0f} {r["stage_updates"]:>9,} '
+              f'{r["locked"] + r["read_errors"]:>7,} {r["reads"]:>7,} '
+              f'{lat.get("p50", 0):>9.1f} {lat.get("p95", 0):>8.1f} '
+              f'{lat.get("p99", 0):>8.1f} {lat.get("max", 0):>8.1f} ms')
+
+if __name__ == '__main__':
+    main()
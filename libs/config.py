@@ -2,12 +2,16 @@ from pathlib import Path
 from dataclasses import dataclass
 import json
 
+# Most concurrent `autopkg run` processes a run may start (workflow.run_shards).
+MAX_RUN_SHARDS = 16
+
 
 @dataclass(frozen=True)
 class AutopkgConfig:
     bin_path: Path
     cache_path: Path
     recipe_list: Path
+    overrides_dir: Path
 
 
 @dataclass(frozen=True)
@@ -47,6 +51,12 @@ class PipelineConfig:
     update_repos: bool
     notifiers: list        # list of webapp.models.Notifier instances (or dicts)
     flags: list[str]
+    run_shards: int = 1    # concurrent `autopkg run` processes; 1 = single batch
+    trust_workers: int = 1 # concurrent trust-info checks; 1 = one at a time
+    native_trust: bool = True  # verify trust info in Python before calling autopkg
+    repo_update_workers: int = 1  # concurrent `autopkg repo-update` processes
+    repo_freshness_check: bool = True  # skip repos whose HEAD matches the remote
+    repo_fresh_minutes: int = 0   # skip repos fetched within this window; 0 = off
 
 
 def config_from_settings() -> 'PipelineConfig':
@@ -60,6 +70,7 @@ def config_from_settings() -> 'PipelineConfig':
             bin_path=Path(s('autopkg.bin_path')).expanduser(),
             cache_path=Path(s('autopkg.cache_path')).expanduser(),
             recipe_list=Path(s('autopkg.recipe_list')).expanduser(),
+            overrides_dir=Path(s('autopkg.overrides_dir')).expanduser(),
         ),
         repository=RepositoryConfig(
             repo_type=s('repository.type', 'remote'),
@@ -86,6 +97,12 @@ def config_from_settings() -> 'PipelineConfig':
         update_repos=Setting.get_bool('workflow.update_repos'),
         notifiers=list(Notifier.objects.filter(enabled=True)),
         flags=[],
+        run_shards=min(max(1, Setting.get_int('workflow.run_shards', 1)), MAX_RUN_SHARDS),
+        trust_workers=max(1, Setting.get_int('workflow.trust_workers', 1)),
+        native_trust=Setting.get_bool('workflow.native_trust'),
+        repo_update_workers=max(1, Setting.get_int('workflow.repo_update_workers', 1)),
+        repo_freshness_check=Setting.get_bool('workflow.repo_freshness_check'),
+        repo_fresh_minutes=max(0, Setting.get_int('workflow.repo_fresh_minutes', 0)),
     )
 
 
@@ -96,6 +113,7 @@ def pipeline_config_to_dict(config: 'PipelineConfig') -> dict:
             'bin_path':    str(config.autopkg.bin_path),
             'cache_path':  str(config.autopkg.cache_path),
             'recipe_list': str(config.autopkg.recipe_list),
+            'overrides_dir': str(config.autopkg.overrides_dir),
         },
         'repository': {
             'type':            config.repository.repo_type,
@@ -120,6 +138,12 @@ def pipeline_config_to_dict(config: 'PipelineConfig') -> dict:
         },
         'update_repos': config.update_repos,
         'flags': config.flags,
+        'run_shards': config.run_shards,
+        'trust_workers': config.trust_workers,
+        'native_trust': config.native_trust,
+        'repo_update_workers': config.repo_update_workers,
+        'repo_freshness_check': config.repo_freshness_check,
+        'repo_fresh_minutes': config.repo_fresh_minutes,
     }
 
 
@@ -134,6 +158,8 @@ def load_config(path: str) -> 'PipelineConfig':
             bin_path=Path(raw['autopkg']['bin_path']).expanduser(),
             cache_path=Path(raw['autopkg']['cache_path']).expanduser(),
             recipe_list=Path(raw['autopkg']['recipe_list']).expanduser(),
+            overrides_dir=Path(raw['autopkg'].get(
+                'overrides_dir', '~/Library/AutoPkg/RecipeOverrides')).expanduser(),
         ),
         repository=RepositoryConfig(
             repo_type='remote',
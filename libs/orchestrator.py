@@ -1,8 +1,11 @@
+import inspect
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
-from typing import Callable, Optional
+from typing import Callable, ContextManager, Optional
 
 from logbook import Logger
 
+from libs.resource_usage import StageUsage
 from libs.stage import Stage
 from libs.config import PipelineConfig
 from stages import (
@@ -11,6 +14,15 @@ from stages import (
 )
 
 
+def _accepts_usage(callback) -> bool:
+    """Whether *callback* takes a ``usage`` keyword (or **kwargs)."""
+    try:
+        params = inspect.signature(callback).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.name == 'usage' or p.kind is p.VAR_KEYWORD for p in params)
+
+
 class Orchestrator:
     STAGE_CLASSES: list[type[Stage]] = [
         EnvironmentCheck,
@@ -26,12 +38,18 @@ class Orchestrator:
         self,
         config: PipelineConfig,
         logger: Logger,
-        stage_callback: Optional[Callable[[str, str, datetime], None]] = None,
+        # Called as (stage_name, status, timestamp); finished stages also pass
+        # usage=<resource usage dict> when the callback accepts it.
+        stage_callback: Optional[Callable[..., None]] = None,
+        thread_context: Optional[Callable[[], ContextManager]] = None,
     ):
         self.config = config
         self.ctx: dict = {}
         self.logger: Logger = logger
         self.stage_callback = stage_callback
+        # Entered around every stage that runs on a worker thread, so callers
+        # can install thread-local state (log handlers, run id) there too.
+        self.thread_context = thread_context
 
     def configure_stages(self, override_stage_name):
         override_stage_class = None
@@ -52,6 +70,12 @@ class Orchestrator:
     def execute(self, cancel_flag=None) -> bool:
         """Run all configured stages. Returns True on full success, False otherwise.
 
+        Stages start as soon as everything in their ``depends_on`` has
+        completed, so independent stages (e.g. MountRepository and
+        UpdateRepos) overlap.  When only one stage is ready it runs in the
+        calling thread; extra ready stages run on worker threads, each
+        wrapped in ``thread_context`` so per-thread logging still applies.
+
         cancel_flag is an optional threading.Event; when set the pipeline aborts
         before the next stage and cleanup runs for all completed stages.
         """
@@ -65,28 +89,70 @@ class Orchestrator:
             (s for s in self.stages if isinstance(s, NotifyOnCompletion)), None
         )
         pipeline_stages = [s for s in self.stages if not isinstance(s, NotifyOnCompletion)]
+        dependencies = self._dependencies(pipeline_stages)
 
         completed = []
-        current_stage = None
+        finished: set = set()
+        pending = list(pipeline_stages)
+        running: dict = {}    # Future -> Stage
         success = True
 
+        pool = ThreadPoolExecutor(
+            max_workers=max(1, len(pipeline_stages)), thread_name_prefix='stage',
+        )
         try:
-            for stage in pipeline_stages:
-                if cancel_flag and cancel_flag.is_set():
-                    self.logger.info('Run cancelled — stopping pipeline before next stage.')
-                    success = False
+            while pending or running:
+                ready = []
+                if success and pending:
+                    if cancel_flag and cancel_flag.is_set():
+                        self.logger.info('Run cancelled — stopping pipeline before next stage.')
+                        success = False
+                    else:
+                        ready = [s for s in pending if dependencies[s] <= finished]
+
+                if not ready and not running:
+                    if success and pending:
+                        self.logger.error(
+                            'Unresolvable stage dependencies: '
+                            f'{[type(s).__name__ for s in pending]}'
+                        )
+                        success = False
                     break
-                current_stage = stage
-                self._notify(stage.name, 'running')
-                stage()
-                self._notify(stage.name, 'success')
-                completed.append(stage)
+
+                for stage in ready:
+                    pending.remove(stage)
+
+                if len(ready) == 1 and not running:
+                    stage = ready[0]
+                    try:
+                        self._run_stage(stage)
+                    except Exception:
+                        success = False
+                        self.logger.exception('Pipeline failed, starting cleanup…')
+                    else:
+                        completed.append(stage)
+                        finished.add(type(stage).__name__)
+                    continue
+
+                for stage in ready:
+                    running[pool.submit(self._run_stage_in_thread, stage)] = stage
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception:
+                        success = False
+                        self.logger.exception(f'{stage.name} failed, starting cleanup…')
+                    else:
+                        completed.append(stage)
+                        finished.add(type(stage).__name__)
         except Exception:
             success = False
-            if current_stage is not None:
-                self._notify(current_stage.name, 'failed')
             self.logger.exception('Pipeline failed, starting cleanup…')
         finally:
+            pool.shutdown(wait=True)
             for s in reversed(completed):
                 try:
                     s.cleanup()
@@ -96,18 +162,55 @@ class Orchestrator:
             # Always dispatch notifications - success or failure.
             if notify_stage is not None:
                 try:
-                    self._notify(notify_stage.name, 'running')
-                    notify_stage()
-                    self._notify(notify_stage.name, 'success')
+                    self._run_stage(notify_stage)
                 except Exception:
-                    self._notify(notify_stage.name, 'failed')
                     self.logger.exception('Notification stage failed')
 
         return success
 
-    def _notify(self, stage_name: str, status: str):
+    @staticmethod
+    def _dependencies(stages: list[Stage]) -> dict:
+        """Map each stage to the set of configured stage class names it waits on.
+
+        Dependencies on stages that are not configured (e.g. a single-stage
+        override) are dropped; ``depends_on = None`` means the previous stage.
+        """
+        names = {type(s).__name__ for s in stages}
+        dependencies = {}
+        previous = None
+        for stage in stages:
+            declared = stage.depends_on
+            if declared is None:
+                declared = (type(previous).__name__,) if previous is not None else ()
+            dependencies[stage] = {name for name in declared if name in names}
+            previous = stage
+        return dependencies
+
+    def _run_stage(self, stage: Stage):
+        self._notify(stage.name, 'running')
+        usage = StageUsage()
+        try:
+            with usage:
+                stage()
+        except Exception:
+            self._notify(stage.name, 'failed', usage.as_dict())
+            raise
+        self._notify(stage.name, 'success', usage.as_dict())
+
+    def _run_stage_in_thread(self, stage: Stage):
+        if self.thread_context is None:
+            return self._run_stage(stage)
+        with self.thread_context():
+            return self._run_stage(stage)
+
+    def _notify(self, stage_name: str, status: str, usage: Optional[dict] = None):
+        """Report a status change; finished stages also pass their resource usage."""
         if self.stage_callback:
             try:
-                self.stage_callback(stage_name, status, datetime.now(timezone.utc))
+                now = datetime.now(timezone.utc)
+                if usage is not None and _accepts_usage(self.stage_callback):
+                    self.stage_callback(stage_name, status, now, usage=usage)
+                else:
+                    self.stage_callback(stage_name, status, now)
             except Exception:
-                pass
+                self.logger.exception(f"Stage callback failed for {stage_name} ({status})")
@@ -0,0 +1,119 @@
+"""Per-stage resource accounting.
+
+A StageUsage is opened around each stage in the thread that runs it.  It
+records that thread's own CPU time and block I/O from getrusage(), and every
+child reaped through run_cmd / run_cmds is waited for with os.wait4() so the
+child's exact rusage is added to the stage that started it - even when
+stages overlap.
+
+Where RUSAGE_THREAD is unavailable (macOS) the stage's own figures are
+process-wide deltas and include anything else the process did meanwhile;
+``scope`` in the result says which applies.  Child figures are exact on
+every platform.
+"""
+from __future__ import annotations
+
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Optional
+
+_local = threading.local()
+
+# RUSAGE_THREAD is Linux-only; elsewhere fall back to the whole process.
+_SELF_WHO = getattr(resource, 'RUSAGE_THREAD', resource.RUSAGE_SELF)
+_SELF_SCOPE = 'thread' if _SELF_WHO != resource.RUSAGE_SELF else 'process'
+# ru_maxrss is kilobytes on Linux and bytes on macOS.
+_MAXRSS_BYTES = 1 if sys.platform == 'darwin' else 1024
+
+
+class StageUsage:
+    """Context manager collecting resource usage for one stage."""
+
+    def __init__(self):
+        self.subprocesses = 0
+        self.child_user = 0.0
+        self.child_system = 0.0
+        self.child_block_in = 0
+        self.child_block_out = 0
+        self.child_peak_rss = 0
+        self._start: Optional[resource.struct_rusage] = None
+        self._end: Optional[resource.struct_rusage] = None
+        self._wall_start = 0.0
+        self._wall = 0.0
+        self._parent: Optional[StageUsage] = None
+
+    def __enter__(self) -> 'StageUsage':
+        self._parent = getattr(_local, 'usage', None)
+        _local.usage = self
+        self._wall_start = time.monotonic()
+        self._start = resource.getrusage(_SELF_WHO)
+        return self
+
+    def __exit__(self, *exc):
+        self._end = resource.getrusage(_SELF_WHO)
+        self._wall = time.monotonic() - self._wall_start
+        _local.usage = self._parent
+        return False
+
+    def add_child(self, ru: Optional[resource.struct_rusage]) -> None:
+        """Record one reaped child; *ru* is None when its rusage was lost."""
+        self.subprocesses += 1
+        if ru is None:
+            return
+        self.child_user += ru.ru_utime
+        self.child_system += ru.ru_stime
+        self.child_block_in += ru.ru_inblock
+        self.child_block_out += ru.ru_oublock
+        self.child_peak_rss = max(self.child_peak_rss, ru.ru_maxrss * _MAXRSS_BYTES)
+
+    def as_dict(self) -> dict:
+        """JSON-safe summary; times in seconds, memory in bytes, I/O in blocks."""
+        start, end = self._start, self._end or resource.getrusage(_SELF_WHO)
+        if start is None:
+            start = end
+        return {
+            'scope':            _SELF_SCOPE,
+            'wall_seconds':     round(self._wall, 3),
+            'cpu_user':         round(end.ru_utime - start.ru_utime, 3),
+            'cpu_system':       round(end.ru_stime - start.ru_stime, 3),
+            'block_in':         end.ru_inblock - start.ru_inblock,
+            'block_out':        end.ru_oublock - start.ru_oublock,
+            # Peak RSS is a high-water mark for the whole process, not a delta.
+            'peak_rss':         resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_BYTES,
+            'subprocesses':     self.subprocesses,
+            'child_cpu_user':   round(self.child_user, 3),
+            'child_cpu_system': round(self.child_system, 3),
+            'child_block_in':   self.child_block_in,
+            'child_block_out':  self.child_block_out,
+            'child_peak_rss':   self.child_peak_rss,
+        }
+
+
+def current() -> Optional[StageUsage]:
+    """The StageUsage open in this thread, if any."""
+    return getattr(_local, 'usage', None)
+
+
+def wait_child(proc) -> int:
+    """Wait for *proc* and charge its rusage to the current stage.
+
+    Outside a stage this is just proc.wait().  If the child was already
+    reaped elsewhere (cancel_run polls it from another thread) it is still
+    counted, without CPU or I/O figures.
+    """
+    usage = current()
+    if usage is None or proc.returncode is not None:
+        if usage is not None:
+            usage.add_child(None)
+        return proc.wait()
+    try:
+        _, status, ru = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        usage.add_child(None)
+        return proc.wait()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    usage.add_child(ru)
+    return proc.returncode
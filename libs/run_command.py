@@ -1,8 +1,12 @@
+import codecs
 import os
 import select
 import subprocess
+from collections import deque
 from typing import Protocol
 
+from libs.resource_usage import wait_child
+
 
 class _SupportsLogging(Protocol):
     """Structural type accepted by run_cmd - satisfied by logbook.Logger,
@@ -11,47 +15,208 @@ class _SupportsLogging(Protocol):
     def error(self, msg: str, /) -> None: ...
 
 
-def run_cmd(command: list[str], logger: _SupportsLogging, on_proc=None):
-    """Run *command*, streaming stdout/stderr to *logger*.
+# Bytes requested from a pipe per os.read() call.
+_CHUNK = 64 * 1024
+# A line longer than this (e.g. a progress bar that never prints a newline)
+# is logged in pieces rather than buffered without bound.
+_MAX_LINE = 1024 * 1024
 
-    on_proc: optional callback invoked with the Popen object immediately after
-    the process starts — used to register the process for external cancellation.
-    """
+
+def _popen(command: list[str]) -> subprocess.Popen:
     # For Python children, ensure unbuffered output; harmless for others.
     env = os.environ.copy()
     env.setdefault("PYTHONUNBUFFERED", "1")
 
-    proc = subprocess.Popen(
+    # Binary, unbuffered pipes: output is read in chunks with os.read() and
+    # decoded by _LineReader, so a partial line never blocks the loop.
+    return subprocess.Popen(
         command,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1,   # line-buffered
+        bufsize=0,
         env=env,
     )
+
+
+class _LineReader:
+    """Incrementally decode one pipe's bytes and emit complete lines.
+
+    Decoding is UTF-8 with replacement, and CRLF, CR and LF all end a line -
+    the same splitting the text-mode pipes used to do.  Each chunk is
+    decoded and split once, so cost is linear in the output size even when
+    a single line arrives over many reads.
+    """
+
+    def __init__(self, emit):
+        self._emit = emit
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._pending: list[str] = []   # pieces of the current, unfinished line
+        self._pending_len = 0
+        self._cr = False                # last chunk ended in CR (maybe half of CRLF)
+
+    def feed(self, data: bytes) -> None:
+        self._split(self._decoder.decode(data))
+
+    def close(self) -> None:
+        """Flush the decoder and emit any final line without a newline."""
+        self._split(self._decoder.decode(b'', final=True))
+        if self._cr:
+            self._cr = False
+            self._split('\n')
+        if self._pending:
+            self._emit(''.join(self._pending))
+            self._pending, self._pending_len = [], 0
+
+    def _split(self, text: str) -> None:
+        if self._cr:
+            text = '\r' + text
+            self._cr = False
+        if text.endswith('\r'):
+            text = text[:-1]
+            self._cr = True
+        if not text:
+            return
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+        *lines, rest = text.split('\n')
+        if lines:
+            lines[0] = ''.join(self._pending) + lines[0]
+            self._pending, self._pending_len = [], 0
+            for line in lines:
+                self._emit(line)
+        if rest:
+            self._pending.append(rest)
+            self._pending_len += len(rest)
+            if self._pending_len >= _MAX_LINE:
+                self._emit(''.join(self._pending))
+                self._pending, self._pending_len = [], 0
+
+
+def run_cmd(command: list[str], logger: _SupportsLogging, on_proc=None):
+    """Run *command*, streaming stdout/stderr to *logger*.
+
+    on_proc: optional callback invoked with the Popen object immediately after
+    the process starts — used to register the process for external cancellation.
+    """
+    proc = _popen(command)
     if on_proc is not None:
         on_proc(proc)
 
     # Read both pipes in the *calling* thread rather than spawning reader
     # threads.  This is essential so that Logbook's thread-local handler
     # stack - which holds DBLogHandler - is active when each line is logged.
-    # select.select() lets us multiplex both pipes without blocking on either.
-    open_fds = {proc.stdout, proc.stderr}
-    while open_fds:
-        readable, _, _ = select.select(open_fds, [], [])
+    # select.select() lets us multiplex both pipes without blocking on either,
+    # and os.read() returns whatever is available, newline or not.
+    readers = {
+        proc.stdout.fileno(): _LineReader(lambda line: logger.info(line.rstrip())),
+        proc.stderr.fileno(): _LineReader(lambda line: logger.error(line.rstrip())),
+    }
+    while readers:
+        readable, _, _ = select.select(list(readers), [], [])
         for fd in readable:
-            if fd is not None:
-                line = fd.readline()
-                if line:
-                    if fd is proc.stdout:
-                        logger.info(line.rstrip())
-                    else:
-                        logger.error(line.rstrip())
-                else:
-                    # EOF on this pipe - process has closed it.
-                    open_fds.discard(fd)
-
-    proc.wait()
+            data = os.read(fd, _CHUNK)
+            if data:
+                readers[fd].feed(data)
+            else:
+                # EOF on this pipe - process has closed it.
+                readers.pop(fd).close()
+
+    proc.stdout.close()
+    proc.stderr.close()
+    wait_child(proc)
     if proc.returncode:
         logger.error(f"Command {command!r} exited with code {proc.returncode}")
-        raise subprocess.CalledProcessError(proc.returncode, command)
\ No newline at end of file
+        raise subprocess.CalledProcessError(proc.returncode, command)
+
+
+def run_cmds(commands, logger: _SupportsLogging, max_workers: int,
+             on_proc=None, on_exit=None, cancel_flag=None) -> dict[str, int]:
+    """Run several commands concurrently, streaming their output to *logger*.
+
+    commands: iterable of (label, argv) pairs.  At most *max_workers* children
+    run at once; the next command starts as soon as a running one exits.
+    Every output line is prefixed with ``[label]`` so interleaved output
+    stays attributable.
+
+    Like run_cmd, all pipes are multiplexed with select() in the calling
+    thread so DBLogHandler's thread-local context applies to every line.
+
+    on_proc / on_exit: optional callbacks invoked with each Popen object when
+    it starts and after it has been reaped.
+    cancel_flag: optional threading.Event; once set no further commands are
+    started (children already running are left to the caller to terminate).
+
+    Returns {label: returncode} for every command that was started.  Non-zero
+    exits are logged but not raised - callers decide which failures are fatal.
+    If a command cannot be started, the children already running are
+    terminated and reaped (on_exit is called for each) and the error is
+    re-raised.
+    """
+    pending = deque(commands)
+    max_workers = max(1, max_workers)
+    pipes: dict = {}      # fd -> (label, proc, _LineReader)
+    open_pipes: dict = {} # proc -> number of pipes not yet at EOF
+    results: dict[str, int] = {}
+
+    def _start_next():
+        while pending and len(open_pipes) < max_workers:
+            if cancel_flag is not None and cancel_flag.is_set():
+                pending.clear()
+                return
+            label, command = pending.popleft()
+            proc = _popen(command)
+            pipes[proc.stdout.fileno()] = (label, proc, _LineReader(
+                lambda line, label=label: logger.info(f"[{label}] {line.rstrip()}")))
+            pipes[proc.stderr.fileno()] = (label, proc, _LineReader(
+                lambda line, label=label: logger.error(f"[{label}] {line.rstrip()}")))
+            open_pipes[proc] = 2
+            if on_proc is not None:
+                on_proc(proc)
+
+    def _abandon():
+        # Starting a command failed (or the caller's callback raised): stop
+        # and reap everything already running so nothing is left behind.
+        for proc in list(open_pipes):
+            if proc.poll() is None:
+                proc.terminate()
+            proc.stdout.close()
+            proc.stderr.close()
+            wait_child(proc)
+            if on_exit is not None:
+                on_exit(proc)
+        open_pipes.clear()
+        pipes.clear()
+
+    try:
+        _start_next()
+        while pipes:
+            readable, _, _ = select.select(list(pipes), [], [])
+            for fd in readable:
+                label, proc, reader = pipes[fd]
+                data = os.read(fd, _CHUNK)
+                if data:
+                    reader.feed(data)
+                    continue
+
+                # EOF on this pipe; reap the child once both pipes are closed.
+                reader.close()
+                del pipes[fd]
+                open_pipes[proc] -= 1
+                if open_pipes[proc]:
+                    continue
+                del open_pipes[proc]
+                proc.stdout.close()
+                proc.stderr.close()
+                wait_child(proc)
+                results[label] = proc.returncode
+                if proc.returncode:
+                    logger.error(f"[{label}] Command {proc.args!r} exited with code {proc.returncode}")
+                if on_exit is not None:
+                    on_exit(proc)
+                _start_next()
+    except BaseException:
+        _abandon()
+        raise
+
+    return results
@@ -8,6 +8,10 @@ from libs.config import PipelineConfig
 class Stage(ABC):
     """Base class for one step in the pipeline."""
     name = "unnamed‑stage"
+    # Class names of the stages that must finish before this one starts.
+    # None means "the stage configured before it", which keeps pipelines
+    # linear unless a stage opts in to running alongside its neighbours.
+    depends_on: Optional[tuple[str, ...]] = None
     logger: Logger
     config: PipelineConfig
     ctx: dict[str, Any]
@@ -8,6 +8,7 @@ from libs.stage import Stage
 
 class EnvironmentCheck(Stage):
     name = "Environment Check"
+    depends_on = ()
 
     def __init__(self, config, ctx, logger):
         super().__init__(config, ctx, logger)
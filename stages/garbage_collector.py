@@ -12,6 +12,7 @@ from libs.run_command import run_cmd
 
 class GarbageCollector(Stage):
     name = "Garbage Collector"
+    depends_on = ('RunAutoPkg',)
 
     def __init__(self, config, ctx, logger):
         super().__init__(config, ctx, logger)
@@ -31,6 +31,7 @@ def _build_host(repo) -> BaseHost:
 
 class MountRepository(Stage):
     name = "Mount Repository"
+    depends_on = ('EnvironmentCheck',)
 
     def __init__(self, config, ctx, logger):
         super().__init__(config, ctx, logger)
@@ -6,12 +6,18 @@ from pathlib import Path
 from typing import Optional, Any
 
 from libs.stage import Stage
-from libs.run_command import run_cmd
+from libs.run_command import run_cmd, run_cmds
 from stages import TrustVerification
 
 
+def _is_makecatalogs(recipe: str) -> bool:
+    # Same test webapp.views.recipes._sort_run_list uses to move it last.
+    return 'makecatalogs' in recipe.lower()
+
+
 class RunAutoPkg(Stage):
     name = "Run AutoPkg"
+    depends_on = ('MountRepository', 'TrustVerification')
 
     def __init__(self, config, ctx, logger):
         super().__init__(config, ctx, logger)
@@ -19,10 +25,13 @@ class RunAutoPkg(Stage):
         self.autopkg_fpath: Path = config.autopkg.bin_path
         self.recipe_fpath: Path  = config.autopkg.recipe_list
         self.local_mnt: Path     = config.repository.mount_path
+        self.run_shards: int     = config.run_shards
 
         # Temporary file used for autopkg's --report-plist output.
         # Created fresh each run; cleaned up in cleanup().
         self._tmp_plist = None
+        # Per-shard report plists in parallel mode; merged into _tmp_plist.
+        self._shard_plists: list[str] = []
 
     def run(self) -> Optional[Any]:
         recipes = []
@@ -39,6 +48,27 @@ class RunAutoPkg(Stage):
         )
         self._tmp_plist.close()
 
+        if self.run_shards > 1 and len(recipes) > 1:
+            self._run_sharded(recipes)
+        else:
+            self._run_batch(recipes)
+
+        self._write_recipe_results()
+
+    def _autopkg_run_cmd(self, recipes: list, report_plist: str) -> list:
+        return [
+            str(self.autopkg_fpath),
+            "run",
+            *recipes,
+            "--report-plist",
+            report_plist,
+            "-q",
+            "-k",
+            f"MUNKI_REPO={self.local_mnt}"
+        ]
+
+    def _run_batch(self, recipes: list):
+        """Run every recipe in a single ``autopkg run`` process."""
         run_id = self.ctx.get('run_id')
         try:
             from webapp.runner import register_active_proc, unregister_active_proc
@@ -47,23 +77,109 @@ class RunAutoPkg(Stage):
                 if run_id:
                     register_active_proc(str(run_id), proc)
 
-            run_cmd([
-                str(self.autopkg_fpath),
-                "run",
-                *recipes,
-                "--report-plist",
-                self._tmp_plist.name,
-                "-q",
-                "-k",
-                f"MUNKI_REPO={self.local_mnt}"
-            ], self.logger, on_proc=_on_proc)
+            run_cmd(self._autopkg_run_cmd(recipes, self._tmp_plist.name),
+                    self.logger, on_proc=_on_proc)
         except subprocess.CalledProcessError as err:
             self.logger.error("Some recipes failed to execute: " + str(err))
         finally:
             if run_id:
                 unregister_active_proc(str(run_id))
 
-        self._write_recipe_results()
+    def _run_sharded(self, recipes: list):
+        """Split the run list across concurrent ``autopkg run`` processes.
+
+        Each shard writes its own report plist; the reports are merged into
+        _tmp_plist afterwards so _write_recipe_results sees a single report.
+        MakeCatalogs must see every import, so it runs once, after all shards.
+        """
+        from webapp.runner import (
+            register_active_proc, unregister_active_proc, get_cancel_event,
+        )
+
+        run_id = self.ctx.get('run_id')
+        cancel_event = get_cancel_event(str(run_id)) if run_id else None
+        catalog_recipes = [r for r in recipes if _is_makecatalogs(r)]
+        batch = [r for r in recipes if r and not _is_makecatalogs(r)]
+
+        def _on_proc(proc):
+            if run_id:
+                register_active_proc(str(run_id), proc)
+
+        def _on_exit(proc):
+            if run_id:
+                unregister_active_proc(str(run_id), proc)
+
+        shard_count = min(self.run_shards, len(batch))
+        if shard_count:
+            commands = []
+            for index in range(shard_count):
+                report = self._new_shard_plist()
+                label = f"shard {index + 1}/{shard_count}"
+                commands.append((label, self._autopkg_run_cmd(batch[index::shard_count], report)))
+
+            self.logger.info(
+                f"Running {len(batch)} recipe(s) across {shard_count} parallel autopkg process(es)"
+            )
+            results = run_cmds(commands, self.logger, max_workers=shard_count,
+                               on_proc=_on_proc, on_exit=_on_exit,
+                               cancel_flag=cancel_event)
+            failed = sorted(label for label, code in results.items() if code)
+            if failed:
+                self.logger.error(f"Some recipes failed to execute in {', '.join(failed)}")
+
+        if catalog_recipes and not (cancel_event and cancel_event.is_set()):
+            report = self._new_shard_plist()
+            try:
+                run_cmd(self._autopkg_run_cmd(catalog_recipes, report),
+                        self.logger, on_proc=_on_proc)
+            except subprocess.CalledProcessError as err:
+                self.logger.error("Some recipes failed to execute: " + str(err))
+            finally:
+                if run_id:
+                    unregister_active_proc(str(run_id))
+
+        self._merge_reports(self._shard_plists, self._tmp_plist.name)
+
+    def _new_shard_plist(self) -> str:
+        tmp = tempfile.NamedTemporaryFile(suffix='.plist', delete=False)
+        tmp.close()
+        self._shard_plists.append(tmp.name)
+        return tmp.name
+
+    def _merge_reports(self, sources: list, dest: str):
+        """Combine several autopkg report plists into one at *dest*.
+
+        ``failures`` and every ``summary_results`` section's ``data_rows`` are
+        concatenated; the remaining keys are taken from the first report that
+        has them.  Unreadable or empty reports (e.g. a shard that crashed
+        before writing) are skipped.
+        """
+        merged: dict = {}
+        for path in sources:
+            try:
+                with open(path, 'rb') as f:
+                    data = plistlib.load(f)
+            except Exception as exc:
+                self.logger.warning(f'Could not read autopkg report plist {path}: {exc}')
+                continue
+            if not isinstance(data, dict):
+                continue
+
+            for key, value in data.items():
+                if key == 'failures':
+                    merged.setdefault('failures', []).extend(value or [])
+                elif key == 'summary_results' and isinstance(value, dict):
+                    summary = merged.setdefault('summary_results', {})
+                    for name, section in value.items():
+                        if not isinstance(section, dict):
+                            continue
+                        target = summary.setdefault(name, {**section, 'data_rows': []})
+                        target['data_rows'].extend(section.get('data_rows', []))
+                else:
+                    merged.setdefault(key, value)
+
+        with open(dest, 'wb') as f:
+            plistlib.dump(merged, f)
 
     def _write_recipe_results(self):
         """Parse the autopkg report plist and write RecipeResult rows to the DB."""
@@ -111,21 +227,41 @@ class RunAutoPkg(Stage):
                 'trust_updated':  _trust_section(),
             }
 
-            for result_type, section in type_map.items():
-                rows = section.get('data_rows', []) if isinstance(section, dict) else []
-                if rows:
-                    RecipeResult.objects.create(
-                        run_id=run_id,
-                        result_type=result_type,
-                        data=rows,
-                    )
+            def _create_results():
+                from django.utils import timezone
+                from webapp.models import RecipeEvent
+                from webapp.recipe_events import build_events
+
+                now = timezone.now()
+                events = []
+                for result_type, section in type_map.items():
+                    rows = section.get('data_rows', []) if isinstance(section, dict) else []
+                    if rows:
+                        RecipeResult.objects.create(
+                            run_id=run_id,
+                            result_type=result_type,
+                            data=rows,
+                        )
+                        events.extend(build_events(run_id, result_type, rows, now))
+                RecipeEvent.objects.bulk_create(events)
+
+            writer = self.ctx.get('db_writer')
+            if writer is not None:
+                writer.call(_create_results)
+            else:
+                _create_results()
         except Exception as exc:
             self.logger.warning(f'Could not write recipe results to DB: {exc}')
 
     def cleanup(self):
-        if self._tmp_plist and os.path.exists(self._tmp_plist.name):
-            try:
-                os.unlink(self._tmp_plist.name)
-            except OSError:
-                pass
+        paths = list(self._shard_plists)
+        if self._tmp_plist:
+            paths.append(self._tmp_plist.name)
+        for path in paths:
+            if os.path.exists(path):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
         self._tmp_plist = None
+        self._shard_plists = []
@@ -1,18 +1,59 @@
 from pathlib import Path
+import hashlib
+import os
+import plistlib
 import subprocess
+from typing import Optional
 
 from libs.stage import Stage
-from libs.run_command import run_cmd
+from libs.run_command import run_cmd, run_cmds
+
+try:
+    import yaml
+except ImportError:  # YAML overrides fall back to autopkg
+    yaml = None
+
+
+def _load_recipe(path: Path) -> Optional[dict]:
+    """Parse a plist or YAML recipe file; None if it cannot be read."""
+    try:
+        if path.name.endswith('.yaml'):
+            if yaml is None:
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                data = yaml.safe_load(f)
+        else:
+            with open(path, 'rb') as f:
+                data = plistlib.load(f)
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _recipe_name(path: Path) -> str:
+    for suffix in ('.recipe.yaml', '.recipe.plist', '.recipe'):
+        if path.name.endswith(suffix):
+            return path.name[: -len(suffix)]
+    return path.stem
+
+
+def _resolve(path: str) -> str:
+    """Absolute real path; AutoPkg records trust info paths in ~/ form."""
+    return os.path.realpath(os.path.expanduser(path))
 
 
 class TrustVerification(Stage):
     name = "Trust Verification"
+    depends_on = ('UpdateRepos',)
 
     def __init__(self, config, ctx, logger):
         super().__init__(config, ctx, logger)
 
         self.autopkg_fpath: Path    = config.autopkg.bin_path
         self.recipe_fpath: Path     = config.autopkg.recipe_list
+        self.trust_workers: int     = config.trust_workers
+        self.native_trust: bool     = config.native_trust
+        self.overrides_dir: Path    = config.autopkg.overrides_dir
 
     def run(self) -> list:
         recipes = []
@@ -22,28 +63,213 @@ class TrustVerification(Stage):
                 recipes.append(recipe.strip())
         self.logger.info(f"Loaded {len(recipes)} recipe(s)")
 
+        if self.native_trust:
+            recipes = self._verify_natively(recipes)
+
+        if self.trust_workers > 1:
+            return self._run_concurrent(recipes)
+
         self.logger.info("Starting trust information verification...")
         needs_update = []
         for recipe in recipes:
+            if self._cancelled():
+                return self._stop_cancelled(needs_update)
             try:
                 run_cmd([
                     str(self.autopkg_fpath),
                     "verify-trust-info",
                     recipe
-                ], self.logger)
+                ], self.logger, on_proc=self._on_proc)
             except subprocess.CalledProcessError:
                 needs_update.append(recipe)
+            finally:
+                self._on_exit()
 
         if needs_update:
+            if self._cancelled():
+                return self._stop_cancelled(needs_update)
             self.logger.info(f"{len(needs_update)} recipe(s) failed verification, updating...")
             for recipe in needs_update:
+                if self._cancelled():
+                    return self._stop_cancelled(needs_update)
                 try:
                     run_cmd([
                         str(self.autopkg_fpath),
                         "update-trust-info",
                         recipe
-                    ], self.logger)
+                    ], self.logger, on_proc=self._on_proc)
                 except subprocess.CalledProcessError as err:
+                    if self._cancelled():
+                        return self._stop_cancelled(needs_update)
                     raise RuntimeError("Failed to update trust information") from err
+                finally:
+                    self._on_exit()
+
+        return needs_update
+
+    # -- Cancellation -----------------------------------------------------------
+
+    def _cancel_event(self):
+        from webapp.runner import get_cancel_event
+        run_id = self.ctx.get('run_id')
+        return get_cancel_event(str(run_id)) if run_id else None
+
+    def _cancelled(self) -> bool:
+        event = self._cancel_event()
+        return event is not None and event.is_set()
+
+    def _stop_cancelled(self, needs_update: list) -> list:
+        self.logger.info("Run cancelled, skipping the remaining trust information checks")
+        return needs_update
+
+    def _on_proc(self, proc):
+        """Register *proc* so cancelling the run terminates it."""
+        from webapp.runner import register_active_proc
+        run_id = self.ctx.get('run_id')
+        if run_id:
+            register_active_proc(str(run_id), proc)
+
+    def _on_exit(self, proc=None):
+        from webapp.runner import unregister_active_proc
+        run_id = self.ctx.get('run_id')
+        if run_id:
+            unregister_active_proc(str(run_id), proc)
+
+    def _run_concurrent(self, recipes: list) -> list:
+        """Verify (and if needed update) trust info through a bounded pool.
+
+        Output from every child is streamed to the run log prefixed with the
+        recipe name.  Returns the recipes that failed verification, in run
+        list order - the same contract as the sequential path.
+        """
+        recipes = list(dict.fromkeys(r for r in recipes if r))
+        self.logger.info(
+            f"Starting trust information verification ({self.trust_workers} at a time)..."
+        )
+        results = self._run_pool("verify-trust-info", recipes)
+        needs_update = [r for r in recipes if results.get(r)]
+
+        if self._cancelled():
+            return self._stop_cancelled(needs_update)
+        if needs_update:
+            self.logger.info(f"{len(needs_update)} recipe(s) failed verification, updating...")
+            results = self._run_pool("update-trust-info", needs_update)
+            failed = [r for r in needs_update if results.get(r, 1)]
+            if self._cancelled():
+                return self._stop_cancelled(needs_update)
+            if failed:
+                raise RuntimeError(
+                    f"Failed to update trust information for: {', '.join(failed)}"
+                )
 
         return needs_update
+
+    def _run_pool(self, verb: str, recipes: list) -> dict:
+        commands = [
+            (recipe, [str(self.autopkg_fpath), verb, recipe])
+            for recipe in recipes
+        ]
+        return run_cmds(commands, self.logger, max_workers=self.trust_workers,
+                        on_proc=self._on_proc, on_exit=self._on_exit,
+                        cancel_flag=self._cancel_event())
+
+    # -- Native verification ----------------------------------------------------
+
+    def _verify_natively(self, recipes: list) -> list:
+        """Confirm trust info in Python; return the recipes left for autopkg.
+
+        A recipe is only confirmed when every parent in its chain resolves,
+        through the recipe file index, to the exact path recorded in the
+        override's ParentRecipeTrustInfo with a matching sha256, and every
+        non-core processor file still hashes to its recorded value.  The
+        runner passes the index in as ``ctx['recipe_file_index']``, a
+        callable returning the Recipes tab's entries; without it every
+        recipe goes to autopkg.
+        Anything else - including an outright mismatch - is left for
+        ``autopkg verify-trust-info`` so it stays the authority on failures
+        and on which overrides get ``update-trust-info``.
+        """
+        recipe_file_index = self.ctx.get('recipe_file_index')
+        if recipe_file_index is None:
+            return recipes
+        try:
+            index: dict = {}
+            # First in search-directory order wins, as it does for autopkg.
+            for entry in recipe_file_index():
+                if entry.get('path'):
+                    index.setdefault(entry['identifier'], entry)
+        except Exception as exc:
+            self.logger.warning(f"Recipe index unavailable, verifying with autopkg: {exc}")
+            return recipes
+
+        overrides = self._load_overrides()
+        hashes: dict = {}
+        undecided = [
+            r for r in recipes
+            if not (r and self._is_trusted(overrides.get(r), index, hashes))
+        ]
+        self.logger.info(
+            f"Verified trust info for {len(recipes) - len(undecided)} recipe(s) natively, "
+            f"{len(undecided)} left for autopkg"
+        )
+        return undecided
+
+    def _load_overrides(self) -> dict:
+        """Map both identifier and file name of each override to its contents."""
+        overrides: dict = {}
+        od = Path(self.overrides_dir)
+        if not od.is_dir():
+            return overrides
+        for pattern in ('*.recipe', '*.recipe.plist', '*.recipe.yaml'):
+            for path in od.glob(pattern):
+                data = _load_recipe(path)
+                if data is None:
+                    continue
+                overrides.setdefault(_recipe_name(path), data)
+                if data.get('Identifier'):
+                    overrides.setdefault(data['Identifier'], data)
+        return overrides
+
+    @staticmethod
+    def _sha256(path: str, hashes: dict) -> Optional[str]:
+        path = _resolve(path)
+        if path not in hashes:
+            try:
+                with open(path, 'rb') as f:
+                    hashes[path] = hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                hashes[path] = None
+        return hashes[path]
+
+    def _is_trusted(self, override: Optional[dict], index: dict, hashes: dict) -> bool:
+        if not override:
+            return False
+        trust = override.get('ParentRecipeTrustInfo')
+        if not isinstance(trust, dict):
+            return False
+        expected_parents = trust.get('parent_recipes') or {}
+
+        seen: set = set()
+        parent_id = override.get('ParentRecipe')
+        while parent_id:
+            if parent_id in seen:
+                return False
+            seen.add(parent_id)
+            entry = index.get(parent_id)
+            expected = expected_parents.get(parent_id)
+            if not entry or not isinstance(expected, dict) or not expected.get('path'):
+                return False
+            if _resolve(entry['path']) != _resolve(expected['path']):
+                return False
+            if self._sha256(entry['path'], hashes) != expected.get('sha256_hash'):
+                return False
+            parent_id = entry.get('parent')
+        if seen != set(expected_parents):
+            return False
+
+        for info in (trust.get('non_core_processors') or {}).values():
+            if not isinstance(info, dict) or not info.get('path'):
+                return False
+            if self._sha256(info['path'], hashes) != info.get('sha256_hash'):
+                return False
+        return True
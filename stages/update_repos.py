@@ -1,22 +1,46 @@
 from __future__ import annotations
 from pathlib import Path
+import os
 import re
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from libs.stage import Stage
-from libs.run_command import run_cmd
+from libs.run_command import run_cmd, run_cmds
 from libs.intercept_logger import InterceptLogger
 
 
+def _git(path: str, *args: str) -> str:
+    """Run a git query against *path*; return stripped stdout or '' on any failure.
+
+    git must never prompt: a remote that wants credentials would otherwise
+    block until the timeout, or prompt on the server's terminal.
+    """
+    try:
+        r = subprocess.run(
+            ['git', '-C', path, *args],
+            capture_output=True, text=True, timeout=30, stdin=subprocess.DEVNULL,
+            env={**os.environ, 'GIT_TERMINAL_PROMPT': '0', 'GIT_ASKPASS': '', 'SSH_ASKPASS': ''},
+        )
+    except (subprocess.TimeoutExpired, OSError):
+        return ''
+    return r.stdout.strip() if r.returncode == 0 else ''
+
+
 class UpdateRepos(Stage):
     name = "Update AutoPkg Repositories"
+    depends_on = ('EnvironmentCheck',)
 
     def __init__(self, config, ctx, logger):
         super().__init__(config, ctx, logger)
 
         self.autopkg_fpath: Path          = config.autopkg.bin_path
         self.update_before_each_run: bool = config.update_repos
+        self.update_workers: int          = config.repo_update_workers
+        self.freshness_check: bool        = config.repo_freshness_check
+        self.fresh_minutes: int           = config.repo_fresh_minutes
         self.error_flag: bool             = False
 
     def run(self) -> Optional[list]:
@@ -26,6 +50,7 @@ class UpdateRepos(Stage):
 
         cmd_out = InterceptLogger()
         repo_urls = []
+        repo_paths: dict = {}
 
         # Capture the repo-list command output
         try:
@@ -35,29 +60,132 @@ class UpdateRepos(Stage):
             ], cmd_out)
         except subprocess.CalledProcessError:
             self.logger.error("Could not retreive repo list")
+            self.error_flag = True
 
-        # Extract repo URLs
+        # Extract repo URLs (inside parenthesis) and local paths (before them)
         for entry in cmd_out.entries():
-            match = re.search(r'\(([^)]*)\)', entry.get("msg", ""))
+            match = re.search(r'^(.*?)\s*\(([^)]*)\)', entry.get("msg", ""))
             if match:
-                # Inside parenthesis
-                repo_urls.append(match.group(1))
-        
+                repo_urls.append(match.group(2))
+                repo_paths[match.group(2)] = match.group(1).strip()
+        repo_urls = list(dict.fromkeys(repo_urls))
+
         self.logger.info(f"Found {len(repo_urls)} repository URL(s)")
+
+        skipped = self._skip_fresh(repo_urls, repo_paths)
+        repo_urls = [url for url in repo_urls if url not in skipped]
+
         self.logger.info("Updating from remote repositories...")
 
         # Update remote repos - errors are caught per-URL so a single failure
         # does not prevent the remaining repositories from being updated.
-        for url in repo_urls:
+        if self.update_workers > 1 and len(repo_urls) > 1:
+            results = self._update_concurrent(repo_urls)
+        else:
+            results = [self._update_one(url) for url in repo_urls]
+
+        failed = [r['url'] for r in results if not r['success']]
+        if failed:
+            self.error_flag = True
+            self.logger.error(f"{len(failed)} repository update(s) failed: {', '.join(failed)}")
+        return list(skipped.values()) + results
+
+    def _skip_fresh(self, repo_urls: list, repo_paths: dict) -> dict:
+        """Return {url: result} for repositories that do not need a pull."""
+        if not (self.freshness_check or self.fresh_minutes) or not repo_urls:
+            return {}
+
+        workers = min(16, max(self.update_workers, 4), len(repo_urls))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            reasons = list(pool.map(
+                lambda url: self._freshness_reason(repo_paths.get(url, ''), url), repo_urls
+            ))
+
+        skipped = {}
+        for url, reason in zip(repo_urls, reasons):
+            if reason:
+                self.logger.info(f"Skipping {url}: {reason}")
+                skipped[url] = {'url': url, 'success': True, 'seconds': 0.0, 'skipped': True}
+        if skipped:
+            self.logger.info(f"Skipped {len(skipped)} repository update(s)")
+        return skipped
+
+    def _freshness_reason(self, path: str, url: str) -> Optional[str]:
+        """Return why the checkout at *path* can skip its pull, or None.
+
+        Anything that prevents a decision (not a git checkout, no upstream,
+        remote unreachable) returns None so the repository is pulled as usual.
+        """
+        if not path:
+            return None
+
+        if self.fresh_minutes:
             try:
-                run_cmd([
-                    str(self.autopkg_fpath),
-                    "repo-update",
-                    url,
-                ], self.logger)
-            except subprocess.CalledProcessError:
-                self.logger.error(f"Failed to update repository {url}")
-    
+                age = time.time() - (Path(path) / '.git' / 'FETCH_HEAD').stat().st_mtime
+            except OSError:
+                age = None
+            if age is not None and age < self.fresh_minutes * 60:
+                return f"fetched {age / 60:.0f} minute(s) ago"
+
+        if not self.freshness_check:
+            return None
+        local = _git(path, 'rev-parse', 'HEAD')
+        if not local:
+            return None
+        # Compare against the branch this checkout tracks, or the remote's
+        # default branch when there is no upstream configured.
+        upstream = _git(path, 'rev-parse', '--abbrev-ref', '--symbolic-full-name', '@{u}')
+        ref = f"refs/heads/{upstream.split('/', 1)[1]}" if '/' in upstream else 'HEAD'
+        remote = _git(path, 'ls-remote', url, ref).split()
+        if remote and remote[0] == local:
+            return f"already at remote {ref} ({local[:7]})"
+        return None
+
+    def _update_one(self, url: str) -> dict:
+        started = time.monotonic()
+        try:
+            run_cmd([
+                str(self.autopkg_fpath),
+                "repo-update",
+                url,
+            ], self.logger)
+            success = True
+        except subprocess.CalledProcessError:
+            success = False
+        return self._record(url, success, time.monotonic() - started)
+
+    def _update_concurrent(self, repo_urls: list) -> list:
+        """Run ``autopkg repo-update`` for every URL through a bounded pool."""
+        started: dict = {}
+        results: dict = {}
+
+        def _on_proc(proc):
+            started[proc.args[-1]] = time.monotonic()
+
+        def _on_exit(proc):
+            url = proc.args[-1]
+            results[url] = self._record(
+                url, proc.returncode == 0, time.monotonic() - started.pop(url)
+            )
+
+        self.logger.info(f"Updating {len(repo_urls)} repositories ({self.update_workers} at a time)")
+        run_cmds(
+            [(url, [str(self.autopkg_fpath), "repo-update", url]) for url in repo_urls],
+            self.logger,
+            max_workers=self.update_workers,
+            on_proc=_on_proc,
+            on_exit=_on_exit,
+        )
+        return [results[url] for url in repo_urls if url in results]
+
+    def _record(self, url: str, success: bool, elapsed: float) -> dict:
+        """Log and return the outcome of a single repository update."""
+        if success:
+            self.logger.info(f"Updated {url} in {elapsed:.1f}s")
+        else:
+            self.logger.error(f"Failed to update repository {url} after {elapsed:.1f}s")
+        return {'url': url, 'success': success, 'seconds': round(elapsed, 3), 'skipped': False}
+
     def post_check(self):
         if self.update_before_each_run:
             if self.error_flag:
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import os
 import uuid
+from pathlib import Path
 from datetime import datetime, timezone, timedelta
 from unittest.mock import patch
 
@@ -17,13 +18,50 @@ def _no_recipe_cache_thread(request):
     The _build() thread opens Django DB connections that can outlive test
     teardown, producing ResourceWarning noise. Mark a test with
     ``@pytest.mark.real_cache_build`` to skip this patch and exercise the
-    real function.
+    real function.  The recipe watcher thread is never started.
     """
-    if request.node.get_closest_marker('real_cache_build'):
-        yield
-    else:
-        with patch('webapp.views.recipes._start_cache_build'):
+    with patch('webapp.views.recipes.start_recipe_watcher'):
+        if request.node.get_closest_marker('real_cache_build'):
             yield
+        else:
+            with patch('webapp.views.recipes._start_cache_build'):
+                yield
+
+@pytest.fixture(autouse=True)
+def _fresh_settings_snapshot(settings, tmp_path):
+    """Start every test without a Setting snapshot, keeping version stamps in tmp_path.
+
+    Rolling back a test's transaction sends no signal, so a snapshot loaded
+    during one test would otherwise leak its rows into the next.
+    """
+    from webapp import settings_cache
+    settings.SETTINGS_STAMP = tmp_path / 'settings.stamp'
+    settings.CREDENTIALS_STAMP = tmp_path / 'credentials.stamp'
+    settings_cache.clear()
+    yield
+    settings_cache.clear()
+
+@pytest.fixture(autouse=True)
+def _isolated_recipe_file_index(monkeypatch, tmp_path):
+    """Keep each test's recipe file index (webapp.recipe_files) in its tmp_path."""
+    from webapp import recipe_files
+    monkeypatch.setattr(recipe_files, 'index_path', lambda: tmp_path / 'recipe-files.json')
+    recipe_files._state.update(index=None, stamp=None)
+    yield
+    recipe_files._state.update(index=None, stamp=None)
+
+@pytest.fixture(autouse=True)
+def _isolated_run_events_dir(settings):
+    """Bind each test's run event sockets (webapp.event_channel) in a temp dir.
+
+    AF_UNIX paths are limited to ~104 bytes, too short for pytest's tmp_path.
+    """
+    import tempfile
+    from webapp.event_channel import event_channel
+    with tempfile.TemporaryDirectory(prefix='ev') as d:
+        settings.RUN_EVENTS_DIR = Path(d) / 'run-events'
+        yield
+        event_channel.close()
 
 # Ensure the required environment variable is present before Django loads.
 os.environ.setdefault('DJANGO_SECRET_KEY', 'test-secret-key-not-for-production')
@@ -227,3 +265,74 @@ def schedule(db):
     s.month = '*'
     s.save()
     return s
+
+
+# ---------------------------------------------------------------------------
+# Offline git fixtures
+# ---------------------------------------------------------------------------
+
+_FAKE_AUTOPKG_REPOS = '''\
+import json, subprocess, sys
+repos = json.load(open({state!r}))
+if sys.argv[1] == 'repo-list':
+    for clone, url in repos.items():
+        print(f'{{clone}} ({{url}})')
+elif sys.argv[1] == 'repo-update':
+    clone = next(c for c, u in repos.items() if u == sys.argv[2])
+    sys.exit(subprocess.call(['git', '-C', clone, 'pull', '-q']))
+'''
+
+
+@pytest.fixture
+def local_git_repos(tmp_path):
+    """Factory: build *count* bare repos with local clones, offline.
+
+    Returns ``(autopkg_path, repos)`` where *autopkg_path* is a stand-in
+    ``autopkg`` executable that understands ``repo-list`` and
+    ``repo-update <url>`` (a ``git pull`` of the matching clone), and
+    *repos* is a list of ``{'url', 'bare', 'clone'}`` dicts.  Bare repos
+    play the role of the GitHub remotes, so UpdateRepos can be exercised
+    and timed without a network.
+
+    Usage::
+
+        def test_something(local_git_repos):
+            autopkg, repos = local_git_repos(3)
+    """
+    import json
+    import shutil
+    import subprocess
+    import sys
+
+    if shutil.which('git') is None:
+        pytest.skip('git is not installed')
+
+    def _git(*args, cwd=None):
+        subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True,
+                       env={**os.environ,
+                            'GIT_AUTHOR_NAME': 'test', 'GIT_AUTHOR_EMAIL': 'test@example.com',
+                            'GIT_COMMITTER_NAME': 'test', 'GIT_COMMITTER_EMAIL': 'test@example.com'})
+
+    def _make(count):
+        repos = []
+        for i in range(count):
+            bare = tmp_path / f'remote-{i}.git'
+            seed = tmp_path / f'seed-{i}'
+            clone = tmp_path / f'clone-{i}'
+            _git('init', '-q', '--bare', str(bare))
+            _git('clone', '-q', str(bare), str(seed))
+            (seed / 'Example.recipe').write_text(f'recipe {i}\n')
+            _git('add', '.', cwd=seed)
+            _git('commit', '-q', '-m', 'initial', cwd=seed)
+            _git('push', '-q', 'origin', 'HEAD', cwd=seed)
+            _git('clone', '-q', str(bare), str(clone))
+            repos.append({'url': bare.as_uri(), 'bare': bare, 'clone': clone, 'seed': seed})
+
+        state = tmp_path / 'repos.json'
+        state.write_text(json.dumps({str(r['clone']): r['url'] for r in repos}))
+        autopkg = tmp_path / 'autopkg'
+        autopkg.write_text(f'#!{sys.executable}\n' + _FAKE_AUTOPKG_REPOS.format(state=str(state)))
+        autopkg.chmod(0o755)
+        return autopkg, repos
+
+    return _make
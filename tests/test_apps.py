@@ -88,6 +88,24 @@ class TestStartServices:
         mock_sched.assert_called_once()
         mock_mark.assert_called_once()
 
+    @pytest.mark.parametrize('holds_lock', [True, False])
+    def test_only_the_scheduler_worker_watches_recipes(self, holds_lock, tmp_path, monkeypatch):
+        import tempfile
+        from webapp.apps import WebappConfig
+
+        monkeypatch.setattr(tempfile, 'gettempdir', lambda: str(tmp_path))
+        cfg = WebappConfig('webapp', __import__('webapp'))
+        with patch('webapp.scheduler.acquire_scheduler_lock', return_value=holds_lock), \
+             patch('webapp.scheduler.start_scheduler') as mock_sched, \
+             patch('webapp.views.recipes.start_recipe_watcher') as mock_watch, \
+             patch('webapp.views.recipes._start_cache_build'), \
+             patch('webapp.recipe_index._fetch'), \
+             patch.object(cfg, '_mark_interrupted_runs'):
+            cfg._start_services_in_worker()
+
+        assert mock_sched.called is holds_lock
+        assert mock_watch.called is holds_lock
+
 
 def _load_original_apps_module():
     """Load a fresh, unpatched copy of webapp.apps from source.
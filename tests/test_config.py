@@ -31,6 +31,14 @@ class TestConfigFromSettings:
         config = config_from_settings()
         assert config.garbage_collector.keep_versions == 7
 
+    def test_run_shards_clamped(self):
+        from webapp.models import Setting
+        from libs.config import MAX_RUN_SHARDS, config_from_settings
+        Setting.set('workflow.run_shards', '500')
+        assert config_from_settings().run_shards == MAX_RUN_SHARDS
+        Setting.set('workflow.run_shards', '-3')
+        assert config_from_settings().run_shards == 1
+
 
 @pytest.mark.django_db
 class TestPipelineConfigToDict:
@@ -99,5 +99,124 @@ class TestDBLogHandler:
         record.level_name = 'ERROR'
         record.message = 'boom'
 
-        with patch('webapp.models.LogEntry.objects.create', side_effect=Exception('DB down')):
+        with patch('webapp.models.LogEntry.objects.bulk_create', side_effect=Exception('DB down')):
             handler.emit(record)  # must not raise
+
+
+def _record(message, level='INFO'):
+    record = MagicMock()
+    record.level_name = level
+    record.message = message
+    return record
+
+
+@pytest.mark.django_db
+class TestDBLogHandlerBuffered:
+    def test_records_wait_for_flush(self, run):
+        from webapp.db_logger import DBLogHandler, set_run_id
+        from webapp.models import LogEntry
+
+        set_run_id(run.id)
+        handler = DBLogHandler(batch_rows=10, batch_latency=60)
+        handler.emit(_record('one'))
+        handler.emit(_record('two'))
+        assert LogEntry.objects.filter(run=run).count() == 0
+
+        handler.flush()
+        assert list(
+            LogEntry.objects.filter(run=run).order_by('id').values_list('message', flat=True)
+        ) == ['one', 'two']
+        handler.close()
+
+    def test_size_threshold_flushes_in_one_bulk_create(self, run):
+        from webapp.db_logger import DBLogHandler, set_run_id
+        from webapp.models import LogEntry
+
+        set_run_id(run.id)
+        handler = DBLogHandler(batch_rows=3, batch_latency=60)
+        with patch.object(LogEntry.objects, 'create') as create:
+            for i in range(3):
+                handler.emit(_record(f'line {i}'))
+        create.assert_not_called()
+        assert LogEntry.objects.filter(run=run).count() == 3
+        handler.close()
+
+    def test_stage_captured_at_emit_time(self, run):
+        from webapp.db_logger import DBLogHandler, set_run_id, set_current_stage
+        from webapp.models import LogEntry
+
+        set_run_id(run.id)
+        handler = DBLogHandler(batch_rows=10, batch_latency=60)
+        set_current_stage('UpdateRepos')
+        handler.emit(_record('pulling'))
+        set_current_stage('RunAutoPkg')
+        handler.emit(_record('running'))
+        handler.close()
+
+        stages = dict(LogEntry.objects.filter(run=run).values_list('message', 'stage_name'))
+        assert stages == {'pulling': 'UpdateRepos', 'running': 'RunAutoPkg'}
+
+    def test_close_flushes_remaining(self, run):
+        from webapp.db_logger import DBLogHandler, set_run_id
+        from webapp.models import LogEntry
+
+        set_run_id(run.id)
+        handler = DBLogHandler(batch_rows=10, batch_latency=60)
+        handler.emit(_record('last words'))
+        handler.close()
+        assert LogEntry.objects.filter(run=run, message='last words').exists()
+
+    def test_flush_swallows_exceptions(self, run):
+        from webapp.db_logger import DBLogHandler, set_run_id
+
+        set_run_id(run.id)
+        handler = DBLogHandler(batch_rows=10, batch_latency=60)
+        handler.emit(_record('boom'))
+        with patch('webapp.models.LogEntry.objects.bulk_create', side_effect=Exception('DB down')):
+            handler.close()  # must not raise
+
+
+@pytest.mark.django_db(transaction=True)
+class TestDBLogHandlerLatency:
+    def test_latency_threshold_flushes_in_background(self, run):
+        import time
+        from webapp.db_logger import DBLogHandler, set_run_id
+        from webapp.models import LogEntry
+
+        set_run_id(run.id)
+        handler = DBLogHandler(batch_rows=1000, batch_latency=0.05)
+        handler.emit(_record('quiet line'))
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if LogEntry.objects.filter(run=run).exists():
+                break
+            time.sleep(0.02)
+        assert LogEntry.objects.filter(run=run, message='quiet line').exists()
+        handler.close()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestDBLogHandlerWithWriter:
+    def test_batches_are_written_by_the_writer_then_published(self, run):
+        from webapp.db_logger import DBLogHandler, set_run_id
+        from webapp.db_writer import DBWriter
+        from webapp.models import LogEntry
+
+        set_run_id(run.id)
+        writer = DBWriter()
+        handler = DBLogHandler(batch_rows=10, batch_latency=60, writer=writer)
+        handler.emit(_record('one'))
+        handler.emit(_record('two'))
+        with patch('webapp.db_logger._publish') as publish:
+            handler.close()
+            writer.flush()
+        writer.close()
+
+        assert list(
+            LogEntry.objects.filter(run=run).order_by('id').values_list('message', flat=True)
+        ) == ['one', 'two']
+        published = publish.call_args.args[0]
+        assert [e.message for e in published] == ['one', 'two']
+        assert all(e.pk is not None for e in published)
+        assert writer.stats()['writes'] == 1
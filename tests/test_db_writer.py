@@ -0,0 +1,183 @@
+"""Tests for webapp.db_writer.DBWriter."""
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+
+def _run():
+    from webapp.models import Run
+    return Run.objects.create(status='pending', config_snapshot={})
+
+
+@pytest.mark.django_db(transaction=True)
+class TestDBWriter:
+    def test_call_returns_result_from_writer_thread(self):
+        from webapp.db_writer import DBWriter
+
+        writer = DBWriter(name='test-writer')
+        try:
+            run = writer.call(_run)
+            name = writer.call(lambda: threading.current_thread().name)
+        finally:
+            writer.close()
+        assert run.pk is not None
+        assert name == 'test-writer'
+
+    def test_queued_writes_share_a_transaction_in_order(self):
+        from webapp.db_writer import DBWriter
+        from webapp.models import Run
+
+        writer = DBWriter(max_group=64)
+        gate = threading.Event()
+        order = []
+        try:
+            writer.submit(gate.wait)
+            futures = [writer.submit(lambda i=i: order.append(i) or _run()) for i in range(10)]
+            gate.set()
+            for future in futures:
+                future.result(5)
+        finally:
+            writer.close()
+
+        assert order == list(range(10))
+        assert Run.objects.count() == 10
+        stats = writer.stats()
+        assert stats['writes'] == 11
+        # The gate held the queue, so the ten runs were committed together.
+        assert stats['commits'] <= 2
+
+    def test_failing_write_does_not_roll_back_its_neighbours(self):
+        from webapp.db_writer import DBWriter
+        from webapp.models import Run
+
+        def boom():
+            _run()
+            raise ValueError('boom')
+
+        writer = DBWriter()
+        gate = threading.Event()
+        try:
+            writer.submit(gate.wait)
+            before = writer.submit(_run)
+            failing = writer.submit(boom)
+            after = writer.submit(_run)
+            gate.set()
+            before.result(5)
+            after.result(5)
+            with pytest.raises(ValueError):
+                failing.result(5)
+        finally:
+            writer.close()
+
+        assert Run.objects.count() == 2
+        assert writer.stats()['failed'] == 1
+
+    def test_callback_runs_after_commit(self):
+        from django.db import connection
+        from webapp.db_writer import DBWriter
+
+        seen = []
+        writer = DBWriter()
+        try:
+            writer.submit(_run, callback=lambda run: seen.append(
+                (run.pk, connection.in_atomic_block))).result(5)
+        finally:
+            writer.close()
+        assert len(seen) == 1
+        assert seen[0][0] is not None
+        assert seen[0][1] is False
+
+    def test_submit_blocks_while_queue_is_full(self):
+        from webapp.db_writer import DBWriter
+
+        writer = DBWriter(max_pending=1)
+        gate = threading.Event()
+        submitted = threading.Event()
+        try:
+            writer.submit(gate.wait)
+            writer.barrier()          # fills the one queue slot
+
+            def producer():
+                writer.submit(lambda: None)
+                submitted.set()
+
+            t = threading.Thread(target=producer)
+            t.start()
+            assert not submitted.wait(0.2)
+            gate.set()
+            assert submitted.wait(5)
+            t.join()
+        finally:
+            gate.set()
+            writer.close()
+        assert writer.stats()['peak_depth'] == 1
+
+    def test_flush_waits_for_earlier_writes(self):
+        from webapp.db_writer import DBWriter
+        from webapp.models import Run
+
+        writer = DBWriter()
+        try:
+            for _ in range(5):
+                writer.submit(_run)
+            writer.flush(5)
+            assert Run.objects.count() == 5
+        finally:
+            writer.close()
+
+    def test_close_applies_queued_writes_then_rejects_more(self):
+        from webapp.db_writer import DBWriter
+        from webapp.models import Run
+
+        writer = DBWriter()
+        writer.submit(_run)
+        writer.close()
+        assert Run.objects.count() == 1
+        with pytest.raises(RuntimeError):
+            writer.submit(_run)
+
+    def test_stats_report_commit_latency(self):
+        from webapp.db_writer import DBWriter
+
+        writer = DBWriter()
+        try:
+            writer.call(_run)
+        finally:
+            writer.close()
+        stats = writer.stats()
+        assert stats['commits'] == 1
+        assert stats['depth'] == 0
+        assert 0 < stats['commit_p50'] <= stats['commit_p95'] <= stats['commit_max']
+
+    def test_transaction_opened_only_on_the_databases_written(self):
+        """Log batches routed to the log database leave the main one unlocked."""
+        from contextlib import contextmanager
+        from unittest.mock import patch
+        from webapp.db_writer import DBWriter
+        from webapp.models import LogEntry
+
+        opened = []
+
+        @contextmanager
+        def _recording(using=None):
+            opened.append(using)
+            yield
+
+        def _route(model, **hints):
+            return 'logs' if model is LogEntry else 'default'
+
+        writer = DBWriter()
+        try:
+            with patch('django.db.router.db_for_write', side_effect=_route), \
+                 patch('webapp.sqlite_backend.write_transaction', _recording):
+                writer.call(lambda: None, model=LogEntry)
+                logs_only = list(opened)
+                opened.clear()
+                writer.call(lambda: None)
+                writer.flush(5)
+        finally:
+            writer.close()
+        assert logs_only == ['logs', 'logs']
+        assert opened == ['default', 'default']
@@ -0,0 +1,107 @@
+"""Tests for webapp.event_channel - cross-worker run event wake-ups."""
+from __future__ import annotations
+
+import os
+import queue
+import socket
+import tempfile
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def channel_dir():
+    # AF_UNIX paths are limited to ~104 bytes, so avoid pytest's long tmp_path.
+    with tempfile.TemporaryDirectory(prefix='ev') as d:
+        yield Path(d) / 'run-events'
+
+
+def _channel(directory):
+    from webapp.event_channel import EventChannel
+    return EventChannel(directory)
+
+
+class TestEventChannel:
+    def test_publish_reaches_listener(self, channel_dir):
+        received = queue.Queue()
+        listener = _channel(channel_dir)
+        assert listener.listen(received.put) is True
+        try:
+            _channel(channel_dir).publish('run-1', 'log', 42)
+            assert received.get(timeout=5) == {'run': 'run-1', 'kind': 'log', 'id': 42}
+        finally:
+            listener.close()
+        assert not (channel_dir / f'{os.getpid()}.sock').exists()
+
+    def test_listen_is_idempotent(self, channel_dir):
+        listener = _channel(channel_dir)
+        try:
+            assert listener.listen(lambda e: None) is True
+            assert listener.listen(lambda e: None) is True
+        finally:
+            listener.close()
+
+    def test_own_socket_excluded(self, channel_dir):
+        received = queue.Queue()
+        ch = _channel(channel_dir)
+        ch.listen(received.put)
+        try:
+            ch.publish('run-1', 'stage')
+            with pytest.raises(queue.Empty):
+                received.get(timeout=0.2)
+        finally:
+            ch.close()
+
+    def test_stale_socket_removed(self, channel_dir):
+        channel_dir.mkdir(parents=True)
+        stale = channel_dir / '999999.sock'
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        s.bind(str(stale))
+        s.close()   # the file stays behind, as after a crashed worker
+
+        _channel(channel_dir).publish('run-1', 'status')
+        assert not stale.exists()
+
+    def test_publish_without_directory_is_noop(self, channel_dir):
+        _channel(channel_dir).publish('run-1', 'log', 1)   # must not raise
+
+    def test_directory_follows_setting(self, channel_dir, settings):
+        from webapp.event_channel import EventChannel
+        settings.RUN_EVENTS_DIR = channel_dir
+        assert EventChannel().directory == channel_dir
+
+    def test_listen_unavailable_returns_false(self, tmp_path):
+        blocker = tmp_path / 'file'
+        blocker.write_text('')
+        assert _channel(blocker / 'run-events').listen(lambda e: None) is False
+
+
+class TestRemoteWake:
+    def _broadcaster(self):
+        from unittest.mock import patch
+        from webapp.run_broadcaster import RunBroadcaster
+        with patch('webapp.run_broadcaster.threading.Thread'):
+            return RunBroadcaster('run-1')
+
+    def test_remote_event_wakes_broadcaster(self):
+        from webapp.run_broadcaster import _BroadcasterManager
+        manager = _BroadcasterManager()
+        b = self._broadcaster()
+        manager._broadcasters['run-1'] = b
+
+        manager._on_remote_event({'run': 'run-1', 'kind': 'stage', 'id': None})
+        assert b._wake.is_set()
+        assert b._notified is True
+
+    def test_log_event_already_polled_does_not_wake(self):
+        b = self._broadcaster()
+        b._polled_log_id = 10
+        b.remote_wake(last_log_id=10)
+        assert not b._wake.is_set()
+        b.remote_wake(last_log_id=11)
+        assert b._wake.is_set()
+
+    def test_unknown_run_ignored(self):
+        from webapp.run_broadcaster import _BroadcasterManager
+        _BroadcasterManager()._on_remote_event({'run': 'nope', 'kind': 'log', 'id': 1})
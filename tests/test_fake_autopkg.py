@@ -0,0 +1,96 @@
+"""Tests for the benchmark harness: benchmarks.fake_autopkg and benchmarks.pipeline."""
+from __future__ import annotations
+
+import plistlib
+import subprocess
+
+import pytest
+
+
+@pytest.fixture
+def fake_env(monkeypatch):
+    for name in ('LINES', 'LINE_RATE', 'REPOS', 'FAIL_EVERY', 'UNTRUSTED_EVERY', 'FAIL'):
+        monkeypatch.delenv(f'FAKE_AUTOPKG_{name}', raising=False)
+    return monkeypatch
+
+
+class TestFakeAutopkg:
+
+    def test_repo_list_matches_update_repos_format(self, fake_env, capsys):
+        from benchmarks import fake_autopkg
+        fake_env.setenv('FAKE_AUTOPKG_REPOS', '3')
+        assert fake_autopkg.main(['repo-list']) == 0
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 3
+        assert lines[0].endswith(f'({fake_autopkg.repo_urls(1)[0]})')
+
+    def test_repo_update_fails_listed_url(self, fake_env):
+        from benchmarks import fake_autopkg
+        url = fake_autopkg.repo_urls(1)[0]
+        fake_env.setenv('FAKE_AUTOPKG_FAIL', url)
+        assert fake_autopkg.main(['repo-update', url]) == 1
+        assert fake_autopkg.main(['repo-update', 'https://example.com/other']) == 0
+
+    def test_verify_trust_info_is_deterministic(self, fake_env):
+        from benchmarks import fake_autopkg
+        fake_env.setenv('FAKE_AUTOPKG_UNTRUSTED_EVERY', '3')
+        recipes = [f'R{i}.munki' for i in range(30)]
+        first = [fake_autopkg.main(['verify-trust-info', r]) for r in recipes]
+        second = [fake_autopkg.main(['verify-trust-info', r]) for r in recipes]
+        assert first == second
+        assert 0 < sum(first) < len(recipes)
+
+    def test_run_writes_report_plist(self, fake_env, tmp_path, capsys):
+        from benchmarks import fake_autopkg
+        fake_env.setenv('FAKE_AUTOPKG_LINES', '5')
+        fake_env.setenv('FAKE_AUTOPKG_FAIL', 'Bad.munki')
+        report = tmp_path / 'report.plist'
+        code = fake_autopkg.main(['run', 'Good.munki', 'Bad.munki', '--report-plist', str(report),
+                                  '-q', '-k', 'MUNKI_REPO=/tmp/repo'])
+        assert code == fake_autopkg.RECIPE_FAILED_CODE
+        assert len([l for l in capsys.readouterr().out.splitlines() if l.startswith('Good.munki')]) == 4
+        with open(report, 'rb') as f:
+            data = plistlib.load(f)
+        assert [f['recipe'] for f in data['failures']] == ['Bad.munki']
+        rows = data['summary_results']['munki_importer_summary_result']['data_rows']
+        assert [r['name'] for r in rows] == ['Good']
+
+    def test_unknown_verb(self, fake_env):
+        from benchmarks import fake_autopkg
+        assert fake_autopkg.main(['frobnicate']) == 1
+
+    def test_installed_wrapper_is_executable(self, fake_env, tmp_path):
+        from benchmarks import fake_autopkg
+        path = fake_autopkg.install(tmp_path)
+        out = subprocess.run([str(path), 'verify-trust-info', 'Firefox.munki'],
+                             capture_output=True, text=True, check=True).stdout
+        assert out.strip() == 'Firefox.munki: OK'
+
+
+class TestPercentiles:
+
+    def test_nearest_rank(self):
+        from benchmarks.pipeline import percentiles
+        stats = percentiles([float(i) for i in range(1, 101)])
+        assert (stats['p50'], stats['p95'], stats['p99'], stats['max']) == (50, 95, 99, 100)
+        assert stats['count'] == 100
+
+    def test_empty(self):
+        from benchmarks.pipeline import percentiles
+        assert percentiles([]) == {}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_pipeline_benchmark_end_to_end(fake_env, tmp_path):
+    """A small run through the real runner, orchestrator and stages."""
+    from benchmarks.pipeline import build_parser, run_pipeline
+    from webapp.models import RecipeResult
+
+    opts = build_parser().parse_args(['--recipes', '5', '--lines', '4', '--repos', '2'])
+    result = run_pipeline(opts, tmp_path)
+
+    assert result['status'] == 'success'
+    assert result['log_lines'] > 5 * 4
+    assert result['sse_log_frames'] == result['log_lines']
+    assert result['db_write_seconds']['count'] > 0
+    assert RecipeResult.objects.filter(result_type='munki_import').exists()
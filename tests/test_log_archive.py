@@ -0,0 +1,196 @@
+"""Tests for webapp.log_archive - compressing finished runs' logs."""
+from __future__ import annotations
+
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.core.management import call_command
+
+T0 = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _log(run, message, stage='', level='INFO', seconds=0):
+    from webapp.models import LogEntry
+    return LogEntry.objects.create(run=run, message=message, stage_name=stage, level=level,
+                                   timestamp=T0 + timedelta(seconds=seconds))
+
+
+def _seed(run):
+    return [
+        _log(run, 'starting', seconds=0),
+        _log(run, 'pulling repo', 'Update Repos', seconds=1),
+        _log(run, 'Firefox: URLDownloader – ok ✓', 'Run AutoPkg', seconds=2),
+        _log(run, 'HTTP 404', 'Run AutoPkg', level='ERROR', seconds=3),
+        _log(run, 'repo updated', 'Update Repos', seconds=4),
+    ]
+
+
+@pytest.mark.django_db
+class TestArchiveRun:
+    @pytest.mark.parametrize('codec', ['zlib', 'lzma'])
+    def test_round_trip_replaces_rows(self, run, codec):
+        from webapp.log_archive import archive_run, run_log_entries
+        from webapp.models import LogEntry, RunLogArchive
+
+        rows = _seed(run)
+        result = archive_run(run.id, codec)
+
+        assert result.entries == 5
+        assert not LogEntry.objects.filter(run=run).exists()
+        archive = RunLogArchive.objects.get(run=run)
+        assert archive.codec == codec
+        assert archive.last_log_id == rows[-1].id
+        assert archive.compressed_bytes == len(bytes(archive.data))
+
+        entries = run_log_entries(run.id)
+        assert [(e.id, e.timestamp, e.level, e.message, e.stage_name) for e in entries] == \
+               [(r.id, r.timestamp, r.level, r.message, r.stage_name) for r in rows]
+
+    def test_stage_index_reads_one_segment(self, run):
+        from webapp.log_archive import archive_run, run_log_entries
+        from webapp.models import RunLogArchive
+
+        _seed(run)
+        archive_run(run.id)
+        index = RunLogArchive.objects.get(run=run).stage_index
+        assert {name: count for name, (_, _, count, _) in index.items()} == \
+               {'': 1, 'Update Repos': 2, 'Run AutoPkg': 2}
+
+        with pytest.MonkeyPatch.context() as mp:
+            import zlib
+            calls = []
+            real = zlib.decompress
+            mp.setattr(zlib, 'decompress', lambda data: calls.append(data) or real(data))
+            from webapp import log_archive
+            mp.setitem(log_archive.CODECS, 'zlib', (log_archive.CODECS['zlib'][0], zlib.decompress))
+            entries = run_log_entries(run.id, stage='Update Repos')
+        assert [e.message for e in entries] == ['pulling repo', 'repo updated']
+        assert len(calls) == 1
+
+    def test_after_id_and_id_order(self, run):
+        from webapp.log_archive import archive_run, run_log_entries
+
+        rows = _seed(run)
+        archive_run(run.id)
+        entries = run_log_entries(run.id, after_id=rows[2].id, by_id=True)
+        assert [e.id for e in entries] == [rows[3].id, rows[4].id]
+        assert run_log_entries(run.id, after_id=rows[-1].id) == []
+
+    @pytest.mark.parametrize('codec', ['zlib', 'lzma'])
+    def test_iter_streams_segments_without_decoding_them_whole(self, run, codec, monkeypatch):
+        from webapp import log_archive
+        from webapp.log_archive import archive_run, iter_run_log_entries
+
+        rows = _seed(run)
+        archive_run(run.id, codec)
+        late = _log(run, 'late line', 'Notify', seconds=10)
+        monkeypatch.setattr(log_archive, '_STREAM_CHUNK', 7)
+        monkeypatch.setattr(log_archive, 'read_archive', None)
+        monkeypatch.setitem(log_archive.CODECS, codec, (log_archive.CODECS[codec][0], None))
+
+        assert [e.id for e in iter_run_log_entries(run.id)] == [r.id for r in rows] + [late.id]
+        assert [e.message for e in iter_run_log_entries(run.id, stage='Run AutoPkg',
+                                                         after_id=rows[2].id)] == ['HTTP 404']
+
+    def test_late_rows_merge_into_existing_archive(self, run):
+        from webapp.log_archive import archive_run, run_log_count, run_log_entries
+
+        _seed(run)
+        archive_run(run.id)
+        _log(run, 'late line', 'Notify', seconds=10)
+        assert run_log_count(run.id) == 6
+        assert run_log_entries(run.id)[-1].message == 'late line'
+
+        result = archive_run(run.id)
+        assert result.entries == 6
+        assert [e.message for e in run_log_entries(run.id)][-1] == 'late line'
+
+    def test_nothing_to_archive(self, run):
+        from webapp.log_archive import archive_run
+        from webapp.models import RunLogArchive
+
+        assert archive_run(run.id) is None
+        assert not RunLogArchive.objects.exists()
+
+    def test_unknown_codec_rejected(self, run):
+        from webapp.log_archive import archive_run
+        with pytest.raises(ValueError):
+            archive_run(run.id, 'bz2')
+
+    def test_archive_codec_setting(self):
+        from webapp.log_archive import archive_codec
+        from webapp.models import Setting
+
+        assert archive_codec() == 'zlib'
+        Setting.set('logging.archive_codec', 'lzma')
+        assert archive_codec() == 'lzma'
+        Setting.set('logging.archive_codec', 'off')
+        assert archive_codec() is None
+
+    def test_deleting_run_deletes_archive(self, run):
+        from webapp.log_archive import archive_run
+        from webapp.models import RunLogArchive
+
+        _seed(run)
+        archive_run(run.id)
+        run.delete()
+        assert not RunLogArchive.objects.exists()
+
+
+@pytest.mark.django_db
+class TestArchiveLogsCommand:
+    def test_archives_finished_runs_only(self, run, pending_run):
+        from webapp.models import LogEntry, RunLogArchive
+
+        _seed(run)
+        _log(pending_run, 'still going')
+        out = io.StringIO()
+        call_command('archive_logs', '--codec', 'lzma', stdout=out)
+
+        assert 'Archived 1 run(s), 5 log line(s) with lzma' in out.getvalue()
+        assert RunLogArchive.objects.get().run_id == run.id
+        assert LogEntry.objects.filter(run=pending_run).count() == 1
+
+    def test_dry_run_changes_nothing(self, run):
+        from webapp.models import LogEntry
+
+        _seed(run)
+        out = io.StringIO()
+        call_command('archive_logs', '--dry-run', stdout=out)
+        assert 'Would archive 1 run(s), 5 log line(s)' in out.getvalue()
+        assert LogEntry.objects.count() == 5
+
+    def test_report(self, run):
+        _seed(run)
+        call_command('archive_logs', stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('archive_logs', '--report', stdout=out)
+        assert 'Archived runs:      1' in out.getvalue()
+        assert 'Archived lines:     5' in out.getvalue()
+
+    def test_nothing_to_do(self, db):
+        out = io.StringIO()
+        call_command('archive_logs', stdout=out)
+        assert 'No finished runs' in out.getvalue()
+
+    def test_vacuum_converts_database_with_nothing_to_archive(self, db, tmp_path, monkeypatch):
+        import sqlite3
+        from django.db.utils import ConnectionHandler
+        from webapp.management.commands.archive_logs import Command
+
+        path = tmp_path / 'old.sqlite3'
+        with sqlite3.connect(path) as old:
+            old.execute('CREATE TABLE t (x)')
+        handler = ConnectionHandler({'default': {'ENGINE': 'webapp.sqlite_backend', 'NAME': str(path)}})
+        conn = handler['default']
+        monkeypatch.setattr(Command, '_log_databases', lambda self: {conn})
+        try:
+            out = io.StringIO()
+            call_command('archive_logs', '--vacuum', stdout=out)
+        finally:
+            conn.close()
+        assert 'No finished runs' in out.getvalue()
+        assert 'default: database file' in out.getvalue()
+        with sqlite3.connect(path) as check:
+            assert check.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
@@ -82,6 +82,50 @@ class TestSetting:
         result = Setting.get_all()
         assert result['autopkg.bin_path'] == '/custom/autopkg'
 
+    def test_set_many_writes_new_and_existing_keys(self):
+        from webapp.models import Setting
+        Setting.set('gc.keep_versions', '3')
+        Setting.set_many({'gc.keep_versions': '5', 'logging.level': 'DEBUG',
+                          'repository.password': 'secret'})
+        assert Setting.get('gc.keep_versions') == '5'
+        assert Setting.get('logging.level') == 'DEBUG'
+        assert Setting.objects.filter(key='gc.keep_versions').count() == 1
+        assert Setting.objects.get(key='repository.password').value != 'secret'
+        assert Setting.get('repository.password') == 'secret'
+
+    def test_get_reads_from_one_snapshot(self, django_assert_num_queries):
+        from webapp.models import Setting
+        Setting.set('gc.keep_versions', '4')
+        with django_assert_num_queries(1):
+            assert Setting.get('gc.keep_versions') == '4'
+            assert Setting.get('logging.level') == 'INFO'
+            assert Setting.get_all()['gc.keep_versions'] == '4'
+
+    def test_snapshot_dropped_on_save_and_delete(self):
+        from webapp.models import Setting
+        assert Setting.get('gc.keep_versions') == '3'
+        row = Setting.objects.create(key='gc.keep_versions', value='9')
+        assert Setting.get('gc.keep_versions') == '9'
+        row.delete()
+        assert Setting.get('gc.keep_versions') == '3'
+
+    def test_snapshot_reloaded_when_stamp_changes(self):
+        """Another worker's write: the row changes behind the model, then the stamp."""
+        from webapp import settings_cache
+        from webapp.models import Setting
+        Setting.set('gc.keep_versions', '4')
+        assert Setting.get('gc.keep_versions') == '4'
+        Setting.objects.filter(key='gc.keep_versions').update(value='6')
+        assert Setting.get('gc.keep_versions') == '4'
+        settings_cache._bump_stamp()
+        assert Setting.get('gc.keep_versions') == '6'
+
+    def test_stamp_lives_at_the_configured_path(self, settings, tmp_path):
+        from webapp import settings_cache
+        settings.SETTINGS_STAMP = tmp_path / 'elsewhere.stamp'
+        settings_cache._bump_stamp()
+        assert (tmp_path / 'elsewhere.stamp').exists()
+
 
 # ---------------------------------------------------------------------------
 # Schedule (singleton)
@@ -294,6 +338,23 @@ class TestModelStrMethods:
         s = StageExecution.objects.create(run=run, name='Stage', status='running', order=0)
         assert s.duration is None
 
+    def test_stage_execution_usage_summary(self, run):
+        from webapp.models import StageExecution
+        s = StageExecution.objects.create(run=run, name='Stage', status='success', order=0,
+                                          resource_usage={'cpu_user': 1.0, 'cpu_system': 0.5,
+                                                          'child_cpu_user': 2.0, 'subprocesses': 3,
+                                                          'block_in': 1, 'child_block_in': 4})
+        summary = s.usage_summary
+        assert summary['cpu_seconds'] == pytest.approx(1.5)
+        assert summary['child_cpu_seconds'] == pytest.approx(2.0)
+        assert summary['subprocesses'] == 3
+        assert summary['block_in'] == 5
+
+    def test_stage_execution_usage_summary_empty(self, run):
+        from webapp.models import StageExecution
+        s = StageExecution.objects.create(run=run, name='Stage', status='running', order=0)
+        assert s.usage_summary == {}
+
     def test_log_entry_str(self, run):
         from webapp.models import LogEntry
         from datetime import datetime, timezone
@@ -2,6 +2,8 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
+import threading
+from contextlib import contextmanager
 from unittest.mock import MagicMock, call, patch
 
 import pytest
@@ -11,7 +13,8 @@ import pytest
 # FakeStage helpers
 # ---------------------------------------------------------------------------
 
-def _make_fake_stage_class(name: str, should_raise: bool = False, cleanup_fn=None):
+def _make_fake_stage_class(name: str, should_raise: bool = False, cleanup_fn=None,
+                           depends_on=None, run_fn=None):
     """Return a Stage-compatible class for testing the orchestrator.
 
     Uses ``type()`` so that the ``run`` method is defined at class-creation
@@ -22,10 +25,12 @@ def _make_fake_stage_class(name: str, should_raise: bool = False, cleanup_fn=Non
     from libs.stage import Stage
 
     def run(self):
+        if run_fn is not None:
+            run_fn()
         if should_raise:
             raise RuntimeError(f'{name} failed')
 
-    attrs: dict = {'name': name, 'run': run}
+    attrs: dict = {'name': name, 'run': run, 'depends_on': depends_on}
     if cleanup_fn:
         attrs['cleanup'] = cleanup_fn
 
@@ -155,6 +160,28 @@ class TestExecute:
         names_statuses = [(c[0], c[1]) for c in calls]
         assert ('FailStage', 'failed') in names_statuses
 
+    def test_stage_callback_receives_resource_usage_when_finished(self):
+        callback = MagicMock()
+        orch, _ = self._make_orch_with_fakes(('MyStage', False))
+        orch.stage_callback = callback
+        orch.execute()
+        by_status = {c[0][1]: c for c in callback.call_args_list}
+        assert len(by_status['running'][0]) == 3
+        usage = by_status['success'][1]['usage']
+        assert usage['subprocesses'] == 0
+        assert 'cpu_user' in usage and 'peak_rss' in usage
+
+    def test_three_argument_callback_sees_finished_stages(self):
+        seen = []
+
+        def callback(stage_name, status, timestamp):
+            seen.append((stage_name, status))
+
+        orch, _ = self._make_orch_with_fakes(('MyStage', False))
+        orch.stage_callback = callback
+        orch.execute()
+        assert ('MyStage', 'success') in seen
+
     def test_callback_exception_does_not_propagate(self):
         def bad_callback(*args):
             raise RuntimeError('callback exploded')
@@ -164,3 +191,111 @@ class TestExecute:
         # Should not raise despite bad callback
         result = orch.execute()
         assert result is True
+
+
+# ---------------------------------------------------------------------------
+# Dependency graph
+# ---------------------------------------------------------------------------
+
+class TestStageDependencies:
+    def _make_orch(self, classes, **kwargs):
+        from libs.orchestrator import Orchestrator
+        orch = Orchestrator(config=MagicMock(), logger=MagicMock(), **kwargs)
+        orch.STAGE_CLASSES = classes
+        orch.configure_stages(None)
+        return orch
+
+    def test_default_pipeline_overlaps_mount_and_update(self):
+        from libs.orchestrator import Orchestrator
+        from stages import MountRepository, UpdateRepos, RunAutoPkg
+        assert MountRepository.depends_on == ('EnvironmentCheck',)
+        assert UpdateRepos.depends_on == ('EnvironmentCheck',)
+        assert set(RunAutoPkg.depends_on) == {'MountRepository', 'TrustVerification'}
+        names = {cls.__name__ for cls in Orchestrator.STAGE_CLASSES}
+        for cls in Orchestrator.STAGE_CLASSES:
+            assert set(cls.depends_on or ()) <= names
+
+    def test_undeclared_dependencies_run_in_order(self):
+        order = []
+        classes = [
+            _make_fake_stage_class(n, run_fn=lambda n=n: order.append(n))
+            for n in ('A', 'B', 'C')
+        ]
+        assert self._make_orch(classes).execute() is True
+        assert order == ['A', 'B', 'C']
+
+    def test_independent_stages_run_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+        A = _make_fake_stage_class('A', depends_on=())
+        B = _make_fake_stage_class('B', depends_on=('A',), run_fn=barrier.wait)
+        C = _make_fake_stage_class('C', depends_on=('A',), run_fn=barrier.wait)
+        D = _make_fake_stage_class('D', depends_on=('B', 'C'))
+        callback = MagicMock()
+        orch = self._make_orch([A, B, C, D], stage_callback=callback)
+        # A broken barrier (stages serialised) raises and fails the run.
+        assert orch.execute() is True
+        statuses = [(c[0][0], c[0][1]) for c in callback.call_args_list]
+        assert statuses.index(('D', 'running')) > statuses.index(('B', 'success'))
+        assert statuses.index(('D', 'running')) > statuses.index(('C', 'success'))
+
+    def test_thread_context_wraps_worker_stages(self):
+        entered = []
+
+        @contextmanager
+        def ctx():
+            entered.append(threading.current_thread().name)
+            yield
+
+        barrier = threading.Barrier(2, timeout=5)
+        A = _make_fake_stage_class('A', depends_on=(), run_fn=barrier.wait)
+        B = _make_fake_stage_class('B', depends_on=(), run_fn=barrier.wait)
+        orch = self._make_orch([A, B], thread_context=ctx)
+        assert orch.execute() is True
+        assert len(entered) == 2
+        assert threading.current_thread().name not in entered
+
+    def test_failure_skips_dependents_and_cleans_up_completed(self):
+        cleaned = []
+        barrier = threading.Barrier(2, timeout=5)
+
+        def cleanup(self):
+            cleaned.append(self.name)
+
+        A = _make_fake_stage_class('A', depends_on=(), cleanup_fn=cleanup)
+        B = _make_fake_stage_class('B', depends_on=('A',), should_raise=True,
+                                   run_fn=barrier.wait, cleanup_fn=cleanup)
+        C = _make_fake_stage_class('C', depends_on=('A',), run_fn=barrier.wait,
+                                   cleanup_fn=cleanup)
+        D_run = MagicMock()
+        D = _make_fake_stage_class('D', depends_on=('B', 'C'), run_fn=D_run)
+        callback = MagicMock()
+        orch = self._make_orch([A, B, C, D], stage_callback=callback)
+        assert orch.execute() is False
+        D_run.assert_not_called()
+        assert cleaned == ['C', 'A']
+        statuses = [(c[0][0], c[0][1]) for c in callback.call_args_list]
+        assert ('B', 'failed') in statuses
+
+    def test_cancel_stops_before_next_stage(self):
+        cancel = threading.Event()
+        B_run = MagicMock()
+        A = _make_fake_stage_class('A', run_fn=cancel.set)
+        B = _make_fake_stage_class('B', run_fn=B_run)
+        orch = self._make_orch([A, B])
+        assert orch.execute(cancel_flag=cancel) is False
+        B_run.assert_not_called()
+
+    def test_unresolvable_dependencies_fail(self):
+        A = _make_fake_stage_class('A', depends_on=('B',))
+        B = _make_fake_stage_class('B', depends_on=('A',))
+        orch = self._make_orch([A, B])
+        assert orch.execute() is False
+
+    def test_unconfigured_dependencies_are_ignored(self):
+        from libs.orchestrator import Orchestrator
+        from stages import GarbageCollector
+        orch = Orchestrator(config=MagicMock(), logger=MagicMock())
+        orch.configure_stages(override_stage_name='GarbageCollector')
+        deps = orch._dependencies(orch.stages)
+        assert deps == {orch.stages[0]: set()}
+        assert isinstance(orch.stages[0], GarbageCollector)
@@ -0,0 +1,117 @@
+"""Tests for webapp.recipe_events - per-recipe history."""
+from __future__ import annotations
+
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.core.management import call_command
+
+T0 = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class TestEventName:
+    @pytest.mark.parametrize('row, name', [
+        ({'name': 'Firefox', 'version': '1'}, 'Firefox'),
+        ({'recipe_id': 'Broken.munki', 'recipe': '/r/Broken.munki.recipe'}, 'Broken.munki'),
+        ({'recipe': 'Chrome.munki'}, 'Chrome.munki'),
+        ({'download_path': '/Users/a/Library/AutoPkg/Cache/local.munki.Zoom/downloads/Zoom.pkg'},
+         'local.munki.Zoom'),
+        ({'pkg_path': '/tmp/Thing-1.0.pkg'}, 'Thing-1.0.pkg'),
+        ({'url': 'https://example.com/x.dmg'}, ''),
+        ('not a dict', ''),
+    ])
+    def test_names(self, row, name):
+        from webapp.recipe_events import event_name
+        assert event_name(row) == name
+
+
+class TestRecipeKey:
+    @pytest.mark.parametrize('name', [
+        'Firefox', 'Firefox.munki', 'Firefox.download', 'local.munki.Firefox',
+        'com.github.autopkg.download.firefox', '/r/Firefox.munki.recipe', 'Firefox.munki.recipe.yaml',
+    ])
+    def test_spellings_of_one_recipe_share_a_key(self, name):
+        from webapp.recipe_events import recipe_key
+        assert recipe_key(name) == 'firefox'
+
+    def test_other_dots_are_kept(self):
+        from webapp.recipe_events import recipe_key
+        assert recipe_key('Node.js') == 'node.js'
+        assert recipe_key('local.munki.Node.js') == 'node.js'
+
+
+def _result(run, result_type, rows):
+    from webapp.models import RecipeResult
+    return RecipeResult.objects.create(run=run, result_type=result_type, data=rows)
+
+
+@pytest.mark.django_db
+class TestHistory:
+    def test_newest_first_and_filtered_by_type(self):
+        from webapp.models import RecipeEvent, Run
+        from webapp.recipe_events import build_events, history
+
+        runs = [Run.objects.create(status='success', config_snapshot={}) for _ in range(3)]
+        for i, run in enumerate(runs):
+            RecipeEvent.objects.bulk_create(build_events(
+                run.id, 'munki_import', [{'name': 'Firefox', 'version': f'12{i}.0'}],
+                T0 + timedelta(days=i)))
+        RecipeEvent.objects.bulk_create(build_events(
+            runs[2].id, 'failure', [{'recipe_id': 'Firefox'}], T0 + timedelta(days=3)))
+
+        assert [e.event_type for e in history('Firefox')] == ['failure', 'munki_import',
+                                                              'munki_import', 'munki_import']
+        last = history('Firefox', 'munki_import', limit=1)
+        assert [(e.version, e.run_id) for e in last] == [('122.0', runs[2].id)]
+        assert history('Chrome') == []
+
+    def test_one_lookup_finds_every_result_type(self):
+        from webapp.models import RecipeEvent, Run
+        from webapp.recipe_events import build_events, history
+
+        run = Run.objects.create(status='success', config_snapshot={})
+        for result_type, row in [
+            ('munki_import', {'name': 'Firefox', 'version': '125.0'}),
+            ('failure', {'recipe': 'Firefox.munki', 'message': 'boom'}),
+            ('trust_updated', {'recipe': 'Firefox.munki'}),
+            ('url_downloaded',
+             {'download_path': '/Users/a/Library/AutoPkg/Cache/local.munki.Firefox/downloads/Firefox.dmg'}),
+            ('munki_import', {'name': 'Chrome'}),
+        ]:
+            RecipeEvent.objects.bulk_create(build_events(run.id, result_type, [row], T0))
+
+        expected = {'munki_import', 'failure', 'trust_updated', 'url_downloaded'}
+        assert {e.event_type for e in history('Firefox')} == expected
+        assert {e.event_type for e in history('local.munki.Firefox')} == expected
+
+
+@pytest.mark.django_db
+class TestBackfill:
+    def test_backfills_runs_without_events(self):
+        from webapp.models import RecipeEvent, Run
+
+        old = Run.objects.create(status='success', config_snapshot={}, completed_at=T0)
+        _result(old, 'munki_import', [{'name': 'Firefox', 'version': '1.0'}, {'name': 'Zoom'}])
+        _result(old, 'failure', [{'recipe_id': 'Broken.munki'}])
+        Run.objects.create(status='success', config_snapshot={})
+
+        out = io.StringIO()
+        call_command('backfill_recipe_events', stdout=out)
+        assert 'Created 3 recipe event(s) from 1 run(s).' in out.getvalue()
+        assert set(RecipeEvent.objects.values_list('name', 'timestamp')) == {
+            ('Firefox', T0), ('Zoom', T0), ('Broken.munki', T0),
+        }
+
+        call_command('backfill_recipe_events', stdout=out)
+        assert RecipeEvent.objects.count() == 3
+
+    def test_replace_rebuilds(self):
+        from webapp.models import RecipeEvent, Run
+
+        run = Run.objects.create(status='success', config_snapshot={}, completed_at=T0)
+        _result(run, 'munki_import', [{'name': 'Firefox'}])
+        RecipeEvent.objects.create(run=run, name='stale', event_type='munki_import', timestamp=T0)
+
+        call_command('backfill_recipe_events', '--replace', stdout=io.StringIO())
+        assert list(RecipeEvent.objects.values_list('name', flat=True)) == ['Firefox']
@@ -0,0 +1,143 @@
+"""Tests for webapp.recipe_files - the persistent recipe file index."""
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+OLD = time.time() - 3600
+
+
+def _recipe(path: Path, identifier: str, parent: str = '') -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    body = f'<key>Identifier</key><string>{identifier}</string>'
+    if parent:
+        body += f'<key>ParentRecipe</key><string>{parent}</string>'
+    path.write_text(f'<plist><dict>{body}</dict></plist>')
+    return path
+
+
+def _age(root: Path) -> None:
+    """Backdate everything under *root* so no entry is too recent to trust."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            os.utime(os.path.join(dirpath, name), (OLD, OLD))
+    os.utime(root, (OLD, OLD))
+
+
+class _Reader:
+    def __init__(self):
+        self.read = []
+
+    def __call__(self, path: Path) -> dict:
+        from webapp.views.recipes import _read_recipe_info
+        self.read.append(path.name)
+        return _read_recipe_info(path)
+
+
+@pytest.fixture
+def repos(tmp_path):
+    root = tmp_path / 'repos'
+    _recipe(root / 'a-recipes' / 'Firefox' / 'Firefox.download.recipe', 'com.a.download.Firefox')
+    _recipe(root / 'a-recipes' / 'Firefox' / 'Firefox.munki.recipe', 'com.a.munki.Firefox',
+            'com.a.download.Firefox')
+    _recipe(root / 'b-recipes' / 'Zoom.munki.recipe.yaml', 'unused')
+    (root / 'b-recipes' / 'Zoom.munki.recipe.yaml').write_text('Identifier: com.b.munki.Zoom\n')
+    _age(root)
+    return root
+
+
+def _refresh(repos, reader):
+    from webapp.recipe_files import refresh
+    return refresh([str(repos / 'a-recipes'), str(repos / 'b-recipes')], reader)
+
+
+class TestRefresh:
+    def test_cold_scan_reads_every_file(self, repos):
+        reader = _Reader()
+        entries = _refresh(repos, reader)
+        assert sorted(reader.read) == ['Firefox.download.recipe', 'Firefox.munki.recipe',
+                                       'Zoom.munki.recipe.yaml']
+        assert [(Path(e['path']).name, e['identifier'], e['parent']) for e in entries] == [
+            ('Firefox.download.recipe', 'com.a.download.Firefox', None),
+            ('Firefox.munki.recipe', 'com.a.munki.Firefox', 'com.a.download.Firefox'),
+            ('Zoom.munki.recipe.yaml', 'com.b.munki.Zoom', None),
+        ]
+
+    def test_warm_rescan_only_stats(self, repos, monkeypatch):
+        _refresh(repos, _Reader())
+        listed = []
+        real_scandir = os.scandir
+        monkeypatch.setattr(os, 'scandir', lambda path: listed.append(path) or real_scandir(path))
+        reader = _Reader()
+        assert len(_refresh(repos, reader)) == 3
+        assert reader.read == []
+        assert listed == []
+
+    def test_changed_file_is_read_again(self, repos):
+        _refresh(repos, _Reader())
+        _recipe(repos / 'a-recipes' / 'Firefox' / 'Firefox.munki.recipe', 'com.a.munki.FirefoxESR')
+        reader = _Reader()
+        entries = _refresh(repos, reader)
+        assert reader.read == ['Firefox.munki.recipe']
+        assert 'com.a.munki.FirefoxESR' in [e['identifier'] for e in entries]
+
+    def test_added_and_removed_files(self, repos):
+        _refresh(repos, _Reader())
+        (repos / 'b-recipes' / 'Zoom.munki.recipe.yaml').unlink()
+        _recipe(repos / 'a-recipes' / 'Chrome' / 'Chrome.munki.recipe', 'com.a.munki.Chrome')
+        reader = _Reader()
+        entries = _refresh(repos, reader)
+        assert reader.read == ['Chrome.munki.recipe']
+        assert sorted(e['identifier'] for e in entries) == [
+            'com.a.download.Firefox', 'com.a.munki.Chrome', 'com.a.munki.Firefox']
+
+    def test_recent_entries_are_checked_again(self, repos):
+        """A file written in the same clock tick as the scan could change unseen."""
+        _recipe(repos / 'b-recipes' / 'New.munki.recipe', 'com.b.munki.New')
+        _refresh(repos, _Reader())
+        reader = _Reader()
+        _refresh(repos, reader)
+        assert reader.read == ['New.munki.recipe']
+
+    def test_hidden_directories_are_skipped(self, repos):
+        _recipe(repos / 'a-recipes' / '.git' / 'Stale.munki.recipe', 'com.a.stale')
+        _age(repos)
+        assert 'com.a.stale' not in [e['identifier'] for e in _refresh(repos, _Reader())]
+
+    def test_index_is_shared_through_the_file(self, repos):
+        """Another worker - no in-memory state - starts from the file."""
+        from webapp import recipe_files
+        _refresh(repos, _Reader())
+        recipe_files._state.update(index=None, stamp=None)
+        reader = _Reader()
+        assert len(_refresh(repos, reader)) == 3
+        assert reader.read == []
+
+    def test_unreadable_index_is_rebuilt(self, repos):
+        from webapp.recipe_files import index_path
+        index_path().write_text('{not json')
+        reader = _Reader()
+        assert len(_refresh(repos, reader)) == 3
+        assert len(reader.read) == 3
+        assert json.loads(index_path().read_text())['version'] == 1
+
+    def test_changed_paths_limit_the_stat_calls(self, repos, monkeypatch):
+        """With the watcher's changed paths, nothing else is stat'ed."""
+        from webapp.recipe_files import refresh
+        search = [str(repos / 'a-recipes'), str(repos / 'b-recipes')]
+        refresh(search, _Reader())
+        chrome = _recipe(repos / 'b-recipes' / 'Chrome.munki.recipe', 'com.b.munki.Chrome')
+        os.utime(chrome, (OLD, OLD))
+        os.utime(repos / 'b-recipes', (OLD + 60, OLD + 60))
+        statted = []
+        real_stat = os.stat
+        monkeypatch.setattr(os, 'stat', lambda path, *a, **kw: statted.append(str(path)) or real_stat(path, *a, **kw))
+        reader = _Reader()
+        entries = refresh(search, reader, changed=[str(repos / 'b-recipes')])
+        assert reader.read == ['Chrome.munki.recipe']
+        assert 'com.b.munki.Chrome' in [e['identifier'] for e in entries]
+        assert not [p for p in statted if 'a-recipes' in p]
@@ -0,0 +1,132 @@
+"""Tests for webapp.recipe_watch - the recipe directory watcher."""
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import pytest
+
+from webapp import recipe_watch
+from webapp.recipe_watch import RecipeWatcher, _Inotify, _Poller
+
+OLD = time.time() - 3600
+
+
+def _inotify_or_skip():
+    try:
+        return _Inotify()
+    except OSError:
+        pytest.skip('inotify is not available here')
+
+
+@pytest.fixture
+def watched(tmp_path):
+    d = tmp_path / 'repo'
+    d.mkdir()
+    os.utime(d, (OLD, OLD))
+    return d
+
+
+class TestPoller:
+    def test_reports_directories_whose_mtime_changed(self, watched, tmp_path, monkeypatch):
+        monkeypatch.setattr(recipe_watch, 'POLL_SECONDS', 0)
+        other = tmp_path / 'other'
+        other.mkdir()
+        poller = _Poller()
+        assert poller.sync([str(watched), str(other)]) == {str(watched), str(other)}
+        assert poller.read(0) == set()
+        (watched / 'New.munki.recipe').write_text('x')
+        assert poller.read(0) == {str(watched)}
+        assert poller.read(0) == set()
+
+    def test_sync_reports_only_new_directories(self, watched, tmp_path):
+        poller = _Poller()
+        poller.sync([str(watched)])
+        assert poller.sync([str(watched), str(tmp_path)]) == {str(tmp_path)}
+
+
+class TestInotify:
+    def test_reports_entry_changes_and_in_place_writes(self, watched):
+        source = _inotify_or_skip()
+        try:
+            recipe = watched / 'Firefox.munki.recipe'
+            recipe.write_text('x')
+            source.sync([str(watched)])
+            recipe.write_text('y')
+            assert source.read(1.0) == {str(recipe)}
+            (watched / 'Chrome.munki.recipe').touch()
+            assert str(watched) in source.read(1.0)
+        finally:
+            source.close()
+
+    def test_hidden_entries_are_ignored(self, watched):
+        source = _inotify_or_skip()
+        try:
+            source.sync([str(watched)])
+            (watched / '.Firefox.munki.recipe.swp').write_text('x')
+            assert source.read(0.2) == set()
+        finally:
+            source.close()
+
+
+class TestRecipeWatcher:
+    def _watch(self, directories, use_inotify, monkeypatch):
+        monkeypatch.setattr(recipe_watch, 'DEBOUNCE_SECONDS', 0.05)
+        monkeypatch.setattr(recipe_watch, 'POLL_SECONDS', 0.05)
+        calls = []
+        seen = threading.Event()
+
+        def on_change(changed):
+            calls.append(changed)
+            seen.set()
+
+        watcher = RecipeWatcher(lambda: directories, on_change, use_inotify=use_inotify)
+        watcher.start()
+        return watcher, calls, seen
+
+    def test_polling_reports_changes(self, watched, monkeypatch):
+        watcher, calls, seen = self._watch([str(watched)], False, monkeypatch)
+        try:
+            assert seen.wait(5)   # newly watched directories come first
+            assert calls == [{str(watched)}]
+            seen.clear()
+            (watched / 'New.munki.recipe').write_text('x')
+            assert seen.wait(5)
+        finally:
+            watcher.stop(5)
+        assert watcher.backend == 'polling'
+        assert calls[-1] == {str(watched)}
+
+    def test_falls_back_to_polling_without_inotify(self, watched, monkeypatch):
+        def unavailable():
+            raise OSError('no inotify')
+        monkeypatch.setattr(recipe_watch, '_Inotify', unavailable)
+        watcher, calls, seen = self._watch([str(watched)], True, monkeypatch)
+        try:
+            assert seen.wait(5)
+        finally:
+            watcher.stop(5)
+        assert watcher.backend == 'polling'
+
+    def test_callback_errors_do_not_stop_the_watcher(self, watched, monkeypatch):
+        monkeypatch.setattr(recipe_watch, 'DEBOUNCE_SECONDS', 0.05)
+        monkeypatch.setattr(recipe_watch, 'POLL_SECONDS', 0.05)
+        calls = []
+
+        def on_change(changed):
+            calls.append(changed)
+            raise RuntimeError('boom')
+
+        watcher = RecipeWatcher(lambda: [str(watched)], on_change, use_inotify=False)
+        watcher.start()
+        try:
+            deadline = time.monotonic() + 5
+            while not calls and time.monotonic() < deadline:
+                time.sleep(0.02)
+            (watched / 'New.munki.recipe').write_text('x')
+            while len(calls) < 2 and time.monotonic() < deadline:
+                time.sleep(0.02)
+        finally:
+            watcher.stop(5)
+        assert len(calls) >= 2
@@ -0,0 +1,98 @@
+"""Tests for libs.resource_usage: StageUsage and wait_child."""
+from __future__ import annotations
+
+import subprocess
+import sys
+import threading
+
+import pytest
+
+_BUSY = 'import time\nt = time.process_time()\nwhile time.process_time() - t < 0.2: pass'
+
+
+def _spawn(code='pass'):
+    return subprocess.Popen([sys.executable, '-c', code])
+
+
+class TestStageUsage:
+
+    def test_as_dict_keys(self):
+        from libs.resource_usage import StageUsage
+        with StageUsage() as usage:
+            pass
+        assert set(usage.as_dict()) == {
+            'scope', 'wall_seconds', 'cpu_user', 'cpu_system', 'block_in', 'block_out',
+            'peak_rss', 'subprocesses', 'child_cpu_user', 'child_cpu_system',
+            'child_block_in', 'child_block_out', 'child_peak_rss',
+        }
+
+    def test_records_own_cpu_time(self):
+        import time
+        from libs.resource_usage import StageUsage
+        with StageUsage() as usage:
+            t = time.process_time()
+            while time.process_time() - t < 0.1:
+                pass
+        d = usage.as_dict()
+        assert d['cpu_user'] + d['cpu_system'] > 0
+        assert d['wall_seconds'] >= 0.1
+        assert d['peak_rss'] > 0
+
+    def test_current_is_thread_local_and_nested(self):
+        from libs.resource_usage import StageUsage, current
+        seen = []
+        with StageUsage() as outer:
+            with StageUsage() as inner:
+                assert current() is inner
+                t = threading.Thread(target=lambda: seen.append(current()))
+                t.start()
+                t.join()
+            assert current() is outer
+        assert current() is None
+        assert seen == [None]
+
+
+class TestWaitChild:
+
+    def test_outside_stage_is_plain_wait(self):
+        from libs.resource_usage import wait_child
+        proc = _spawn('raise SystemExit(3)')
+        assert wait_child(proc) == 3
+        assert proc.returncode == 3
+
+    def test_child_rusage_charged_to_stage(self):
+        from libs.resource_usage import StageUsage, wait_child
+        with StageUsage() as usage:
+            proc = _spawn(_BUSY)
+            assert wait_child(proc) == 0
+        d = usage.as_dict()
+        assert d['subprocesses'] == 1
+        assert d['child_cpu_user'] + d['child_cpu_system'] >= 0.15
+        assert d['child_peak_rss'] > 0
+
+    def test_negative_returncode_for_signal(self):
+        import signal
+        from libs.resource_usage import StageUsage, wait_child
+        with StageUsage():
+            proc = _spawn('import time; time.sleep(30)')
+            proc.send_signal(signal.SIGTERM)
+            assert wait_child(proc) == -signal.SIGTERM
+
+    def test_already_reaped_child_still_counted(self):
+        from libs.resource_usage import StageUsage, wait_child
+        with StageUsage() as usage:
+            proc = _spawn()
+            proc.wait()
+            assert wait_child(proc) == 0
+        assert usage.subprocesses == 1
+        assert usage.child_user == 0.0
+
+    def test_run_cmd_children_counted(self):
+        from unittest.mock import MagicMock
+        from libs.resource_usage import StageUsage
+        from libs.run_command import run_cmd, run_cmds
+        with StageUsage() as usage:
+            run_cmd([sys.executable, '-c', 'pass'], MagicMock())
+            run_cmds([(str(i), [sys.executable, '-c', 'pass']) for i in range(3)],
+                     MagicMock(), max_workers=2)
+        assert usage.subprocesses == 4
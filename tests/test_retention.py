@@ -0,0 +1,184 @@
+"""Tests for webapp.retention - the database cleanup's policies and batching."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+NOW = datetime.now(timezone.utc)
+
+
+def _run(status='success', days_ago=0, logs=0):
+    from webapp.models import LogEntry, Run, StageExecution
+    completed = NOW - timedelta(days=days_ago)
+    run = Run.objects.create(status=status, config_snapshot={}, completed_at=completed)
+    Run.objects.filter(pk=run.pk).update(started_at=completed - timedelta(minutes=5))
+    StageExecution.objects.create(run=run, name='Run AutoPkg', status=status if status != 'cancelled' else 'failed')
+    LogEntry.objects.bulk_create([
+        LogEntry(run=run, level='INFO', message=f'line {i}', timestamp=completed) for i in range(logs)
+    ])
+    return run
+
+
+def _policy(**kwargs):
+    from webapp.retention import Policy
+    kwargs.setdefault('batch_pause_ms', 0)
+    kwargs.setdefault('incremental_vacuum', False)
+    return Policy(**kwargs)
+
+
+@pytest.mark.django_db
+class TestSelect:
+    def test_age_limit(self):
+        from webapp.retention import select
+        old, recent = _run(days_ago=100), _run(days_ago=5)
+        delete, trim = select(_policy(max_age_days=90))
+        assert delete == [old.id]
+        assert trim == []
+        assert recent.id not in delete
+
+    def test_failures_kept_longer(self):
+        from webapp.retention import select
+        failed = _run('failed', days_ago=100)
+        very_old_failure = _run('failed', days_ago=400)
+        success = _run(days_ago=100)
+        delete, _ = select(_policy(max_age_days=90, failed_max_age_days=365))
+        assert set(delete) == {success.id, very_old_failure.id}
+        assert failed.id not in delete
+
+    def test_count_limit_spares_protected_failures(self):
+        from webapp.retention import select
+        oldest = _run(days_ago=3)
+        failure = _run('failed', days_ago=2)
+        newest = _run(days_ago=1)
+        delete, _ = select(_policy(max_age_days=0, max_runs=1, failed_max_age_days=30))
+        assert delete == [oldest.id]
+        delete, _ = select(_policy(max_age_days=0, max_runs=1))
+        assert delete == [oldest.id, failure.id]
+        assert newest.id not in delete
+
+    def test_running_runs_never_selected(self):
+        from webapp.models import Run
+        from webapp.retention import select
+        running = Run.objects.create(status='running', config_snapshot={})
+        delete, trim = select(_policy(max_age_days=0, max_runs=0, log_max_age_days=0))
+        assert running.id not in delete + trim
+
+    def test_log_only_trimming(self):
+        from webapp.retention import select
+        old = _run(days_ago=40)
+        _run(days_ago=5)
+        delete, trim = select(_policy(max_age_days=90, log_max_age_days=30))
+        assert delete == []
+        assert trim == [old.id]
+
+
+@pytest.mark.django_db
+class TestRetentionEngine:
+    def test_deletes_in_batches_and_reports_progress(self):
+        from webapp.models import LogEntry, Run, StageExecution
+        from webapp.retention import RetentionEngine
+
+        old = _run(days_ago=100, logs=7)
+        keep = _run(days_ago=1, logs=2)
+        reports, pauses = [], []
+        engine = RetentionEngine(_policy(max_age_days=90, batch_rows=3, batch_pause_ms=10),
+                                 on_progress=reports.append, sleep=pauses.append)
+        result = engine.run()
+
+        assert not Run.objects.filter(id=old.id).exists()
+        assert not StageExecution.objects.filter(run_id=old.id).exists()
+        assert LogEntry.objects.filter(run_id=keep.id).count() == 2
+        assert result['runs_deleted'] == 1
+        assert result['log_lines_deleted'] == 7
+        assert result['phase'] == 'done'
+        # 7 log lines in batches of 3 -> three batches, each followed by a pause.
+        assert [r['log_lines_deleted'] for r in reports if r['phase'] == 'runs'][:4] == [0, 3, 6, 7]
+        assert pauses and all(p == 0.01 for p in pauses)
+
+    def test_log_trimming_keeps_the_run(self):
+        from webapp.log_archive import archive_run
+        from webapp.models import LogEntry, Run, RunLogArchive
+        from webapp.retention import RetentionEngine
+
+        run = _run(days_ago=40, logs=3)
+        archive_run(run.id)
+        LogEntry.objects.create(run=run, level='INFO', message='late', timestamp=NOW)
+
+        result = RetentionEngine(_policy(max_age_days=90, log_max_age_days=30)).run()
+        assert Run.objects.filter(id=run.id).exists()
+        assert not LogEntry.objects.filter(run=run).exists()
+        assert not RunLogArchive.objects.filter(run=run).exists()
+        assert result['log_runs_trimmed'] == 1
+        assert result['log_lines_deleted'] == 4
+
+    def test_policy_from_settings(self):
+        from webapp.models import Setting
+        from webapp.retention import Policy
+
+        Setting.set('retention.max_age_days', '30')
+        Setting.set('retention.max_runs', 'lots')
+        Setting.set('retention.batch_rows', '0')
+        Setting.set('retention.incremental_vacuum', 'false')
+        policy = Policy.from_settings()
+        assert policy.max_age_days == 30
+        assert policy.max_runs == 0
+        assert policy.batch_rows == 1
+        assert policy.incremental_vacuum is False
+
+
+@pytest.mark.django_db
+class TestIncrementalVacuum:
+    def test_reclaims_free_pages(self, tmp_path):
+        from django.db.utils import ConnectionHandler
+        from webapp.retention import RetentionEngine
+
+        handler = ConnectionHandler({'default': {
+            'ENGINE': 'webapp.sqlite_backend', 'NAME': str(tmp_path / 'vac.sqlite3'),
+        }})
+        conn = handler['default']
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('CREATE TABLE blob (data TEXT)')
+                cursor.executemany('INSERT INTO blob VALUES (%s)', [('x' * 4000,)] * 200)
+                cursor.execute('DELETE FROM blob')
+                cursor.execute('PRAGMA freelist_count')
+                assert cursor.fetchone()[0] > 0
+
+            engine = RetentionEngine(_policy(incremental_vacuum=True))
+            engine._vacuum_connection(conn)
+
+            with conn.cursor() as cursor:
+                cursor.execute('PRAGMA freelist_count')
+                assert cursor.fetchone()[0] == 0
+            assert engine.progress['pages_vacuumed'] > 0
+        finally:
+            conn.close()
+
+    @pytest.mark.parametrize('freelist, steps', [
+        ([5000] * 10, 1),                                      # incremental_vacuum frees nothing
+        ([5000] + [4999 - i for i in range(10)] + [4990] * 5, 11),  # it stalls part way
+    ])
+    def test_stops_when_vacuum_makes_no_progress(self, freelist, steps):
+        from unittest.mock import MagicMock
+        from webapp.retention import RetentionEngine
+
+        counts = iter(freelist)
+        executed = []
+        cursor = MagicMock()
+
+        def _execute(sql):
+            executed.append(sql)
+            if sql == 'PRAGMA auto_vacuum':
+                cursor.fetchone.return_value = (2,)
+            elif sql == 'PRAGMA freelist_count':
+                cursor.fetchone.return_value = (next(counts),)
+            return cursor
+
+        cursor.execute.side_effect = _execute
+        conn = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+
+        engine = RetentionEngine(_policy(incremental_vacuum=True, batch_pause_ms=0))
+        engine._vacuum_connection(conn)
+        assert sum(sql.startswith('PRAGMA incremental_vacuum') for sql in executed) == steps
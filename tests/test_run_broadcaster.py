@@ -0,0 +1,163 @@
+"""Tests for webapp.run_broadcaster: push/poll merging and subscriber wake-ups."""
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+def _broadcaster(run_id='run-1'):
+    """A RunBroadcaster whose poll thread is never started."""
+    from webapp.run_broadcaster import RunBroadcaster
+    with patch('webapp.run_broadcaster.threading.Thread'):
+        return RunBroadcaster(run_id)
+
+
+def _entry(entry_id, message=None):
+    return SimpleNamespace(
+        id=entry_id, run_id='run-1', level='INFO', stage_name='RunAutoPkg',
+        message=message or f'line {entry_id}',
+        timestamp=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+def _stage(name, status):
+    return SimpleNamespace(name=name, status=status, order=0,
+                           started_at=None, completed_at=None)
+
+
+def _messages(broadcaster):
+    frames, _ = broadcaster.events_since(-1)
+    out = []
+    for frame in frames:
+        payload = json.loads(frame.split(b'data: ', 1)[1])
+        out.append(payload.get('message') or f"{payload.get('name')}:{payload.get('status')}")
+    return out
+
+
+class TestPushAndPoll:
+    def test_pushes_ignored_until_first_poll(self):
+        b = _broadcaster()
+        b.publish_logs([_entry(1)])
+        assert _messages(b) == []
+
+        b._merge_polled([_entry(1), _entry(2)], [])
+        assert _messages(b) == ['line 1', 'line 2']
+
+    def test_pushed_entries_not_repeated_by_poll(self):
+        b = _broadcaster()
+        b._merge_polled([_entry(1)], [])
+        b.publish_logs([_entry(2), _entry(3)])
+        b._merge_polled([_entry(2), _entry(3), _entry(4)], [])
+        assert _messages(b) == ['line 1', 'line 2', 'line 3', 'line 4']
+        assert b._seen_log_ids == set()
+
+    def test_polled_entries_not_repeated_by_push(self):
+        b = _broadcaster()
+        b._merge_polled([_entry(1), _entry(2)], [])
+        b.publish_logs([_entry(2)])
+        assert _messages(b) == ['line 1', 'line 2']
+
+    def test_entries_without_id_left_to_poller(self):
+        b = _broadcaster()
+        b._merge_polled([], [])
+        b.publish_logs([_entry(None)])
+        assert _messages(b) == []
+
+    def test_stage_changes_deduplicated(self):
+        b = _broadcaster()
+        b.publish_stage(_stage('UpdateRepos', 'running'))
+        b._merge_polled([], [_stage('UpdateRepos', 'running')])
+        b.publish_stage(_stage('UpdateRepos', 'success'))
+        assert _messages(b) == ['UpdateRepos:running', 'UpdateRepos:success']
+
+    def test_push_switches_to_fallback_polling(self):
+        b = _broadcaster()
+        assert b._pushed is False
+        b.publish_stage(_stage('UpdateRepos', 'running'))
+        assert b._pushed is True
+
+
+class TestWaitForEvents:
+    def test_returns_immediately_when_events_pending(self):
+        b = _broadcaster()
+        b.publish_stage(_stage('A', 'running'))
+        asyncio.run(asyncio.wait_for(b.wait_for_events(-1, timeout=30), 1))
+
+    def test_woken_by_publish_from_another_thread(self):
+        import threading
+
+        b = _broadcaster()
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.05, lambda: threading.Thread(
+                target=b.publish_stage, args=(_stage('A', 'running'),)).start())
+            started = loop.time()
+            await b.wait_for_events(-1, timeout=30)
+            return loop.time() - started
+
+        assert asyncio.run(main()) < 5
+
+    def test_times_out_without_events(self):
+        b = _broadcaster()
+        asyncio.run(b.wait_for_events(-1, timeout=0.01))
+        assert b._waiters == []
+
+
+class TestManager:
+    def test_publish_without_broadcaster_is_noop(self):
+        from webapp.run_broadcaster import _BroadcasterManager
+        manager = _BroadcasterManager()
+        manager.publish_logs('missing', [_entry(1)])
+        manager.publish_stage('missing', _stage('A', 'running'))
+        manager.wake('missing')
+        assert manager.find('missing') is None
+
+    def test_publish_routes_to_existing_broadcaster(self):
+        from webapp.run_broadcaster import _BroadcasterManager
+        manager = _BroadcasterManager()
+        b = _broadcaster('run-1')
+        manager._broadcasters['run-1'] = b
+        manager.publish_stage('run-1', _stage('A', 'running'))
+        assert _messages(b) == ['A:running']
+
+
+@pytest.mark.django_db
+class TestHandlerPush:
+    def test_db_handler_publishes_saved_entries(self, run):
+        from webapp.db_logger import DBLogHandler, set_run_id
+
+        set_run_id(run.id)
+        record = MagicMock()
+        record.level_name = 'INFO'
+        record.message = 'pushed'
+        with patch('webapp.run_broadcaster.broadcaster_manager') as manager:
+            handler = DBLogHandler(batch_rows=10, batch_latency=60)
+            handler.emit(record)
+            manager.publish_logs.assert_not_called()
+            handler.close()
+        (run_id, entries), _ = manager.publish_logs.call_args
+        assert run_id == run.id
+        assert [e.message for e in entries] == ['pushed']
+
+
+@pytest.mark.django_db
+class TestArchivedReplay:
+    def test_poll_replays_archived_run(self, run):
+        from webapp.log_archive import archive_run
+        from webapp.models import LogEntry
+
+        for i in range(3):
+            LogEntry.objects.create(run=run, level='INFO', stage_name='RunAutoPkg',
+                                    message=f'line {i}', timestamp=datetime.now(timezone.utc))
+        archive_run(run.id)
+
+        b = _broadcaster(str(run.id))
+        b._poll_once()
+        b._poll_once()
+        assert _messages(b) == ['line 0', 'line 1', 'line 2']
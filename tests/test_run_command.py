@@ -1,101 +1,172 @@
-"""Tests for libs.run_command.run_cmd."""
+"""Tests for libs.run_command: run_cmd, run_cmds and the chunked line reader."""
 from __future__ import annotations
 
 import subprocess
-from io import StringIO
-from unittest.mock import MagicMock, patch, call
+from unittest.mock import MagicMock, call
 
 import pytest
 
 
-def _make_popen_mock(stdout_lines=None, stderr_lines=None, returncode=0):
-    """Build a Popen mock that feeds lines through select.select."""
-    mock_proc = MagicMock()
-    mock_proc.returncode = returncode
-    mock_proc.poll.return_value = returncode
-
-    stdout_lines = stdout_lines or []
-    stderr_lines = stderr_lines or []
-
-    # Build readline sequences: lines + '' (EOF)
-    stdout_reads = [l + '\n' for l in stdout_lines] + ['']
-    stderr_reads = [l + '\n' for l in stderr_lines] + ['']
-
-    mock_proc.stdout = MagicMock()
-    mock_proc.stdout.readline.side_effect = stdout_reads
-    mock_proc.stdout.fileno.return_value = 3
-
-    mock_proc.stderr = MagicMock()
-    mock_proc.stderr.readline.side_effect = stderr_reads
-    mock_proc.stderr.fileno.return_value = 4
-
-    mock_proc.wait.return_value = returncode
-    mock_proc.__enter__ = MagicMock(return_value=mock_proc)
-    mock_proc.__exit__ = MagicMock(return_value=False)
-
-    return mock_proc
+def _py(code):
+    import sys
+    return [sys.executable, '-c', code]
 
 
 class TestRunCmd:
-    def _run(self, popen_mock, logger=None):
-        from libs.run_command import run_cmd
-        logger = logger or MagicMock()
-
-        # select.select alternates between stdout and stderr, then returns nothing
-        # We simulate: first call returns stdout ready, next returns stderr, then both EOF
-        select_results = [
-            ([popen_mock.stdout], [], []),
-        ] * len(popen_mock.stdout.readline.side_effect) + [
-            ([popen_mock.stderr], [], []),
-        ] * len(popen_mock.stderr.readline.side_effect) + [
-            ([], [], []),
-        ]
-
-        with patch('subprocess.Popen', return_value=popen_mock), \
-             patch('select.select', side_effect=select_results):
-            run_cmd(['echo', 'hello'], logger)
+    """run_cmd reads its pipes with os.read(), so it is exercised with real
+    child processes rather than mocked file objects."""
 
     def test_stdout_lines_logged_as_info(self):
+        from libs.run_command import run_cmd
         logger = MagicMock()
-        mock_proc = _make_popen_mock(stdout_lines=['hello', 'world'], returncode=0)
-        select_results = (
-            [([mock_proc.stdout], [], [])] * 3 +  # 2 lines + EOF
-            [([mock_proc.stderr], [], [])] * 1 +  # EOF
-            [([], [], [])]
-        )
-        with patch('subprocess.Popen', return_value=mock_proc), \
-             patch('select.select', side_effect=select_results):
-            from libs.run_command import run_cmd
-            run_cmd(['echo', 'hello'], logger)
-        info_calls = [str(c) for c in logger.info.call_args_list]
-        assert any('hello' in c for c in info_calls)
+        run_cmd(_py('print("hello"); print("world")'), logger)
+        assert logger.info.call_args_list == [call('hello'), call('world')]
 
     def test_stderr_lines_logged_as_error(self):
+        from libs.run_command import run_cmd
         logger = MagicMock()
-        mock_proc = _make_popen_mock(stderr_lines=['uh oh'], returncode=0)
-        select_results = (
-            [([mock_proc.stdout], [], [])] * 1 +  # EOF
-            [([mock_proc.stderr], [], [])] * 2 +  # 1 line + EOF
-            [([], [], [])]
-        )
-        with patch('subprocess.Popen', return_value=mock_proc), \
-             patch('select.select', side_effect=select_results):
-            from libs.run_command import run_cmd
-            run_cmd(['cmd'], logger)
-        error_calls = [str(c) for c in logger.error.call_args_list]
-        assert any('uh oh' in c for c in error_calls)
+        run_cmd(_py('import sys; print("uh oh", file=sys.stderr)'), logger)
+        assert call('uh oh') in logger.error.call_args_list
 
     def test_nonzero_exit_raises_called_process_error(self):
+        from libs.run_command import run_cmd
+        logger = MagicMock()
+        with pytest.raises(subprocess.CalledProcessError):
+            run_cmd(_py('raise SystemExit(1)'), logger)
+        assert any('exited with code 1' in str(c) for c in logger.error.call_args_list)
+
+    def test_partial_line_does_not_block_other_pipe(self):
+        """A line without a newline must not stop stderr being logged."""
+        from libs.run_command import run_cmd
+        seen = []
+        logger = MagicMock()
+        logger.error.side_effect = lambda msg: seen.append(('error', msg))
+        logger.info.side_effect = lambda msg: seen.append(('info', msg))
+        run_cmd(_py(
+            'import sys, time\n'
+            'sys.stdout.write("downloading 50%"); sys.stdout.flush()\n'
+            'print("status", file=sys.stderr); sys.stderr.flush()\n'
+            'time.sleep(0.2)\n'
+            'sys.stdout.write(" 100%\\n")'
+        ), logger)
+        assert seen == [('error', 'status'), ('info', 'downloading 50% 100%')]
+
+    def test_on_proc_receives_process(self):
+        from libs.run_command import run_cmd
+        procs = []
+        run_cmd(_py('pass'), MagicMock(), on_proc=procs.append)
+        assert len(procs) == 1 and procs[0].returncode == 0
+
+
+class TestLineReader:
+    def _reader(self):
+        from libs.run_command import _LineReader
+        lines = []
+        return _LineReader(lines.append), lines
+
+    def test_splits_across_chunks(self):
+        reader, lines = self._reader()
+        for chunk in (b'he', b'llo\nwor', b'ld\n', b'tail'):
+            reader.feed(chunk)
+        assert lines == ['hello', 'world']
+        reader.close()
+        assert lines == ['hello', 'world', 'tail']
+
+    def test_crlf_split_between_chunks_is_one_break(self):
+        reader, lines = self._reader()
+        reader.feed(b'one\r')
+        reader.feed(b'\ntwo\rthree\n')
+        reader.close()
+        assert lines == ['one', 'two', 'three']
+
+    def test_trailing_cr_at_eof_ends_line(self):
+        reader, lines = self._reader()
+        reader.feed(b'progress\r')
+        reader.close()
+        assert lines == ['progress']
+
+    def test_multibyte_character_split_between_chunks(self):
+        reader, lines = self._reader()
+        data = 'caf\u00e9 \u2713\n'.encode()
+        for i in range(len(data)):
+            reader.feed(data[i:i + 1])
+        reader.close()
+        assert lines == ['caf\u00e9 \u2713']
+
+    def test_invalid_utf8_replaced(self):
+        reader, lines = self._reader()
+        reader.feed(b'bad \xff byte\n')
+        reader.close()
+        assert lines == ['bad \ufffd byte']
+
+    def test_overlong_line_emitted_in_pieces(self):
+        from libs.run_command import _MAX_LINE
+        reader, lines = self._reader()
+        for _ in range(3):
+            reader.feed(b'x' * (_MAX_LINE // 2))
+        reader.close()
+        assert ''.join(lines) == 'x' * (3 * (_MAX_LINE // 2))
+        assert all(len(line) <= _MAX_LINE for line in lines)
+
+
+class TestRunCmds:
+    """run_cmds is exercised with real child processes - select() on mocked
+    pipes cannot model several children interleaving."""
+
+    _py = staticmethod(_py)
+
+    def test_output_prefixed_with_label(self):
+        from libs.run_command import run_cmds
+        logger = MagicMock()
+        run_cmds([('one', self._py('print("hello")')),
+                  ('two', self._py('import sys; print("oops", file=sys.stderr)'))],
+                 logger, max_workers=2)
+        assert call('[one] hello') in logger.info.call_args_list
+        assert call('[two] oops') in logger.error.call_args_list
+
+    def test_returns_exit_codes_without_raising(self):
+        from libs.run_command import run_cmds
         logger = MagicMock()
-        mock_proc = _make_popen_mock(returncode=1)
-        mock_proc.wait.return_value = 1
-        select_results = [
-            ([mock_proc.stdout], [], []),
-            ([mock_proc.stderr], [], []),
-            ([], [], []),
-        ]
-        with patch('subprocess.Popen', return_value=mock_proc), \
-             patch('select.select', side_effect=select_results):
-            from libs.run_command import run_cmd
-            with pytest.raises(subprocess.CalledProcessError):
-                run_cmd(['fail'], logger)
+        results = run_cmds([('ok', self._py('pass')),
+                            ('bad', self._py('raise SystemExit(3)'))],
+                           logger, max_workers=2)
+        assert results == {'ok': 0, 'bad': 3}
+        assert any('exited with code 3' in str(c) for c in logger.error.call_args_list)
+
+    def test_respects_max_workers(self):
+        from libs.run_command import run_cmds
+        running = []
+        peak = [0]
+
+        def _on_proc(proc):
+            running.append(proc)
+            peak[0] = max(peak[0], len(running))
+
+        def _on_exit(proc):
+            running.remove(proc)
+
+        commands = [(str(i), self._py('import time; time.sleep(0.05)')) for i in range(5)]
+        results = run_cmds(commands, MagicMock(), max_workers=2,
+                           on_proc=_on_proc, on_exit=_on_exit)
+        assert len(results) == 5
+        assert peak[0] == 2
+
+    def test_cancel_flag_stops_new_commands(self):
+        import threading
+        from libs.run_command import run_cmds
+        cancel = threading.Event()
+        commands = [(str(i), self._py('pass')) for i in range(4)]
+        results = run_cmds(commands, MagicMock(), max_workers=1,
+                           on_exit=lambda proc: cancel.set(), cancel_flag=cancel)
+        assert list(results) == ['0']
+
+    def test_start_failure_reaps_running_children(self):
+        from libs.run_command import run_cmds
+        started, exited = [], []
+        commands = [('slow', self._py('import time; time.sleep(30)')),
+                    ('missing', ['/nonexistent/autopkg'])]
+        with pytest.raises(FileNotFoundError):
+            run_cmds(commands, MagicMock(), max_workers=2,
+                     on_proc=started.append, on_exit=exited.append)
+        assert exited == started
+        assert started[0].returncode is not None
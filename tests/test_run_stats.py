@@ -0,0 +1,141 @@
+"""Tests for webapp.run_stats - the daily run statistics rollup."""
+from __future__ import annotations
+
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.core.management import call_command
+
+DAY = datetime(2024, 5, 1, 9, 0, tzinfo=timezone.utc)
+
+
+def _run(status, started=DAY, stages=(), results=()):
+    from webapp.models import RecipeResult, Run, StageExecution
+    run = Run.objects.create(status=status, config_snapshot={})
+    Run.objects.filter(pk=run.pk).update(started_at=started)
+    for order, (name, seconds, stage_status) in enumerate(stages):
+        StageExecution.objects.create(run=run, name=name, order=order, status=stage_status,
+                                      started_at=started,
+                                      completed_at=started + timedelta(seconds=seconds))
+    for result_type, count in results:
+        RecipeResult.objects.create(run=run, result_type=result_type,
+                                    data=[{'recipe': f'R{i}'} for i in range(count)])
+    return run
+
+
+@pytest.mark.django_db
+class TestRefreshDay:
+    def test_counts_statuses_results_and_stage_durations(self):
+        from webapp.run_stats import refresh_day
+
+        _run('success', stages=[('Run AutoPkg', 30, 'success'), ('GC', 5, 'skipped')],
+             results=[('munki_import', 2), ('url_downloaded', 3)])
+        _run('failed', started=DAY + timedelta(hours=5),
+             stages=[('Run AutoPkg', 10, 'failed')], results=[('failure', 1)])
+        _run('running')
+        _run('success', started=DAY + timedelta(days=1))
+
+        stats = refresh_day(DAY.date())
+        assert (stats.runs, stats.success, stats.failed, stats.cancelled) == (2, 1, 1, 0)
+        assert (stats.imports, stats.downloads, stats.recipe_failures) == (2, 3, 1)
+        assert stats.stage_durations == {'Run AutoPkg': [10.0, 30.0]}
+
+    def test_refresh_is_idempotent(self):
+        from webapp.models import RunDailyStats
+        from webapp.run_stats import refresh_run
+
+        run = _run('success')
+        refresh_run(run.id)
+        refresh_run(run.id)
+        assert RunDailyStats.objects.get().runs == 1
+
+    def test_day_without_finished_runs_keeps_its_row(self):
+        from webapp.models import RunDailyStats
+        from webapp.run_stats import refresh_day
+
+        RunDailyStats.objects.create(day=DAY.date(), runs=3, success=3)
+        assert refresh_day(DAY.date()) is None
+        assert RunDailyStats.objects.get().runs == 3
+
+
+class TestSummaries:
+    def test_summarize_pools_stage_samples(self):
+        from webapp.models import RunDailyStats
+        from webapp.run_stats import summarize
+
+        rows = [
+            RunDailyStats(day=DAY.date(), runs=2, success=1, failed=1, imports=4,
+                          stage_durations={'Run AutoPkg': [10.0, 30.0]}),
+            RunDailyStats(day=DAY.date() + timedelta(days=1), runs=2, success=2,
+                          stage_durations={'Run AutoPkg': [20.0], 'GC': [1.0]}),
+        ]
+        totals = summarize(rows)
+        assert (totals['runs'], totals['success'], totals['imports']) == (4, 3, 4)
+        assert totals['success_rate'] == 75
+        stages = {s['stage']: s for s in totals['stages']}
+        assert stages['Run AutoPkg'] == {'stage': 'Run AutoPkg', 'count': 3,
+                                         'p50': 20.0, 'p95': 30.0, 'max': 30.0}
+
+    def test_summarize_empty(self):
+        from webapp.run_stats import summarize
+        totals = summarize([])
+        assert totals['runs'] == 0 and totals['success_rate'] == 0 and totals['stages'] == []
+
+
+@pytest.mark.django_db
+class TestRebuildCommand:
+    def test_rebuilds_every_day(self):
+        from webapp.models import RunDailyStats
+
+        _run('success')
+        _run('cancelled', started=DAY + timedelta(days=2))
+        out = io.StringIO()
+        call_command('rebuild_run_stats', stdout=out)
+        assert 'for 2 day(s)' in out.getvalue()
+        assert list(RunDailyStats.objects.values_list('runs', 'cancelled')) == [(1, 0), (1, 1)]
+
+    def test_days_limits_the_window(self):
+        from django.utils import timezone as tz
+        from webapp.models import RunDailyStats
+
+        _run('success')
+        _run('success', started=tz.now())
+        call_command('rebuild_run_stats', '--days', '7', stdout=io.StringIO())
+        assert list(RunDailyStats.objects.values_list('day', flat=True)) == [tz.localdate()]
+
+    def test_migration_backfills_existing_runs(self):
+        import importlib
+        from django.db import connection
+        from django.db.migrations.loader import MigrationLoader
+        from webapp.models import RunDailyStats
+
+        from webapp.run_stats import rebuild
+
+        _run('success', stages=[('Run AutoPkg', 30, 'success'), ('GC', 5, 'skipped')],
+             results=[('munki_import', 2), ('url_downloaded', 3)])
+        _run('failed', started=DAY + timedelta(hours=5),
+             stages=[('Run AutoPkg', 10, 'failed')], results=[('failure', 1)])
+        _run('running')
+        _run('cancelled', started=DAY + timedelta(days=1))
+        columns = ('day', 'runs', 'success', 'failed', 'cancelled', 'imports', 'downloads',
+                   'recipe_failures', 'stage_durations')
+
+        state = MigrationLoader(connection).project_state(('webapp', '0011_backfill_rundailystats'))
+        migration = importlib.import_module('webapp.migrations.0011_backfill_rundailystats')
+        migration._backfill(state.apps, None)
+        backfilled = list(RunDailyStats.objects.order_by('day').values_list(*columns))
+        assert [row[1:3] for row in backfilled] == [(2, 1), (1, 0)]
+
+        RunDailyStats.objects.all().delete()
+        rebuild()
+        assert list(RunDailyStats.objects.order_by('day').values_list(*columns)) == backfilled
+
+    def test_interrupted_runs_are_folded_in_at_startup(self):
+        from webapp.apps import WebappConfig
+        from webapp.models import RunDailyStats
+
+        _run('success')
+        _run('running')
+        WebappConfig('webapp', __import__('webapp'))._mark_interrupted_runs()
+        assert list(RunDailyStats.objects.values_list('runs', 'failed')) == [(2, 1)]
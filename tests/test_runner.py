@@ -136,6 +136,31 @@ class TestExecuteDbCleanup:
         task.refresh_from_db()
         assert task.status == 'success'
 
+    def test_progress_recorded_on_task(self):
+        from webapp.models import Run, Setting, Task
+        from webapp.runner import _execute_db_cleanup
+
+        Setting.set('retention.batch_pause_ms', '0')
+        now = datetime.now(timezone.utc)
+        Run.objects.create(status='failed', completed_at=now - timedelta(days=100), config_snapshot={})
+        task = Task.objects.create(task_type='db_cleanup', status='pending')
+        _execute_db_cleanup(task.id)
+        task.refresh_from_db()
+        assert task.progress['phase'] == 'done'
+        assert task.progress['runs_deleted'] == 1
+
+    def test_failed_runs_kept_longer_when_configured(self):
+        from webapp.models import Run, Setting, Task
+        from webapp.runner import _execute_db_cleanup
+
+        Setting.set('retention.failed_max_age_days', '365')
+        now = datetime.now(timezone.utc)
+        failed = Run.objects.create(status='failed', completed_at=now - timedelta(days=100),
+                                    config_snapshot={})
+        task = Task.objects.create(task_type='db_cleanup', status='pending')
+        _execute_db_cleanup(task.id)
+        assert Run.objects.filter(id=failed.id).exists()
+
     def test_task_marked_failed_on_exception(self):
         from webapp.models import Task
         from webapp.runner import _execute_db_cleanup
@@ -146,6 +171,7 @@ class TestExecuteDbCleanup:
             _execute_db_cleanup(task.id)
         task.refresh_from_db()
         assert task.status == 'failed'
+        assert task.error == 'DB error'
 
 
 @pytest.mark.django_db(transaction=True)
@@ -187,6 +213,24 @@ class TestExecuteRun:
         run.refresh_from_db()
         assert run.status == 'success'
 
+    def test_stages_get_the_recipe_file_index_through_ctx(self):
+        from webapp.models import Run, Task
+        from webapp.runner import _execute_run
+        from webapp.views.recipes import recipe_file_index
+
+        run = Run.objects.create(status='pending', config_snapshot={})
+        task = Task.objects.create(task_type='pipeline_run', status='pending', run=run)
+        mock_orch = self._make_mock_orchestrator(success=True)
+
+        with patch('webapp.db_logger.DBLogHandler', MagicMock(return_value=MagicMock())), \
+             patch('webapp.db_logger.set_run_id'), \
+             patch('webapp.db_logger.set_current_stage'), \
+             patch('libs.config.config_from_settings', return_value=MagicMock()), \
+             patch('libs.orchestrator.Orchestrator', return_value=mock_orch):
+            _execute_run(run.id, task.id)
+
+        assert mock_orch.ctx['recipe_file_index'] is recipe_file_index
+
     def test_run_marked_failed_when_pipeline_returns_false(self):
         from webapp.models import Run, Task
         from webapp.runner import _execute_run
@@ -302,8 +346,240 @@ class TestExecuteRun:
 
         assert StageExecution.objects.filter(run=run, name='UpdateRepos').exists()
 
+    def test_stage_callback_stores_resource_usage(self):
+        from datetime import datetime, timezone
+        from webapp.models import Run, Task, StageExecution
+        from webapp.runner import _execute_run
+
+        run = Run.objects.create(status='pending', config_snapshot={})
+        task = Task.objects.create(task_type='pipeline_run', status='pending', run=run)
+        usage = {'cpu_user': 1.5, 'subprocesses': 2}
+
+        def fake_orchestrator_cls(**kwargs):
+            mock_orch = MagicMock()
+            cb = kwargs['stage_callback']
 
-@pytest.mark.django_db
+            def execute_with_callback(cancel_flag=None):
+                cb('UpdateRepos', 'running', datetime.now(timezone.utc))
+                cb('UpdateRepos', 'success', datetime.now(timezone.utc), usage)
+                return True
+
+            mock_orch.execute.side_effect = execute_with_callback
+            return mock_orch
+
+        with patch('webapp.db_logger.DBLogHandler', MagicMock(return_value=MagicMock())), \
+             patch('webapp.db_logger.set_run_id'), \
+             patch('webapp.db_logger.set_current_stage'), \
+             patch('libs.config.config_from_settings', return_value=MagicMock()), \
+             patch('libs.orchestrator.Orchestrator', side_effect=fake_orchestrator_cls):
+            _execute_run(run.id, task.id)
+
+        stage = StageExecution.objects.get(run=run, name='UpdateRepos')
+        assert stage.resource_usage == usage
+
+
+    def test_thread_context_installs_logging_in_worker_threads(self):
+        """Stages run on worker threads get run_id and DBLogHandler pushed."""
+        import threading
+        from webapp.models import Run, Task
+        from webapp.runner import _execute_run
+
+        run = Run.objects.create(status='pending', config_snapshot={})
+        task = Task.objects.create(task_type='pipeline_run', status='pending', run=run)
+        handler = MagicMock()
+
+        def fake_orchestrator_cls(**kwargs):
+            mock_orch = MagicMock()
+
+            def execute(cancel_flag=None):
+                def worker():
+                    with kwargs['thread_context']():
+                        pass
+                t = threading.Thread(target=worker)
+                t.start()
+                t.join()
+                return True
+
+            mock_orch.execute.side_effect = execute
+            return mock_orch
+
+        with patch('webapp.db_logger.DBLogHandler', MagicMock(return_value=handler)), \
+             patch('webapp.db_logger.set_run_id') as set_run_id, \
+             patch('webapp.db_logger.set_current_stage'), \
+             patch('libs.config.config_from_settings', return_value=MagicMock()), \
+             patch('libs.orchestrator.Orchestrator', side_effect=fake_orchestrator_cls):
+            _execute_run(run.id, task.id)
+
+        assert set_run_id.call_count == 2
+        assert handler.push_thread.call_count == 2
+        assert handler.pop_thread.call_count == 2
+
+    def test_log_buffer_flushed_on_stage_transitions_and_run_end(self):
+        from webapp.models import Run, Task
+        from webapp.runner import _execute_run
+
+        run = Run.objects.create(status='pending', config_snapshot={})
+        task = Task.objects.create(task_type='pipeline_run', status='pending', run=run)
+        handler = MagicMock()
+
+        def fake_orchestrator_cls(**kwargs):
+            mock_orch = MagicMock()
+            cb = kwargs['stage_callback']
+
+            def execute(cancel_flag=None):
+                cb('UpdateRepos', 'running', datetime.now(timezone.utc))
+                cb('UpdateRepos', 'success', datetime.now(timezone.utc))
+                return True
+
+            mock_orch.execute.side_effect = execute
+            return mock_orch
+
+        with patch('webapp.db_logger.DBLogHandler', MagicMock(return_value=handler)) as handler_cls, \
+             patch('webapp.db_logger.set_run_id'), \
+             patch('webapp.db_logger.set_current_stage'), \
+             patch('libs.config.config_from_settings', return_value=MagicMock()), \
+             patch('libs.orchestrator.Orchestrator', side_effect=fake_orchestrator_cls):
+            _execute_run(run.id, task.id)
+
+        kwargs = handler_cls.call_args.kwargs
+        assert (kwargs['batch_rows'], kwargs['batch_latency']) == (200, 0.25)
+        assert kwargs['writer'] is not None
+        assert handler.flush.call_count == 2
+        handler.close.assert_called_once()
+
+    def test_stage_callback_publishes_to_broadcaster(self):
+        from webapp.models import Run, Task
+        from webapp.runner import _execute_run
+
+        run = Run.objects.create(status='pending', config_snapshot={})
+        task = Task.objects.create(task_type='pipeline_run', status='pending', run=run)
+
+        def fake_orchestrator_cls(**kwargs):
+            mock_orch = MagicMock()
+            cb = kwargs['stage_callback']
+
+            def execute(cancel_flag=None):
+                cb('UpdateRepos', 'running', datetime.now(timezone.utc))
+                cb('UpdateRepos', 'success', datetime.now(timezone.utc))
+                return True
+
+            mock_orch.execute.side_effect = execute
+            return mock_orch
+
+        with patch('webapp.db_logger.DBLogHandler', MagicMock(return_value=MagicMock())), \
+             patch('webapp.db_logger.set_run_id'), \
+             patch('webapp.db_logger.set_current_stage'), \
+             patch('webapp.run_broadcaster.broadcaster_manager') as manager, \
+             patch('libs.config.config_from_settings', return_value=MagicMock()), \
+             patch('libs.orchestrator.Orchestrator', side_effect=fake_orchestrator_cls):
+            _execute_run(run.id, task.id)
+
+        published = [c.args[1].status for c in manager.publish_stage.call_args_list]
+        assert published == ['running', 'success']
+        manager.wake.assert_called_once_with(run.id)
+
+    def test_pipeline_writes_go_through_writer_thread(self):
+        import threading
+        from webapp.models import Run, Task, StageExecution
+        from webapp.runner import _execute_run
+
+        run = Run.objects.create(status='pending', config_snapshot={})
+        task = Task.objects.create(task_type='pipeline_run', status='pending', run=run)
+        writer_threads = set()
+
+        def fake_orchestrator_cls(**kwargs):
+            mock_orch = MagicMock()
+            cb = kwargs['stage_callback']
+
+            def execute(cancel_flag=None):
+                cb('UpdateRepos', 'running', datetime.now(timezone.utc))
+                cb('UpdateRepos', 'success', datetime.now(timezone.utc))
+                return True
+
+            mock_orch.execute.side_effect = execute
+            return mock_orch
+
+        def record_thread(sender, **kwargs):
+            writer_threads.add(threading.current_thread().name)
+
+        from django.db.models.signals import post_save
+        post_save.connect(record_thread, sender=StageExecution)
+        try:
+            with patch('webapp.db_logger.DBLogHandler', MagicMock(return_value=MagicMock())), \
+                 patch('libs.config.config_from_settings', return_value=MagicMock()), \
+                 patch('libs.orchestrator.Orchestrator', side_effect=fake_orchestrator_cls):
+                _execute_run(run.id, task.id)
+        finally:
+            post_save.disconnect(record_thread, sender=StageExecution)
+
+        assert writer_threads == {f'db-writer-{run.id}'}
+        run.refresh_from_db()
+        assert run.status == 'success'
+        assert StageExecution.objects.get(run=run).status == 'success'
+
+
+    def test_logs_archived_when_run_finishes(self):
+        from webapp.models import LogEntry, Run, RunLogArchive, Task
+        from webapp.runner import _execute_run
+
+        run = Run.objects.create(status='pending', config_snapshot={})
+        task = Task.objects.create(task_type='pipeline_run', status='pending', run=run)
+
+        def fake_orchestrator_cls(**kwargs):
+            mock_orch = MagicMock()
+
+            def execute(cancel_flag=None):
+                LogEntry.objects.create(run=run, level='INFO', message='hello',
+                                        timestamp=datetime.now(timezone.utc))
+                return True
+
+            mock_orch.execute.side_effect = execute
+            return mock_orch
+
+        with patch('webapp.db_logger.DBLogHandler', MagicMock(return_value=MagicMock())), \
+             patch('libs.config.config_from_settings', return_value=MagicMock()), \
+             patch('libs.orchestrator.Orchestrator', side_effect=fake_orchestrator_cls):
+            _execute_run(run.id, task.id)
+
+        assert not LogEntry.objects.filter(run=run).exists()
+        assert RunLogArchive.objects.get(run=run).entry_count == 1
+
+    def test_archiving_off_keeps_rows(self):
+        from webapp.models import LogEntry, Run, RunLogArchive, Setting, Task
+        from webapp.runner import _execute_run
+
+        Setting.set('logging.archive_codec', 'off')
+        run = Run.objects.create(status='pending', config_snapshot={})
+        task = Task.objects.create(task_type='pipeline_run', status='pending', run=run)
+        LogEntry.objects.create(run=run, level='INFO', message='hello',
+                                timestamp=datetime.now(timezone.utc))
+
+        with patch('webapp.db_logger.DBLogHandler', MagicMock(return_value=MagicMock())), \
+             patch('libs.config.config_from_settings', return_value=MagicMock()), \
+             patch('libs.orchestrator.Orchestrator', return_value=self._make_mock_orchestrator(True)):
+            _execute_run(run.id, task.id)
+
+        assert LogEntry.objects.filter(run=run).count() == 1
+        assert not RunLogArchive.objects.exists()
+
+    def test_daily_stats_updated_when_run_finishes(self):
+        from django.utils import timezone as tz
+        from webapp.models import Run, RunDailyStats, Task
+        from webapp.runner import _execute_run
+
+        run = Run.objects.create(status='pending', config_snapshot={})
+        task = Task.objects.create(task_type='pipeline_run', status='pending', run=run)
+
+        with patch('webapp.db_logger.DBLogHandler', MagicMock(return_value=MagicMock())), \
+             patch('libs.config.config_from_settings', return_value=MagicMock()), \
+             patch('libs.orchestrator.Orchestrator', return_value=self._make_mock_orchestrator(False)):
+            _execute_run(run.id, task.id)
+
+        stats = RunDailyStats.objects.get(day=tz.localdate(run.started_at))
+        assert (stats.runs, stats.success, stats.failed) == (1, 0, 1)
+
+
+@pytest.mark.django_db(transaction=True)
 class TestExecuteRunLogbookFallback:
     def test_logbook_import_failure_is_swallowed(self, db):
         """Lines 129-130: if logbook.Logger import fails inside the except handler, it's swallowed."""
@@ -318,3 +594,42 @@ class TestExecuteRunLogbookFallback:
 
         run.refresh_from_db()
         assert run.status == 'failed'
+
+
+class TestActiveProcRegistry:
+    def test_cancel_terminates_every_registered_proc(self):
+        from webapp import runner
+        event = threading.Event()
+        procs = [MagicMock(), MagicMock()]
+        for proc in procs:
+            proc.poll.return_value = None
+        runner._register_run('run-x', event)
+        try:
+            for proc in procs:
+                runner.register_active_proc('run-x', proc)
+            runner.cancel_run('run-x')
+        finally:
+            runner._unregister_run('run-x')
+        assert event.is_set()
+        for proc in procs:
+            proc.terminate.assert_called_once()
+
+    def test_unregister_single_proc_keeps_others(self):
+        from webapp import runner
+        first, second = MagicMock(), MagicMock()
+        runner.register_active_proc('run-y', first)
+        runner.register_active_proc('run-y', second)
+        runner.unregister_active_proc('run-y', first)
+        assert runner._active_procs['run-y'] == [second]
+        runner.unregister_active_proc('run-y', second)
+        assert 'run-y' not in runner._active_procs
+
+    def test_get_cancel_event(self):
+        from webapp import runner
+        event = threading.Event()
+        runner._register_run('run-z', event)
+        try:
+            assert runner.get_cancel_event('run-z') is event
+        finally:
+            runner._unregister_run('run-z')
+        assert runner.get_cancel_event('run-z') is None
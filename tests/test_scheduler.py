@@ -101,6 +101,7 @@ class TestRescheduleJob:
         ids = [c[1].get('id') for c in mock_sched.add_job.call_args_list]
         assert 'autopkg_scheduled_run' not in ids
         assert 'recipe_index_refresh' in ids
+        assert 'prune_used_nonces' in ids
 
     def test_starts_scheduler_when_not_running(self, schedule):
         from webapp.scheduler import reschedule_job
@@ -0,0 +1,203 @@
+"""Tests for webapp.sqlite_backend and webapp.routers."""
+from __future__ import annotations
+
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+def _connection(path, **options):
+    from django.db.utils import ConnectionHandler
+    handler = ConnectionHandler({'default': {
+        'ENGINE': 'webapp.sqlite_backend', 'NAME': str(path), 'OPTIONS': {'timeout': 5, **options},
+    }})
+    return handler['default']
+
+
+def _pragma(conn, name):
+    with conn.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db   # lifts pytest-django's block on opening connections
+class TestSqliteBackend:
+
+    def test_pragmas_applied_on_connect(self, tmp_path):
+        conn = _connection(tmp_path / 'db.sqlite3')
+        try:
+            assert _pragma(conn, 'journal_mode') == 'wal'
+            assert _pragma(conn, 'synchronous') == 1        # NORMAL
+            assert _pragma(conn, 'cache_size') == -20000
+            assert _pragma(conn, 'foreign_keys') == 1
+        finally:
+            conn.close()
+
+    def test_foreign_keys_option_disables_enforcement(self, tmp_path):
+        conn = _connection(tmp_path / 'logs.sqlite3', foreign_keys=False)
+        try:
+            assert _pragma(conn, 'foreign_keys') == 0
+        finally:
+            conn.close()
+
+    def test_foreign_keys_stay_off_after_schema_changes(self, tmp_path):
+        conn = _connection(tmp_path / 'logs.sqlite3', foreign_keys=False)
+        try:
+            with conn.schema_editor() as editor:
+                editor.execute('CREATE TABLE t (id INTEGER PRIMARY KEY)')
+            assert _pragma(conn, 'foreign_keys') == 0
+        finally:
+            conn.close()
+
+    def test_in_memory_database_skips_wal(self):
+        conn = _connection(':memory:')
+        try:
+            assert _pragma(conn, 'journal_mode') == 'memory'
+        finally:
+            conn.close()
+
+    def test_concurrent_read_then_write_transactions_wait_instead_of_failing(self, tmp_path):
+        """Deferred BEGIN lets two read-then-write transactions deadlock on the
+        lock upgrade ("database is locked"); BEGIN IMMEDIATE serialises them."""
+        path = tmp_path / 'db.sqlite3'
+        setup = _connection(path)
+        with setup.cursor() as cursor:
+            cursor.execute('CREATE TABLE stage (name TEXT PRIMARY KEY, hits INTEGER)')
+            cursor.execute("INSERT INTO stage VALUES ('a', 0)")
+        setup.close()
+
+        errors = []
+        barrier = threading.Barrier(4)
+
+        def worker():
+            conn = _connection(path)
+            conn.begin_immediate = True   # as write_transaction() sets it
+            try:
+                barrier.wait()
+                for _ in range(20):
+                    with conn.cursor() as cursor:
+                        conn._start_transaction_under_autocommit()
+                        cursor.execute("SELECT hits FROM stage WHERE name = 'a'")
+                        hits = cursor.fetchone()[0]
+                        cursor.execute("UPDATE stage SET hits = %s WHERE name = 'a'", [hits + 1])
+                        cursor.execute('COMMIT')
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                conn.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        check = _connection(path)
+        try:
+            with check.cursor() as cursor:
+                cursor.execute("SELECT hits FROM stage WHERE name = 'a'")
+                assert cursor.fetchone()[0] == 80
+        finally:
+            check.close()
+
+
+    def test_only_write_transactions_take_the_write_lock_up_front(self, tmp_path):
+        path = tmp_path / 'db.sqlite3'
+        reader, writer = _connection(path), _connection(path, timeout=0.1)
+        try:
+            with writer.cursor() as cursor:
+                cursor.execute('CREATE TABLE t (id INTEGER PRIMARY KEY)')
+            for immediate, locked in ((False, False), (True, True)):
+                reader.begin_immediate = immediate
+                with reader.cursor() as cursor:
+                    reader._start_transaction_under_autocommit()
+                    cursor.execute('SELECT COUNT(*) FROM t')
+                    try:
+                        with writer.cursor() as other:
+                            other.execute('INSERT INTO t DEFAULT VALUES')
+                        blocked = False
+                    except Exception as exc:
+                        assert 'locked' in str(exc)
+                        blocked = True
+                    cursor.execute('COMMIT')
+                assert blocked is locked
+        finally:
+            reader.close()
+            writer.close()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_write_transaction_begins_immediate_only_when_outermost(self):
+        from django.db import connections, transaction
+        from webapp.sqlite_backend import write_transaction
+        conn = connections['default']
+        begun = []
+        real = type(conn)._start_transaction_under_autocommit
+
+        def spy(self):
+            begun.append(self.begin_immediate)
+            return real(self)
+
+        with patch.object(type(conn), '_start_transaction_under_autocommit', spy):
+            with write_transaction():
+                with write_transaction():
+                    pass
+            with transaction.atomic():
+                pass
+        assert begun == [True, False]
+        assert conn.begin_immediate is False
+
+class TestLogDatabaseRouter:
+
+    def _router(self):
+        from webapp.routers import LogDatabaseRouter
+        return LogDatabaseRouter()
+
+    def test_log_entries_routed_to_logs_database(self):
+        from webapp.models import LogEntry, Run
+        router = self._router()
+        assert router.db_for_read(LogEntry) == 'logs'
+        assert router.db_for_write(LogEntry) == 'logs'
+        assert router.db_for_read(Run) is None
+
+    def test_relation_between_log_entry_and_run_allowed(self):
+        from webapp.models import LogEntry, Run, Setting
+        router = self._router()
+        assert router.allow_relation(LogEntry(), Run()) is True
+        assert router.allow_relation(Run(), Setting()) is None
+
+    def test_only_log_table_migrated_into_logs_database(self):
+        router = self._router()
+        assert router.allow_migrate('logs', 'webapp', model_name='logentry') is True
+        assert router.allow_migrate('logs', 'webapp', model_name='run') is False
+        assert router.allow_migrate('logs', 'auth', model_name='user') is False
+        assert router.allow_migrate('default', 'webapp', model_name='logentry') is None
+
+    def test_migrate_log_database_noop_when_disabled(self):
+        from webapp.routers import migrate_log_database
+        with patch('django.core.management.call_command') as call_command:
+            migrate_log_database(MagicMock(label='webapp'), using='default')
+        call_command.assert_not_called()
+
+    def test_migrate_log_database_when_enabled(self):
+        from webapp.routers import migrate_log_database
+        with patch('webapp.routers.log_database_enabled', return_value=True), \
+             patch('django.core.management.call_command') as call_command:
+            migrate_log_database(MagicMock(label='webapp'), using='default')
+            migrate_log_database(MagicMock(label='webapp'), using='logs')
+        call_command.assert_called_once_with('migrate', 'webapp', database='logs',
+                                             verbosity=0, interactive=False)
+
+    @pytest.mark.django_db
+    def test_delete_run_logs_removes_entries(self):
+        from django.utils import timezone
+        from webapp.models import LogEntry, Run
+        from webapp.routers import delete_run_logs
+        run = Run.objects.create(status='success', config_snapshot={})
+        other = Run.objects.create(status='success', config_snapshot={})
+        for r in (run, other):
+            LogEntry.objects.create(run=r, timestamp=timezone.now(), message='x')
+        delete_run_logs(Run, run)
+        assert not LogEntry.objects.filter(run=run).exists()
+        assert LogEntry.objects.filter(run=other).exists()
@@ -10,7 +10,7 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 
-def _make_stage(tmp_path, recipe_lines='Firefox.munki\n'):
+def _make_stage(tmp_path, recipe_lines='Firefox.munki\n', run_shards=1):
     from stages.run_autopkg import RunAutoPkg
     rfile = tmp_path / 'recipes.txt'
     rfile.write_text(recipe_lines)
@@ -18,6 +18,7 @@ def _make_stage(tmp_path, recipe_lines='Firefox.munki\n'):
     config.autopkg.bin_path = Path('/usr/local/bin/autopkg')
     config.autopkg.recipe_list = str(rfile)
     config.repository.mount_path = Path('/tmp/munki-repo')
+    config.run_shards = run_shards
     ctx = {'stage_outputs': {}}
     logger: MagicMock = MagicMock()
     return RunAutoPkg(config, ctx, logger), logger
@@ -76,6 +77,108 @@ class TestRun:
         assert '--report-plist' in cmd_args
 
 
+# -- run() in sharded mode -----------------------------------------------------
+
+def _report_arg(cmd):
+    return cmd[cmd.index('--report-plist') + 1]
+
+
+class TestRunSharded:
+    RECIPES = 'A.munki\nB.munki\nC.munki\nMakeCatalogs.munki\n'
+
+    def test_single_shard_uses_one_batch(self, tmp_path):
+        stage, _ = _make_stage(tmp_path, self.RECIPES, run_shards=1)
+        with patch('stages.run_autopkg.run_cmd') as mock_cmd, \
+             patch('stages.run_autopkg.run_cmds') as mock_cmds, \
+             patch.object(stage, '_write_recipe_results'):
+            stage.run()
+        assert mock_cmd.call_count == 1
+        mock_cmds.assert_not_called()
+
+    def test_recipes_split_across_shards(self, tmp_path):
+        stage, _ = _make_stage(tmp_path, self.RECIPES, run_shards=2)
+        with patch('stages.run_autopkg.run_cmd'), \
+             patch('stages.run_autopkg.run_cmds', return_value={}) as mock_cmds, \
+             patch.object(stage, '_write_recipe_results'):
+            stage.run()
+        commands = mock_cmds.call_args[0][0]
+        assert len(commands) == 2
+        sharded = [r for _, cmd in commands for r in cmd if r.endswith('.munki')]
+        assert sorted(sharded) == ['A.munki', 'B.munki', 'C.munki']
+        # Every shard writes its own report plist.
+        assert len({_report_arg(cmd) for _, cmd in commands}) == 2
+        assert mock_cmds.call_args[1]['max_workers'] == 2
+
+    def test_makecatalogs_runs_once_after_shards(self, tmp_path):
+        stage, _ = _make_stage(tmp_path, self.RECIPES, run_shards=3)
+        order = []
+        with patch('stages.run_autopkg.run_cmd',
+                   side_effect=lambda cmd, *a, **k: order.append(('cmd', cmd))), \
+             patch('stages.run_autopkg.run_cmds',
+                   side_effect=lambda cmds, *a, **k: order.append(('cmds', cmds)) or {}), \
+             patch.object(stage, '_write_recipe_results'):
+            stage.run()
+        assert [kind for kind, _ in order] == ['cmds', 'cmd']
+        assert all('MakeCatalogs.munki' not in cmd for _, cmd in order[0][1])
+        assert 'MakeCatalogs.munki' in order[1][1]
+
+    def test_shard_count_capped_by_recipe_count(self, tmp_path):
+        stage, _ = _make_stage(tmp_path, 'A.munki\nB.munki\n', run_shards=8)
+        with patch('stages.run_autopkg.run_cmd') as mock_cmd, \
+             patch('stages.run_autopkg.run_cmds', return_value={}) as mock_cmds, \
+             patch.object(stage, '_write_recipe_results'):
+            stage.run()
+        assert len(mock_cmds.call_args[0][0]) == 2
+        mock_cmd.assert_not_called()
+
+    def test_failed_shard_is_logged_not_raised(self, tmp_path):
+        stage, logger = _make_stage(tmp_path, 'A.munki\nB.munki\n', run_shards=2)
+        with patch('stages.run_autopkg.run_cmds',
+                   return_value={'shard 1/2': 0, 'shard 2/2': 1}), \
+             patch.object(stage, '_write_recipe_results'):
+            stage.run()
+        assert any('shard 2/2' in str(c) for c in logger.error.call_args_list)
+
+    def test_shard_reports_merged(self, tmp_path):
+        stage, _ = _make_stage(tmp_path, 'A.munki\nB.munki\n', run_shards=2)
+        reports = [
+            {'failures': [{'recipe': 'A.munki'}],
+             'summary_results': {'munki_importer_summary_result': {
+                 'summary_text': 'Imported:', 'data_rows': [{'name': 'A'}]}}},
+            {'failures': [],
+             'summary_results': {'munki_importer_summary_result': {
+                 'summary_text': 'Imported:', 'data_rows': [{'name': 'B'}]}}},
+        ]
+
+        def _fake_cmds(commands, *args, **kwargs):
+            for (_, cmd), data in zip(commands, reports):
+                with open(_report_arg(cmd), 'wb') as f:
+                    plistlib.dump(data, f)
+            return {}
+
+        with patch('stages.run_autopkg.run_cmds', side_effect=_fake_cmds), \
+             patch.object(stage, '_write_recipe_results'):
+            stage.run()
+        with open(stage._tmp_plist.name, 'rb') as f:
+            merged = plistlib.load(f)
+        assert merged['failures'] == [{'recipe': 'A.munki'}]
+        section = merged['summary_results']['munki_importer_summary_result']
+        assert section['summary_text'] == 'Imported:'
+        assert section['data_rows'] == [{'name': 'A'}, {'name': 'B'}]
+        stage.cleanup()
+
+    def test_unreadable_shard_report_skipped(self, tmp_path):
+        stage, logger = _make_stage(tmp_path)
+        good = tmp_path / 'good.plist'
+        with open(good, 'wb') as f:
+            plistlib.dump({'failures': [{'recipe': 'A'}]}, f)
+        dest = tmp_path / 'merged.plist'
+        stage._merge_reports([str(tmp_path / 'missing.plist'), str(good)], str(dest))
+        with open(dest, 'rb') as f:
+            assert plistlib.load(f) == {'failures': [{'recipe': 'A'}]}
+        logger.warning.assert_called()
+
+
 # -- _write_recipe_results() ---------------------------------------------------
 
 class TestWriteRecipeResults:
@@ -142,6 +245,39 @@ class TestWriteRecipeResults:
         assert 'munki_import' in types
         assert 'url_downloaded' in types
 
+    @pytest.mark.django_db
+    def test_writes_recipe_events(self, tmp_path):
+        from webapp.models import Run, RecipeEvent
+        run = Run.objects.create(status='running', triggered_by='test', config_snapshot={})
+        stage, _ = _make_stage(tmp_path)
+        stage.ctx['run_id'] = run.pk
+        plist_data = {
+            'failures': [{'recipe_id': 'Broken.munki', 'message': 'oops'}],
+            'summary_results': {
+                'munki_importer_summary_result': {
+                    'summary_text': 'Imported:',
+                    'data_rows': [{'name': 'Firefox', 'version': '120.0'}],
+                },
+                'url_downloader_summary_result': {
+                    'summary_text': 'Downloaded:',
+                    'data_rows': [{'download_path': '/cache/com.github.autopkg.munki.firefox/downloads/Firefox.dmg'}],
+                },
+            },
+        }
+        pfile = tmp_path / 'report.plist'
+        with open(pfile, 'wb') as f:
+            plistlib.dump(plist_data, f)
+        tmp = MagicMock()
+        tmp.name = str(pfile)
+        stage._tmp_plist = tmp
+        stage._write_recipe_results()
+        events = set(RecipeEvent.objects.filter(run=run).values_list('event_type', 'name', 'version'))
+        assert events == {
+            ('failure', 'Broken.munki', ''),
+            ('munki_import', 'Firefox', '120.0'),
+            ('url_downloaded', 'com.github.autopkg.munki.firefox', ''),
+        }
+
     @pytest.mark.django_db
     def test_trust_section_written_when_recipes_updated(self, tmp_path):
         from webapp.models import Run, RecipeResult
@@ -183,6 +319,15 @@ class TestCleanup:
         stage.cleanup()  # must not raise
         assert stage._tmp_plist is None
 
+    def test_removes_shard_plists(self, tmp_path):
+        stage, _ = _make_stage(tmp_path)
+        shard = tmp_path / 'shard.plist'
+        shard.write_bytes(b'')
+        stage._shard_plists = [str(shard)]
+        stage.cleanup()
+        assert not shard.exists()
+        assert stage._shard_plists == []
+
     def test_noop_when_no_plist(self, tmp_path):
         stage, _ = _make_stage(tmp_path)
         stage._tmp_plist = None
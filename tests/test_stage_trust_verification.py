@@ -1,6 +1,8 @@
 """Tests for stages.trust_verification.TrustVerification."""
 from __future__ import annotations
 
+import hashlib
+import plistlib
 import subprocess
 from pathlib import Path
 from unittest.mock import MagicMock, patch
@@ -8,12 +10,18 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 
-def _make_stage(recipe_file_path=None):
+def _make_stage(recipe_file_path=None, trust_workers=1, native_trust=False,
+                overrides_dir='/tmp/RecipeOverrides', run_id=None):
     from stages.trust_verification import TrustVerification
     config = MagicMock()
     config.autopkg.bin_path = Path('/usr/local/bin/autopkg')
     config.autopkg.recipe_list = recipe_file_path or '/tmp/recipes.txt'
+    config.autopkg.overrides_dir = Path(overrides_dir)
+    config.trust_workers = trust_workers
+    config.native_trust = native_trust
     ctx = {'stage_outputs': {}}
+    if run_id:
+        ctx['run_id'] = run_id
     logger = MagicMock()
     return TrustVerification(config, ctx, logger)
 
@@ -49,7 +57,7 @@ class TestTrustVerificationRun:
         rfile.write_text('Firefox.munki\n')
         stage = _make_stage(str(rfile))
 
-        def _cmd(args, logger):
+        def _cmd(args, logger, on_proc=None):
             if 'verify-trust-info' in args:
                 raise subprocess.CalledProcessError(1, args)
             # update-trust-info succeeds silently
@@ -74,7 +82,7 @@ class TestTrustVerificationRun:
         stage = _make_stage(str(rfile))
         update_calls = []
 
-        def _cmd(args, logger):
+        def _cmd(args, logger, on_proc=None):
             if 'verify-trust-info' in args:
                 raise subprocess.CalledProcessError(1, args)
             update_calls.append(args[-1])  # last arg is the recipe name
@@ -89,7 +97,7 @@ class TestTrustVerificationRun:
         rfile.write_text('Firefox.munki\nChrome.pkg\n')
         stage = _make_stage(str(rfile))
 
-        def _cmd(args, logger):
+        def _cmd(args, logger, on_proc=None):
             # Only Firefox fails verify
             if 'verify-trust-info' in args and 'Firefox' in args[-1]:
                 raise subprocess.CalledProcessError(1, args)
@@ -97,3 +105,249 @@ class TestTrustVerificationRun:
         with patch('stages.trust_verification.run_cmd', side_effect=_cmd):
             result = stage.run()
         assert result == ['Firefox.munki']
+
+
+class TestTrustVerificationConcurrent:
+    @staticmethod
+    def _fake_pool(verify_fail=(), update_fail=()):
+        calls = []
+
+        def _cmds(commands, logger, max_workers, **kwargs):
+            calls.append((commands, max_workers))
+            verb = commands[0][1][1]
+            failing = verify_fail if verb == 'verify-trust-info' else update_fail
+            return {label: (1 if label in failing else 0) for label, _ in commands}
+
+        return calls, _cmds
+
+    def test_all_pass_returns_empty_list(self, tmp_path):
+        rfile = tmp_path / 'recipes.txt'
+        rfile.write_text('Firefox.munki\nChrome.pkg\n')
+        stage = _make_stage(str(rfile), trust_workers=4)
+        calls, fake = self._fake_pool()
+        with patch('stages.trust_verification.run_cmds', side_effect=fake), \
+             patch('stages.trust_verification.run_cmd') as mock_cmd:
+            result = stage.run()
+        assert result == []
+        mock_cmd.assert_not_called()
+        assert len(calls) == 1
+        commands, max_workers = calls[0]
+        assert max_workers == 4
+        # Each child is labelled with its recipe so log lines stay attributable.
+        assert [label for label, _ in commands] == ['Firefox.munki', 'Chrome.pkg']
+
+    def test_failed_verify_updated_in_run_list_order(self, tmp_path):
+        rfile = tmp_path / 'recipes.txt'
+        rfile.write_text('A.munki\nB.munki\nC.munki\n')
+        stage = _make_stage(str(rfile), trust_workers=2)
+        calls, fake = self._fake_pool(verify_fail={'C.munki', 'A.munki'})
+        with patch('stages.trust_verification.run_cmds', side_effect=fake):
+            result = stage.run()
+        assert result == ['A.munki', 'C.munki']
+        update_commands = calls[1][0]
+        assert all(cmd[1] == 'update-trust-info' for _, cmd in update_commands)
+        assert [label for label, _ in update_commands] == ['A.munki', 'C.munki']
+
+    def test_failed_update_raises_runtime_error(self, tmp_path):
+        rfile = tmp_path / 'recipes.txt'
+        rfile.write_text('Firefox.munki\n')
+        stage = _make_stage(str(rfile), trust_workers=2)
+        _, fake = self._fake_pool(verify_fail={'Firefox.munki'},
+                                  update_fail={'Firefox.munki'})
+        with patch('stages.trust_verification.run_cmds', side_effect=fake):
+            with pytest.raises(RuntimeError, match='Firefox.munki'):
+                stage.run()
+
+    def test_blank_and_duplicate_lines_skipped(self, tmp_path):
+        rfile = tmp_path / 'recipes.txt'
+        rfile.write_text('Firefox.munki\n\nFirefox.munki\n')
+        stage = _make_stage(str(rfile), trust_workers=2)
+        calls, fake = self._fake_pool()
+        with patch('stages.trust_verification.run_cmds', side_effect=fake):
+            stage.run()
+        assert [label for label, _ in calls[0][0]] == ['Firefox.munki']
+
+
+class TestTrustVerificationCancel:
+    @pytest.fixture
+    def cancel_event(self):
+        import threading
+        event = threading.Event()
+        with patch('webapp.runner.get_cancel_event', return_value=event):
+            yield event
+
+    def test_children_registered_for_cancellation(self, tmp_path, cancel_event):
+        rfile = tmp_path / 'recipes.txt'
+        rfile.write_text('Firefox.munki\n')
+        stage = _make_stage(str(rfile), run_id='r1')
+        proc = MagicMock()
+
+        def _cmd(args, logger, on_proc=None):
+            from webapp.runner import _active_procs
+            on_proc(proc)
+            assert _active_procs['r1'] == [proc]
+
+        with patch('stages.trust_verification.run_cmd', side_effect=_cmd):
+            stage.run()
+        from webapp.runner import _active_procs
+        assert 'r1' not in _active_procs
+
+    def test_cancel_stops_sequential_checks(self, tmp_path, cancel_event):
+        rfile = tmp_path / 'recipes.txt'
+        rfile.write_text('Firefox.munki\nChrome.pkg\n')
+        stage = _make_stage(str(rfile), run_id='r1')
+        calls = []
+
+        def _cmd(args, logger, on_proc=None):
+            # The run is cancelled while the first check runs; autopkg is killed.
+            calls.append(args[1:])
+            cancel_event.set()
+            raise subprocess.CalledProcessError(-15, args)
+
+        with patch('stages.trust_verification.run_cmd', side_effect=_cmd):
+            assert stage.run() == ['Firefox.munki']
+        assert calls == [['verify-trust-info', 'Firefox.munki']]
+
+    def test_cancel_skips_concurrent_update_pass(self, tmp_path, cancel_event):
+        rfile = tmp_path / 'recipes.txt'
+        rfile.write_text('Firefox.munki\nChrome.pkg\n')
+        stage = _make_stage(str(rfile), trust_workers=2, run_id='r1')
+        pools = []
+
+        def _cmds(commands, logger, max_workers, on_proc=None, on_exit=None, cancel_flag=None):
+            pools.append(commands[0][1][1])
+            assert cancel_flag is cancel_event and on_proc and on_exit
+            cancel_flag.set()
+            return {label: -15 for label, _ in commands}
+
+        with patch('stages.trust_verification.run_cmds', side_effect=_cmds):
+            stage.run()
+        assert pools == ['verify-trust-info']
+
+
+class TestTrustVerificationNative:
+    """Overrides whose stored trust info still matches the files on disk are
+    confirmed without spawning autopkg; everything else falls back."""
+
+    def _setup(self, tmp_path, override_format='plist', home_relative=False):
+        repo = tmp_path / 'repo'
+        repo.mkdir()
+        download = repo / 'Firefox.download.recipe'
+        download.write_text('download recipe')
+        munki = repo / 'Firefox.munki.recipe'
+        munki.write_text('munki recipe')
+        processor = repo / 'FirefoxProcessor.py'
+        processor.write_text('class FirefoxProcessor: pass')
+
+        def _info(path):
+            # AutoPkg writes paths under the home directory as ~/...
+            shown = f'~/{path.relative_to(tmp_path)}' if home_relative else str(path)
+            return {'path': shown,
+                    'sha256_hash': hashlib.sha256(path.read_bytes()).hexdigest(),
+                    'git_hash': 'abc'}
+
+        override = {
+            'Identifier': 'local.munki.Firefox',
+            'ParentRecipe': 'com.example.munki.Firefox',
+            'ParentRecipeTrustInfo': {
+                'parent_recipes': {
+                    'com.example.munki.Firefox': _info(munki),
+                    'com.example.download.Firefox': _info(download),
+                },
+                'non_core_processors': {
+                    'com.example.shared/FirefoxProcessor': _info(processor),
+                },
+            },
+        }
+        overrides = tmp_path / 'RecipeOverrides'
+        overrides.mkdir()
+        if override_format == 'yaml':
+            import yaml
+            (overrides / 'Firefox.munki.recipe.yaml').write_text(yaml.safe_dump(override))
+        else:
+            with open(overrides / 'Firefox.munki.recipe', 'wb') as f:
+                plistlib.dump(override, f)
+
+        index = [
+            {'stem': 'Firefox.munki', 'identifier': 'com.example.munki.Firefox',
+             'parent': 'com.example.download.Firefox', 'path': str(munki)},
+            {'stem': 'Firefox.download', 'identifier': 'com.example.download.Firefox',
+             'parent': None, 'path': str(download)},
+        ]
+        rfile = tmp_path / 'recipes.txt'
+        rfile.write_text('Firefox.munki\nlocal.munki.Firefox\nChrome.munki\n')
+        stage = _make_stage(str(rfile), native_trust=True, overrides_dir=overrides)
+        return stage, index, {'munki': munki, 'download': download, 'processor': processor}
+
+    def _run(self, stage, index):
+        stage.ctx['recipe_file_index'] = lambda: index
+        with patch('stages.trust_verification.run_cmd') as mock_cmd:
+            result = stage.run()
+        return result, [c[0][0][-1] for c in mock_cmd.call_args_list]
+
+    def test_matching_hashes_skip_autopkg(self, tmp_path):
+        stage, index, _ = self._setup(tmp_path)
+        result, verified = self._run(stage, index)
+        assert result == []
+        # Both name and identifier resolve to the override; only the
+        # recipe without an override is left for autopkg.
+        assert verified == ['Chrome.munki']
+
+    def test_yaml_override_supported(self, tmp_path):
+        stage, index, _ = self._setup(tmp_path, override_format='yaml')
+        _, verified = self._run(stage, index)
+        assert verified == ['Chrome.munki']
+
+    def test_home_relative_trust_paths(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('HOME', str(tmp_path))
+        stage, index, _ = self._setup(tmp_path, home_relative=True)
+        _, verified = self._run(stage, index)
+        assert verified == ['Chrome.munki']
+
+    def test_duplicate_identifier_resolves_to_first_in_search_order(self, tmp_path):
+        stage, index, files = self._setup(tmp_path)
+        shadowed = tmp_path / 'later' / 'Firefox.download.recipe'
+        shadowed.parent.mkdir()
+        shadowed.write_text('a different download recipe')
+        index.append(dict(index[1], path=str(shadowed)))
+        _, verified = self._run(stage, index)
+        assert verified == ['Chrome.munki']
+
+    def test_changed_parent_falls_back(self, tmp_path):
+        stage, index, files = self._setup(tmp_path)
+        files['download'].write_text('download recipe v2')
+        _, verified = self._run(stage, index)
+        assert verified == ['Firefox.munki', 'local.munki.Firefox', 'Chrome.munki']
+
+    def test_changed_processor_falls_back(self, tmp_path):
+        stage, index, files = self._setup(tmp_path)
+        files['processor'].write_text('class FirefoxProcessor: changed = True')
+        _, verified = self._run(stage, index)
+        assert 'Firefox.munki' in verified
+
+    def test_parent_resolved_elsewhere_falls_back(self, tmp_path):
+        stage, index, files = self._setup(tmp_path)
+        moved = tmp_path / 'other.recipe'
+        moved.write_bytes(files['download'].read_bytes())
+        index[1] = dict(index[1], path=str(moved))
+        _, verified = self._run(stage, index)
+        assert 'Firefox.munki' in verified
+
+    def test_new_parent_in_chain_falls_back(self, tmp_path):
+        stage, index, _ = self._setup(tmp_path)
+        index[1] = dict(index[1], parent='com.example.base.Firefox')
+        _, verified = self._run(stage, index)
+        assert 'Firefox.munki' in verified
+
+    def test_index_error_falls_back_to_autopkg(self, tmp_path):
+        stage, _, _ = self._setup(tmp_path)
+        stage.ctx['recipe_file_index'] = MagicMock(side_effect=OSError('boom'))
+        with patch('stages.trust_verification.run_cmd') as mock_cmd:
+            stage.run()
+        assert mock_cmd.call_count == 3
+
+    def test_no_index_in_ctx_falls_back_to_autopkg(self, tmp_path):
+        stage, _, _ = self._setup(tmp_path)
+        with patch('stages.trust_verification.run_cmd') as mock_cmd:
+            stage.run()
+        assert mock_cmd.call_count == 3
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import re
 import subprocess
+import time
 from pathlib import Path
 from typing import cast
 from unittest.mock import MagicMock, patch, call
@@ -10,12 +11,16 @@ from unittest.mock import MagicMock, patch, call
 import pytest
 
 
-def _make_stage(update_before_each_run=True):
+def _make_stage(update_before_each_run=True, workers=1, bin_path='/usr/local/bin/autopkg',
+                freshness_check=False, fresh_minutes=0):
     from stages.update_repos import UpdateRepos
 
     config = MagicMock()
-    config.autopkg.bin_path = Path('/usr/local/bin/autopkg')
+    config.autopkg.bin_path = Path(bin_path)
     config.update_repos = update_before_each_run
+    config.repo_update_workers = workers
+    config.repo_freshness_check = freshness_check
+    config.repo_fresh_minutes = fresh_minutes
 
     ctx = {'stage_outputs': {}}
     logger = MagicMock()
@@ -69,6 +74,19 @@ class TestUpdateRepos:
             stage.run()
         # Should have attempted both URLs despite first failure
         assert call_count[0] >= 2
+        assert stage.error_flag is True
+        assert stage.post_check() is False
+
+    def test_results_record_success_and_duration(self):
+        stage = _make_stage()
+        fake_entries = [{'msg': 'one (https://github.com/autopkg/one.git)'}]
+        with patch('stages.update_repos.run_cmd'), \
+             patch('libs.intercept_logger.InterceptLogger.entries', return_value=fake_entries):
+            results = stage.run()
+        assert results[0]['url'] == 'https://github.com/autopkg/one.git'
+        assert results[0]['success'] is True
+        assert results[0]['seconds'] >= 0
+        assert stage.error_flag is False
 
     def test_repo_list_failure_logs_error(self):
         stage = _make_stage()
@@ -76,6 +94,164 @@ class TestUpdateRepos:
                    side_effect=subprocess.CalledProcessError(1, 'autopkg')):
             stage.run()  # must not raise
         cast(MagicMock, stage.logger).error.assert_called()
+        assert stage.error_flag is True
+
+
+class TestUpdateReposConcurrent:
+    ENTRIES = [
+        {'msg': 'one (https://github.com/autopkg/one.git)'},
+        {'msg': 'two (https://github.com/autopkg/two.git)'},
+        {'msg': 'three (https://github.com/autopkg/three.git)'},
+    ]
+
+    @staticmethod
+    def _fake_cmds(failing=()):
+        calls = []
+
+        def _cmds(commands, logger, max_workers, on_proc, on_exit):
+            calls.append((commands, max_workers))
+            for label, cmd in commands:
+                proc = MagicMock()
+                proc.args = cmd
+                proc.returncode = 1 if label in failing else 0
+                on_proc(proc)
+                on_exit(proc)
+            return {}
+
+        return calls, _cmds
+
+    def test_updates_through_bounded_pool(self):
+        stage = _make_stage(workers=2)
+        calls, fake = self._fake_cmds()
+        with patch('stages.update_repos.run_cmd'), \
+             patch('stages.update_repos.run_cmds', side_effect=fake), \
+             patch('libs.intercept_logger.InterceptLogger.entries', return_value=self.ENTRIES):
+            results = stage.run()
+        commands, max_workers = calls[0]
+        assert max_workers == 2
+        assert [label for label, _ in commands] == [
+            'https://github.com/autopkg/one.git',
+            'https://github.com/autopkg/two.git',
+            'https://github.com/autopkg/three.git',
+        ]
+        assert all(r['success'] for r in results)
+        assert stage.post_check() is True
+
+    def test_failures_set_error_flag(self):
+        stage = _make_stage(workers=3)
+        _, fake = self._fake_cmds(failing={'https://github.com/autopkg/two.git'})
+        with patch('stages.update_repos.run_cmd'), \
+             patch('stages.update_repos.run_cmds', side_effect=fake), \
+             patch('libs.intercept_logger.InterceptLogger.entries', return_value=self.ENTRIES):
+            results = stage.run()
+        assert [r['success'] for r in results] == [True, False, True]
+        assert stage.error_flag is True
+        assert stage.post_check() is False
+
+
+class TestUpdateReposLocalGit:
+    """End-to-end against local bare repositories - no network needed."""
+
+    @pytest.mark.parametrize('workers', [1, 3])
+    def test_pulls_new_commits(self, local_git_repos, workers):
+        import subprocess as sp
+        autopkg, repos = local_git_repos(3)
+        for repo in repos:
+            (repo['seed'] / 'New.recipe').write_text('new\n')
+            sp.run(['git', '-C', str(repo['seed']), 'add', '.'], check=True)
+            sp.run(['git', '-C', str(repo['seed']), '-c', 'user.name=t', '-c', 'user.email=t@e',
+                    'commit', '-q', '-m', 'new'], check=True)
+            sp.run(['git', '-C', str(repo['seed']), 'push', '-q'], check=True)
+
+        stage = _make_stage(workers=workers, bin_path=str(autopkg))
+        results = stage.run()
+        assert [r['success'] for r in results] == [True] * 3
+        assert all((repo['clone'] / 'New.recipe').exists() for repo in repos)
+        assert stage.post_check() is True
+
+    def test_missing_remote_reported(self, local_git_repos):
+        import shutil
+        autopkg, repos = local_git_repos(2)
+        shutil.rmtree(repos[0]['bare'])
+        stage = _make_stage(workers=2, bin_path=str(autopkg))
+        results = stage.run()
+        assert [r['success'] for r in results] == [False, True]
+        assert stage.post_check() is False
+
+
+def _push_commit(repo):
+    import subprocess as sp
+    (repo['seed'] / 'New.recipe').write_text('new\n')
+    sp.run(['git', '-C', str(repo['seed']), 'add', '.'], check=True)
+    sp.run(['git', '-C', str(repo['seed']), '-c', 'user.name=t', '-c', 'user.email=t@e',
+            'commit', '-q', '-m', 'new'], check=True)
+    sp.run(['git', '-C', str(repo['seed']), 'push', '-q'], check=True)
+
+
+class TestUpdateReposFreshness:
+    """Local bare repositories stand in for the GitHub remotes."""
+
+    def test_unchanged_repos_skipped(self, local_git_repos):
+        from libs.run_command import run_cmds
+        autopkg, repos = local_git_repos(3)
+        _push_commit(repos[1])
+        stage = _make_stage(workers=2, bin_path=str(autopkg), freshness_check=True)
+        with patch('stages.update_repos.run_cmds', wraps=run_cmds) as mock_cmds:
+            results = stage.run()
+        by_url = {r['url']: r for r in results}
+        assert by_url[repos[0]['url']]['skipped'] is True
+        assert by_url[repos[2]['url']]['skipped'] is True
+        assert by_url[repos[1]['url']]['skipped'] is False
+        assert by_url[repos[1]['url']]['success'] is True
+        assert (repos[1]['clone'] / 'New.recipe').exists()
+        # Only the changed repository was handed to repo-update (a single
+        # URL runs through the sequential path).
+        mock_cmds.assert_not_called()
+        assert stage.post_check() is True
+
+    def test_disabled_check_pulls_everything(self, local_git_repos):
+        autopkg, repos = local_git_repos(2)
+        stage = _make_stage(bin_path=str(autopkg), freshness_check=False)
+        results = stage.run()
+        assert [r['skipped'] for r in results] == [False, False]
+
+    def test_recent_fetch_window_skips_without_remote_check(self, local_git_repos):
+        autopkg, repos = local_git_repos(2)
+        _push_commit(repos[0])
+        (repos[0]['clone'] / '.git' / 'FETCH_HEAD').write_text('')
+        stage = _make_stage(bin_path=str(autopkg), fresh_minutes=30)
+        results = stage.run()
+        by_url = {r['url']: r for r in results}
+        # Fetched moments ago, so skipped even though the remote moved on.
+        assert by_url[repos[0]['url']]['skipped'] is True
+        assert not (repos[0]['clone'] / 'New.recipe').exists()
+        assert by_url[repos[1]['url']]['skipped'] is False
+
+    def test_stale_fetch_outside_window_is_pulled(self, local_git_repos):
+        import os
+        autopkg, repos = local_git_repos(1)
+        fetch_head = repos[0]['clone'] / '.git' / 'FETCH_HEAD'
+        fetch_head.write_text('')
+        old = time.time() - 3600
+        os.utime(fetch_head, (old, old))
+        stage = _make_stage(bin_path=str(autopkg), fresh_minutes=30)
+        results = stage.run()
+        assert results[0]['skipped'] is False
+
+    def test_undecidable_repo_is_pulled(self):
+        stage = _make_stage(freshness_check=True)
+        assert stage._freshness_reason('/nonexistent/checkout', 'https://example.com/r.git') is None
+        assert stage._freshness_reason('', 'https://example.com/r.git') is None
+
+
+    def test_git_queries_never_prompt(self):
+        from stages.update_repos import _git
+        with patch('stages.update_repos.subprocess.run') as run:
+            run.return_value = MagicMock(returncode=0, stdout='abc\n')
+            assert _git('/repo', 'ls-remote', 'origin', 'HEAD') == 'abc'
+        kwargs = run.call_args.kwargs
+        assert kwargs['stdin'] is subprocess.DEVNULL
+        assert kwargs['env']['GIT_TERMINAL_PROMPT'] == '0'
 
 
 class TestPostCheck:
@@ -268,3 +268,79 @@ class TestHmacAuthenticationRareEdgeCases:
         with patch('hmac.compare_digest', side_effect=TypeError('bad type')):
             resp = anon_api_client.get(self.url)
         assert resp.status_code in (401, 403)
+
+
+@pytest.mark.django_db
+class TestHmacAuthenticationCaching:
+    url = '/api/auth/check_token/'
+
+    def _get(self, client, api_token):
+        client.credentials(HTTP_AUTHORIZATION=_hmac_auth_header(
+            api_token.token_id, api_token.decrypted_secret, 'GET', self.url,
+        ))
+        return client.get(self.url)
+
+    def test_known_token_costs_only_the_nonce_insert(self, anon_api_client, api_token):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        assert self._get(anon_api_client, api_token).status_code == 200
+        with CaptureQueriesContext(connection) as ctx:
+            assert self._get(anon_api_client, api_token).status_code == 200
+        sql = [q['sql'] for q in ctx.captured_queries]
+        assert not [q for q in sql if 'webapp_apitoken' in q]
+        assert [q.split()[0] for q in sql if 'webapp_usednonce' in q] == ['INSERT']
+
+    def test_revoked_token_rejected_at_once(self, anon_api_client, config_editor_client, api_token):
+        assert self._get(anon_api_client, api_token).status_code == 200
+        config_editor_client.post('/config/tokens/', {'action': 'revoke', 'token_id': str(api_token.pk)})
+        assert self._get(anon_api_client, api_token).status_code in (401, 403)
+
+    def test_token_revoked_on_another_worker_rejected_once_stamped(self, anon_api_client, api_token):
+        """Another worker's revoke: the row goes behind this process's cache, then the stamp."""
+        from webapp.models import APIToken
+        from webapp.stamp import bump_stamp
+        from api.authentication import _stamp_path
+        assert self._get(anon_api_client, api_token).status_code == 200
+        APIToken.objects.filter(pk=api_token.pk).delete()
+        assert self._get(anon_api_client, api_token).status_code == 200
+        bump_stamp(_stamp_path())
+        assert self._get(anon_api_client, api_token).status_code in (401, 403)
+
+    def test_user_deactivated_on_another_worker_rejected_once_stamped(self, anon_api_client, api_token, user):
+        from django.contrib.auth import get_user_model
+        from webapp.stamp import bump_stamp
+        from api.authentication import _stamp_path
+        assert self._get(anon_api_client, api_token).status_code == 200
+        get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+        bump_stamp(_stamp_path())
+        assert self._get(anon_api_client, api_token).status_code in (401, 403)
+
+    def test_forget_credentials_bumps_the_stamp_on_commit(self, django_capture_on_commit_callbacks):
+        from webapp.stamp import read_stamp
+        from api.authentication import _stamp_path, forget_credentials
+        with django_capture_on_commit_callbacks(execute=True):
+            forget_credentials(['abc'])
+        assert read_stamp(_stamp_path()) is not None
+
+    def test_nonce_used_on_another_worker_is_rejected(self, anon_api_client, api_token):
+        """A nonce missing from this process's window still hits the unique constraint."""
+        from api import authentication
+        anon_api_client.credentials(HTTP_AUTHORIZATION=_hmac_auth_header(
+            api_token.token_id, api_token.decrypted_secret, 'GET', self.url,
+        ))
+        assert anon_api_client.get(self.url).status_code == 200
+        authentication._seen_nonces.clear()
+        assert anon_api_client.get(self.url).status_code in (401, 403)
+
+    def test_prune_used_nonces_keeps_the_replay_window(self, db):
+        from datetime import timedelta
+        from django.utils import timezone
+        from api.authentication import NONCE_WINDOW, prune_used_nonces
+        from webapp.models import UsedNonce
+
+        now = timezone.now()
+        UsedNonce.objects.create(token_id='a', nonce='old', used_at=now - timedelta(seconds=NONCE_WINDOW + 5))
+        UsedNonce.objects.create(token_id='a', nonce='new', used_at=now - timedelta(seconds=NONCE_WINDOW - 60))
+        assert prune_used_nonces() == 1
+        assert list(UsedNonce.objects.values_list('nonce', flat=True)) == ['new']
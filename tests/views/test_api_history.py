@@ -83,6 +83,57 @@ class TestListRunsView:
         assert 'completed_at' in run_data
         assert 'duration_seconds' in run_data
 
+    def test_status_and_triggered_by_filters(self, api_run_manager_client):
+        from webapp.models import Run
+        failed = Run.objects.create(status='failed', triggered_by='schedule', config_snapshot={})
+        Run.objects.create(status='success', triggered_by='schedule', config_snapshot={})
+        Run.objects.create(status='failed', triggered_by='manual', config_snapshot={})
+        resp = api_run_manager_client.get(self.url, {'status': 'failed,cancelled',
+                                                     'triggered_by': 'schedule'})
+        assert [r['id'] for r in resp.json()] == [str(failed.id)]
+
+    def test_invalid_status_returns_400(self, api_run_manager_client):
+        assert api_run_manager_client.get(self.url, {'status': 'exploded'}).status_code == 400
+
+    def test_fields_projection(self, api_run_manager_client, run):
+        resp = api_run_manager_client.get(self.url, {'fields': 'id,config_snapshot'})
+        assert resp.status_code == 200
+        assert resp.json() == [{'id': str(run.id), 'config_snapshot': run.config_snapshot}]
+
+    def test_fields_projection_skips_unused_columns(self, api_run_manager_client, run):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            api_run_manager_client.get(self.url, {'fields': 'id,status'})
+        select = next(q['sql'] for q in queries.captured_queries if 'webapp_run' in q['sql'])
+        assert 'config_snapshot' not in select
+        assert 'triggered_by' not in select
+
+    def test_unknown_field_returns_400(self, api_run_manager_client):
+        assert api_run_manager_client.get(self.url, {'fields': 'id,password'}).status_code == 400
+
+    def test_keyset_pagination(self, api_run_manager_client):
+        same = datetime(2024, 6, 1, 12, 0, 0, tzinfo=timezone.utc)
+        runs = [self._create_run_with_started_at(same) for _ in range(3)]
+        runs.append(self._create_run_with_started_at(datetime(2024, 5, 1, tzinfo=timezone.utc)))
+        expected = [str(r.id) for r in sorted(runs, key=lambda r: (r.started_at, r.id), reverse=True)]
+
+        seen, params = [], {'limit': 2, 'fields': 'id'}
+        for _ in range(3):
+            resp = api_run_manager_client.get(self.url, params)
+            assert resp.status_code == 200
+            seen += [r['id'] for r in resp.json()]
+            cursor = resp.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+            assert 'rel="next"' in resp.headers['Link']
+            params = {**params, 'cursor': cursor}
+        assert seen == expected
+
+    @pytest.mark.parametrize('params', [{'limit': '0'}, {'limit': 'x'}, {'limit': '5', 'cursor': '!!'}])
+    def test_invalid_paging_returns_400(self, api_run_manager_client, params):
+        assert api_run_manager_client.get(self.url, params).status_code == 400
+
 
 @pytest.mark.django_db
 class TestGetRunDataView:
@@ -148,6 +199,17 @@ class TestGetRunDataView:
         messages = [e['message'] for e in data['logs']]
         assert 'Updating repos...' in messages
 
+    def test_archived_logs_included(self, api_run_manager_client, run):
+        from django.utils import timezone
+        from webapp.log_archive import archive_run
+        from webapp.models import LogEntry
+        LogEntry.objects.create(run=run, timestamp=timezone.now(), level='INFO',
+                                stage_name='UpdateRepos', message='archived line')
+        archive_run(run.id)
+        resp = api_run_manager_client.get(self.url, {'uuid': str(run.id)})
+        assert resp.status_code == 200
+        assert [e['message'] for e in resp.json()['logs']] == ['archived line']
+
     def test_run_with_recipe_results_included(self, api_run_manager_client, run):
         from webapp.models import RecipeResult
         RecipeResult.objects.create(
@@ -160,3 +222,148 @@ class TestGetRunDataView:
         data = resp.json()
         result_types = [r['result_type'] for r in data['results']]
         assert 'success' in result_types
+
+
+def _ndjson(resp):
+    import json
+    return [json.loads(line) for line in b''.join(resp.streaming_content).decode().splitlines()]
+
+
+@pytest.mark.django_db
+class TestGetRunLogsView:
+    url = '/api/history/get_run_logs/'
+
+    def _lines(self, run, count, stage='UpdateRepos'):
+        from django.utils import timezone
+        from webapp.models import LogEntry
+        return LogEntry.objects.bulk_create([
+            LogEntry(run=run, timestamp=timezone.now(), level='INFO',
+                     stage_name=stage, message=f'{stage} {i}')
+            for i in range(count)
+        ])
+
+    def test_unauthenticated_returns_401(self, anon_api_client, run):
+        resp = anon_api_client.get(self.url, {'uuid': str(run.id)})
+        assert resp.status_code in (401, 403)
+
+    def test_missing_uuid_returns_400(self, api_run_manager_client):
+        assert api_run_manager_client.get(self.url).status_code == 400
+
+    def test_nonexistent_uuid_returns_404(self, api_run_manager_client):
+        resp = api_run_manager_client.get(self.url, {'uuid': str(uuid.uuid4())})
+        assert resp.status_code == 404
+
+    @pytest.mark.parametrize('params', [{'after_id': 'x'}, {'limit': '0'}, {'after_id': '-1'}])
+    def test_invalid_paging_returns_400(self, api_run_manager_client, run, params):
+        resp = api_run_manager_client.get(self.url, {'uuid': str(run.id), **params})
+        assert resp.status_code == 400
+
+    def test_streams_ndjson_in_id_order(self, api_run_manager_client, run):
+        rows = self._lines(run, 3)
+        resp = api_run_manager_client.get(self.url, {'uuid': str(run.id)})
+        assert resp.status_code == 200
+        assert resp.streaming
+        assert resp['Content-Type'] == 'application/x-ndjson'
+        lines = _ndjson(resp)
+        assert [line['id'] for line in lines] == [r.id for r in rows]
+        assert set(lines[0]) == {'id', 'timestamp', 'level', 'stage_name', 'message'}
+
+    def test_pages_with_after_id_and_limit(self, api_run_manager_client, run):
+        rows = self._lines(run, 5)
+        first = _ndjson(api_run_manager_client.get(self.url, {'uuid': str(run.id), 'limit': 2}))
+        assert [line['id'] for line in first] == [rows[0].id, rows[1].id]
+        rest = _ndjson(api_run_manager_client.get(
+            self.url, {'uuid': str(run.id), 'after_id': first[-1]['id'], 'limit': 10}))
+        assert [line['id'] for line in rest] == [r.id for r in rows[2:]]
+
+    def test_stage_filter(self, api_run_manager_client, run):
+        self._lines(run, 2, stage='UpdateRepos')
+        self._lines(run, 1, stage='')
+        lines = _ndjson(api_run_manager_client.get(self.url, {'uuid': str(run.id), 'stage': ''}))
+        assert [line['stage_name'] for line in lines] == ['']
+
+    def test_merges_archived_and_live_lines(self, api_run_manager_client, run):
+        from webapp.log_archive import archive_run
+        archived = self._lines(run, 3)
+        archive_run(run.id)
+        late = self._lines(run, 1, stage='Cleanup')
+        lines = _ndjson(api_run_manager_client.get(
+            self.url, {'uuid': str(run.id), 'after_id': archived[0].id}))
+        assert [line['id'] for line in lines] == [archived[1].id, archived[2].id, late[0].id]
+
+    def test_streams_asynchronously_under_asgi(self, user, grant_perm, run):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncRequestFactory
+        from rest_framework.test import force_authenticate
+        from api.views.history import GetRunLogsView
+
+        grant_perm(user, can_view_runs=True)
+        rows = self._lines(run, 3)
+        request = AsyncRequestFactory().get(self.url, {'uuid': str(run.id)})
+        force_authenticate(request, user=user)
+        resp = GetRunLogsView.as_view()(request)
+        assert resp.is_async
+
+        async def _gather():
+            return b''.join([chunk async for chunk in resp.streaming_content])
+        lines = async_to_sync(_gather)().decode().splitlines()
+        assert len(lines) == len(rows)
+
+
+@pytest.mark.django_db
+class TestRunStatsView:
+    url = '/api/history/run_stats/'
+
+    def test_unauthenticated_returns_401(self, anon_api_client):
+        assert anon_api_client.get(self.url).status_code in (401, 403)
+
+    @pytest.mark.parametrize('days', ['0', 'x', '100000'])
+    def test_invalid_days_returns_400(self, api_run_manager_client, days):
+        assert api_run_manager_client.get(self.url, {'days': days}).status_code == 400
+
+    def test_reads_the_rollup(self, api_run_manager_client):
+        from datetime import timedelta
+        from django.utils import timezone as tz
+        from webapp.models import RunDailyStats
+        today = tz.localdate()
+        RunDailyStats.objects.create(day=today, runs=2, success=1, failed=1, imports=3,
+                                     stage_durations={'Run AutoPkg': [10.0, 20.0]})
+        RunDailyStats.objects.create(day=today - timedelta(days=40), runs=5, success=5)
+
+        data = api_run_manager_client.get(self.url).json()
+        assert data['days'] == 30
+        assert [d['day'] for d in data['daily']] == [today.isoformat()]
+        assert data['daily'][0]['stages'] == [{'stage': 'Run AutoPkg', 'p50': 10.0, 'p95': 20.0}]
+        assert data['totals']['runs'] == 2
+        assert data['totals']['success_rate'] == 50
+
+        data = api_run_manager_client.get(self.url, {'days': 90}).json()
+        assert data['totals']['runs'] == 7
+
+
+@pytest.mark.django_db
+class TestRecipeHistoryView:
+    url = '/api/history/recipe_history/'
+
+    def test_unauthenticated_returns_401(self, anon_api_client):
+        assert anon_api_client.get(self.url, {'name': 'Firefox'}).status_code in (401, 403)
+
+    @pytest.mark.parametrize('params', [{}, {'name': 'Firefox', 'event_type': 'nope'},
+                                        {'name': 'Firefox', 'limit': '0'}])
+    def test_invalid_params_return_400(self, api_run_manager_client, params):
+        assert api_run_manager_client.get(self.url, params).status_code == 400
+
+    def test_last_import(self, api_run_manager_client, run):
+        from webapp.models import RecipeEvent
+        for version, event_type, month in [('120.0', 'munki_import', 5), ('121.0', 'munki_import', 6),
+                                           ('', 'failure', 7)]:
+            RecipeEvent.objects.create(run=run, name='Firefox', recipe_key='firefox', version=version,
+                                       event_type=event_type,
+                                       timestamp=datetime(2024, month, 1, tzinfo=timezone.utc))
+        resp = api_run_manager_client.get(self.url, {'name': 'Firefox', 'event_type': 'munki_import',
+                                                     'limit': 1})
+        assert resp.status_code == 200
+        assert resp.json() == {'name': 'Firefox', 'events': [{
+            'event_type': 'munki_import', 'version': '121.0', 'run': str(run.id),
+            'timestamp': '2024-06-01T00:00:00+00:00',
+        }]}
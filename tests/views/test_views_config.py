@@ -122,6 +122,12 @@ class TestConfigSectionViewPost:
         })
         assert Setting.get('gc.keep_versions') == '0'
 
+    @pytest.mark.parametrize('posted, stored', [('500', '16'), ('0', '1'), ('4', '4')])
+    def test_post_clamps_run_shards(self, admin_client, posted, stored):
+        from webapp.models import Setting
+        admin_client.post('/config/workflow/', {'workflow.run_shards': posted})
+        assert Setting.get('workflow.run_shards') == stored
+
     def test_logging_level_query_param_overrides_stored_value(self, admin_client):
         """GET /config/logging/?level=DEBUG should reflect DEBUG in context."""
         resp = admin_client.get('/config/logging/?level=DEBUG')
@@ -136,6 +142,19 @@ class TestConfigSectionViewPost:
         assert resp.status_code == 200
         assert resp.context['s'].get('logging.level') == 'INFO'
 
+    def test_post_saves_retention_settings(self, admin_client):
+        from webapp.models import Setting
+        admin_client.post('/config/logging/', {
+            'logging.level': 'INFO',
+            'retention.max_age_days': '30',
+            'retention.failed_max_age_days': '180',
+            'retention.log_max_age_days': '14',
+        })
+        assert Setting.get('retention.max_age_days') == '30'
+        assert Setting.get('retention.failed_max_age_days') == '180'
+        assert Setting.get('retention.log_max_age_days') == '14'
+        assert Setting.get('retention.incremental_vacuum') == 'false'
+
     def test_requires_permission(self, client):
         resp = client.post('/config/autopkg/', {'autopkg.bin_path': '/evil'})
         assert resp.status_code == 403
@@ -42,9 +42,23 @@ class TestDashboardView:
                            completed_at=now - timedelta(days=1), config_snapshot={})
         Run.objects.create(status='failed', started_at=now - timedelta(hours=1),
                            completed_at=now - timedelta(hours=1), config_snapshot={})
+        # The dashboard reads finished runs from the daily rollup.
+        from webapp.run_stats import rebuild
+        rebuild()
         resp = client.get(self.url)
         assert resp.context['success_rate_30d'] == 50
 
+    def test_counts_come_from_rollup_plus_runs_in_flight(self, client, db):
+        from webapp.models import Run, RunDailyStats
+        from django.utils import timezone as tz
+        RunDailyStats.objects.create(day=tz.localdate() - timedelta(days=3), runs=4, success=3, failed=1)
+        RunDailyStats.objects.create(day=tz.localdate() - timedelta(days=60), runs=9, success=9)
+        Run.objects.create(status='running', config_snapshot={})
+        resp = client.get(self.url)
+        assert resp.context['total_runs_30d'] == 5
+        assert resp.context['success_rate_30d'] == 75
+        assert [d['runs'] for d in resp.context['run_trend']] == [9, 4]
+
     def test_schedule_disabled_shows_no_next_run(self, client, db):
         from webapp.models import Schedule
         s = Schedule.get()
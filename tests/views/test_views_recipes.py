@@ -10,6 +10,9 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
+# Imported before the autouse fixture in conftest.py patches it out.
+from webapp.views.recipes import start_recipe_watcher
+
 
 # --- Helper: _git_behind_count -----------------------------------------------
 
@@ -320,6 +323,80 @@ class TestCacheHelpers:
         rv._RECIPES_BUILDING = False
 
 
+# --- Helper: recipe watcher ---------------------------------------------------
+
+class TestRecipeWatcherHooks:
+    @pytest.fixture
+    def watching(self, monkeypatch):
+        import webapp.views.recipes as rv
+        monkeypatch.setattr(rv, '_RECIPE_WATCHER', MagicMock(backend='inotify'))
+        monkeypatch.setitem(rv._OVERRIDES_CACHE, 'data', None)
+        monkeypatch.setitem(rv._RECIPES_CACHE, 'data', [{'stem': 'A', 'identifier': 'com.a'}])
+        monkeypatch.setitem(rv._RECIPES_CACHE, 'ts', time.monotonic() - 400)
+        return rv
+
+    def test_cache_does_not_expire_while_watching(self, watching):
+        assert watching._is_cache_ready()
+
+    def test_cache_keeps_its_ttl_while_polling(self, watching):
+        watching._RECIPE_WATCHER.backend = 'polling'
+        assert not watching._is_cache_ready()
+
+    def test_invalidate_still_forces_a_rescan(self, watching):
+        watching._invalidate_recipe_cache()
+        assert not watching._is_cache_ready()
+
+    def test_changes_rescan_only_the_changed_paths(self, watching, tmp_path):
+        with patch('webapp.views.recipes._overrides_dir', return_value=tmp_path / 'RecipeOverrides'), \
+             patch('webapp.views.recipes._scan_recipe_files', return_value=[]) as scan, \
+             patch('django.db.close_old_connections'):
+            watching._on_recipe_files_changed({'/repos/a-recipes'})
+        scan.assert_called_once_with({'/repos/a-recipes'})
+        assert watching._RECIPES_CACHE['data'] == []
+
+    def test_override_changes_only_drop_the_override_map(self, watching, tmp_path):
+        od = tmp_path / 'RecipeOverrides'
+        watching._OVERRIDES_CACHE['data'] = {}
+        with patch('webapp.views.recipes._overrides_dir', return_value=od), \
+             patch('webapp.views.recipes._scan_recipe_files') as scan:
+            watching._on_recipe_files_changed({str(od / 'Firefox.munki.recipe')})
+        scan.assert_not_called()
+        assert watching._OVERRIDES_CACHE['data'] is None
+
+    def test_overrides_are_cached_while_watching(self, watching, tmp_path):
+        od = tmp_path / 'RecipeOverrides'
+        od.mkdir()
+        (od / 'Firefox.munki.recipe').write_text(
+            '<plist><dict><key>Identifier</key><string>local.firefox</string></dict></plist>')
+        with patch('webapp.views.recipes._overrides_dir', return_value=od):
+            assert list(watching._list_overrides()) == ['Firefox.munki']
+            (od / 'Chrome.munki.recipe').write_text('<plist/>')
+            assert list(watching._list_overrides()) == ['Firefox.munki']
+
+    def test_overrides_are_reread_while_polling(self, watching, tmp_path):
+        watching._RECIPE_WATCHER.backend = 'polling'
+        od = tmp_path / 'RecipeOverrides'
+        od.mkdir()
+        (od / 'Firefox.munki.recipe').write_text('<plist/>')
+        with patch('webapp.views.recipes._overrides_dir', return_value=od):
+            assert list(watching._list_overrides()) == ['Firefox.munki']
+            (od / 'Chrome.munki.recipe').write_text('<plist/>')
+            assert sorted(watching._list_overrides()) == ['Chrome.munki', 'Firefox.munki']
+
+    @pytest.mark.django_db
+    def test_start_respects_the_setting(self, monkeypatch):
+        import webapp.views.recipes as rv
+        from webapp.models import Setting
+        monkeypatch.setattr(rv, '_RECIPE_WATCHER', None)
+        Setting.set('autopkg.watch_recipes', 'false')
+        with patch('webapp.recipe_watch.RecipeWatcher') as watcher:
+            assert not start_recipe_watcher()
+            Setting.set('autopkg.watch_recipes', 'true')
+            assert start_recipe_watcher()
+        watcher.return_value.start.assert_called_once()
+        assert rv._RECIPE_WATCHER is watcher.return_value
+
+
 # --- Helper: _build_recipe_entries -------------------------------------------
 
 class TestBuildRecipeEntries:
@@ -947,6 +1024,25 @@ class TestStartCacheBuild:
             recipes_mod._RECIPES_BUILDING = original_building
 
         assert build_result.get('data') is not None
+        assert build_result['data'][0]['path'] == str(recipe_dir / 'Firefox.munki.recipe')
+
+    def test_recipe_file_index_scans_synchronously_when_cold(self, tmp_path):
+        from webapp.views import recipes as recipes_mod
+        recipe_dir = tmp_path / 'recipes'
+        recipe_dir.mkdir()
+        (recipe_dir / 'Firefox.munki.recipe').write_text(
+            '<plist><dict><key>Identifier</key><string>com.example.Firefox</string></dict></plist>'
+        )
+        original_cache = dict(recipes_mod._RECIPES_CACHE)
+        recipes_mod._RECIPES_CACHE['data'] = None
+        recipes_mod._RECIPES_CACHE['ts'] = 0.0
+        try:
+            with patch('webapp.views.recipes._recipe_search_dirs', return_value=[str(recipe_dir)]):
+                index = recipes_mod.recipe_file_index()
+            assert [e['identifier'] for e in index] == ['com.example.Firefox']
+            assert recipes_mod._is_cache_ready()
+        finally:
+            recipes_mod._RECIPES_CACHE.update(original_cache)
 
     def test_build_skips_when_cache_is_ready(self):
         """Line 360: _start_cache_build returns early when cache is warm."""
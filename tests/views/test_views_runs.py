@@ -83,6 +83,34 @@ class TestRunDetailView:
         assert resp.status_code == 200
         assert 'UpdateRepos' in resp.context['logs_by_stage']
 
+    def test_detail_reads_archived_logs(self, run_manager_client, run):
+        from webapp.log_archive import archive_run
+        from webapp.models import LogEntry
+        entry = LogEntry.objects.create(
+            run=run, level='INFO', message='step done',
+            stage_name='UpdateRepos', timestamp=datetime.now(timezone.utc),
+        )
+        archive_run(run.id)
+        resp = run_manager_client.get(self._url(run.id))
+        assert resp.status_code == 200
+        assert [e.message for e in resp.context['logs_by_stage']['UpdateRepos']] == ['step done']
+        assert resp.context['last_log_id'] == entry.id
+
+    def test_detail_renders_only_newest_lines(self, run_manager_client, run):
+        from webapp.models import LogEntry
+        from webapp.views import runs
+        LogEntry.objects.bulk_create([
+            LogEntry(run=run, level='INFO', message=f'line {i}', stage_name='Run AutoPkg',
+                     timestamp=datetime.now(timezone.utc))
+            for i in range(5)
+        ])
+        with patch.object(runs, '_LOG_TAIL_LINES', 2):
+            resp = run_manager_client.get(self._url(run.id))
+        shown = resp.context['logs_by_stage']['Run AutoPkg']
+        assert [e.message for e in shown] == ['line 3', 'line 4']
+        assert resp.context['log_cursors'] == {'Run AutoPkg': shown[0].id}
+        assert resp.context['log_counts'] == {'Run AutoPkg': 5}
+
     def test_detail_munki_exception_is_silenced(self, run_manager_client, run):
         """Exception inside the munki icon block is swallowed; view still returns 200."""
         from webapp.models import RecipeResult, Setting
@@ -113,6 +141,106 @@ class TestRunDetailView:
         mock_map.assert_called_once_with('http://munki.local', 'production', '')
 
 
+def _log_lines(run, count, stage='Run AutoPkg', level='INFO'):
+    from webapp.models import LogEntry
+    return LogEntry.objects.bulk_create([
+        LogEntry(run=run, level=level, message=f'{stage} {i}', stage_name=stage,
+                 timestamp=datetime.now(timezone.utc))
+        for i in range(count)
+    ])
+
+
+@pytest.mark.django_db
+class TestRunLogs:
+    def _url(self, run_id):
+        return f'/runs/{run_id}/logs/'
+
+    def test_requires_login(self, anon_client, run):
+        assert anon_client.get(self._url(run.id)).status_code == 302
+
+    def test_requires_permission(self, client, run):
+        assert client.get(self._url(run.id)).status_code == 403
+
+    def test_unknown_run_is_404(self, run_manager_client):
+        assert run_manager_client.get(self._url(uuid.uuid4())).status_code == 404
+
+    def test_pages_backwards_through_a_stage(self, run_manager_client, run):
+        rows = _log_lines(run, 5)
+        _log_lines(run, 2, stage='Update Repos')
+
+        data = run_manager_client.get(self._url(run.id), {'stage': 'Run AutoPkg', 'limit': 2}).json()
+        assert [e['message'] for e in data['entries']] == ['Run AutoPkg 3', 'Run AutoPkg 4']
+        assert data['has_more'] is True
+        assert data['next'] == {'before': rows[3].id}
+
+        data = run_manager_client.get(self._url(run.id), {
+            'stage': 'Run AutoPkg', 'limit': 10, 'before': data['next']['before'],
+        }).json()
+        assert [e['message'] for e in data['entries']] == ['Run AutoPkg 0', 'Run AutoPkg 1', 'Run AutoPkg 2']
+        assert data['has_more'] is False
+        assert data['next'] == {}
+
+    def test_pages_forwards_with_after(self, run_manager_client, run):
+        rows = _log_lines(run, 4)
+        data = run_manager_client.get(self._url(run.id), {'after': rows[0].id, 'limit': 2}).json()
+        assert [e['id'] for e in data['entries']] == [rows[1].id, rows[2].id]
+        assert data['next'] == {'after': rows[2].id}
+
+    def test_level_filter_and_general_stage(self, run_manager_client, run):
+        _log_lines(run, 2, stage='', level='INFO')
+        _log_lines(run, 1, stage='', level='ERROR')
+        _log_lines(run, 1, stage='Run AutoPkg', level='ERROR')
+        data = run_manager_client.get(self._url(run.id), {
+            'stage': '__general__', 'level': 'error,warning',
+        }).json()
+        assert [(e['stage'], e['level']) for e in data['entries']] == [('', 'ERROR')]
+
+    def test_reads_archived_run(self, run_manager_client, run):
+        from webapp.log_archive import archive_run
+        _log_lines(run, 3)
+        archive_run(run.id)
+        data = run_manager_client.get(self._url(run.id), {'stage': 'Run AutoPkg', 'limit': 2}).json()
+        assert [e['message'] for e in data['entries']] == ['Run AutoPkg 1', 'Run AutoPkg 2']
+        assert data['has_more'] is True
+
+    @pytest.mark.parametrize('direction', ['before', 'after'])
+    def test_archived_pages_decompress_only_nearby_blocks(self, run_manager_client, run,
+                                                          monkeypatch, direction):
+        from webapp import log_archive
+        from webapp.log_archive import archive_run
+        from webapp.models import LogEntry
+        monkeypatch.setattr(log_archive, '_BLOCK_LINES', 4)
+        for _ in range(8):
+            _log_lines(run, 3)
+            _log_lines(run, 1, stage='Update Repos')
+        ids = list(LogEntry.objects.filter(run=run).order_by('id').values_list('id', flat=True))
+        archive_run(run.id)
+
+        decoded = []
+        real = log_archive._decode_block
+        monkeypatch.setattr(log_archive, '_decode_block',
+                            lambda *args: decoded.append(args[2]) or real(*args))
+        seen, params, per_page = [], {'limit': 3}, []
+        if direction == 'after':
+            params['after'] = 0
+        while True:
+            decoded.clear()
+            data = run_manager_client.get(self._url(run.id), params).json()
+            per_page.append(len(decoded))
+            page = [e['id'] for e in data['entries']]
+            seen = seen + page if direction == 'after' else page + seen
+            if not data['has_more']:
+                break
+            params = {'limit': 3, **data['next']}
+
+        assert seen == ids
+        # 32 lines in 8 blocks: a page of 3 needs at most two blocks per stage.
+        assert max(per_page) <= 4
+
+    def test_bad_cursor_is_400(self, run_manager_client, run):
+        assert run_manager_client.get(self._url(run.id), {'before': 'x'}).status_code == 400
+
+
 @pytest.mark.django_db
 class TestTriggerRunView:
     url = '/runs/trigger/'
@@ -233,6 +361,9 @@ class FakeBroadcaster:
         out = [f'id: {start + i}\n'.encode() + f for i, f in enumerate(raw)]
         return out, self._done
 
+    async def wait_for_events(self, cursor, timeout):
+        pass
+
 
 @pytest.mark.django_db
 class TestRunStream:
@@ -332,6 +463,9 @@ class TestRunStream:
                 out = [f'id: {start + i}\n'.encode() + f for i, f in enumerate(raw)]
                 return out, done
 
+            async def wait_for_events(self, cursor, timeout):
+                pass
+
         with patch('webapp.run_broadcaster.broadcaster_manager') as m:
             m.get.return_value = SlowBroadcaster()
             resp = run_manager_client.get(self._url(run.id))
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from webapp.models import Schedule, Run, StageExecution, LogEntry, RecipeResult, Task
+from webapp.models import Schedule, Run, StageExecution, LogEntry, RecipeResult, RecipeEvent, Task
 
 
 @admin.register(Schedule)
@@ -41,6 +41,13 @@ class RecipeResultAdmin(admin.ModelAdmin):
     list_filter  = ['result_type']
 
 
+@admin.register(RecipeEvent)
+class RecipeEventAdmin(admin.ModelAdmin):
+    list_display  = ['name', 'event_type', 'version', 'timestamp', 'run']
+    list_filter   = ['event_type']
+    search_fields = ['name']
+
+
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
     list_display  = ['id', 'task_type', 'status', 'run', 'created_at', 'completed_at']
@@ -32,6 +32,8 @@ class WebappConfig(AppConfig):
     name = 'webapp'
 
     def ready(self):
+        self._connect_log_database()
+
         # Only start background services (scheduler, stale-run cleanup) when
         # the process is actually *serving requests*.
         #
@@ -81,16 +83,26 @@ class WebappConfig(AppConfig):
         # changing the effective startup behaviour.
         threading.Thread(target=self._start_services, daemon=True).start()
 
+    def _connect_log_database(self):
+        """Wire up the optional separate log database (webapp.routers)."""
+        from webapp.routers import delete_run_logs, log_database_enabled, migrate_log_database
+        if not log_database_enabled():
+            return
+        from django.db.models.signals import post_migrate, pre_delete
+        post_migrate.connect(migrate_log_database, sender=self)
+        pre_delete.connect(delete_run_logs, sender=self.get_model('Run'))
+
     def _start_services(self):
         """Start services for direct manage.py serving (runserver / --noreload).
         Runs in a daemon thread so it executes after the app registry is fully
         initialised."""
         from webapp.scheduler import start_scheduler
-        from webapp.views.recipes import _start_cache_build
+        from webapp.views.recipes import _start_cache_build, start_recipe_watcher
         from webapp.recipe_index import ensure_fresh as index_ensure_fresh
         start_scheduler()
         self._mark_interrupted_runs()
         _start_cache_build()
+        start_recipe_watcher()
         index_ensure_fresh()
 
     def _start_services_in_worker(self):
@@ -98,14 +110,15 @@ class WebappConfig(AppConfig):
 
         All workers run the one-shot startup tasks.  Only the worker that wins
         the scheduler lock starts APScheduler, preventing duplicate scheduled
-        runs when workers > 1.
+        runs when workers > 1, and the recipe watcher, so the recipe
+        directories are polled once rather than once per worker.
         """
         import fcntl
         import time as _time
         import tempfile
         import os as _os
         from webapp.scheduler import acquire_scheduler_lock, start_scheduler
-        from webapp.views.recipes import _start_cache_build
+        from webapp.views.recipes import _start_cache_build, start_recipe_watcher
         from webapp.recipe_index import _fetch as _index_fetch
         self._mark_interrupted_runs()
         _start_cache_build()
@@ -130,6 +143,7 @@ class WebappConfig(AppConfig):
                 fcntl.flock(_lf.fileno(), fcntl.LOCK_UN)
         if acquire_scheduler_lock():
             start_scheduler()
+            start_recipe_watcher()
 
     def _mark_interrupted_runs(self):
         """
@@ -148,12 +162,16 @@ class WebappConfig(AppConfig):
 
         try:
             stale_runs = Run.objects.filter(status__in=stale)
-            if stale_runs.exists():
+            run_ids = list(stale_runs.values_list('id', flat=True))
+            if run_ids:
                 StageExecution.objects.filter(
-                    run__in=stale_runs,
+                    run_id__in=run_ids,
                     status__in=stale,
                 ).update(status='failed', completed_at=now)
-                stale_runs.update(status='failed', completed_at=now)
+                Run.objects.filter(id__in=run_ids).update(status='failed', completed_at=now)
+                # Fold the now-failed runs into the dashboard's daily stats.
+                from webapp.run_stats import refresh_runs
+                refresh_runs(run_ids)
 
             Task.objects.filter(status__in=stale).update(
                 status='failed', completed_at=now,
@@ -1,4 +1,5 @@
 import threading
+import time
 
 import logbook
 
@@ -24,6 +25,25 @@ def get_current_stage() -> str:
     return getattr(_local, 'stage_name', '')
 
 
+# -- Live push -----------------------------------------------------------------
+
+def _publish(entries):
+    """Hand saved entries to this process's RunBroadcaster, if one is watching.
+
+    Called with the handler lock held so entries reach the broadcaster in id
+    order.  Failures are ignored - the broadcaster also polls the database.
+    """
+    try:
+        from webapp.run_broadcaster import broadcaster_manager
+        by_run: dict = {}
+        for entry in entries:
+            by_run.setdefault(entry.run_id, []).append(entry)
+        for run_id, run_entries in by_run.items():
+            broadcaster_manager.publish_logs(run_id, run_entries)
+    except Exception:
+        pass
+
+
 # -- Handler -------------------------------------------------------------------
 
 class DBLogHandler(logbook.Handler):
@@ -33,8 +53,40 @@ class DBLogHandler(logbook.Handler):
     pipeline background thread so it only intercepts logs from that thread.
     Stage attribution relies on set_current_stage() being called by the
     orchestrator's stage_callback before each stage runs.
+
+    With batch_rows > 1 records are buffered and written with bulk_create
+    once batch_rows lines are waiting or the oldest has waited batch_latency
+    seconds, whichever comes first.  The run id, stage and timestamp are
+    captured when each record is emitted, so attribution does not depend on
+    when the flush happens.  Callers flush() on stage transitions and
+    close() at the end of the run.
+
+    Written entries are also pushed to the run's in-process RunBroadcaster
+    so live viewers do not wait for its database poll.
+
+    With a writer (webapp.db_writer.DBWriter) the inserts are queued on it
+    instead of run on the logging thread; entries are published once the
+    writer has committed them.
     """
 
+    def __init__(self, level=logbook.NOTSET, filter=None, bubble=False,
+                 batch_rows: int = 1, batch_latency: float = 0.25, writer=None):
+        super().__init__(level, filter, bubble)
+        self.writer = writer
+        self.batch_rows = batch_rows
+        self.batch_latency = batch_latency
+        self._buffer: list = []
+        self._buffer_since = 0.0
+        # Held while writing too, so concurrent flushes keep insert order.
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher = None
+
+    @property
+    def buffered(self) -> bool:
+        return self.batch_rows > 1
+
     def emit(self, record):
         run_id = get_run_id()
         if run_id is None:
@@ -43,12 +95,86 @@ class DBLogHandler(logbook.Handler):
             from django.utils import timezone
             from webapp.models import LogEntry
 
-            LogEntry.objects.create(
+            entry = LogEntry(
                 run_id=run_id,
                 level=record.level_name,
                 message=record.message,
                 stage_name=get_current_stage(),
                 timestamp=timezone.now(),
             )
+            if not self.buffered:
+                with self._lock:
+                    self._write([entry])
+                return
+
+            with self._lock:
+                if not self._buffer:
+                    self._buffer_since = time.monotonic()
+                self._buffer.append(entry)
+                full = len(self._buffer) >= self.batch_rows
+            if full:
+                self.flush()
+            else:
+                self._ensure_flusher()
         except Exception:
             pass
+
+    def flush(self):
+        """Write every buffered record now."""
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+            if entries:
+                self._write(entries)
+
+    def _write(self, entries):
+        # Called with the lock held, so entries are written (or queued on the
+        # writer, which keeps submission order) in the order they were logged.
+        from webapp.models import LogEntry
+        if self.writer is not None:
+            try:
+                self.writer.submit(LogEntry.objects.bulk_create, entries, batch_size=500,
+                                   model=LogEntry, callback=lambda _: _publish(entries))
+            except Exception:
+                pass
+            return
+        try:
+            LogEntry.objects.bulk_create(entries, batch_size=500)
+        except Exception:
+            return
+        _publish(entries)
+
+    def close(self):
+        """Stop the background flusher and write anything still buffered."""
+        self._closed = True
+        self._wake.set()
+        flusher = self._flusher
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join(timeout=5)
+        self.flush()
+
+    # -- Background flushing ---------------------------------------------------
+
+    def _ensure_flusher(self):
+        if self._flusher is not None or self._closed:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, daemon=True, name='db-log-flusher',
+                )
+                self._flusher.start()
+
+    def _flush_loop(self):
+        import django.db
+        try:
+            while not self._closed:
+                with self._lock:
+                    waited = time.monotonic() - self._buffer_since
+                    due = bool(self._buffer) and waited >= self.batch_latency
+                    timeout = self.batch_latency - waited if self._buffer else self.batch_latency
+                if due:
+                    self.flush()
+                    continue
+                self._wake.wait(max(timeout, 0.01))
+        finally:
+            django.db.connection.close()
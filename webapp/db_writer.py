@@ -0,0 +1,205 @@
+"""Single-writer database queue for pipeline runs.
+
+A run writes to the database from several threads at once - the stage
+threads' status changes, DBLogHandler's batches, recipe results and the
+run's own status.  Under SQLite every one of those is a separate write
+transaction competing for the lock with request threads.  DBWriter
+funnels them through one thread instead: writes are queued, and the thread
+commits whatever has queued up together in one transaction, each write
+inside its own savepoint so a failing write does not take its neighbours
+with it.
+
+The queue is bounded: submit() blocks while it is full, which slows the
+producers (and, through their pipes, the autopkg children) rather than
+letting memory grow.  Writes are applied in submission order, so a
+barrier() submitted after a write completes only once that write has been
+committed; flush() waits for one.
+
+A group's transaction is opened only on the databases its writes route to:
+submit(..., model=LogEntry) sends a write to router.db_for_write(LogEntry),
+anything else to the default database.  With the separate log database
+(webapp.routers) log batches therefore never take the main database's
+write lock.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger('autopkg_runner')
+
+_STOP = object()
+
+
+class DBWriter:
+    """Owns a thread that applies queued database writes in grouped transactions.
+
+    max_pending: writes that may wait in the queue before submit() blocks.
+    max_group: most writes committed in one transaction.
+    """
+
+    def __init__(self, max_pending: int = 1000, max_group: int = 64, name: str = 'db-writer'):
+        self.max_group = max(1, max_group)
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_pending))
+        self._closed = False
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._failed = 0
+        self._commits = 0
+        self._peak_depth = 0
+        self._commit_seconds: deque = deque(maxlen=2000)
+        self._thread = threading.Thread(target=self._run, daemon=True, name=name)
+        self._thread.start()
+
+    # -- Producer API ----------------------------------------------------------
+
+    def submit(self, fn: Callable, *args, callback: Optional[Callable] = None,
+               model: Optional[type] = None, **kwargs) -> Future:
+        """Queue ``fn(*args, **kwargs)``; blocks while the queue is full.
+
+        The returned future resolves with fn's result once its transaction
+        has committed.  *callback*, if given, is called with the result on
+        the writer thread right after the commit - in submission order.
+        *model* names what fn writes, so the write joins a transaction on
+        that model's database; without it the default database is used.
+        """
+        from django.db import DEFAULT_DB_ALIAS, router
+        if self._closed or not self._thread.is_alive():
+            raise RuntimeError('DBWriter is closed')
+        alias = router.db_for_write(model) if model is not None else DEFAULT_DB_ALIAS
+        future: Future = Future()
+        self._queue.put((fn, args, kwargs, callback, future, alias))
+        depth = self._queue.qsize()
+        if depth > self._peak_depth:
+            self._peak_depth = depth
+        return future
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Run fn through the queue and return its result (or raise its error)."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def barrier(self) -> Future:
+        """A future that resolves once every write submitted before it has committed."""
+        return self.submit(_noop)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait until every write submitted so far has committed."""
+        if self._closed or not self._thread.is_alive():
+            return
+        self.barrier().result(timeout)
+
+    def close(self, timeout: float = 30) -> None:
+        """Apply everything queued, then stop the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # -- Metrics -----------------------------------------------------------------
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        """Counters and commit latency; latencies in seconds."""
+        with self._lock:
+            samples = sorted(self._commit_seconds)
+            stats = {
+                'writes': self._writes,
+                'failed': self._failed,
+                'commits': self._commits,
+                'depth': self.depth,
+                'peak_depth': self._peak_depth,
+            }
+
+        def rank(p):
+            return samples[max(0, math.ceil(p / 100 * len(samples)) - 1)] if samples else 0.0
+
+        stats.update({
+            'commit_p50': rank(50),
+            'commit_p95': rank(95),
+            'commit_max': samples[-1] if samples else 0.0,
+        })
+        return stats
+
+    # -- Writer thread ---------------------------------------------------------
+
+    def _next_group(self) -> tuple[list, bool]:
+        group = [self._queue.get()]
+        while len(group) < self.max_group and group[-1] is not _STOP:
+            try:
+                group.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        stop = group[-1] is _STOP
+        return [item for item in group if item is not _STOP], stop
+
+    def _run(self):
+        import django.db
+        try:
+            while True:
+                group, stop = self._next_group()
+                if group:
+                    self._apply(group)
+                if stop:
+                    break
+        finally:
+            django.db.connection.close()
+
+    def _apply(self, group: list) -> None:
+        results = []
+        started = time.perf_counter()
+        try:
+            # Barriers write nothing and need no transaction.
+            with _atomic({item[5] for item in group if item[0] is not _noop}):
+                for fn, args, kwargs, callback, future, alias in group:
+                    try:
+                        with _atomic([] if fn is _noop else [alias]):
+                            results.append((future, callback, fn(*args, **kwargs), None))
+                    except Exception as exc:
+                        results.append((future, None, None, exc))
+        except Exception as exc:
+            # The commit itself failed - nothing in the group was written.
+            logger.exception('Database writer could not commit %d write(s)', len(group))
+            results = [(item[4], None, None, exc) for item in group]
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self._commits += 1
+            self._writes += sum(1 for item in group if item[0] is not _noop)
+            self._failed += sum(1 for r in results if r[3] is not None)
+            self._commit_seconds.append(elapsed)
+
+        for future, callback, result, exc in results:
+            if exc is not None:
+                future.set_exception(exc)
+                continue
+            if callback is not None:
+                try:
+                    callback(result)
+                except Exception:
+                    logger.exception('Database writer callback failed')
+            future.set_result(result)
+
+
+def _noop():
+    return None
+
+
+@contextmanager
+def _atomic(aliases):
+    """write_transaction() on each of *aliases*, in a stable order."""
+    from webapp.sqlite_backend import write_transaction
+    with ExitStack() as stack:
+        for alias in sorted(aliases):
+            stack.enter_context(write_transaction(using=alias))
+        yield
@@ -13,6 +13,7 @@ existing plain-text rows continue to work until they are next saved.
 from __future__ import annotations
 
 import base64
+import functools
 import hashlib
 
 from cryptography.fernet import Fernet, InvalidToken
@@ -22,8 +23,13 @@ ENCRYPTED_PREFIX = 'enc:'
 
 def _get_fernet() -> Fernet:
     from django.conf import settings
-    raw = hashlib.sha256(settings.SECRET_KEY.encode()).digest()   # 32 bytes
-    key = base64.urlsafe_b64encode(raw)                           # Fernet-compatible
+    return _fernet_for(settings.SECRET_KEY)
+
+
+@functools.lru_cache(maxsize=1)
+def _fernet_for(secret_key: str) -> Fernet:
+    raw = hashlib.sha256(secret_key.encode()).digest()   # 32 bytes
+    key = base64.urlsafe_b64encode(raw)                  # Fernet-compatible
     return Fernet(key)
 
 
@@ -0,0 +1,157 @@
+"""Cross-worker wake-ups for run broadcasters.
+
+With several gunicorn workers the SSE viewer is often served by a different
+process from the one executing the pipeline, so its RunBroadcaster can only
+learn about new events from the database.  This channel lets the pipeline's
+process tell the others the moment something changes.
+
+Every process with live viewers binds a Unix datagram socket at
+<settings.RUN_EVENTS_DIR>/<pid>.sock.  The pipeline sends a tiny JSON datagram
+(run id, event kind, newest log id) to every socket in that directory except
+its own; the receiving worker wakes its broadcaster, which then reads the
+new rows straight away instead of waiting out its poll interval.
+
+Sending never blocks and every failure is ignored - broadcasters keep
+polling the database, so a lost datagram only costs latency.  Sockets left
+behind by dead workers are removed by the first sender that gets
+ECONNREFUSED.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+logger = logging.getLogger('autopkg_runner')
+
+_PEER_REFRESH = 2.0   # seconds between rescans of the socket directory
+
+
+class EventChannel:
+    def __init__(self, directory: Optional[Path] = None):
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._path: Optional[Path] = None
+        self._send_sock: Optional[socket.socket] = None
+        self._peers: list[str] = []
+        self._peers_at = 0.0
+
+    @property
+    def directory(self) -> Path:
+        if self._directory is not None:
+            return self._directory
+        from django.conf import settings
+        return Path(settings.RUN_EVENTS_DIR)
+
+    # -- Receiving -------------------------------------------------------------
+
+    def listen(self, on_event: Callable[[dict], None]) -> bool:
+        """Start receiving events in a daemon thread; idempotent.
+
+        Returns False when the channel is unavailable (no AF_UNIX support,
+        unwritable RUN_EVENTS_DIR, socket path too long, ...).
+        """
+        with self._lock:
+            if self._sock is not None:
+                return True
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                path = self.directory / f'{os.getpid()}.sock'
+                try:
+                    path.unlink()   # left by an earlier process with our pid
+                except FileNotFoundError:
+                    pass
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                sock.bind(str(path))
+            except (AttributeError, OSError) as exc:
+                logger.warning('Run event channel unavailable, polling only: %s', exc)
+                return False
+            self._sock, self._path = sock, path
+            atexit.register(self.close)
+
+        threading.Thread(
+            target=self._receive_loop, args=(sock, on_event),
+            daemon=True, name='run-event-channel',
+        ).start()
+        return True
+
+    def _receive_loop(self, sock: socket.socket, on_event):
+        while True:
+            try:
+                data = sock.recv(4096)
+            except OSError:
+                return   # closed
+            try:
+                on_event(json.loads(data))
+            except Exception:
+                logger.exception('Run event channel handler failed')
+
+    def close(self):
+        with self._lock:
+            sock, path = self._sock, self._path
+            self._sock = self._path = None
+            self._peers, self._peers_at = [], 0.0
+        if sock is not None:
+            sock.close()
+        if path is not None:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    # -- Sending ---------------------------------------------------------------
+
+    def publish(self, run_id, kind: str, last_id: Optional[int] = None) -> None:
+        """Notify every other listening worker that *run_id* has a new *kind* event."""
+        try:
+            payload = json.dumps({'run': str(run_id), 'kind': kind, 'id': last_id}).encode()
+            for peer in self._current_peers():
+                self._send(peer, payload)
+        except Exception:
+            pass
+
+    def _current_peers(self) -> list[str]:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._peers_at < _PEER_REFRESH:
+                return list(self._peers)
+            own = str(self._path) if self._path is not None else None
+            try:
+                peers = [
+                    entry.path for entry in os.scandir(self.directory)
+                    if entry.name.endswith('.sock') and entry.path != own
+                ]
+            except OSError:
+                peers = []
+            self._peers, self._peers_at = peers, now
+            return list(peers)
+
+    def _send(self, peer: str, payload: bytes) -> None:
+        with self._lock:
+            if self._send_sock is None:
+                self._send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._send_sock.setblocking(False)
+            sock = self._send_sock
+        try:
+            sock.sendto(payload, peer)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # The worker that owned this socket has gone away.
+            try:
+                os.unlink(peer)
+            except OSError:
+                pass
+            with self._lock:
+                if peer in self._peers:
+                    self._peers.remove(peer)
+        except OSError:
+            pass   # receiver's buffer is full; it will catch up from the DB
+
+
+event_channel = EventChannel()
@@ -0,0 +1,406 @@
+"""Compressed log archives for finished runs.
+
+While a run executes, its log lines are LogEntry rows - one per line, which
+is what makes live streaming and batching simple, and what makes logs most
+of the database's size.  Once the run has finished, archive_run() packs the
+rows into a single RunLogArchive and deletes them.  Each stage's lines are
+encoded as JSON lines, in id order, and compressed as a separate segment, so
+one stage can be read without decompressing the rest.  A segment is itself
+a run of independently compressed blocks of _BLOCK_LINES lines whose id
+ranges are kept in the stage index, so RunLogReader decompresses only the
+blocks a page of the log covers.
+
+Readers go through run_log_entries() (or iter_run_log_entries() to stream),
+which return LogEntry rows or ArchivedEntry objects - whichever the run
+has - with the same attributes.
+The archive is written and the rows deleted in one transaction; rows are
+read before the archive, so a reader racing the archiver sees the lines
+once or twice (de-duplicated by id), never zero times.
+"""
+from __future__ import annotations
+
+import heapq
+import json
+import lzma
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional
+
+CODECS = {
+    'zlib': (lambda data: zlib.compress(data, 9), zlib.decompress),
+    'lzma': (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+DEFAULT_CODEC = 'zlib'
+# Incremental decompressors, for streaming a segment line by line.
+_DECOMPRESSORS = {
+    'zlib': zlib.decompressobj,
+    'lzma': lzma.LZMADecompressor,
+}
+# Compressed bytes fed to a decompressor at a time.
+_STREAM_CHUNK = 64 * 1024
+# Lines per independently compressed block of a stage's segment.
+_BLOCK_LINES = 500
+
+# Rows are deleted in chunks of this many ids.
+_DELETE_CHUNK = 500
+
+
+@dataclass(frozen=True)
+class ArchivedEntry:
+    """One archived log line; attribute-compatible with LogEntry for readers."""
+    id: int
+    run_id: object
+    timestamp: datetime
+    level: str
+    message: str
+    stage_name: str
+
+    @property
+    def pk(self) -> int:
+        return self.id
+
+
+def archive_codec() -> Optional[str]:
+    """The codec set in ``logging.archive_codec``, or None when archiving is off."""
+    from webapp.models import Setting
+    codec = Setting.get('logging.archive_codec', DEFAULT_CODEC).strip().lower()
+    return codec if codec in CODECS else None
+
+
+# -- Encoding ------------------------------------------------------------------
+
+def _micros(ts: datetime) -> int:
+    delta = ts - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _from_micros(value: int) -> datetime:
+    seconds, micros = divmod(value, 1_000_000)
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(microsecond=micros)
+
+
+def _encode(entries) -> bytes:
+    return '\n'.join(
+        json.dumps([e.id, _micros(e.timestamp), e.level, e.message],
+                   ensure_ascii=False, separators=(',', ':'))
+        for e in entries
+    ).encode()
+
+
+def _entry(run_id, stage: str, line: bytes) -> ArchivedEntry:
+    entry_id, micros, level, message = json.loads(line)
+    return ArchivedEntry(entry_id, run_id, _from_micros(micros), level, message, stage)
+
+
+def _decode(run_id, stage: str, data: bytes) -> list[ArchivedEntry]:
+    if not data:
+        return []
+    return [_entry(run_id, stage, line) for line in data.split(b'\n')]
+
+
+def _blocks(archive, stage: str) -> list[tuple]:
+    """(offset, length, first id, last id) of each block of *stage*'s segment.
+
+    Offsets are into archive.data.  An index entry without blocks (an
+    archive written before segments were split) is one block of any ids.
+    """
+    offset, length, _, *blocks = archive.stage_index[stage]
+    if not blocks:
+        return [(offset, length, 0, float('inf'))]
+    return [(offset + start, size, first, last) for start, size, first, last in blocks[0]]
+
+
+def _decode_block(archive, stage: str, block: tuple) -> list[ArchivedEntry]:
+    offset, length = block[0], block[1]
+    data = CODECS[archive.codec][1](bytes(archive.data[offset:offset + length]))
+    return _decode(archive.run_id, stage, data)
+
+
+def _iter_segment(archive, stage: str) -> Iterator[ArchivedEntry]:
+    """Decode one stage's segment line by line as it is decompressed."""
+    data = memoryview(archive.data)
+    for offset, length, _, _ in _blocks(archive, stage):
+        decompressor = _DECOMPRESSORS[archive.codec]()
+        pending = b''
+        for start in range(offset, offset + length, _STREAM_CHUNK):
+            pending += decompressor.decompress(data[start:min(start + _STREAM_CHUNK, offset + length)])
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                yield _entry(archive.run_id, stage, line)
+        if hasattr(decompressor, 'flush'):
+            pending += decompressor.flush()
+        if pending:
+            yield _entry(archive.run_id, stage, pending)
+
+
+def read_archive(archive, stage: Optional[str] = None) -> list[ArchivedEntry]:
+    """Decompress *archive*'s lines - only *stage*'s segment when given."""
+    entries = []
+    for name in archive.stage_index:
+        if stage is not None and name != stage:
+            continue
+        for block in _blocks(archive, name):
+            entries.extend(_decode_block(archive, name, block))
+    return entries
+
+
+# -- Reading -------------------------------------------------------------------
+
+def run_log_entries(run_id, stage: Optional[str] = None, after_id: int = 0,
+                    by_id: bool = False) -> list:
+    """Every log line of a run, archived or not, in timestamp order.
+
+    stage: only lines of that stage ('' for lines logged between stages).
+    after_id: only lines with a larger id.
+    by_id: order by id (insertion order) instead of timestamp.
+    """
+    from webapp.models import LogEntry, RunLogArchive
+
+    rows = LogEntry.objects.filter(run_id=run_id, id__gt=after_id)
+    if stage is not None:
+        rows = rows.filter(stage_name=stage)
+    entries = list(rows.order_by('id' if by_id else 'timestamp'))
+
+    archive = RunLogArchive.objects.filter(run_id=run_id, last_log_id__gt=after_id).first()
+    if archive is not None:
+        seen = {e.id for e in entries}
+        entries.extend(e for e in read_archive(archive, stage)
+                       if e.id > after_id and e.id not in seen)
+        entries.sort(key=(lambda e: e.id) if by_id else (lambda e: (e.timestamp, e.id)))
+    return entries
+
+
+def iter_run_log_entries(run_id, stage: Optional[str] = None, after_id: int = 0,
+                         chunk_size: int = 2000) -> Iterator:
+    """Stream a run's lines in id order without loading every row at once.
+
+    Rows come from a server-side cursor (QuerySet.iterator()); archived lines
+    are decompressed incrementally, each stage segment as its own stream, and
+    merged in by id, so neither is held in memory whole.  Same arguments as
+    run_log_entries().
+    """
+    from webapp.models import LogEntry, RunLogArchive
+
+    rows = LogEntry.objects.filter(run_id=run_id, id__gt=after_id)
+    if stage is not None:
+        rows = rows.filter(stage_name=stage)
+    rows = rows.order_by('id').iterator(chunk_size=chunk_size)
+
+    archive = RunLogArchive.objects.filter(run_id=run_id, last_log_id__gt=after_id).first()
+    if archive is None:
+        yield from rows
+        return
+
+    names = [name for name in archive.stage_index if stage is None or name == stage]
+    segments = [(e for e in _iter_segment(archive, name) if e.id > after_id) for name in names]
+    last = None
+    for entry in heapq.merge(rows, *segments, key=lambda e: e.id):
+        if entry.id != last:
+            last = entry.id
+            yield entry
+
+
+class RunLogReader:
+    """Paged access to one run's log, whether it is rows, an archive or both.
+
+    The archive is fetched at most once per reader, and a page decompresses
+    only the blocks of each stage's segment that hold lines in its window,
+    nearest first, stopping once the page is full - so a page costs about
+    the same wherever it falls in the log.
+    """
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self._archive = None
+        self._archive_loaded = False
+        self._blocks: dict = {}
+
+    @property
+    def archive(self):
+        if not self._archive_loaded:
+            from webapp.models import RunLogArchive
+            self._archive = RunLogArchive.objects.filter(run_id=self.run_id).first()
+            self._archive_loaded = True
+        return self._archive
+
+    def _block(self, stage: str, block: tuple) -> list[ArchivedEntry]:
+        key = (stage, block[0])
+        if key not in self._blocks:
+            self._blocks[key] = _decode_block(self.archive, stage, block)
+        return self._blocks[key]
+
+    def _segment(self, stage: str, blocks: list, before: Optional[int],
+                 after: Optional[int], forward: bool) -> Iterator[ArchivedEntry]:
+        """*stage*'s archived lines between *after* and *before*, in page order.
+
+        Each block is decompressed only when the stream reaches it.
+        """
+        for block in blocks if forward else reversed(blocks):
+            entries = self._block(stage, block)
+            for entry in entries if forward else reversed(entries):
+                if (before is None or entry.id < before) and (after is None or entry.id > after):
+                    yield entry
+
+    def _archived(self, stage: Optional[str], before: Optional[int], after: Optional[int],
+                  forward: bool) -> list[Iterator[ArchivedEntry]]:
+        archive = self.archive
+        if archive is None:
+            return []
+        names = archive.stage_index if stage is None else [stage]
+        segments = []
+        for name in names:
+            if name not in archive.stage_index:
+                continue
+            blocks = [block for block in _blocks(archive, name)
+                      if (before is None or block[2] < before) and (after is None or block[3] > after)]
+            segments.append(self._segment(name, blocks, before, after, forward))
+        return segments
+
+    def stage_counts(self) -> dict[str, int]:
+        """{stage name: lines}; '' is lines logged outside any stage."""
+        from django.db.models import Count
+        from webapp.models import LogEntry
+
+        counts = dict(
+            LogEntry.objects.filter(run_id=self.run_id).order_by()
+            .values('stage_name').annotate(n=Count('id')).values_list('stage_name', 'n')
+        )
+        if self.archive is not None:
+            for name, (_, _, count, *_) in self.archive.stage_index.items():
+                counts[name] = counts.get(name, 0) + count
+        return counts
+
+    def last_id(self) -> int:
+        from django.db.models import Max
+        from webapp.models import LogEntry
+
+        last = LogEntry.objects.filter(run_id=self.run_id).aggregate(m=Max('id'))['m'] or 0
+        if self.archive is not None:
+            last = max(last, self.archive.last_log_id)
+        return last
+
+    def page(self, stage: Optional[str] = None, before: Optional[int] = None,
+             after: Optional[int] = None, levels: Optional[Iterable[str]] = None,
+             limit: int = 200) -> tuple[list, bool]:
+        """A page of lines in id order, and whether more lie beyond it.
+
+        With *after*, the page is the oldest *limit* lines above that id and
+        "more" means newer lines; otherwise it is the newest *limit* lines
+        below *before* (or the end of the log) and "more" means older lines.
+        """
+        from webapp.models import LogEntry
+
+        forward = after is not None
+        levels = {lvl.upper() for lvl in levels} if levels else None
+
+        rows = LogEntry.objects.filter(run_id=self.run_id)
+        if stage is not None:
+            rows = rows.filter(stage_name=stage)
+        if levels:
+            rows = rows.filter(level__in=levels)
+        if before is not None:
+            rows = rows.filter(id__lt=before)
+        if after is not None:
+            rows = rows.filter(id__gt=after)
+        rows = rows.order_by('id' if forward else '-id')[:limit + 1]
+
+        # Rows and segments are each in page order, so merging them and
+        # stopping at limit + 1 lines reads no more of either than needed.
+        # A line can be both a row and archived while the archiver runs.
+        entries: list = []
+        last = None
+        for entry in heapq.merge(rows, *self._archived(stage, before, after, forward),
+                                 key=lambda e: e.id, reverse=not forward):
+            if entry.id == last or (levels and entry.level not in levels):
+                continue
+            last = entry.id
+            entries.append(entry)
+            if len(entries) > limit:
+                break
+
+        more = len(entries) > limit
+        entries = entries[:limit]
+        if not forward:
+            entries.reverse()
+        return entries, more
+
+
+def run_log_count(run_id) -> int:
+    from webapp.models import LogEntry, RunLogArchive
+
+    count = LogEntry.objects.filter(run_id=run_id).count()
+    archived = RunLogArchive.objects.filter(run_id=run_id).values_list('entry_count', flat=True).first()
+    return count + (archived or 0)
+
+
+# -- Archiving -----------------------------------------------------------------
+
+@dataclass
+class ArchiveResult:
+    run_id: object
+    entries: int
+    raw_bytes: int
+    compressed_bytes: int
+
+
+def _build(run_id, entries: Iterable, codec: str) -> dict:
+    compress = CODECS[codec][0]
+    by_stage: dict[str, list] = {}
+    # Id order within each segment lets iter_run_log_entries() merge them as streams.
+    for entry in sorted(entries, key=lambda e: e.id):
+        by_stage.setdefault(entry.stage_name or '', []).append(entry)
+
+    segments, index, raw, offset = [], {}, 0, 0
+    for stage, stage_entries in by_stage.items():
+        blocks, size = [], 0
+        for start in range(0, len(stage_entries), _BLOCK_LINES):
+            chunk = stage_entries[start:start + _BLOCK_LINES]
+            encoded = _encode(chunk)
+            block = compress(encoded)
+            blocks.append([size, len(block), chunk[0].id, chunk[-1].id])
+            segments.append(block)
+            raw += len(encoded)
+            size += len(block)
+        index[stage] = [offset, size, len(stage_entries), blocks]
+        offset += size
+    return {
+        'run_id': run_id,
+        'codec': codec,
+        'data': b''.join(segments),
+        'stage_index': index,
+        'entry_count': sum(len(v) for v in by_stage.values()),
+        'last_log_id': max((e.id for v in by_stage.values() for e in v), default=0),
+        'raw_bytes': raw,
+    }
+
+
+def archive_run(run_id, codec: str = DEFAULT_CODEC) -> Optional[ArchiveResult]:
+    """Compress a run's LogEntry rows into its RunLogArchive and delete them.
+
+    Lines already in an archive are kept, so archiving twice - or after a
+    line was logged late - merges rather than replaces.  Returns None when
+    the run has no rows to archive.
+    """
+    from django.db import router
+    from webapp.models import LogEntry, RunLogArchive
+    from webapp.sqlite_backend import write_transaction
+
+    if codec not in CODECS:
+        raise ValueError(f'Unknown log archive codec: {codec!r}')
+
+    using = router.db_for_write(RunLogArchive)
+    with write_transaction(using=using):
+        rows = list(LogEntry.objects.using(using).filter(run_id=run_id))
+        if not rows:
+            return None
+        existing = RunLogArchive.objects.using(using).filter(run_id=run_id).first()
+        entries = rows + (read_archive(existing) if existing else [])
+        fields = _build(run_id, entries, codec)
+        RunLogArchive.objects.using(using).update_or_create(run_id=run_id, defaults=fields)
+
+        ids = [row.id for row in rows]
+        for start in range(0, len(ids), _DELETE_CHUNK):
+            LogEntry.objects.using(using).filter(id__in=ids[start:start + _DELETE_CHUNK]).delete()
+
+    return ArchiveResult(run_id, fields['entry_count'], fields['raw_bytes'], len(fields['data']))
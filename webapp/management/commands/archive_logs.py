@@ -0,0 +1,167 @@
+"""
+Management command: archive_logs
+
+Compresses the LogEntry rows of finished runs into RunLogArchive blobs (see
+webapp.log_archive) - the same thing the runner does when a run ends, for
+runs that finished before archiving was enabled - and reports the space
+saved.
+
+Usage:
+    python manage.py archive_logs                  # archive every finished run
+    python manage.py archive_logs --codec lzma     # smaller, slower to write
+    python manage.py archive_logs --dry-run        # only report what would be archived
+    python manage.py archive_logs --report         # totals for existing archives
+    python manage.py archive_logs --vacuum         # then VACUUM to give the space back
+
+--vacuum also converts a database created before incremental auto-vacuum
+was enabled, so the periodic cleanup can reclaim space without a VACUUM;
+it runs even when there is nothing left to archive.
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+_TERMINAL = ('success', 'failed', 'cancelled')
+
+
+def _size(num: float) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if abs(num) < 1024:
+            return f'{num:.0f} B' if unit == 'B' else f'{num:.1f} {unit}'
+        num /= 1024
+    return f'{num:.1f} GB'
+
+
+class Command(BaseCommand):
+    help = 'Compress the log rows of finished runs into per-run archives.'
+
+    def add_arguments(self, parser):
+        from webapp.log_archive import CODECS
+        parser.add_argument(
+            '--codec',
+            choices=sorted(CODECS),
+            default=None,
+            help='Compression to use (default: the logging.archive_codec setting, else zlib).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the runs that would be archived without changing anything.',
+        )
+        parser.add_argument(
+            '--report',
+            action='store_true',
+            help='Only print totals for the archives that already exist.',
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='Run VACUUM afterwards so the database file shrinks.',
+        )
+
+    def handle(self, *args, **options):
+        if options['report']:
+            self._report()
+            return
+
+        from django.db.models import Count
+        from webapp.log_archive import DEFAULT_CODEC, archive_codec, archive_run
+        from webapp.models import LogEntry, Run
+
+        codec = options['codec'] or archive_codec() or DEFAULT_CODEC
+        # LogEntry may live in a separate database (webapp.routers), so look
+        # the runs up by id rather than with a cross-database join.
+        row_counts = dict(
+            LogEntry.objects.order_by().values('run_id')
+            .annotate(rows=Count('id')).values_list('run_id', 'rows')
+        )
+        run_ids = [
+            run_id for run_id in Run.objects.filter(status__in=_TERMINAL)
+            .order_by('started_at').values_list('id', flat=True)
+            if run_id in row_counts
+        ]
+        if not run_ids:
+            self.stdout.write('No finished runs have log rows to archive.')
+            if options['vacuum'] and not options['dry_run']:
+                self._vacuum(self._file_sizes())
+            return
+
+        if options['dry_run']:
+            rows = sum(row_counts[run_id] for run_id in run_ids)
+            self.stdout.write(f'Would archive {len(run_ids)} run(s), {rows:,} log line(s), with {codec}.')
+            return
+
+        sizes = self._file_sizes()
+        runs = lines = raw = compressed = 0
+        for run_id in run_ids:
+            try:
+                result = archive_run(run_id, codec)
+            except Exception as exc:
+                raise CommandError(f'Could not archive run {run_id}: {exc}') from exc
+            if result is None:
+                continue
+            runs += 1
+            lines += result.entries
+            raw += result.raw_bytes
+            compressed += result.compressed_bytes
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {run_id}: {result.entries:,} lines, '
+                                  f'{_size(result.raw_bytes)} -> {_size(result.compressed_bytes)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {runs} run(s), {lines:,} log line(s) with {codec}: '
+            f'{_size(raw)} of log text stored in {_size(compressed)}'
+            + (f' ({raw / compressed:.1f}x).' if compressed else '.')
+        ))
+        if options['vacuum']:
+            self._vacuum(sizes)
+
+    # ------------------------------------------------------------------
+
+    def _report(self):
+        from django.db.models import Count, Sum
+        from webapp.models import LogEntry, RunLogArchive
+
+        totals = RunLogArchive.objects.aggregate(
+            runs=Count('run_id'), lines=Sum('entry_count'), raw=Sum('raw_bytes'),
+        )
+        compressed = sum(
+            archive.compressed_bytes
+            for archive in RunLogArchive.objects.only('stage_index').iterator()
+        )
+        raw = totals['raw'] or 0
+        self.stdout.write(f'Archived runs:      {totals["runs"]:,}')
+        self.stdout.write(f'Archived lines:     {totals["lines"] or 0:,}')
+        self.stdout.write(f'Log text:           {_size(raw)}')
+        self.stdout.write(f'Compressed:         {_size(compressed)}'
+                          + (f' ({raw / compressed:.1f}x)' if compressed else ''))
+        self.stdout.write(f'Saved:              {_size(raw - compressed)}')
+        self.stdout.write(f'Unarchived lines:   {LogEntry.objects.count():,}')
+
+    def _log_databases(self):
+        from django.db import connections, router
+        from webapp.models import LogEntry
+        return {connections['default'], connections[router.db_for_write(LogEntry)]}
+
+    def _file_sizes(self) -> dict:
+        sizes = {}
+        for connection in self._log_databases():
+            name = str(connection.settings_dict['NAME'])
+            if os.path.exists(name):
+                sizes[connection.alias] = os.path.getsize(name)
+        return sizes
+
+    def _vacuum(self, before: dict):
+        for connection in self._log_databases():
+            if connection.vendor != 'sqlite' or connection.alias not in before:
+                continue
+            with connection.cursor() as cursor:
+                # Takes effect on an existing database only through VACUUM.
+                cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                cursor.execute('VACUUM')
+            after = os.path.getsize(str(connection.settings_dict['NAME']))
+            self.stdout.write(
+                f'{connection.alias}: database file {_size(before[connection.alias])} -> '
+                f'{_size(after)} (saved {_size(before[connection.alias] - after)})'
+            )
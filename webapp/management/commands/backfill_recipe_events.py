@@ -0,0 +1,30 @@
+"""
+Management command: backfill_recipe_events
+
+Creates RecipeEvent rows (see webapp.recipe_events) from the RecipeResult
+reports of runs recorded before per-recipe history existed.  New runs get
+their events as RunAutoPkg writes its results.
+
+Usage:
+    python manage.py backfill_recipe_events             # runs without events only
+    python manage.py backfill_recipe_events --replace   # rebuild every run's events
+"""
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Build per-recipe history from the recipe results of existing runs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Rebuild events for runs that already have them.',
+        )
+
+    def handle(self, *args, **options):
+        from webapp.recipe_events import backfill
+
+        runs, events = backfill(replace=options['replace'])
+        self.stdout.write(self.style.SUCCESS(f'Created {events:,} recipe event(s) from {runs} run(s).'))
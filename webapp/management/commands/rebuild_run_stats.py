@@ -0,0 +1,35 @@
+"""
+Management command: rebuild_run_stats
+
+Recomputes the RunDailyStats rollup (see webapp.run_stats) from the runs in
+the database - for history recorded before the rollup existed, or after
+runs were imported or edited by hand.  The runner keeps the rollup current
+on its own as runs finish.
+
+Usage:
+    python manage.py rebuild_run_stats             # every day with finished runs
+    python manage.py rebuild_run_stats --days 30   # only the last 30 days
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily run statistics used by the dashboard and the stats API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Only recompute the last N days (default: all history).',
+        )
+
+    def handle(self, *args, **options):
+        from webapp.run_stats import rebuild
+
+        days = options['days']
+        if days is not None and days < 1:
+            raise CommandError('--days must be at least 1.')
+        count = rebuild(days)
+        self.stdout.write(self.style.SUCCESS(f'Recomputed run statistics for {count} day(s).'))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0005_userpermission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stageexecution',
+            name='resource_usage',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0006_stageexecution_resource_usage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunLogArchive',
+            fields=[
+                ('run', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='log_archive', serialize=False, to='webapp.run')),
+                ('codec', models.CharField(choices=[('zlib', 'zlib'), ('lzma', 'LZMA')], default='zlib', max_length=10)),
+                ('data', models.BinaryField()),
+                ('stage_index', models.JSONField(default=dict)),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('last_log_id', models.BigIntegerField(default=0)),
+                ('raw_bytes', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0008_rundailystats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('recipe_key', models.CharField(default='', max_length=255)),
+                ('version', models.CharField(blank=True, default='', max_length=100)),
+                ('event_type', models.CharField(choices=[('failure', 'Failure'), ('munki_import', 'Munki Import'), ('pkg_copied', 'Package Copied'), ('url_downloaded', 'URL Downloaded'), ('trust_updated', 'Trust Updated'), ('deprecation', 'Deprecation')], max_length=30)),
+                ('timestamp', models.DateTimeField()),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_events', to='webapp.run')),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['recipe_key', 'timestamp'], name='recipeevent_key_ts')],
+            },
+        ),
+    ]
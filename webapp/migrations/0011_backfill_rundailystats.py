@@ -0,0 +1,72 @@
+"""
+Migration: fill RunDailyStats from the runs already in the database.
+
+The dashboard reads only RunDailyStats, so without this it would show no
+runs until ``rebuild_run_stats`` was run by hand.  The rollup is the one
+webapp.run_stats.refresh_day() did when this migration was written, kept
+here against the historical models so later changes to either cannot
+change what the migration does.
+"""
+from django.db import migrations
+from django.utils import timezone
+
+TERMINAL_STATUSES = ('success', 'failed', 'cancelled')
+RESULT_COLUMNS = {
+    'munki_import': 'imports',
+    'url_downloaded': 'downloads',
+    'failure': 'recipe_failures',
+}
+COUNT_FIELDS = ('runs', 'success', 'failed', 'cancelled', 'imports', 'downloads', 'recipe_failures')
+
+
+def _backfill(apps, schema_editor):
+    RecipeResult = apps.get_model('webapp', 'RecipeResult')
+    Run = apps.get_model('webapp', 'Run')
+    RunDailyStats = apps.get_model('webapp', 'RunDailyStats')
+    StageExecution = apps.get_model('webapp', 'StageExecution')
+
+    days = {}      # day -> column values
+    run_days = {}  # run id -> day
+    for run_id, status, started in (
+        Run.objects.filter(status__in=TERMINAL_STATUSES, started_at__isnull=False)
+        .values_list('id', 'status', 'started_at').iterator()
+    ):
+        day = timezone.localdate(started)
+        run_days[run_id] = day
+        fields = days.setdefault(day, {**dict.fromkeys(COUNT_FIELDS, 0), 'stage_durations': {}})
+        fields['runs'] += 1
+        fields[status] += 1
+    if not days:
+        return
+
+    for run_id, result_type, data in (
+        RecipeResult.objects.filter(result_type__in=RESULT_COLUMNS)
+        .values_list('run_id', 'result_type', 'data').iterator()
+    ):
+        if run_id in run_days and isinstance(data, list):
+            days[run_days[run_id]][RESULT_COLUMNS[result_type]] += len(data)
+
+    for run_id, name, started, completed in (
+        StageExecution.objects.filter(started_at__isnull=False, completed_at__isnull=False)
+        .exclude(status='skipped')
+        .values_list('run_id', 'name', 'started_at', 'completed_at').iterator()
+    ):
+        if run_id in run_days:
+            durations = days[run_days[run_id]]['stage_durations']
+            durations.setdefault(name, []).append(round((completed - started).total_seconds(), 3))
+
+    for day, fields in days.items():
+        for values in fields['stage_durations'].values():
+            values.sort()
+        RunDailyStats.objects.update_or_create(day=day, defaults=fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0010_task_progress'),
+    ]
+
+    operations = [
+        migrations.RunPython(_backfill, migrations.RunPython.noop),
+    ]
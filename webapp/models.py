@@ -37,8 +37,15 @@ class Setting(models.Model):
         'autopkg.recipe_list':   '~/Library/Application Support/AutoPkgr/recipe_list.txt',
         'autopkg.overrides_dir': '~/Library/AutoPkg/RecipeOverrides',
         'autopkg.recipe_repos_dir': '~/Library/AutoPkg/RecipeRepos',
+        'autopkg.watch_recipes': 'true',   # update the Recipes tab as files change
         # Workflow
         'workflow.update_repos': 'true',
+        'workflow.run_shards':   '1',       # concurrent `autopkg run` processes
+        'workflow.trust_workers': '1',      # concurrent trust-info checks
+        'workflow.native_trust':  'true',   # hash-check trust info before calling autopkg
+        'workflow.repo_update_workers': '1',  # concurrent `autopkg repo-update` processes
+        'workflow.repo_freshness_check': 'true',  # skip repos already at the remote HEAD
+        'workflow.repo_fresh_minutes':   '0',     # skip repos fetched this recently; 0 = off
         # Repository
         'repository.type':            'remote',   # local | remote
         'repository.connection_type': 'smb',      # smb | sftp  (remote only)
@@ -60,6 +67,17 @@ class Setting(models.Model):
         'logging.level':     'INFO',
         'logging.to_file':   'false',
         'logging.file_path': '~/logs/autopkg-runner',
+        'logging.db_batch_rows': '200',  # log lines per database write; 1 = write each line
+        'logging.db_batch_ms':   '250',  # longest a buffered line waits before being written
+        'logging.archive_codec': 'zlib', # compress a finished run's log: zlib, lzma or off
+        # Retention (webapp.retention); day and count limits of 0 = off
+        'retention.max_age_days':        '90',
+        'retention.max_runs':            '0',
+        'retention.failed_max_age_days': '0',   # keep failed runs this long, if longer
+        'retention.log_max_age_days':    '0',   # drop logs but keep the run after this long
+        'retention.batch_rows':          '1000',  # rows per DELETE
+        'retention.batch_pause_ms':      '50',    # pause between batches
+        'retention.incremental_vacuum':  'true',
         # Notifications
         'notify.pwa_base_url': '',          # Base URL for share links (e.g. https://autopkg.example.com)
         'notify.share_link_expiry_days': '', # Days after which share links expire; blank = never
@@ -81,13 +99,24 @@ class Setting(models.Model):
     def __str__(self):
         return f'{self.key} = {self.value[:60]}'
 
+    def save(self, *args, **kwargs):
+        from webapp.settings_cache import invalidate
+        super().save(*args, **kwargs)
+        invalidate()
+
+    def delete(self, *args, **kwargs):
+        from webapp.settings_cache import invalidate
+        result = super().delete(*args, **kwargs)
+        invalidate()
+        return result
+
     # -- Class-level helpers ----------------------------------------------------
 
     @classmethod
     def get(cls, key: str, default: Optional[str]=None) -> str:
-        try:
-            raw = cls.objects.get(key=key).value
-        except cls.DoesNotExist:
+        from webapp.settings_cache import snapshot
+        raw = snapshot().get(key)
+        if raw is None:
             return default if default is not None else cls.DEFAULTS.get(key, '')
         if key in cls.SENSITIVE_KEYS:
             from webapp.encryption import decrypt
@@ -95,12 +124,37 @@ class Setting(models.Model):
         return raw
 
     @classmethod
-    def set(cls, key: str, value: str) -> None:
+    def _stored(cls, key: str, value) -> str:
+        value = str(value)
         if key in cls.SENSITIVE_KEYS and value:
             from webapp.encryption import encrypt, is_encrypted
             if not is_encrypted(value):
                 value = encrypt(value)
-        cls.objects.update_or_create(key=key, defaults={'value': str(value)})
+        return value
+
+    @classmethod
+    def set(cls, key: str, value: str) -> None:
+        cls.objects.update_or_create(key=key, defaults={'value': cls._stored(key, value)})
+
+    @classmethod
+    def set_many(cls, values: dict[str, str]) -> None:
+        """Write several settings in one transaction, with one bulk update and one bulk insert."""
+        from webapp.settings_cache import invalidate
+        from webapp.sqlite_backend import write_transaction
+
+        values = {key: cls._stored(key, value) for key, value in values.items()}
+        if not values:
+            return
+        with write_transaction():
+            existing = list(cls.objects.select_for_update().filter(key__in=values))
+            for row in existing:
+                row.value = values[row.key]
+            cls.objects.bulk_update(existing, ['value'])
+            found = {row.key for row in existing}
+            cls.objects.bulk_create([cls(key=key, value=value)
+                                     for key, value in values.items() if key not in found])
+        # Bulk writes send no post_save.
+        invalidate()
 
     @classmethod
     def get_bool(cls, key: str) -> bool:
@@ -117,9 +171,9 @@ class Setting(models.Model):
     def get_all(cls) -> dict[str, str]:
         """Merge DB values on top of defaults; returns a complete settings dict with sensitive keys decrypted."""
         from webapp.encryption import decrypt
+        from webapp.settings_cache import snapshot
         result = dict(cls.DEFAULTS)
-        for s in cls.objects.all():
-            result[s.key] = s.value
+        result.update(snapshot())
         for key in cls.SENSITIVE_KEYS:
             if key in result:
                 result[key] = decrypt(result[key])
@@ -253,7 +307,9 @@ class Run(models.Model):
     if TYPE_CHECKING:
         stage_executions : models.Manager[StageExecution]
         log_entries      : models.Manager[LogEntry]
+        log_archive      : RunLogArchive
         recipe_results   : models.Manager[RecipeResult]
+        recipe_events    : models.Manager[RecipeEvent]
         tasks            : models.Manager[Task]
         share_token      : RunShareToken
 
@@ -290,6 +346,8 @@ class StageExecution(models.Model):
     order        = models.PositiveIntegerField(default=0)
     started_at   = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    # libs.resource_usage.StageUsage.as_dict() - CPU, memory, I/O, child processes
+    resource_usage = models.JSONField(default=dict, blank=True)
 
     class Meta:
         ordering = ['order']
@@ -297,6 +355,22 @@ class StageExecution(models.Model):
     def __str__(self):
         return f'{self.name} [{self.status}]'
 
+    @property
+    def usage_summary(self) -> dict:
+        """Totals of resource_usage for display; empty when nothing was recorded."""
+        u = self.resource_usage or {}
+        if not u:
+            return {}
+        return {
+            'cpu_seconds':       u.get('cpu_user', 0) + u.get('cpu_system', 0),
+            'child_cpu_seconds': u.get('child_cpu_user', 0) + u.get('child_cpu_system', 0),
+            'subprocesses':      u.get('subprocesses', 0),
+            'peak_rss':          u.get('peak_rss', 0),
+            'child_peak_rss':    u.get('child_peak_rss', 0),
+            'block_in':          u.get('block_in', 0) + u.get('child_block_in', 0),
+            'block_out':         u.get('block_out', 0) + u.get('child_block_out', 0),
+        }
+
     @property
     def duration(self):
         if self.started_at and self.completed_at:
@@ -329,6 +403,37 @@ class LogEntry(models.Model):
         return f'[{self.level}] {self.message[:80]}'
 
 
+class RunLogArchive(models.Model):
+    """A finished run's log lines, compressed into one blob (see webapp.log_archive).
+
+    Each stage's lines are compressed as a separate segment; stage_index maps
+    a stage name to the [offset, length, count, blocks] of its segment in
+    data, blocks being the [offset in the segment, length, first id, last id]
+    of each independently compressed block of the segment.
+    """
+    CODEC_CHOICES = [
+        ('zlib', 'zlib'),
+        ('lzma', 'LZMA'),
+    ]
+
+    run         = models.OneToOneField(Run, on_delete=models.CASCADE, primary_key=True,
+                                       related_name='log_archive')
+    codec       = models.CharField(max_length=10, choices=CODEC_CHOICES, default='zlib')
+    data        = models.BinaryField()
+    stage_index = models.JSONField(default=dict)
+    entry_count = models.PositiveIntegerField(default=0)
+    last_log_id = models.BigIntegerField(default=0)
+    raw_bytes   = models.PositiveBigIntegerField(default=0)   # encoded lines before compression
+    created_at  = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Log archive for run {self.run_id} ({self.entry_count} lines)'
+
+    @property
+    def compressed_bytes(self) -> int:
+        return sum(segment[1] for segment in self.stage_index.values())
+
+
 class RecipeResult(models.Model):
     RESULT_TYPES = [
         ('failure',      'Failure'),
@@ -348,6 +453,54 @@ class RecipeResult(models.Model):
         return f'{self.result_type} for run {self.run_id}'
 
 
+class RecipeEvent(models.Model):
+    """One recipe's entry in a run's AutoPkg report, normalised from RecipeResult.data.
+
+    name is the Munki item name for imports and the recipe otherwise;
+    recipe_key is the same for all of a recipe's rows (see
+    webapp.recipe_events), so a recipe's history is one indexed lookup.
+    """
+    name       = models.CharField(max_length=255)
+    recipe_key = models.CharField(max_length=255, default='')
+    version    = models.CharField(max_length=100, blank=True, default='')
+    event_type = models.CharField(max_length=30, choices=RecipeResult.RESULT_TYPES)
+    run        = models.ForeignKey(Run, on_delete=models.CASCADE, related_name='recipe_events')
+    run_id: uuid.UUID  # synthesised by Django from the ForeignKey; declared for type checkers
+    timestamp  = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [models.Index(fields=['recipe_key', 'timestamp'], name='recipeevent_key_ts')]
+
+    def __str__(self):
+        return f'{self.event_type} {self.name} {self.version}'.rstrip()
+
+
+class RunDailyStats(models.Model):
+    """Per-day rollup of finished runs, kept by webapp.run_stats.
+
+    Rows outlive the runs they count, so trends reach back past the
+    database cleanup's retention.  stage_durations maps a stage name to the
+    sorted durations (seconds) of that stage's executions on the day.
+    """
+    day             = models.DateField(unique=True)
+    runs            = models.PositiveIntegerField(default=0)
+    success         = models.PositiveIntegerField(default=0)
+    failed          = models.PositiveIntegerField(default=0)
+    cancelled       = models.PositiveIntegerField(default=0)
+    imports         = models.PositiveIntegerField(default=0)
+    downloads       = models.PositiveIntegerField(default=0)
+    recipe_failures = models.PositiveIntegerField(default=0)
+    stage_durations = models.JSONField(default=dict)
+    updated_at      = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['day']
+
+    def __str__(self):
+        return f'Run stats for {self.day} ({self.runs} runs)'
+
+
 class RunShareToken(models.Model):
     """
     Obscure, unauthenticated-access token for a completed run's share report.
@@ -429,6 +582,7 @@ class Task(models.Model):
     created_at   = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     error        = models.TextField(blank=True)
+    progress     = models.JSONField(default=dict, blank=True)   # long tasks' running counters
 
     class Meta:
         ordering = ['-created_at']
@@ -0,0 +1,139 @@
+"""Per-recipe history, normalised out of AutoPkg's run reports.
+
+RecipeResult keeps each section of a run's report as one JSON list, which
+is what the run detail page shows but is no use for "when did Firefox last
+import, and which version?" - that would mean decoding every run's blobs.
+RunAutoPkg also writes one RecipeEvent per report row; history() answers
+such questions from the (recipe_key, timestamp) index.
+
+A row's name is the first of these it has: the Munki item name, the
+recipe identifier, the recipe, or - for download and package-copy rows,
+which only carry a path - the recipe's cache directory
+(``~/Library/AutoPkg/Cache/<recipe identifier>/downloads/Firefox.dmg``).
+So one recipe's rows carry different names ("Firefox", "Firefox.munki",
+"local.munki.Firefox"); recipe_key() reduces each of them to the same key.
+"""
+from __future__ import annotations
+
+from pathlib import PurePosixPath
+from typing import Optional
+
+_NAME_KEYS = ('name', 'recipe_id', 'recipe')
+_PATH_KEYS = ('download_path', 'pkg_path')
+_RECIPE_SUFFIXES = ('.recipe.yaml', '.recipe.plist', '.recipe')
+# Recipe types as they appear in recipe names ("Firefox.munki") and
+# identifiers ("com.github.autopkg.munki.Firefox").
+_RECIPE_TYPES = frozenset({
+    'download', 'pkg', 'munki', 'install', 'jss', 'jamf', 'filewave', 'ds', 'lanrev', 'sccm',
+    'bigfix', 'intune',
+})
+
+# Backfill creates events in batches of this many.
+_BATCH = 500
+
+
+def event_name(row) -> str:
+    """The name a report row is filed under; '' when it has none."""
+    if not isinstance(row, dict):
+        return ''
+    for key in _NAME_KEYS:
+        if row.get(key):
+            return str(row[key])
+    for key in _PATH_KEYS:
+        if row.get(key):
+            path = PurePosixPath(str(row[key]))
+            parts = path.parts
+            if 'downloads' in parts[1:]:
+                return parts[parts.index('downloads', 1) - 1]
+            return path.name
+    return ''
+
+
+def recipe_key(name: str) -> str:
+    """The key *name*'s events are filed under, shared by every spelling of a recipe.
+
+    A recipe path keeps only its file name; trailing recipe types are
+    dropped ("Firefox.munki"), as is an identifier's prefix up to its last
+    type ("local.munki.Firefox"); the rest is case-folded.
+    """
+    name = PurePosixPath(str(name)).name if '/' in str(name) else str(name)
+    for suffix in _RECIPE_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    parts = name.split('.')
+    while len(parts) > 1 and parts[-1].lower() in _RECIPE_TYPES:
+        parts.pop()
+    for i in range(len(parts) - 2, -1, -1):
+        if parts[i].lower() in _RECIPE_TYPES:
+            parts = parts[i + 1:]
+            break
+    return '.'.join(parts).casefold()
+
+
+def build_events(run_id, result_type: str, rows, timestamp) -> list:
+    """Unsaved RecipeEvents for one report section's *rows*."""
+    from webapp.models import RecipeEvent
+
+    name_len = RecipeEvent._meta.get_field('name').max_length
+    key_len = RecipeEvent._meta.get_field('recipe_key').max_length
+    version_len = RecipeEvent._meta.get_field('version').max_length
+    events = []
+    for row in rows or ():
+        name = event_name(row)
+        if not name:
+            continue
+        version = row.get('version') or ''
+        events.append(RecipeEvent(
+            run_id=run_id,
+            event_type=result_type,
+            name=name[:name_len],
+            recipe_key=recipe_key(name)[:key_len],
+            version=str(version)[:version_len],
+            timestamp=timestamp,
+        ))
+    return events
+
+
+def history(name: str, event_type: Optional[str] = None, limit: int = 50) -> list:
+    """Events of the recipe *name* spells (see recipe_key), newest first."""
+    from webapp.models import RecipeEvent
+
+    events = RecipeEvent.objects.filter(recipe_key=recipe_key(name))
+    if event_type:
+        events = events.filter(event_type=event_type)
+    return list(events.order_by('-timestamp', '-id')[:limit])
+
+
+def backfill(replace: bool = False) -> tuple[int, int]:
+    """Create RecipeEvents from existing RecipeResults; returns (runs, events).
+
+    Runs that already have events are skipped unless *replace* is set, in
+    which case their events are rebuilt.  Events are stamped with the run's
+    completion time (or start, if it never completed).
+    """
+    from webapp.models import RecipeEvent, RecipeResult, Run
+
+    done = set() if replace else set(RecipeEvent.objects.values_list('run_id', flat=True).distinct())
+    runs = created = 0
+    pending: list = []
+    for run_id, started, completed in list(
+        Run.objects.filter(recipe_results__isnull=False).distinct().order_by('started_at')
+        .values_list('id', 'started_at', 'completed_at')
+    ):
+        if run_id in done:
+            continue
+        if replace:
+            RecipeEvent.objects.filter(run_id=run_id).delete()
+        for result_type, data in RecipeResult.objects.filter(run_id=run_id).values_list('result_type', 'data'):
+            rows = data if isinstance(data, list) else []
+            pending.extend(build_events(run_id, result_type, rows, completed or started))
+        runs += 1
+        if len(pending) >= _BATCH:
+            RecipeEvent.objects.bulk_create(pending)
+            created += len(pending)
+            pending = []
+    if pending:
+        RecipeEvent.objects.bulk_create(pending)
+        created += len(pending)
+    return runs, created
@@ -0,0 +1,222 @@
+"""Persistent index of the recipe files under the AutoPkg search directories.
+
+The Recipes tab and the Trust Verification stage need every recipe's
+Identifier and ParentRecipe.  Walking the recipe repos and reading each
+file is slow with thousands of recipes, and every gunicorn worker used to
+repeat it after each restart and whenever its five-minute cache expired.
+
+refresh() keeps what it learns in one JSON file (settings.RECIPE_FILE_INDEX)
+shared by all workers:
+
+    dirs   {directory: {mtime, dirs, files}} - sub-directories and recipe
+           file names, as listed when the directory had that mtime
+    files  {path: [mtime, size, identifier, parent]}
+
+A rescan stats each directory and lists only those whose mtime changed
+(adding, removing or renaming an entry changes its directory's mtime), then
+stats each recipe file and re-reads only those whose mtime or size changed.
+A warm rescan therefore costs stat calls and no reads.  Entries modified
+within _RACY_NS of being indexed are stored with mtime 0 so they are looked
+at again next time: a change in the same clock tick would otherwise go
+unnoticed on filesystems with coarse timestamps.
+
+Hidden directories (.git and the like) are not descended into.  Workers
+serialise rescans on a lock file next to the index, so the second worker to
+start waits for the first and then finds everything up to date.
+"""
+from __future__ import annotations
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger('autopkg_runner')
+
+INDEX_VERSION = 1
+_SUFFIXES = ('.recipe', '.recipe.yaml')
+_RACY_NS = 2_000_000_000
+
+_lock = threading.Lock()
+_state: dict = {'index': None, 'stamp': None}
+
+
+def index_path() -> Path:
+    from django.conf import settings
+    return Path(settings.RECIPE_FILE_INDEX)
+
+
+def _empty() -> dict:
+    return {'version': INDEX_VERSION, 'dirs': {}, 'files': {}}
+
+
+def _file_stamp(path: Path) -> Optional[tuple]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _current(path: Path) -> dict:
+    """The index as last written by any worker."""
+    stamp = _file_stamp(path)
+    if stamp is not None and stamp == _state['stamp'] and _state['index'] is not None:
+        return _state['index']
+    index = _empty()
+    if stamp is not None:
+        try:
+            loaded = json.loads(path.read_text(encoding='utf-8'))
+            if loaded.get('version') == INDEX_VERSION:
+                index = loaded
+        except (OSError, ValueError, AttributeError):
+            logger.warning('Recipe file index %s is unreadable; rebuilding it', path)
+    _state['index'], _state['stamp'] = index, stamp
+    return index
+
+
+def _save(path: Path, index: dict) -> None:
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(index, separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp, path)
+    except OSError as exc:
+        logger.warning('Could not write recipe file index %s: %s', path, exc)
+        _state['index'], _state['stamp'] = index, None
+        return
+    _state['index'], _state['stamp'] = index, _file_stamp(path)
+
+
+@contextmanager
+def _file_lock(path: Path):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fh = open(path.with_name(f'{path.name}.lock'), 'w')
+    except OSError:
+        yield
+        return
+    with fh:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _settled(mtime_ns: int, now_ns: int) -> int:
+    """*mtime_ns*, or 0 when it is too recent to trust next time."""
+    return mtime_ns if now_ns - mtime_ns >= _RACY_NS else 0
+
+
+def _walk(root: str, old_dirs: dict, new_dirs: dict, found: list, now_ns: int,
+          changed: Optional[set] = None) -> None:
+    """Append the recipe files under *root* to *found*, listing changed directories only.
+
+    With *changed*, directories not in it are taken from the index unstat'ed.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        if directory in new_dirs:
+            continue
+        known = old_dirs.get(directory)
+        if changed is not None and known is not None and known['mtime'] and directory not in changed:
+            new_dirs[directory] = known
+            found.extend(os.path.join(directory, name) for name in known['files'])
+            stack.extend(os.path.join(directory, name) for name in reversed(known['dirs']))
+            continue
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            continue
+        if known is not None and known['mtime'] and known['mtime'] == mtime:
+            subdirs, files = known['dirs'], known['files']
+        else:
+            subdirs, files = [], []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not entry.name.startswith('.'):
+                                subdirs.append(entry.name)
+                        elif entry.name.endswith(_SUFFIXES):
+                            files.append(entry.name)
+            except OSError:
+                continue
+            subdirs.sort()
+            files.sort()
+        new_dirs[directory] = {'mtime': _settled(mtime, now_ns), 'dirs': subdirs, 'files': files}
+        found.extend(os.path.join(directory, name) for name in files)
+        stack.extend(os.path.join(directory, name) for name in reversed(subdirs))
+
+
+def refresh(search_dirs: Iterable[str], read_info: Callable[[Path], dict],
+            changed: Optional[Iterable[str]] = None) -> list[dict]:
+    """Bring the index up to date and return every recipe file under *search_dirs*.
+
+    Each entry is ``{'path', 'identifier', 'parent'}``, in search-directory
+    order and then path order.  *read_info(path)* parses a new or changed
+    file into ``{'identifier', 'parent'}``; it must not raise.
+
+    *changed*, when given, is the directories and files known to have
+    changed (webapp.recipe_watch): everything else is trusted without a
+    stat, so the cost is proportional to the change.
+    """
+    changed = set(changed) if changed is not None else None
+    path = index_path()
+    with _lock, _file_lock(path):
+        index = _current(path)
+        now_ns = time.time_ns()
+
+        dirs: dict = {}
+        found: list = []
+        for root in search_dirs:
+            _walk(str(root), index['dirs'], dirs, found, now_ns, changed)
+
+        old_files = index['files']
+        files: dict = {}
+        stale: list = []
+        for file_path in found:
+            if file_path in files:
+                continue
+            known = old_files.get(file_path)
+            if (changed is not None and known is not None and known[0]
+                    and file_path not in changed and os.path.dirname(file_path) not in changed):
+                files[file_path] = known
+                continue
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            if known is not None and known[0] and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+                files[file_path] = known
+            else:
+                files[file_path] = None
+                stale.append((file_path, st))
+
+        if stale:
+            workers = min(16, len(stale))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                infos = pool.map(lambda item: read_info(Path(item[0])), stale)
+                for (file_path, st), info in zip(stale, infos):
+                    files[file_path] = [_settled(st.st_mtime_ns, now_ns), st.st_size,
+                                        info['identifier'], info['parent']]
+
+        if stale or dirs != index['dirs'] or files.keys() != old_files.keys():
+            _save(path, {'version': INDEX_VERSION, 'dirs': dirs, 'files': files})
+            logger.debug('Recipe file index: %d files, %d re-read', len(files), len(stale))
+
+    return [{'path': p, 'identifier': row[2], 'parent': row[3]} for p, row in files.items()]
+
+
+def indexed_dirs() -> list[str]:
+    """Every directory in the index as this process last saw it."""
+    index = _state['index']
+    return list(index['dirs']) if index else []
@@ -0,0 +1,259 @@
+"""Watch the recipe directories and keep the recipe cache current.
+
+Without a watcher the Recipes tab notices new or edited recipes only when
+its five-minute cache expires (or on a manual reset), and then stats every
+directory and file under the search directories again.  RecipeWatcher
+reports what changed instead, and webapp.views.recipes updates the cache
+from just those paths (webapp.recipe_files.refresh(changed=...)).
+
+Two backends, chosen when the watcher starts:
+
+    inotify  Linux: one watch per directory in the recipe file index plus
+             the overrides directory, via libc through ctypes.  Reports
+             the directory whose entries changed, or the file that was
+             written in place.
+    polling  Everywhere else, or when inotify runs out of watches: every
+             POLL_SECONDS, stat each watched directory and report those
+             whose mtime changed.  A file edited in place does not change
+             its directory's mtime (git and the override editor replace
+             files, which does), so under this backend the recipe cache
+             keeps its five-minute TTL and the override map is not cached:
+             edits such as ``autopkg update-trust-info`` rewriting an
+             override are still seen.
+
+Events are collected for DEBOUNCE_SECONDS after the first one, so a
+repo-update that rewrites hundreds of files triggers one update.  Hidden
+entries (.git, editor swap files) are ignored.  Enabled by the
+``autopkg.watch_recipes`` setting; it is read when the worker starts.
+Only the gunicorn worker holding the scheduler lock runs a watcher.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger('autopkg_runner')
+
+POLL_SECONDS = 10
+DEBOUNCE_SECONDS = 0.5
+
+# <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM  = 0x00000040
+_IN_MOVED_TO    = 0x00000080
+_IN_CREATE      = 0x00000100
+_IN_DELETE      = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF   = 0x00000800
+_IN_Q_OVERFLOW  = 0x00004000
+_IN_IGNORED     = 0x00008000
+_IN_ONLYDIR     = 0x01000000
+_IN_DONT_FOLLOW = 0x02000000
+_WATCH_MASK = (_IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+               | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR | _IN_DONT_FOLLOW)
+_ENTRY_EVENTS = _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _Inotify:
+    """The few inotify calls the watcher needs; raises OSError where unavailable."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        try:
+            self._init1 = libc.inotify_init1
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+        except AttributeError:
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.fd = self._init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._paths: dict[int, str] = {}
+        self._wds: dict[str, int] = {}
+
+    def sync(self, directories: Iterable[str]) -> set:
+        """Watch exactly *directories* and return the newly watched ones.
+
+        Raises OSError when out of watches.
+        """
+        wanted = set(directories)
+        for path in set(self._wds) - wanted:
+            self._rm_watch(self.fd, self._wds.pop(path))
+        added = set()
+        for path in wanted - set(self._wds):
+            wd = self._add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err in (errno.ENOSPC, errno.ENOMEM):
+                    raise OSError(err, 'out of inotify watches')
+                continue   # vanished, or not a directory
+            self._wds[path] = wd
+            self._paths[wd] = path
+            added.add(path)
+        return added
+
+    def read(self, timeout: float) -> Optional[set]:
+        """Changed paths seen within *timeout* seconds; None after a queue overflow."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed: Optional[set] = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                changed = None
+                continue
+            directory = self._paths.get(wd)
+            if mask & _IN_IGNORED:
+                self._paths.pop(wd, None)
+                if directory is not None and self._wds.get(directory) == wd:
+                    del self._wds[directory]
+            if directory is None or changed is None or name.startswith('.'):
+                continue
+            if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                changed.add(os.path.dirname(directory))
+            elif mask & _ENTRY_EVENTS:
+                changed.add(directory)
+            elif mask & _IN_CLOSE_WRITE:
+                changed.add(os.path.join(directory, name))
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class _Poller:
+    """Directory-mtime polling; the same interface as _Inotify."""
+
+    def __init__(self):
+        self._mtimes: dict[str, int] = {}
+        self._next = 0.0
+
+    def _mtime(self, path: str) -> int:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
+
+    def sync(self, directories: Iterable[str]) -> set:
+        wanted = set(directories)
+        for path in set(self._mtimes) - wanted:
+            del self._mtimes[path]
+        added = wanted - set(self._mtimes)
+        for path in added:
+            self._mtimes[path] = self._mtime(path)
+        return added
+
+    def read(self, timeout: float) -> Optional[set]:
+        wait = self._next - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            if wait > timeout:
+                return set()
+        self._next = time.monotonic() + POLL_SECONDS
+        changed = set()
+        for path, seen in self._mtimes.items():
+            mtime = self._mtime(path)
+            if mtime != seen:
+                self._mtimes[path] = mtime
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class RecipeWatcher:
+    """Calls on_change(paths) - None meaning "anything may have changed" -
+    whenever something under the watched directories changes.
+
+    directories() returns what to watch; it is asked again after every
+    change, and every POLL_SECONDS, so new sub-directories are picked up.
+    Directories are reported as changed when they are first watched: they
+    may have changed between being indexed and being watched.
+    """
+
+    def __init__(self, directories: Callable[[], Iterable[str]],
+                 on_change: Callable[[Optional[set]], None], use_inotify: bool = True):
+        self._directories = directories
+        self._on_change = on_change
+        self._use_inotify = use_inotify
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.backend: Optional[str] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, daemon=True, name='recipe-watcher')
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _open(self):
+        if self._use_inotify:
+            try:
+                source = _Inotify()
+                self.backend = 'inotify'
+                return source
+            except OSError as exc:
+                logger.info('Recipe watcher: inotify unavailable (%s); polling directories', exc)
+        self.backend = 'polling'
+        return _Poller()
+
+    def _sync(self, source) -> tuple:
+        try:
+            return source, source.sync(self._directories())
+        except OSError as exc:
+            logger.info('Recipe watcher: %s; polling directories instead', exc)
+            source.close()
+            self.backend = 'polling'
+            source = _Poller()
+            return source, source.sync(self._directories())
+
+    def _run(self) -> None:
+        source = self._open()
+        try:
+            source, pending = self._sync(source)
+            logger.info('Recipe watcher started (%s)', self.backend)
+            last_sync = time.monotonic()
+            while not self._stop.is_set():
+                changed = source.read(1.0)
+                if changed is not None:
+                    changed |= pending
+                pending = set()
+                if changed is not None and not changed:
+                    if time.monotonic() - last_sync >= POLL_SECONDS:
+                        source, pending = self._sync(source)
+                        last_sync = time.monotonic()
+                    continue
+                deadline = time.monotonic() + DEBOUNCE_SECONDS
+                while changed is not None and time.monotonic() < deadline:
+                    more = source.read(max(0.0, deadline - time.monotonic()))
+                    changed = None if more is None else changed | more
+                try:
+                    self._on_change(changed)
+                except Exception:
+                    logger.exception('Recipe watcher: updating the recipe cache failed')
+                source, pending = self._sync(source)
+                last_sync = time.monotonic()
+        finally:
+            source.close()
@@ -0,0 +1,226 @@
+"""Database retention: which finished runs and logs to delete, and deleting them gently.
+
+Policies come from the ``retention.*`` settings:
+
+    retention.max_age_days         delete runs finished more than N days ago (0 = never)
+    retention.max_runs             keep only the newest N finished runs (0 = no limit)
+    retention.failed_max_age_days  failed runs are kept this long instead, if longer
+    retention.log_max_age_days     drop the logs (but keep the run) after N days (0 = never)
+
+Everything is deleted in small batches - a few hundred rows per statement,
+each its own short transaction, with a pause between them - so the
+SQLite write lock is never held for long and pipeline runs and page views
+keep going while a cleanup works through a large backlog.  Freed pages are
+then returned to the filesystem with ``PRAGMA incremental_vacuum`` where
+the database file supports it (see webapp.sqlite_backend).
+
+Progress is written to the Task row's ``progress`` as the cleanup goes.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+logger = logging.getLogger('autopkg_runner')
+
+TERMINAL_STATUSES = ('success', 'failed', 'cancelled')
+
+# Runs deleted per batch; their children are deleted first, in batches of
+# Policy.batch_rows.
+_RUN_BATCH = 50
+# Pages returned per incremental_vacuum step.
+_VACUUM_PAGES = 2000
+
+
+@dataclass
+class Policy:
+    max_age_days: int = 90
+    max_runs: int = 0
+    failed_max_age_days: int = 0
+    log_max_age_days: int = 0
+    batch_rows: int = 1000
+    batch_pause_ms: int = 50
+    incremental_vacuum: bool = True
+
+    @classmethod
+    def from_settings(cls) -> 'Policy':
+        from webapp.models import Setting
+
+        def number(key, default):
+            try:
+                return max(0, int(Setting.get(key, str(default))))
+            except (TypeError, ValueError):
+                return default
+
+        return cls(
+            max_age_days=number('retention.max_age_days', cls.max_age_days),
+            max_runs=number('retention.max_runs', cls.max_runs),
+            failed_max_age_days=number('retention.failed_max_age_days', cls.failed_max_age_days),
+            log_max_age_days=number('retention.log_max_age_days', cls.log_max_age_days),
+            batch_rows=max(1, number('retention.batch_rows', cls.batch_rows)),
+            batch_pause_ms=number('retention.batch_pause_ms', cls.batch_pause_ms),
+            incremental_vacuum=Setting.get('retention.incremental_vacuum', 'true').lower() == 'true',
+        )
+
+
+# -- Selection -----------------------------------------------------------------
+
+def _expired(status: str, completed, days: int, failed_days: int, now: datetime) -> bool:
+    """Whether a run finished at *completed* is past a *days*-day limit."""
+    if status == 'failed' and failed_days > days:
+        days = failed_days
+    return bool(days) and completed is not None and completed < now - timedelta(days=days)
+
+
+def select(policy: Policy, now: Optional[datetime] = None) -> tuple[list, list]:
+    """(run ids to delete, run ids whose logs to drop), oldest first."""
+    from webapp.models import Run
+
+    now = now or datetime.now(timezone.utc)
+    finished = list(
+        Run.objects.filter(status__in=TERMINAL_STATUSES)
+        .order_by('-started_at', '-id')
+        .values_list('id', 'status', 'completed_at')
+    )
+    delete, trim = [], []
+    for position, (run_id, status, completed) in enumerate(finished):
+        # A failure still inside its longer window survives the count limit too.
+        protected = (status == 'failed' and policy.failed_max_age_days
+                     and not _expired(status, completed, 0, policy.failed_max_age_days, now))
+        over_count = bool(policy.max_runs) and position >= policy.max_runs and not protected
+        if over_count or _expired(status, completed, policy.max_age_days,
+                                  policy.failed_max_age_days, now):
+            delete.append(run_id)
+        elif _expired(status, completed, policy.log_max_age_days, policy.failed_max_age_days, now):
+            trim.append(run_id)
+    delete.reverse()
+    trim.reverse()
+    return delete, trim
+
+
+# -- Deletion ------------------------------------------------------------------
+
+class RetentionEngine:
+    """Applies a Policy in bounded batches, reporting progress as it goes.
+
+    on_progress, if given, is called with the progress dict after every
+    batch.
+    """
+
+    def __init__(self, policy: Policy, on_progress: Optional[Callable[[dict], None]] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.policy = policy
+        self.on_progress = on_progress
+        self._sleep = sleep
+        self.progress = {
+            'phase': 'selecting',
+            'runs_total': 0, 'runs_deleted': 0,
+            'log_runs_total': 0, 'log_runs_trimmed': 0,
+            'log_lines_deleted': 0, 'pages_vacuumed': 0,
+        }
+
+    def _report(self, **changes):
+        self.progress.update(changes)
+        if self.on_progress is not None:
+            self.on_progress(dict(self.progress))
+
+    def _pause(self):
+        if self.policy.batch_pause_ms:
+            self._sleep(self.policy.batch_pause_ms / 1000)
+
+    def run(self) -> dict:
+        delete, trim = select(self.policy)
+        self._report(phase='logs', runs_total=len(delete), log_runs_total=len(trim))
+        for start in range(0, len(trim), _RUN_BATCH):
+            chunk = trim[start:start + _RUN_BATCH]
+            self._delete_logs(chunk)
+            self._report(log_runs_trimmed=self.progress['log_runs_trimmed'] + len(chunk))
+
+        self._report(phase='runs')
+        for start in range(0, len(delete), _RUN_BATCH):
+            chunk = delete[start:start + _RUN_BATCH]
+            self._delete_runs(chunk)
+            self._report(runs_deleted=self.progress['runs_deleted'] + len(chunk))
+            self._pause()
+
+        if self.policy.incremental_vacuum:
+            self._report(phase='vacuum')
+            self._vacuum()
+        self._report(phase='done')
+        return self.progress
+
+    def _delete_logs(self, run_ids: list) -> None:
+        """Delete the runs' LogEntry rows batch_rows at a time, then their archives."""
+        from webapp.models import LogEntry, RunLogArchive
+
+        rows = LogEntry.objects.filter(run_id__in=run_ids)
+        while True:
+            ids = list(rows.values_list('id', flat=True)[:self.policy.batch_rows])
+            if not ids:
+                break
+            LogEntry.objects.filter(id__in=ids).delete()
+            self._report(log_lines_deleted=self.progress['log_lines_deleted'] + len(ids))
+            self._pause()
+        archived = list(RunLogArchive.objects.filter(run_id__in=run_ids)
+                        .values_list('entry_count', flat=True))
+        if archived:
+            RunLogArchive.objects.filter(run_id__in=run_ids).delete()
+            self._report(log_lines_deleted=self.progress['log_lines_deleted'] + sum(archived))
+
+    def _delete_runs(self, run_ids: list) -> None:
+        """Delete runs after emptying their large child tables batch by batch."""
+        from webapp.models import RecipeEvent, RecipeResult, Run, StageExecution
+
+        self._delete_logs(run_ids)
+        for model in (RecipeEvent, RecipeResult, StageExecution):
+            rows = model.objects.filter(run_id__in=run_ids)
+            while True:
+                ids = list(rows.values_list('id', flat=True)[:self.policy.batch_rows])
+                if not ids:
+                    break
+                model.objects.filter(id__in=ids).delete()
+                self._pause()
+        # What is left cascades cheaply: tasks, share tokens.
+        Run.objects.filter(id__in=run_ids).delete()
+
+    def _vacuum(self) -> None:
+        """Return free pages to the filesystem in steps, on every SQLite database."""
+        from django.db import connections
+
+        for alias in connections:
+            if connections[alias].vendor == 'sqlite':
+                self._vacuum_connection(connections[alias])
+
+    def _vacuum_connection(self, connection) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA auto_vacuum')
+            if cursor.fetchone()[0] != 2:   # 2 = INCREMENTAL
+                logger.info('Database %s does not use incremental auto-vacuum; '
+                            'run "archive_logs --vacuum" once to convert it', connection.alias)
+                return
+            cursor.execute('PRAGMA freelist_count')
+            free = cursor.fetchone()[0]
+            # sqlite3 may step the pragma only once, freeing a single page per
+            # execute, so the loop is bounded by the pages free now (pages freed
+            # meanwhile by other connections wait for the next cleanup) and an
+            # execute that frees nothing ends it.
+            freed = 0
+            for _ in range(free):
+                cursor.execute(f'PRAGMA incremental_vacuum({_VACUUM_PAGES})').fetchall()
+                cursor.execute('PRAGMA freelist_count')
+                left = cursor.fetchone()[0]
+                if left >= free:
+                    break
+                freed += free - left
+                free = left
+                if not free:
+                    break
+                if freed >= _VACUUM_PAGES:
+                    self._report(pages_vacuumed=self.progress['pages_vacuumed'] + freed)
+                    freed = 0
+                    self._pause()
+            if freed:
+                self._report(pages_vacuumed=self.progress['pages_vacuumed'] + freed)
@@ -0,0 +1,59 @@
+"""Database router keeping run logs in their own SQLite file.
+
+Enabled by ``AUTOPKG_LOG_DATABASE=true`` (see settings.py), which adds a
+``logs`` database and this router.  LogEntry rows and RunLogArchive blobs
+are then read and written there, so the log write storm during a run never
+holds the lock on the main database that settings, runs and sessions live in.
+
+Their tables are still created, empty, in the default database so that
+deleting a Run can cascade as usual; the rows in the logs database are
+removed by ``delete_run_logs``.
+"""
+from django.conf import settings
+
+LOG_DATABASE = 'logs'
+_LOG_MODELS = ('logentry', 'runlogarchive')
+
+
+def _is_log_model(model) -> bool:
+    return model._meta.app_label == 'webapp' and model._meta.model_name in _LOG_MODELS
+
+
+def log_database_enabled() -> bool:
+    return LOG_DATABASE in settings.DATABASES
+
+
+class LogDatabaseRouter:
+
+    def db_for_read(self, model, **hints):
+        return LOG_DATABASE if _is_log_model(model) else None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # LogEntry.run and RunLogArchive.run point across databases; there
+        # is no FK constraint.
+        if _is_log_model(type(obj1)) or _is_log_model(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == LOG_DATABASE:
+            return app_label == 'webapp' and model_name in _LOG_MODELS
+        return None
+
+
+def delete_run_logs(sender, instance, **kwargs):
+    """pre_delete receiver for Run: remove its rows from the logs database."""
+    from webapp.models import LogEntry, RunLogArchive
+    LogEntry.objects.filter(run_id=instance.pk).delete()
+    RunLogArchive.objects.filter(run_id=instance.pk).delete()
+
+
+def migrate_log_database(sender, using, **kwargs):
+    """post_migrate receiver: bring the logs database up to date alongside the default one."""
+    if using == LOG_DATABASE or not log_database_enabled():
+        return
+    from django.core.management import call_command
+    call_command('migrate', sender.label, database=LOG_DATABASE,
+                 verbosity=0, interactive=False)
@@ -1,11 +1,17 @@
 """In-process SSE fan-out broadcaster.
 
-One RunBroadcaster is created per active run. A single daemon thread polls
-the database and appends serialised SSE event frames to an in-memory list.
-Async SSE generators in run_stream read from that list using a cursor
-(the list index of the last event they have seen), so the database is
-queried exactly once per second per run regardless of how many clients
-are watching.
+One RunBroadcaster is created per active run. When the pipeline runs in
+the same process, DBLogHandler and the runner's stage_callback push events
+straight into it; a single daemon thread also polls the database, which is
+the only source for runs executing in another worker.  That worker wakes
+the poll thread through webapp.event_channel whenever it writes, so the
+poll interval only bounds latency when no wake-up arrives.
+
+Serialised SSE event frames are appended to an in-memory list, and async
+SSE generators in run_stream read from it using a cursor (the list index
+of the last event they have seen), waking as soon as new frames arrive.
+The database is queried by one thread per run regardless of how many
+clients are watching.
 
 The manager expires finished broadcasters after a TTL so late-connecting
 clients can still receive the full event history for a recently completed run.
@@ -19,13 +25,49 @@ import time
 
 from django.db import close_old_connections
 
+from webapp.event_channel import event_channel
+
 logger = logging.getLogger('autopkg_runner')
 
 _DONE_TTL = 300   # seconds to keep a finished broadcaster alive
+_POLL_INTERVAL = 1     # seconds between database polls
+_FALLBACK_POLL = 5     # ... once events are pushed or another worker wakes us
+_MIN_POLL_GAP = 0.1    # wake-ups arriving faster than this are coalesced
+
+
+def _log_frame(entry) -> bytes:
+    payload = json.dumps({
+        'type': 'log',
+        'id': entry.id,
+        'level': entry.level,
+        'stage': entry.stage_name,
+        'message': entry.message,
+        'timestamp': entry.timestamp.isoformat(),
+    })
+    return f'data: {payload}\n\n'.encode()
+
+
+def _stage_frame(stage) -> bytes:
+    payload = json.dumps({
+        'type': 'stage',
+        'name': stage.name,
+        'status': stage.status,
+        'order': stage.order,
+        'started_at': stage.started_at.isoformat() if stage.started_at else None,
+        'completed_at': stage.completed_at.isoformat() if stage.completed_at else None,
+    })
+    return f'data: {payload}\n\n'.encode()
 
 
 class RunBroadcaster:
-    """Polls the database for one run and caches events for all subscribers."""
+    """Caches events for one run for all subscribers.
+
+    Events arrive two ways: pushed in-process by the pipeline (publish_logs /
+    publish_stage, when the run executes in this process) and polled from
+    the database by the daemon thread.  Both paths are de-duplicated by log
+    id and stage status, so polling is a safety net for pushed runs and the
+    only source for runs executing in another worker.
+    """
 
     def __init__(self, run_id: str):
         self.run_id = run_id
@@ -33,6 +75,15 @@ class RunBroadcaster:
         self._lock = threading.Lock()
         self._done = False
         self._done_at: float | None = None
+        self._waiters: list = []         # (loop, asyncio.Event) of idle SSE generators
+        self._wake = threading.Event()   # cuts the poll loop's sleep short
+        self._pushed = False             # True once the pipeline has published here
+        self._notified = False           # True once another worker has woken us
+        # De-duplication state shared by the push and poll paths (under _lock).
+        self._polled_log_id = 0          # highest log id the poller has read
+        self._seen_log_ids: set[int] = set()   # pushed ids above _polled_log_id
+        self._stage_keys: dict[str, str] = {}
+        self._primed = False             # set once the first poll has been merged
         self._thread = threading.Thread(
             target=self._poll_loop,
             daemon=True,
@@ -60,12 +111,108 @@ class RunBroadcaster:
             ]
             return frames, self._done
 
+    async def wait_for_events(self, cursor: int, timeout: float) -> None:
+        """Return once there are events after *cursor*, the run is done, or *timeout* passes."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._lock:
+            if self._done or len(self._events) > cursor + 1:
+                return
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
     @property
     def is_expired(self) -> bool:
         if not self._done or self._done_at is None:
             return False
         return (time.monotonic() - self._done_at) > _DONE_TTL
 
+    # ------------------------------------------------------------------
+    # In-process push API (called from pipeline threads)
+    # ------------------------------------------------------------------
+
+    def publish_logs(self, entries) -> None:
+        """Append saved LogEntry objects; entries without an id are left to the poller."""
+        with self._lock:
+            if not self._primed:
+                # The first poll replays history from id 0; anything pushed
+                # before it lands is above its watermark and gets picked up.
+                return
+            frames = []
+            for entry in entries:
+                if entry.id is None:
+                    continue
+                if entry.id <= self._polled_log_id or entry.id in self._seen_log_ids:
+                    continue
+                self._seen_log_ids.add(entry.id)
+                frames.append(_log_frame(entry))
+            self._pushed = True
+            self._append(frames)
+
+    def publish_stage(self, stage) -> None:
+        """Append a StageExecution status change."""
+        with self._lock:
+            self._pushed = True
+            self._append(self._new_stage_frames([stage]))
+
+    def wake(self) -> None:
+        """Make the poll loop check the database now (e.g. the run just finished)."""
+        self._wake.set()
+
+    def remote_wake(self, last_log_id: int | None = None) -> None:
+        """Wake-up from the worker executing the run (see event_channel)."""
+        self._notified = True
+        if last_log_id is not None and last_log_id <= self._polled_log_id:
+            return   # already read up to that row
+        self._wake.set()
+
+    # ------------------------------------------------------------------
+    # Internal helpers (called under _lock)
+    # ------------------------------------------------------------------
+
+    def _append(self, frames: list[bytes]) -> None:
+        if frames:
+            self._events.extend(frames)
+            self._notify_waiters()
+
+    def _notify_waiters(self) -> None:
+        for loop, event in self._waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:   # the viewer's event loop has closed
+                pass
+
+    def _new_stage_frames(self, stages) -> list[bytes]:
+        frames = []
+        for stage in stages:
+            key = f'{stage.name}:{stage.status}'
+            if self._stage_keys.get(stage.name) != key:
+                self._stage_keys[stage.name] = key
+                frames.append(_stage_frame(stage))
+        return frames
+
+    def _merge_polled(self, entries, stages) -> None:
+        """Append polled rows the push path has not already delivered."""
+        with self._lock:
+            frames = []
+            for entry in entries:
+                if entry.id not in self._seen_log_ids:
+                    frames.append(_log_frame(entry))
+                self._polled_log_id = max(self._polled_log_id, entry.id)
+            self._seen_log_ids = {i for i in self._seen_log_ids if i > self._polled_log_id}
+            frames.extend(self._new_stage_frames(stages))
+            self._primed = True
+            self._append(frames)
+
     # ------------------------------------------------------------------
     # Internal poll loop (runs in daemon thread)
     # ------------------------------------------------------------------
@@ -80,12 +227,20 @@ class RunBroadcaster:
             with self._lock:
                 self._done = True
                 self._done_at = time.monotonic()
+                self._notify_waiters()
 
-    def _run(self):
-        from webapp.models import LogEntry, Run, StageExecution
+    def _poll_once(self):
+        from webapp.log_archive import run_log_entries
+        from webapp.models import StageExecution
 
-        last_log_id = 0
-        last_stage_data: dict[str, str] = {}
+        # Includes lines already moved into the run's RunLogArchive, so a
+        # late subscriber to a finished run still gets the full replay.
+        entries = run_log_entries(self.run_id, after_id=self._polled_log_id, by_id=True)
+        stages = list(StageExecution.objects.filter(run_id=self.run_id))
+        self._merge_polled(entries, stages)
+
+    def _run(self):
+        from webapp.models import Run
 
         while True:
             close_old_connections()
@@ -94,40 +249,7 @@ class RunBroadcaster:
             if not run:
                 break
 
-            new_frames: list[bytes] = []
-
-            entries = LogEntry.objects.filter(
-                run_id=self.run_id, id__gt=last_log_id
-            ).order_by('id')
-            for entry in entries:
-                payload = json.dumps({
-                    'type': 'log',
-                    'id': entry.id,
-                    'level': entry.level,
-                    'stage': entry.stage_name,
-                    'message': entry.message,
-                    'timestamp': entry.timestamp.isoformat(),
-                })
-                new_frames.append(f'data: {payload}\n\n'.encode())
-                last_log_id = entry.id
-
-            for stage in StageExecution.objects.filter(run_id=self.run_id):
-                key = f'{stage.name}:{stage.status}'
-                if last_stage_data.get(stage.name) != key:
-                    last_stage_data[stage.name] = key
-                    payload = json.dumps({
-                        'type': 'stage',
-                        'name': stage.name,
-                        'status': stage.status,
-                        'order': stage.order,
-                        'started_at': stage.started_at.isoformat() if stage.started_at else None,
-                        'completed_at': stage.completed_at.isoformat() if stage.completed_at else None,
-                    })
-                    new_frames.append(f'data: {payload}\n\n'.encode())
-
-            if new_frames:
-                with self._lock:
-                    self._events.extend(new_frames)
+            self._poll_once()
 
             if run.status in ('success', 'failed', 'cancelled'):
                 # Wait briefly then do one final pass to collect any log entries
@@ -135,32 +257,7 @@ class RunBroadcaster:
                 # run status was set (common on fast-failing runs).
                 time.sleep(0.3)
                 close_old_connections()
-                for entry in LogEntry.objects.filter(
-                    run_id=self.run_id, id__gt=last_log_id
-                ).order_by('id'):
-                    payload = json.dumps({
-                        'type': 'log',
-                        'level': entry.level,
-                        'stage': entry.stage_name,
-                        'message': entry.message,
-                        'timestamp': entry.timestamp.isoformat(),
-                    })
-                    new_frames.append(f'data: {payload}\n\n'.encode())
-                    last_log_id = entry.id
-
-                for stage in StageExecution.objects.filter(run_id=self.run_id):
-                    key = f'{stage.name}:{stage.status}'
-                    if last_stage_data.get(stage.name) != key:
-                        last_stage_data[stage.name] = key
-                        payload = json.dumps({
-                            'type': 'stage',
-                            'name': stage.name,
-                            'status': stage.status,
-                            'order': stage.order,
-                            'started_at': stage.started_at.isoformat() if stage.started_at else None,
-                            'completed_at': stage.completed_at.isoformat() if stage.completed_at else None,
-                        })
-                        new_frames.append(f'data: {payload}\n\n'.encode())
+                self._poll_once()
 
                 payload = json.dumps({'type': 'complete', 'status': run.status})
                 terminal_frames = [
@@ -168,12 +265,16 @@ class RunBroadcaster:
                     b'event: done\ndata: {}\n\n',
                 ]
                 with self._lock:
-                    self._events.extend(new_frames)
-                    self._events.extend(terminal_frames)
+                    self._append(terminal_frames)
                 run_list_broadcaster.notify()
                 break
 
-            time.sleep(1)
+            # While the pipeline pushes events here, or another worker wakes
+            # us on every change, the database poll is only a safety net.
+            live = self._pushed or self._notified
+            self._wake.wait(_FALLBACK_POLL if live else _POLL_INTERVAL)
+            time.sleep(_MIN_POLL_GAP)
+            self._wake.clear()
 
 
 # ---------------------------------------------------------------------------
@@ -188,12 +289,46 @@ class _BroadcasterManager:
     def get(self, run_id: str) -> RunBroadcaster:
         """Return an existing broadcaster or create one for *run_id*."""
         run_id = str(run_id)
+        event_channel.listen(self._on_remote_event)
         with self._lock:
             self._expire()
             if run_id not in self._broadcasters:
                 self._broadcasters[run_id] = RunBroadcaster(run_id)
             return self._broadcasters[run_id]
 
+    def find(self, run_id: str) -> RunBroadcaster | None:
+        """Return the broadcaster for *run_id* if one exists; never creates one."""
+        with self._lock:
+            return self._broadcasters.get(str(run_id))
+
+    # The publish_* / wake methods are called by the process executing the
+    # run: they feed this process's broadcaster directly and notify the
+    # other workers through the event channel.
+
+    def publish_logs(self, run_id: str, entries) -> None:
+        broadcaster = self.find(run_id)
+        if broadcaster is not None:
+            broadcaster.publish_logs(entries)
+        ids = [e.id for e in entries if e.id is not None]
+        event_channel.publish(run_id, 'log', max(ids) if ids else None)
+
+    def publish_stage(self, run_id: str, stage) -> None:
+        broadcaster = self.find(run_id)
+        if broadcaster is not None:
+            broadcaster.publish_stage(stage)
+        event_channel.publish(run_id, 'stage')
+
+    def wake(self, run_id: str) -> None:
+        broadcaster = self.find(run_id)
+        if broadcaster is not None:
+            broadcaster.wake()
+        event_channel.publish(run_id, 'status')
+
+    def _on_remote_event(self, event: dict) -> None:
+        broadcaster = self.find(event.get('run', ''))
+        if broadcaster is not None:
+            broadcaster.remote_wake(event.get('id') if event.get('kind') == 'log' else None)
+
     def _expire(self):
         """Remove broadcasters whose TTL has elapsed (called under lock)."""
         stale = [rid for rid, b in self._broadcasters.items() if b.is_expired]
@@ -0,0 +1,170 @@
+"""Daily run statistics for the dashboard and the stats API.
+
+Counting runs, recipe results and stage timings over a year of history
+means scanning every Run, StageExecution and RecipeResult row in it.
+RunDailyStats keeps one row per day instead: when a run reaches a terminal
+state, refresh_run() recomputes the row for the day it started on from
+that day's runs, so a refresh is idempotent and costs one day's rows.
+Readers then work in O(days).
+
+Days are calendar days in TIME_ZONE, keyed by the run's started_at.
+"""
+from __future__ import annotations
+
+import math
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Optional
+
+TERMINAL_STATUSES = ('success', 'failed', 'cancelled')
+
+# RecipeResult.result_type counted into each RunDailyStats column; each
+# result's data holds one row per recipe.
+_RESULT_COLUMNS = {
+    'munki_import': 'imports',
+    'url_downloaded': 'downloads',
+    'failure': 'recipe_failures',
+}
+_COUNT_FIELDS = ('runs', 'success', 'failed', 'cancelled', 'imports', 'downloads', 'recipe_failures')
+
+
+def percentile(samples: list, p: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted *samples*; None when empty."""
+    if not samples:
+        return None
+    return samples[max(0, math.ceil(p / 100 * len(samples)) - 1)]
+
+
+def _day_bounds(day: date) -> tuple[datetime, datetime]:
+    from django.utils import timezone
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def refresh_day(day: date):
+    """Recompute *day*'s RunDailyStats from the runs that started on it.
+
+    Returns the row, or None when the day has no finished runs (any stale
+    row is left alone: its runs may have been removed by the cleanup).
+    """
+    from webapp.models import RecipeResult, Run, RunDailyStats, StageExecution
+
+    start, end = _day_bounds(day)
+    runs = dict(
+        Run.objects.filter(started_at__gte=start, started_at__lt=end, status__in=TERMINAL_STATUSES)
+        .values_list('id', 'status')
+    )
+    if not runs:
+        return None
+
+    fields = dict.fromkeys(_COUNT_FIELDS, 0)
+    fields['runs'] = len(runs)
+    for status in runs.values():
+        fields[status] += 1
+
+    run_ids = list(runs)
+    for result_type, data in (
+        RecipeResult.objects.filter(run_id__in=run_ids, result_type__in=_RESULT_COLUMNS)
+        .values_list('result_type', 'data')
+    ):
+        fields[_RESULT_COLUMNS[result_type]] += len(data) if isinstance(data, list) else 0
+
+    durations: dict[str, list] = {}
+    for name, started, completed in (
+        StageExecution.objects.filter(run_id__in=run_ids, started_at__isnull=False,
+                                      completed_at__isnull=False)
+        .exclude(status='skipped')
+        .values_list('name', 'started_at', 'completed_at')
+    ):
+        durations.setdefault(name, []).append(round((completed - started).total_seconds(), 3))
+    fields['stage_durations'] = {name: sorted(values) for name, values in durations.items()}
+
+    stats, _ = RunDailyStats.objects.update_or_create(day=day, defaults=fields)
+    return stats
+
+
+def refresh_run(run_id):
+    """Refresh the stats row for the day *run_id* started on."""
+    from django.utils import timezone
+    from webapp.models import Run
+
+    started = Run.objects.filter(id=run_id).values_list('started_at', flat=True).first()
+    if started is None:
+        return None
+    return refresh_day(timezone.localdate(started))
+
+
+def refresh_runs(run_ids: Iterable) -> int:
+    """Refresh the stats rows for every day one of *run_ids* started on."""
+    from django.utils import timezone
+    from webapp.models import Run
+
+    started = Run.objects.filter(id__in=list(run_ids), started_at__isnull=False)
+    day_list = sorted({timezone.localdate(ts) for ts in started.values_list('started_at', flat=True)})
+    for day in day_list:
+        refresh_day(day)
+    return len(day_list)
+
+
+def rebuild(days: Optional[int] = None) -> int:
+    """Recompute every day that has finished runs (the last *days* only, if given)."""
+    from django.db.models.functions import TruncDate
+    from django.utils import timezone
+    from webapp.models import Run
+
+    runs = Run.objects.filter(status__in=TERMINAL_STATUSES)
+    if days is not None:
+        runs = runs.filter(started_at__gte=_day_bounds(timezone.localdate() - timedelta(days=days - 1))[0])
+    day_list = sorted(set(
+        runs.annotate(day=TruncDate('started_at')).order_by().values_list('day', flat=True)
+    ))
+    for day in day_list:
+        refresh_day(day)
+    return len(day_list)
+
+
+# -- Reading -------------------------------------------------------------------
+
+def daily(days: int) -> list:
+    """RunDailyStats for the last *days* days (today included), oldest first.
+
+    Days without runs have no row and are left out.
+    """
+    from django.utils import timezone
+    from webapp.models import RunDailyStats
+
+    first = timezone.localdate() - timedelta(days=days - 1)
+    return list(RunDailyStats.objects.filter(day__gte=first).order_by('day'))
+
+
+def summarize(rows: Iterable) -> dict:
+    """Totals over RunDailyStats *rows*, with duration percentiles for each stage."""
+    totals = dict.fromkeys(_COUNT_FIELDS, 0)
+    durations: dict[str, list] = {}
+    for row in rows:
+        for field in _COUNT_FIELDS:
+            totals[field] += getattr(row, field)
+        for name, values in row.stage_durations.items():
+            durations.setdefault(name, []).extend(values)
+
+    totals['success_rate'] = round(totals['success'] / totals['runs'] * 100) if totals['runs'] else 0
+    totals['stages'] = []
+    for name, values in durations.items():
+        values.sort()
+        totals['stages'].append({
+            'stage': name,
+            'count': len(values),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'max': values[-1],
+        })
+    return totals
+
+
+def day_dict(row) -> dict:
+    """One RunDailyStats row as plain data for the API and the dashboard chart."""
+    data = {'day': row.day.isoformat(), **{f: getattr(row, f) for f in _COUNT_FIELDS}}
+    data['stages'] = [
+        {'stage': name, 'p50': percentile(values, 50), 'p95': percentile(values, 95)}
+        for name, values in row.stage_durations.items()
+    ]
+    return data
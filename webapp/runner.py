@@ -1,8 +1,11 @@
 """Background pipeline execution. Implemented fully in Phase 4."""
+import logging
 import subprocess as _subprocess
 import threading
 import uuid as _uuid
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from typing import Optional
 
 
 class RunAlreadyRunningError(Exception):
@@ -12,13 +15,13 @@ class RunAlreadyRunningError(Exception):
 # ---------------------------------------------------------------------------
 # Cancellation registry
 # ---------------------------------------------------------------------------
-# Maps run_id (str) → (cancel_event, active_subprocess | None).
+# Maps run_id (str) → (cancel_event, active_subprocesses).
 # Used by cancel_run() to signal the pipeline thread to abort cleanly and
-# to SIGTERM any running child process (e.g. autopkg) immediately.
+# to SIGTERM any running child processes (e.g. autopkg shards) immediately.
 
 _cancel_lock = threading.Lock()
 _cancel_events: dict[str, threading.Event] = {}
-_active_procs: dict[str, _subprocess.Popen] = {}
+_active_procs: dict[str, list[_subprocess.Popen]] = {}
 
 
 def _register_run(run_id: str, event: threading.Event) -> None:
@@ -35,25 +38,43 @@ def _unregister_run(run_id: str) -> None:
 def register_active_proc(run_id: str, proc: _subprocess.Popen) -> None:
     """Called by RunAutoPkg when a child process starts."""
     with _cancel_lock:
-        _active_procs[str(run_id)] = proc
+        _active_procs.setdefault(str(run_id), []).append(proc)
 
 
-def unregister_active_proc(run_id: str) -> None:
-    """Called by RunAutoPkg when a child process finishes."""
+def unregister_active_proc(run_id: str, proc: Optional[_subprocess.Popen] = None) -> None:
+    """Called by RunAutoPkg when a child process finishes.
+
+    With *proc* only that process is forgotten; without it every process
+    registered for the run is.
+    """
     with _cancel_lock:
-        _active_procs.pop(str(run_id), None)
+        if proc is None:
+            _active_procs.pop(str(run_id), None)
+            return
+        procs = _active_procs.get(str(run_id), [])
+        if proc in procs:
+            procs.remove(proc)
+        if not procs:
+            _active_procs.pop(str(run_id), None)
+
+
+def get_cancel_event(run_id: str) -> Optional[threading.Event]:
+    """Return the cancel event for an in-progress run, or None."""
+    with _cancel_lock:
+        return _cancel_events.get(str(run_id))
 
 
 def cancel_run(run_id: str) -> None:
-    """Signal the pipeline thread for *run_id* to abort and kill any running subprocess."""
+    """Signal the pipeline thread for *run_id* to abort and kill any running subprocesses."""
     run_id = str(run_id)
     with _cancel_lock:
         event = _cancel_events.get(run_id)
-        proc = _active_procs.get(run_id)
+        procs = list(_active_procs.get(run_id, []))
     if event:
         event.set()
-    if proc and proc.poll() is None:
-        proc.terminate()
+    for proc in procs:
+        if proc.poll() is None:
+            proc.terminate()
 
 
 def trigger_manual_run(triggered_by: str = 'manual') -> _uuid.UUID:
@@ -118,54 +139,99 @@ def _execute_run(run_id: _uuid.UUID, task_id: _uuid.UUID):
 
     final_status = 'failed'
     db_handler = None
+    writer = None
+
+    def _write(fn):
+        # Pipeline writes go through the run's DBWriter when it has one.
+        return writer.call(fn) if writer is not None else fn()
 
     try:
         from webapp.db_logger import DBLogHandler, set_run_id, set_current_stage
+        from webapp.db_writer import DBWriter
+        from webapp.run_broadcaster import broadcaster_manager
         from libs.config import config_from_settings
         from libs.orchestrator import Orchestrator
         from logbook import Logger
 
+        from webapp.models import Setting
+
         set_run_id(run_id)
-        db_handler = DBLogHandler()
+        writer = DBWriter(name=f'db-writer-{run_id}')
+        db_handler = DBLogHandler(
+            batch_rows=Setting.get_int('logging.db_batch_rows', 200),
+            batch_latency=Setting.get_int('logging.db_batch_ms', 250) / 1000,
+            writer=writer,
+        )
         db_handler.push_thread()
 
-        Run.objects.filter(id=run_id).update(
-            status='running',
-            started_at=datetime.now(timezone.utc),
-        )
-        Task.objects.filter(id=task_id).update(status='running')
+        def _mark_running():
+            Run.objects.filter(id=run_id).update(
+                status='running',
+                started_at=datetime.now(timezone.utc),
+            )
+            Task.objects.filter(id=task_id).update(status='running')
 
-        stage_order_counter = [0]
+        _write(_mark_running)
 
-        def stage_callback(stage_name: str, status: str, timestamp: datetime):
+        stage_order_counter = [0]
+        stage_order_lock = threading.Lock()
+
+        def stage_callback(stage_name: str, status: str, timestamp: datetime,
+                           usage: Optional[dict] = None):
+            # Independent stages run concurrently, so this is called from the
+            # thread executing the stage - thread-locals are per stage.
+            # Write buffered lines first so they land before the status change.
+            db_handler.flush()
             if status == 'running':
                 # Tag this thread so every log record emitted by DBLogHandler
                 # gets the correct stage_name while this stage is executing.
                 set_current_stage(stage_name)
-                order = stage_order_counter[0]
-                stage_order_counter[0] += 1
-                StageExecution.objects.update_or_create(
+                with stage_order_lock:
+                    order = stage_order_counter[0]
+                    stage_order_counter[0] += 1
+                stage, _ = _write(lambda: StageExecution.objects.update_or_create(
                     run_id=run_id,
                     name=stage_name,
                     defaults={'status': status, 'order': order, 'started_at': timestamp},
-                )
+                ))
             else:
                 # Stage finished (success or failed) - clear the thread-local so
                 # any inter-stage log lines don't get attributed to the last stage.
                 set_current_stage('')
-                StageExecution.objects.filter(run_id=run_id, name=stage_name).update(
-                    status=status,
-                    completed_at=timestamp,
-                )
+
+                def _finish_stage():
+                    StageExecution.objects.filter(run_id=run_id, name=stage_name).update(
+                        status=status,
+                        completed_at=timestamp,
+                        resource_usage=usage or {},
+                    )
+                    return StageExecution.objects.filter(run_id=run_id, name=stage_name).first()
+
+                stage = _write(_finish_stage)
+            if stage is not None:
+                broadcaster_manager.publish_stage(run_id, stage)
+
+        @contextmanager
+        def stage_thread():
+            # Worker threads need the same logging context as this one.
+            set_run_id(run_id)
+            db_handler.push_thread()
+            try:
+                yield
+            finally:
+                db_handler.pop_thread()
+                django.db.connection.close()
 
         logger = Logger('autopkg_runner')
         config = config_from_settings()
-        ctx = {'run_id': run_id}
+        from webapp.views.recipes import recipe_file_index
+        ctx = {'run_id': run_id, 'db_writer': writer, 'recipe_file_index': recipe_file_index}
 
         orchestrator = Orchestrator(
             config=config,
             logger=logger,
             stage_callback=stage_callback,
+            thread_context=stage_thread,
         )
         orchestrator.ctx = ctx
         orchestrator.configure_stages(override_stage_name=None)
@@ -182,46 +248,97 @@ def _execute_run(run_id: _uuid.UUID, task_id: _uuid.UUID):
         final_status = 'failed'
     finally:
         _unregister_run(str(run_id))
+        if db_handler is not None:
+            # Flush buffered log lines before the run turns terminal so the
+            # broadcaster's final pass sees all of them.
+            db_handler.close()
         completed_at = datetime.now(timezone.utc)
-        # Only update if the run hasn't been cancelled from outside
-        # (e.g. the user hit "Cancel" in the UI while the pipeline was running).
-        Run.objects.filter(id=run_id).exclude(status='cancelled').update(
-            status=final_status,
-            completed_at=completed_at,
-        )
-        Task.objects.filter(id=task_id).exclude(status='cancelled').update(
-            status=final_status,
-            completed_at=completed_at,
-        )
+
+        def _mark_finished():
+            # Only update if the run hasn't been cancelled from outside
+            # (e.g. the user hit "Cancel" in the UI while the pipeline was running).
+            Run.objects.filter(id=run_id).exclude(status='cancelled').update(
+                status=final_status,
+                completed_at=completed_at,
+            )
+            Task.objects.filter(id=task_id).exclude(status='cancelled').update(
+                status=final_status,
+                completed_at=completed_at,
+            )
+
+        try:
+            # Queued after the last log batch, so it commits after it too.
+            _write(_mark_finished)
+        except Exception:
+            _mark_finished()
+        if writer is not None:
+            writer.close()
+            _log_writer_stats(writer)
+        try:
+            from webapp.run_broadcaster import broadcaster_manager
+            broadcaster_manager.wake(run_id)
+        except Exception:
+            pass
         if db_handler is not None:
             db_handler.pop_thread()
+        _record_run_stats(run_id)
+        _archive_run_logs(run_id)
         django.db.connection.close()
 
 
+def _record_run_stats(run_id) -> None:
+    """Fold the finished run into its day's RunDailyStats (webapp.run_stats)."""
+    try:
+        from webapp.run_stats import refresh_run
+        refresh_run(run_id)
+    except Exception:
+        logging.getLogger('autopkg_runner').exception('Could not update run stats for run %s', run_id)
+
+
+def _archive_run_logs(run_id) -> None:
+    """Compress the finished run's log rows into a RunLogArchive (webapp.log_archive)."""
+    try:
+        from webapp.log_archive import archive_codec, archive_run
+        codec = archive_codec()
+        if codec:
+            archive_run(run_id, codec)
+    except Exception:
+        logging.getLogger('autopkg_runner').exception('Could not archive logs for run %s', run_id)
+
+
+def _log_writer_stats(writer) -> None:
+    stats = writer.stats()
+    logging.getLogger('autopkg_runner').info(
+        'Database writer: %d write(s) in %d transaction(s), %d failed, peak queue %d, '
+        'commit p50 %.1f ms / p95 %.1f ms',
+        stats['writes'], stats['commits'], stats['failed'], stats['peak_depth'],
+        stats['commit_p50'] * 1000, stats['commit_p95'] * 1000,
+    )
+
+
 def _execute_db_cleanup(task_id: _uuid.UUID):
+    """Apply the retention policy (webapp.retention), recording progress on the task."""
     import django.db
-    from datetime import timedelta
-    from django.utils import timezone as tz
-    from webapp.models import Task, Run, LogEntry, RecipeResult, StageExecution
+    from webapp.models import Task
 
     Task.objects.filter(id=task_id).update(status='running')
     try:
-        cutoff = tz.now() - timedelta(days=90)
-        old_runs = Run.objects.filter(
-            completed_at__lt=cutoff,
-            status__in=('success', 'failed', 'cancelled'),
-        )
-        LogEntry.objects.filter(run__in=old_runs).delete()
-        RecipeResult.objects.filter(run__in=old_runs).delete()
-        StageExecution.objects.filter(run__in=old_runs).delete()
-        old_runs.delete()
+        from webapp.retention import Policy, RetentionEngine
+
+        def _progress(progress):
+            Task.objects.filter(id=task_id).update(progress=progress)
+
+        result = RetentionEngine(Policy.from_settings(), on_progress=_progress).run()
         Task.objects.filter(id=task_id).update(
             status='success',
+            progress=result,
             completed_at=datetime.now(timezone.utc),
         )
-    except Exception:
+    except Exception as exc:
+        logging.getLogger('autopkg_runner').exception('Database cleanup failed')
         Task.objects.filter(id=task_id).update(
             status='failed',
+            error=str(exc),
             completed_at=datetime.now(timezone.utc),
         )
     finally:
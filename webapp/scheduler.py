@@ -94,6 +94,20 @@ def _refresh_recipe_index():
     ensure_fresh(force=True)
 
 
+def _prune_used_nonces():
+    """Job: delete UsedNonce rows that have left the API replay window."""
+    import django.db
+    django.db.close_old_connections()
+    from api.authentication import prune_used_nonces
+    try:
+        deleted = prune_used_nonces()
+    except Exception:
+        logger.exception('Failed to prune used API nonces')
+        return
+    if deleted:
+        logger.debug('Pruned %d used API nonces', deleted)
+
+
 def _safe_trigger_scheduled_run():
     """Wrapper called by APScheduler; skips the run if one is already active.
 
@@ -173,6 +187,15 @@ def reschedule_job():
     )
     logger.info('Recipe index refresh job registered (hourly, on the hour)')
 
+    # API replay-protection nonces are only needed for the replay window.
+    scheduler.add_job(
+        _prune_used_nonces,
+        trigger='interval',
+        id='prune_used_nonces',
+        replace_existing=True,
+        minutes=5,
+    )
+
 
 def start_scheduler():
     from django.db import OperationalError, ProgrammingError
@@ -0,0 +1,70 @@
+"""A process-wide snapshot of the Setting table.
+
+Setting.get() used to cost a query per key - config_from_settings() makes
+about twenty of them per run, and the translation context processor one
+per page.  Readers now share a dict of every stored (raw, still encrypted)
+value, loaded with a single query on first use.
+
+Writes in this process drop the snapshot at once: Setting.save() and
+delete(), which Setting.set and the admin go through, and Setting.set_many.
+Other gunicorn workers find out through a version stamp (webapp.stamp): a
+small file next to the database (settings.SETTINGS_STAMP) that every write
+replaces once it has committed.  Each read compares the file's stat() with
+the one seen at load time and reloads when it has changed.  Writes that
+bypass the model (QuerySet.update(), raw SQL) are not seen; call
+invalidate() after them.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+from webapp.stamp import bump_stamp, read_stamp
+
+_lock = threading.Lock()
+_snapshot: Optional[dict] = None
+_stamp: Optional[tuple] = None
+
+
+def stamp_path() -> str:
+    from django.conf import settings
+    return str(settings.SETTINGS_STAMP)
+
+
+def _read_stamp() -> Optional[tuple]:
+    return read_stamp(stamp_path())
+
+
+def _bump_stamp() -> None:
+    bump_stamp(stamp_path())
+
+
+def snapshot() -> dict:
+    """{key: raw stored value} for every Setting row, loading it if stale."""
+    global _snapshot, _stamp
+    stamp = _read_stamp()
+    current = _snapshot
+    if current is not None and stamp == _stamp:
+        return current
+    from webapp.models import Setting
+    with _lock:
+        # Read the stamp before the rows: a write landing in between leaves
+        # the snapshot one version behind, so the next read reloads it.
+        stamp = _read_stamp()
+        current = dict(Setting.objects.values_list('key', 'value'))
+        _snapshot, _stamp = current, stamp
+    return current
+
+
+def invalidate() -> None:
+    """Drop this process's snapshot now and other workers' once the write commits."""
+    global _snapshot
+    from django.db import transaction
+    _snapshot = None
+    transaction.on_commit(_bump_stamp)
+
+
+def clear() -> None:
+    """Forget the snapshot in this process only (tests, after a rollback)."""
+    global _snapshot
+    _snapshot = None
@@ -0,0 +1,28 @@
+"""SQLite database backend with the connection profile the app runs under.
+
+Use as ``'ENGINE': 'webapp.sqlite_backend'`` in ``settings.DATABASES``.
+"""
+from contextlib import ExitStack, contextmanager
+
+
+@contextmanager
+def write_transaction(using=None):
+    """transaction.atomic() that takes the write lock when it begins.
+
+    For blocks that read and then write (select_for_update, read-modify-write):
+    on this backend the outermost block starts with ``BEGIN IMMEDIATE``.
+    Elsewhere, or inside an existing transaction, it is plain atomic().
+    """
+    from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    immediate = hasattr(connection, 'begin_immediate') and not connection.in_atomic_block
+    with ExitStack() as stack:
+        if immediate:
+            connection.begin_immediate = True
+        try:
+            stack.enter_context(transaction.atomic(using=using))
+        finally:
+            if immediate:
+                connection.begin_immediate = False
+        yield
@@ -0,0 +1,71 @@
+"""Django's SQLite backend, tuned for one busy writer and many readers.
+
+Every new connection gets the pragmas in PRAGMAS: incremental auto-vacuum
+so webapp.retention can hand freed pages back a few at a time (it takes
+effect on a new database file, or on an existing one at its next VACUUM),
+write-ahead logging so page views keep reading while a run streams log
+lines in, NORMAL syncing (durable at each checkpoint, safe in WAL mode),
+and a larger page cache and memory map.  Transactions opened with
+webapp.sqlite_backend.write_transaction() start with ``BEGIN IMMEDIATE``, so
+a transaction that reads and then writes takes the write lock up front and
+waits out the busy timeout, rather than failing with "database is locked"
+when two transactions both try to upgrade a read lock.  Plain atomic()
+blocks keep SQLite's deferred BEGIN and do not lock out the writer while
+they only read.
+
+Extra ``OPTIONS`` understood here (removed before connecting):
+
+    foreign_keys    False disables FK enforcement - for a database holding
+                    tables whose parent rows live in another file
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'auto_vacuum':  'INCREMENTAL',   # must come before anything creates the file
+    'journal_mode': 'WAL',
+    'synchronous':  'NORMAL',
+    'mmap_size':    256 * 1024 * 1024,
+    'cache_size':   -20000,          # negative = KiB, i.e. ~20 MB
+    'temp_store':   'MEMORY',
+}
+
+
+# Pragmas about the database file; in-memory databases skip them (on a
+# shared-cache one, re-setting auto_vacuum from each new connection contends
+# for the schema lock).
+_FILE_PRAGMAS = frozenset({'auto_vacuum', 'journal_mode'})
+
+
+def _is_memory(name) -> bool:
+    name = str(name)
+    return name == ':memory:' or 'mode=memory' in name
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    _foreign_keys = True
+    # Set by write_transaction() while it opens its transaction.
+    begin_immediate = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self._foreign_keys = params.pop('foreign_keys', True)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma, value in PRAGMAS.items():
+            if pragma in _FILE_PRAGMAS and _is_memory(conn_params['database']):
+                continue
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        if not self._foreign_keys:
+            conn.execute('PRAGMA foreign_keys = OFF')
+        return conn
+
+    def enable_constraint_checking(self):
+        # Called when a schema editor exits; keep enforcement off if configured so.
+        if self._foreign_keys:
+            super().enable_constraint_checking()
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE' if self.begin_immediate else 'BEGIN')
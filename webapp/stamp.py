@@ -0,0 +1,35 @@
+"""Version stamps: files that tell other gunicorn workers a cache is stale.
+
+A writer replaces the stamp file once its change has committed; readers
+compare its stat() with the one seen when they filled their cache - one
+system call, no query - and reload when it differs.  Used by
+webapp.settings_cache and api.authentication.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Optional
+
+
+def read_stamp(path) -> Optional[tuple]:
+    """An opaque version of the stamp at *path*; None when there is none yet."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    # The file is replaced, not rewritten, so the inode changes even where
+    # mtime resolution is coarse.
+    return st.st_ino, st.st_mtime_ns
+
+
+def bump_stamp(path) -> None:
+    """Replace the stamp at *path*, changing its version for every reader."""
+    path = str(path)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}'
+    try:
+        with open(tmp, 'w') as fh:
+            fh.write(f'{os.getpid()}\n')
+        os.replace(tmp, path)
+    except OSError:
+        pass
@@ -29,6 +29,8 @@ urlpatterns = [
          runs.RunDetailView.as_view(), name='run-detail'),
     path('runs/<uuid:run_id>/status/',
          runs.run_status, name='run-status'),
+    path('runs/<uuid:run_id>/logs/',
+         runs.run_logs, name='run-logs'),
     path('runs/<uuid:run_id>/stream/',
          runs.run_stream, name='run-stream'),
     path('runs/stream/',
@@ -66,7 +66,11 @@ class ApiTokensView(ConfigEditorRequired, TemplateView):
 
         elif action == 'revoke':
             token_id = request.POST.get('token_id')
-            deleted, _ = APIToken.objects.filter(user=request.user, pk=token_id).delete()
+            from api.authentication import forget_credentials
+            tokens = APIToken.objects.filter(user=request.user, pk=token_id)
+            revoked = list(tokens.values_list('token_id', flat=True))
+            deleted, _ = tokens.delete()
+            forget_credentials(revoked)
             if deleted:
                 messages.success(request, 'Token revoked.')
             else:
@@ -4,10 +4,18 @@ from django.contrib import messages
 from django.shortcuts import redirect
 from django.views.generic import TemplateView
 
+from libs.config import MAX_RUN_SHARDS
 from webapp import translations as trans
 from webapp.perms import ConfigEditorRequired
 
 _LOG_LEVELS = [('DEBUG', 'DEBUG'), ('INFO', 'INFO'), ('WARNING', 'WARNING'), ('ERROR', 'ERROR')]
+# Compression for finished runs' logs (webapp.log_archive); 'off' keeps the rows.
+_ARCHIVE_CODECS = [('zlib', 'zlib'), ('lzma', 'LZMA')]
+# Integer settings whose values are clamped to (min, max) when saved; the
+# form's min/max attributes are only a hint to the browser.
+_INT_RANGES = {
+    'workflow.run_shards': (1, MAX_RUN_SHARDS),
+}
 
 # -- Sections shown on the root config page -------------------------------------
 CONFIG_SECTIONS = [
@@ -68,6 +76,7 @@ class ConfigSectionView(ConfigEditorRequired, TemplateView):
         ctx['section']    = self.section
         ctx['s']          = Setting.get_all()
         ctx['log_levels'] = _LOG_LEVELS
+        ctx['archive_codecs'] = _ARCHIVE_CODECS
         ctx['sections']   = CONFIG_SECTIONS
 
         if self.section == 'repository':
@@ -89,22 +98,28 @@ class ConfigSectionView(ConfigEditorRequired, TemplateView):
         section = kwargs.get('section', self.section)
         bool_keys, int_keys, text_keys = _section_keys(section)
 
+        values = {}
         for key in bool_keys:
-            Setting.set(key, 'true' if request.POST.get(key) else 'false')
+            values[key] = 'true' if request.POST.get(key) else 'false'
 
         for key in int_keys:
             try:
-                val = str(int(request.POST.get(key, '0')))
+                value = int(request.POST.get(key, '0'))
             except ValueError:
-                val = '0'
-            Setting.set(key, val)
+                value = 0
+            if key in _INT_RANGES:
+                low, high = _INT_RANGES[key]
+                value = min(max(value, low), high)
+            values[key] = str(value)
 
         for key in text_keys:
             val = request.POST.get(key, '')
             if val is not None:
                 if key in Setting.SENSITIVE_KEYS and not val:
                     continue
-                Setting.set(key, val)
+                values[key] = val
+
+        Setting.set_many(values)
 
         messages.success(request, 'Settings saved.')
         return redirect(f'config-{section}')
@@ -134,13 +149,19 @@ def _section_keys(section: str) -> tuple:
     """Return (bool_keys, int_keys, text_keys) for a config section."""
     if section == 'autopkg':
         return (
-            [],
+            ['autopkg.watch_recipes'],
             [],
             ['autopkg.bin_path', 'autopkg.cache_path', 'autopkg.recipe_list',
              'autopkg.overrides_dir', 'autopkg.recipe_repos_dir'],
         )
     elif section == 'workflow':
-        return (['workflow.update_repos'], [], [])
+        return (
+            ['workflow.update_repos', 'workflow.repo_freshness_check',
+             'workflow.native_trust'],
+            ['workflow.run_shards', 'workflow.trust_workers',
+             'workflow.repo_update_workers', 'workflow.repo_fresh_minutes'],
+            [],
+        )
     elif section == 'repository':
         return (
             [],
@@ -160,9 +181,11 @@ def _section_keys(section: str) -> tuple:
         )
     elif section == 'logging':
         return (
-            ['logging.to_file'],
-            [],
-            ['logging.level', 'logging.file_path'],
+            ['logging.to_file', 'retention.incremental_vacuum'],
+            ['logging.db_batch_rows', 'logging.db_batch_ms',
+             'retention.max_age_days', 'retention.max_runs', 'retention.failed_max_age_days',
+             'retention.log_max_age_days', 'retention.batch_rows', 'retention.batch_pause_ms'],
+            ['logging.level', 'logging.file_path', 'logging.archive_codec'],
         )
     elif section == 'ui':
         return ([], [], ['ui.language'])
@@ -20,11 +20,19 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         ctx['recent_runs'] = list(Run.objects.order_by('-started_at')[:5])
         ctx['last_run'] = ctx['recent_runs'][0] if ctx['recent_runs'] else None
 
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent = Run.objects.filter(started_at__gte=thirty_days_ago)
-        ctx['total_runs_30d'] = recent.count()
-        success = recent.filter(status='success').count()
-        ctx['success_rate_30d'] = round(success / ctx['total_runs_30d'] * 100) if ctx['total_runs_30d'] else 0
+        # Finished runs come from the daily rollup (webapp.run_stats); only
+        # the handful still in flight are counted from Run.
+        from webapp.run_stats import daily, day_dict, summarize
+        year = daily(365)
+        month_start = timezone.localdate() - timedelta(days=29)
+        month = summarize(row for row in year if row.day >= month_start)
+        in_flight = Run.objects.filter(
+            status__in=('pending', 'running'),
+            started_at__gte=timezone.now() - timedelta(days=30),
+        ).count()
+        ctx['total_runs_30d'] = month['runs'] + in_flight
+        ctx['success_rate_30d'] = month['success_rate']
+        ctx['run_trend'] = [day_dict(row) for row in year]
 
         try:
             from webapp.models import Schedule
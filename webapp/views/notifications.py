@@ -242,9 +242,10 @@ class NotificationSettingsView(ConfigEditorRequired, TemplateView):
 
     def post(self, request):
         from webapp.models import Setting
-        Setting.set('notify.pwa_base_url', request.POST.get('notify.pwa_base_url', '').strip())
-        expiry = request.POST.get('notify.share_link_expiry_days', '').strip()
-        Setting.set('notify.share_link_expiry_days', expiry)
+        Setting.set_many({
+            'notify.pwa_base_url': request.POST.get('notify.pwa_base_url', '').strip(),
+            'notify.share_link_expiry_days': request.POST.get('notify.share_link_expiry_days', '').strip(),
+        })
         messages.success(request, 'Settings saved.')
         return redirect('notification-settings')
 
@@ -7,6 +7,7 @@ Covers:
   - Override editor        (/recipes/overrides/<fname>/edit/)
 """
 import json
+import os
 import plistlib
 import re
 import subprocess
@@ -14,7 +15,6 @@ import threading
 import time
 from typing import Optional
 import defusedxml.ElementTree as ET
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 from django.contrib import messages
@@ -335,9 +335,14 @@ def _read_recipe_identifier(path: Path) -> str:
 
 
 _RECIPES_CACHE: dict = {'data': None, 'ts': 0.0}
-_RECIPES_CACHE_TTL = 300  # seconds - re-scan after 5 minutes
+_RECIPES_CACHE_TTL = 300  # seconds - re-check the files after 5 minutes
 _RECIPES_BUILD_LOCK = threading.Lock()
 _RECIPES_BUILDING = False
+# Set by start_recipe_watcher(); while it runs the cache is updated as files
+# change.  Only an inotify watcher sees files edited in place, so only then
+# does the cache never expire and the override map get cached too.
+_RECIPE_WATCHER = None
+_OVERRIDES_CACHE: dict = {'data': None}
 
 
 def _list_parent_recipes() -> list:
@@ -345,10 +350,72 @@ def _list_parent_recipes() -> list:
     return _RECIPES_CACHE['data'] or []
 
 
+def _watcher_sees_edits() -> bool:
+    """Whether the recipe watcher reports files edited in place (inotify only)."""
+    return _RECIPE_WATCHER is not None and _RECIPE_WATCHER.backend == 'inotify'
+
+
 def _is_cache_ready() -> bool:
-    now = time.monotonic()
-    return (_RECIPES_CACHE['data'] is not None
-            and (now - _RECIPES_CACHE['ts']) < _RECIPES_CACHE_TTL)
+    if _RECIPES_CACHE['data'] is None or not _RECIPES_CACHE['ts']:
+        return False
+    if _watcher_sees_edits():
+        return True
+    return (time.monotonic() - _RECIPES_CACHE['ts']) < _RECIPES_CACHE_TTL
+
+
+def _recipe_info_or_stem(path: Path) -> dict:
+    try:
+        return _read_recipe_info(path)
+    except Exception:
+        return {'identifier': _recipe_stem(path), 'parent': None}
+
+
+def _scan_recipe_files(changed: Optional[set] = None) -> list:
+    """Scan every recipe search directory and return one entry per identifier.
+
+    Each entry is a dict with 'stem', 'identifier', 'parent' and 'path' (the
+    file the identifier was read from).  The scan goes through the on-disk
+    index in webapp.recipe_files, so only new or changed files are read, but
+    it still stats every directory and file - request handlers should go
+    through _start_cache_build() instead.  *changed* (from the recipe
+    watcher) limits the stat calls to those paths.
+    """
+    from webapp import recipe_files
+
+    # Deduplicate by identifier, not by filename: two repos can both contain
+    # Firefox.munki.recipe yet have different Identifier values, and both
+    # should appear; two copies of the same recipe (same Identifier) produce
+    # a single entry - the first in search-directory order.
+    seen_identifiers: set = set()
+    results: list = []
+    for entry in recipe_files.refresh(_recipe_search_dirs(), _recipe_info_or_stem, changed):
+        ident = entry['identifier']
+        if ident not in seen_identifiers:
+            seen_identifiers.add(ident)
+            results.append({
+                'stem':       _recipe_stem(Path(entry['path'])),
+                'identifier': ident,
+                'parent':     entry['parent'],
+                'path':       entry['path'],
+            })
+
+    results.sort(key=lambda r: r['stem'].lower())
+    return results
+
+
+def recipe_file_index() -> list:
+    """Return the recipe file index, scanning synchronously if the cache is cold.
+
+    For callers outside the request cycle (e.g. the Trust Verification stage)
+    that need the index now rather than on a later poll.  A fresh scan is
+    stored in the shared cache so the Recipes tab benefits from it too.
+    """
+    if _is_cache_ready():
+        return _RECIPES_CACHE['data']
+    results = _scan_recipe_files()
+    _RECIPES_CACHE['data'] = results
+    _RECIPES_CACHE['ts'] = time.monotonic()
+    return results
 
 
 def _start_cache_build():
@@ -367,47 +434,7 @@ def _start_cache_build():
     def _build():
         global _RECIPES_BUILDING
         try:
-            # Phase 1 — collect every recipe file path across all search dirs.
-            # No deduplication here: two repos can both contain Firefox.munki.recipe
-            # yet have different Identifier values.  We resolve duplicates in
-            # Phase 2 by identifier, not by filename.
-            all_files: list = []
-            for search_dir in _recipe_search_dirs():
-                p = Path(search_dir)
-                if not p.is_dir():
-                    continue
-                for pattern in ('*.recipe', '*.recipe.yaml'):
-                    for recipe_file in p.rglob(pattern):
-                        all_files.append(recipe_file)
-
-            # Phase 2 — read Identifier + ParentRecipe from each file in parallel.
-            # Deduplicate by identifier so that two repos providing the same recipe
-            # (same Identifier value, same filename) produce a single entry while
-            # two repos providing different recipes with the same filename but
-            # different Identifier values both appear in the list.
-            seen_identifiers: set = set()
-            results: list = []
-            workers = min(16, max(1, len(all_files)))
-            with ThreadPoolExecutor(max_workers=workers) as pool:
-                future_map = {pool.submit(_read_recipe_info, f): f
-                              for f in all_files}
-                for fut in as_completed(future_map):
-                    f = future_map[fut]
-                    try:
-                        info = fut.result()
-                    except Exception:
-                        info = {'identifier': _recipe_stem(f), 'parent': None}
-                    ident = info['identifier']
-                    if ident not in seen_identifiers:
-                        seen_identifiers.add(ident)
-                        results.append({
-                            'stem':       _recipe_stem(f),
-                            'identifier': ident,
-                            'parent':     info['parent'],
-                        })
-
-            results.sort(key=lambda r: r['stem'].lower())
-            _RECIPES_CACHE['data'] = results
+            _RECIPES_CACHE['data'] = _scan_recipe_files()
             _RECIPES_CACHE['ts'] = time.monotonic()
         except Exception:
             pass
@@ -428,9 +455,86 @@ def _start_cache_build():
 def _invalidate_recipe_cache():
     """Bust the recipe list cache and trigger a background rebuild."""
     _RECIPES_CACHE['ts'] = 0.0
+    _OVERRIDES_CACHE['data'] = None
     _start_cache_build()
 
 
+def _watched_dirs() -> list:
+    """Every indexed recipe directory, plus the overrides directory."""
+    from webapp import recipe_files
+    dirs = recipe_files.indexed_dirs()
+    od = _overrides_dir()
+    if od.is_dir():
+        dirs.append(str(od))
+    return dirs
+
+
+def _on_recipe_files_changed(changed: Optional[set]) -> None:
+    """Recipe watcher callback: update the caches from the changed paths.
+
+    None means the watcher lost track (an event queue overflow), so every
+    directory is checked again.
+    """
+    od = str(_overrides_dir())
+    if changed is None or any(p == od or os.path.dirname(p) == od for p in changed):
+        _OVERRIDES_CACHE['data'] = None
+    if changed is not None:
+        changed = {p for p in changed if p != od and os.path.dirname(p) != od}
+        if not changed:
+            return
+    try:
+        _RECIPES_CACHE['data'] = _scan_recipe_files(changed)
+        _RECIPES_CACHE['ts'] = time.monotonic()
+    finally:
+        from django.db import close_old_connections
+        close_old_connections()
+
+
+def start_recipe_watcher() -> bool:
+    """Start watching the recipe directories if autopkg.watch_recipes is on.
+
+    Returns whether a watcher is running.  Called at startup by the one
+    worker that holds the scheduler lock; the others keep the cache TTL and
+    find the watcher's updates in the shared recipe file index.
+    """
+    global _RECIPE_WATCHER
+    from webapp.models import Setting
+    from webapp.recipe_watch import RecipeWatcher
+    if _RECIPE_WATCHER is not None:
+        return True
+    if not Setting.get_bool('autopkg.watch_recipes'):
+        return False
+    watcher = RecipeWatcher(_watched_dirs, _on_recipe_files_changed)
+    watcher.start()
+    _RECIPE_WATCHER = watcher
+    return True
+
+
+def _list_overrides() -> dict:
+    """fname stem -> {'stem', 'fname', 'identifier', 'parent'} for every override.
+
+    Read from the overrides directory on every call unless an inotify recipe
+    watcher is running, in which case it is kept until that directory changes.
+    A polling watcher would miss overrides rewritten in place (e.g. by
+    ``autopkg update-trust-info``).
+    """
+    if _watcher_sees_edits() and _OVERRIDES_CACHE['data'] is not None:
+        return _OVERRIDES_CACHE['data']
+    override_map: dict = {}
+    od = _overrides_dir()
+    if od.exists():
+        for f in od.glob('*.recipe'):
+            info = _read_recipe_info(f)
+            override_map[f.stem] = {
+                'stem':       f.stem,
+                'fname':      f.name,
+                'identifier': info['identifier'],
+                'parent':     info['parent'],
+            }
+    _OVERRIDES_CACHE['data'] = override_map
+    return override_map
+
+
 def _build_recipe_entries(run_list_set: set) -> tuple:
     """Return (entries, load_error, orphaned).
 
@@ -450,18 +554,7 @@ def _build_recipe_entries(run_list_set: set) -> tuple:
     ship a file named e.g. Firefox.munki.recipe but with different Identifier
     values are handled correctly.
     """
-    # Collect overrides: fname_stem → {'stem', 'fname', 'identifier', 'parent'}
-    override_map: dict = {}
-    od = _overrides_dir()
-    if od.exists():
-        for f in od.glob('*.recipe'):
-            info = _read_recipe_info(f)
-            override_map[f.stem] = {
-                'stem':       f.stem,
-                'fname':      f.name,
-                'identifier': info['identifier'],
-                'parent':     info['parent'],
-            }
+    override_map = _list_overrides()
 
     load_error = False
     parent_recipes = _list_parent_recipes()
@@ -726,5 +819,6 @@ class OverrideEditView(ConfigEditorRequired, View):
                                               error=f'XML parse error: {exc}'))
         path.parent.mkdir(parents=True, exist_ok=True)
         path.write_text(content)
+        _OVERRIDES_CACHE['data'] = None
         messages.success(request, f'{fname} saved.')
         return redirect('recipes-override-edit', fname=fname)
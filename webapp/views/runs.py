@@ -86,6 +86,14 @@ from webapp.perms import (
 )
 
 
+# Log lines rendered per stage on first load of the run page, and the
+# largest page run_logs serves.
+_LOG_TAIL_LINES = 200
+_LOG_PAGE_MAX = 1000
+# logs_by_stage / run_logs key for lines logged outside any stage.
+_GENERAL_LOGS = '__general__'
+
+
 class RunListView(LoginRequiredMixin, TemplateView):
     template_name = 'webapp/runs/list.html'
 
@@ -115,21 +123,28 @@ class RunDetailView(RunAccessRequired, TemplateView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        from collections import defaultdict
+        from webapp.log_archive import RunLogReader
         from webapp.models import Run
         run = get_object_or_404(Run, id=self.kwargs['run_id'])
         ctx['active_tab'] = 'runs'
         ctx['run'] = run
         ctx['stages'] = run.stage_executions.order_by('order')
 
-        logs_by_stage: dict[str, list] = defaultdict(list)
-        last_log_id = 0
-        for entry in run.log_entries.order_by('timestamp'):
-            logs_by_stage[entry.stage_name or '__general__'].append(entry)
-            if entry.id > last_log_id:
-                last_log_id = entry.id
-        ctx['logs_by_stage'] = dict(logs_by_stage)
-        ctx['last_log_id'] = last_log_id
+        # Only the newest lines of each stage are rendered; run_logs pages
+        # in older ones when the viewer scrolls up.
+        reader = RunLogReader(run.id)
+        logs_by_stage, log_cursors, log_counts = {}, {}, {}
+        for stage_name, count in reader.stage_counts().items():
+            key = stage_name or _GENERAL_LOGS
+            entries, more = reader.page(stage=stage_name, limit=_LOG_TAIL_LINES)
+            logs_by_stage[key] = entries
+            log_counts[key] = count
+            if more and entries:
+                log_cursors[key] = entries[0].id
+        ctx['logs_by_stage'] = logs_by_stage
+        ctx['log_cursors'] = log_cursors
+        ctx['log_counts'] = log_counts
+        ctx['last_log_id'] = reader.last_id()
 
         ctx['results'] = run.recipe_results.all()
 
@@ -262,15 +277,72 @@ def run_status(request, run_id):
     return JsonResponse({'status': run.status, 'stages': stages})
 
 
+@login_required
+def run_logs(request, run_id):
+    """JSON page of a run's log lines, for loading older lines on demand.
+
+    Query parameters (all optional):
+      stage   stage name; ``__general__`` for lines logged outside a stage
+      before  return the newest lines with a smaller id (scrolling up)
+      after   return the oldest lines with a larger id (scrolling down)
+      level   comma-separated levels to include, e.g. ``WARNING,ERROR``
+      limit   lines per page (default 200, at most 1000)
+
+    The response's ``next`` holds the cursor for the following page when
+    ``has_more`` is true.
+    """
+    from webapp.log_archive import RunLogReader
+    from webapp.models import Run
+    from webapp.perms import user_has_perm, PERM_VIEW_RUNS, PERM_TRIGGER_RUNS
+    if not (user_has_perm(request.user, PERM_VIEW_RUNS) or
+            user_has_perm(request.user, PERM_TRIGGER_RUNS)):
+        return JsonResponse({}, status=403)
+    if not Run.objects.filter(id=run_id).exists():
+        return JsonResponse({}, status=404)
+
+    params = request.GET
+    try:
+        before = int(params['before']) if params.get('before') else None
+        after = int(params['after']) if params.get('after') else None
+        limit = min(max(int(params.get('limit') or _LOG_TAIL_LINES), 1), _LOG_PAGE_MAX)
+    except ValueError:
+        return JsonResponse({'error': 'before, after and limit must be integers'}, status=400)
+    stage = params.get('stage')
+    if stage == _GENERAL_LOGS:
+        stage = ''
+    levels = [lvl.strip() for lvl in params.get('level', '').split(',') if lvl.strip()]
+
+    entries, more = RunLogReader(run_id).page(
+        stage=stage, before=before, after=after, levels=levels, limit=limit,
+    )
+    next_cursor = {}
+    if more and entries:
+        next_cursor = {'after': entries[-1].id} if after is not None else {'before': entries[0].id}
+    return JsonResponse({
+        'entries': [
+            {
+                'id': e.id,
+                'timestamp': e.timestamp.isoformat(),
+                'level': e.level,
+                'stage': e.stage_name,
+                'message': e.message,
+            }
+            for e in entries
+        ],
+        'has_more': more,
+        'next': next_cursor,
+    })
+
+
 async def run_stream(request, run_id):
     """SSE endpoint — async, fan-out via RunBroadcaster.
 
     Uses an async generator so each viewer is a cheap coroutine rather than
     a blocked thread.  All DB work is done by the broadcaster's single daemon
-    thread, so the database is polled once per second per run regardless of
-    how many clients are connected.
+    thread, so the database is polled at most once per second per run
+    regardless of how many clients are connected; new frames wake the
+    generator immediately rather than on a fixed sleep.
     """
-    import asyncio
     from asgiref.sync import sync_to_async
     from webapp.run_broadcaster import broadcaster_manager
     from webapp.perms import user_has_perm, PERM_VIEW_RUNS, PERM_TRIGGER_RUNS
@@ -315,7 +387,7 @@ async def run_stream(request, run_id):
                 cursor += 1
             if done and not frames:
                 break
-            await asyncio.sleep(0.5)
+            await broadcaster.wait_for_events(cursor, timeout=15)
 
     response = _AsyncStreamingHttpResponse(event_stream(), content_type='text/event-stream')
     response['Cache-Control'] = 'no-cache'
@@ -5,6 +5,7 @@ from django.contrib.auth import get_user_model
 from django.shortcuts import redirect, get_object_or_404
 from django.views.generic import TemplateView
 
+from api.authentication import forget_credentials
 from webapp.perms import UserManagerRequired
 
 User = get_user_model()
@@ -104,6 +105,8 @@ class UsersView(UserManagerRequired, TemplateView):
                 user.email        = email
                 user.save(update_fields=['is_active', 'is_superuser', 'is_staff', 'email'])
                 _save_permissions(user, request)
+                # API requests hold the user, with its permissions, for a while.
+                forget_credentials()
                 messages.success(request, f'User "{user.username}" updated.')
 
         elif action == 'reset_password':
@@ -146,6 +149,7 @@ class UsersView(UserManagerRequired, TemplateView):
 
             username = user.username
             user.delete()
+            forget_credentials()
             messages.success(request, f'User "{username}" deleted.')
 
         return redirect('users')
@@ -191,6 +195,7 @@ class UserEditView(UserManagerRequired, TemplateView):
                 edit_user.email        = email
                 edit_user.save(update_fields=['is_active', 'is_superuser', 'is_staff', 'email'])
                 _save_permissions(edit_user, request)
+                forget_credentials()
                 messages.success(request, f'User "{edit_user.username}" updated.')
             return redirect('user-edit', pk=pk)
 
@@ -218,6 +223,7 @@ class UserEditView(UserManagerRequired, TemplateView):
                     return redirect('user-edit', pk=pk)
             username = edit_user.username
             edit_user.delete()
+            forget_credentials()
             messages.success(request, f'User "{username}" deleted.')
             return redirect('users')
 